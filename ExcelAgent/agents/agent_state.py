@@ -1,3 +1,6 @@
+import copy
+
+
 class AgentState:
     def __init__(self):
         self.thought_history = []
@@ -9,6 +12,8 @@ class AgentState:
         self.insight = ""
         self.temp_file = "temp"
         self.error_flag = False
+        # Outcome of the last reflection (True: answer A or unrecognized, False: B/C, None: not run)
+        self.reflection_accepted = None
 
         # Runtime configuration (moved here to avoid circular imports)
         self.vl_model_version = "gemini-2.0-flash-exp"
@@ -22,8 +27,27 @@ class AgentState:
         self.icon_caption = False
         self.location_info = False
 
+        # Token budget for the statistical sheet summary in prompts (None: first 100 rows)
+        self.summary_token_budget = None
+
+        # Actions the action agent may plan per turn, executed as one step ("a ; b ; c")
+        self.max_actions = 1
+
         self._prepare_temp_dir()
 
+    def fork(self):
+        """
+        Copy the state for speculative work; histories are copied, the temp dir is left alone.
+
+        Returns:
+            AgentState sharing configuration with this one
+        """
+        forked = copy.copy(self)
+        forked.thought_history = list(self.thought_history)
+        forked.summary_history = list(self.summary_history)
+        forked.action_history = list(self.action_history)
+        return forked
+
     def _prepare_temp_dir(self):
         import os, shutil
         if os.path.exists(self.temp_file):
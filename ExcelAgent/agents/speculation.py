@@ -0,0 +1,90 @@
+"""
+Speculation - Bookkeeping for speculative next-action generation
+While the reflection agent judges the last action, the next action can already be
+requested on the assumption that the reflection answers A. The speculative state and
+the hit-rate / time-saved counters live here; run.py decides when to speculate.
+"""
+
+import time
+
+from .agent_state import AgentState
+
+
+def assume_accepted(agent_state: AgentState, thought: str, summary: str, action: str) -> AgentState:
+    """
+    Fork the state the next action prompt would see after an 'A' reflection.
+
+    The new reflection thought and progress from planning are not known yet, so the
+    speculative prompt carries no reflection thought and the previous progress.
+
+    Args:
+        agent_state: Current state (not modified)
+        thought, summary, action: The step that was just executed
+
+    Returns:
+        Forked AgentState
+    """
+    assumed = agent_state.fork()
+    assumed.thought_history.append(thought)
+    assumed.summary_history.append(summary)
+    assumed.action_history.append(action)
+    assumed.error_flag = False
+    assumed.reflection_thought = ""
+    return assumed
+
+
+async def timed(coro):
+    """
+    Await coro and report its timing.
+
+    Returns:
+        (result, duration in seconds, perf_counter at completion)
+    """
+    start = time.perf_counter()
+    result = await coro
+    end = time.perf_counter()
+    return result, end - start, end
+
+
+class SpeculationStats:
+    """Hit rate and time saved by speculative next actions."""
+
+    def __init__(self):
+        self.attempts = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.time_saved = 0.0
+
+    def record_hit(self, duration: float, waited: float):
+        """
+        Record a used speculative action.
+
+        Args:
+            duration: How long the speculative call took
+            waited: How long the step still waited for it after the other calls finished
+        """
+        self.attempts += 1
+        self.hits += 1
+        # The overlapped part of the call is what left the critical path
+        self.time_saved += max(duration - waited, 0.0)
+
+    def record_miss(self):
+        """Record a speculative action discarded because the reflection answered B or C."""
+        self.attempts += 1
+        self.misses += 1
+
+    def record_error(self):
+        """Record a speculative call that failed (the next action is requested normally)."""
+        self.attempts += 1
+        self.errors += 1
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.attempts if self.attempts else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"Speculation: {self.hits}/{self.attempts} hits ({self.hit_rate:.0%}), "
+            f"{self.misses} discarded, {self.errors} failed, ~{self.time_saved:.2f}s saved"
+        )
@@ -0,0 +1,163 @@
+"""
+Subtask Scheduler - Which of the manager's subtasks can run at the same time
+A subtask's footprint is the set of columns, per sheet, that it reads or changes: its
+"[columns: ...]" annotation from the manager prompt, else the cell references, column
+letters, header names and sheet names in its text. Subtasks are grouped so that no two
+subtasks in a group have overlapping footprints, and a subtask runs in a later group
+than every earlier subtask it overlaps. A subtask without a recognizable footprint, or
+one that acts on whole rows, overlaps everything, so it runs alone and in order.
+"""
+
+import re
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from openpyxl.utils import column_index_from_string
+
+# Sheet title -> 0-based column indices the subtask touches (None: the whole sheet)
+Footprint = Dict[str, Optional[FrozenSet[int]]]
+
+# "... [columns: A, Score]" at the end of a subtask, as the manager prompt asks for
+_ANNOTATION = re.compile(r"\s*\[\s*columns?\s*:\s*([^\]]*)\]\s*$", re.IGNORECASE)
+_NUMBERING = re.compile(r"^\s*\d+\s*[.)]\s*")
+# "B2", "C2:D10"; upper-case letters only, so ordinary words do not match
+_CELL_RANGE = re.compile(r"\b([A-Z]{1,3})\d+(?::([A-Z]{1,3})\d+)?\b")
+# "column C", "columns B to D", "columns A, C and E"
+_COLUMN_LETTERS = re.compile(r"(?i:\bcolumns?)\s+([A-Z]{1,3}\b(?:\s*(?:,|-|:|(?i:and|to|through))\s*[A-Z]{1,3}\b)*)")
+_COLUMN_SEPARATOR = re.compile(r"\s*(,|-|:|(?i:\band\b|\bto\b|\bthrough\b))\s*")
+# Operations on whole rows or the whole sheet touch every column
+_WHOLE_ROWS = re.compile(
+    r"\b(?:rows?|sort\w*|filter\w*|insert\w*|entire sheet|whole sheet|all columns|every column|each column)\b",
+    re.IGNORECASE,
+)
+
+
+def split_annotation(subtask: str) -> Tuple[str, Optional[str]]:
+    """
+    Separate a subtask's "[columns: ...]" annotation from its instruction.
+
+    Returns:
+        (instruction without numbering or annotation, the annotation's column list or None)
+    """
+    subtask = _NUMBERING.sub("", subtask).strip()
+    match = _ANNOTATION.search(subtask)
+    if match is None:
+        return subtask, None
+    return subtask[:match.start()].strip(), match.group(1).strip()
+
+
+def _column_letters(text: str) -> List[int]:
+    """Column indices of a "B to D, F" style list of column letters."""
+    indices = []
+    parts = _COLUMN_SEPARATOR.split(text.strip())
+    for position in range(0, len(parts), 2):
+        index = column_index_from_string(parts[position]) - 1
+        separator = parts[position - 1].lower() if position else ","
+        if separator in ("-", ":", "to", "through") and indices:
+            indices.extend(range(indices[-1] + 1, index + 1))
+        else:
+            indices.append(index)
+    return indices
+
+
+def _header_pattern(name: str) -> re.Pattern:
+    return re.compile(r"\b" + re.escape(name) + r"(?:s|es)?\b", re.IGNORECASE)
+
+
+def subtask_footprint(subtask: str, columns: Sequence, sheet_names: Sequence[str]) -> Optional[Footprint]:
+    """
+    The columns a subtask touches.
+
+    Header names are matched against the first sheet, which the agent edits; a subtask
+    naming another sheet touches that sheet as a whole.
+
+    Args:
+        subtask: Subtask as the manager wrote it, with or without its annotation
+        columns: Header names of the first sheet, in column order
+        sheet_names: Titles of the workbook's sheets, the first sheet first
+
+    Returns:
+        The footprint, or None if it is unknown or spans whole rows
+    """
+    text, annotation = split_annotation(subtask)
+    headers = [(index, _header_pattern(str(name))) for index, name in enumerate(columns)
+               if isinstance(name, str) and name.strip() and not name.strip().isdigit()]
+    found = set()
+
+    if annotation is not None:
+        for item in (item.strip() for item in annotation.split(",")):
+            if not item:
+                continue
+            if re.fullmatch(r"[A-Z]{1,3}(?:\s*(?:-|:|to)\s*[A-Z]{1,3})?", item):
+                found.update(_column_letters(item))
+                continue
+            index = next((index for index, pattern in headers if pattern.fullmatch(item)), None)
+            if index is None:
+                # "all", or a column the sheet does not have
+                return None
+            found.add(index)
+    else:
+        if _WHOLE_ROWS.search(text):
+            return None
+        for first, last in _CELL_RANGE.findall(text):
+            start = column_index_from_string(first) - 1
+            end = column_index_from_string(last) - 1 if last else start
+            found.update(range(min(start, end), max(start, end) + 1))
+        for match in _COLUMN_LETTERS.finditer(text):
+            found.update(_column_letters(match.group(1)))
+        found.update(index for index, pattern in headers if pattern.search(text))
+
+    footprint = {}
+    for sheet in sheet_names[1:]:
+        if re.search(r"\b" + re.escape(sheet) + r"\b", text, re.IGNORECASE):
+            footprint[sheet] = None
+    if found:
+        footprint[sheet_names[0]] = frozenset(found)
+    return footprint or None
+
+
+def _overlaps(first: Optional[Footprint], second: Optional[Footprint]) -> bool:
+    if first is None or second is None:
+        return True
+    for sheet, columns in first.items():
+        if sheet in second:
+            other = second[sheet]
+            if columns is None or other is None or columns & other:
+                return True
+    return False
+
+
+def schedule_subtasks(footprints: Sequence[Optional[Footprint]]) -> List[List[int]]:
+    """
+    Group subtasks for concurrent execution.
+
+    Args:
+        footprints: subtask_footprint() of each subtask, in the manager's order
+
+    Returns:
+        Groups of subtask indices, to be run one group after another
+    """
+    levels = []
+    for position, footprint in enumerate(footprints):
+        level = 0
+        for earlier in range(position):
+            if _overlaps(footprints[earlier], footprint):
+                level = max(level, levels[earlier] + 1)
+        levels.append(level)
+    groups = [[] for _ in range(max(levels, default=-1) + 1)]
+    for position, level in enumerate(levels):
+        groups[level].append(position)
+    return groups
+
+
+def plan_subtasks(subtasks: Sequence[str], columns: Sequence,
+                  sheet_names: Sequence[str]) -> Tuple[List[str], List[List[str]]]:
+    """
+    Strip the manager's annotations and group the subtasks.
+
+    Returns:
+        (subtask instructions in order, groups of instructions that can run concurrently)
+    """
+    instructions = [split_annotation(subtask)[0] for subtask in subtasks]
+    footprints = [subtask_footprint(subtask, columns, sheet_names) for subtask in subtasks]
+    groups = schedule_subtasks(footprints)
+    return instructions, [[instructions[position] for position in group] for group in groups]
@@ -0,0 +1,392 @@
+"""
+Action Parser - One parser for both action syntaxes, compiled once
+Turns the add-on grammar (action_bnf.txt, "REGEX ^9[0-9]$ | SELECT C1:C-1", "READ A1:B5")
+and the CLI agent's calls ("Select(2, 0, 2, 99) IF cell value > 90", "Set("x")", "Copy()")
+into the action_schemas models. An entry is scanned once by a pattern compiled at import
+that finds the optional REGEX prefix together with the action keyword; the keyword's
+argument patterns, also precompiled, then read what follows it.
+
+The CLI's entries may surround the call with prose, so its keywords are searched for;
+a keyword only counts with its arguments in parentheses ("Set(0)", not "set the column
+to zero"), and Terminate and Tell User only when capitalized.
+The add-on's grammar is parsed strictly (strict=True): an entry must be
+"REGEX <pattern> | <KEYWORD> ..." or start with READ, so explanations the model writes
+between actions are errors rather than actions.
+
+Cell references in the models are sheet coordinates: row 1 is the header and row -1 the
+last row. The CLI's 0-based DataFrame indices are converted on the way in (DataFrame row
+0 is sheet row 2).
+"""
+
+import re
+from typing import List, Optional
+
+from openpyxl.utils import get_column_letter
+
+from .action_schemas import *
+from .exceptions import ActionStrParseError
+
+
+class InterfaceAction(Action):
+    """
+    A CLI step naming part of Excel's interface ("Format Cells", "Right Click") rather than
+    a change to the sheet. Only produced for the CLI syntax; the add-on never receives one.
+    """
+    type: str = "Interface"
+    name: str
+
+    def _format_params(self):
+        return self.name
+
+
+# Action keywords of both syntaxes, longest alternative first; the group name is the kind
+_KEYWORDS = (
+    ("selectanddrag", r"Select\s*and\s*Drag"),
+    ("select", r"Select"),
+    ("set", r"Set"),
+    ("interface", r"Format\s+Cells|Apply\s+Formatting|Background\s+Color"),
+    ("format", r"Format"),
+    ("read", r"Read"),
+    ("toolaction", r"Tool\s*Action"),
+    ("interface_menu", r"Copy/Paste/Delete/\.\.\.|Right\s*Click|Context\s+Menu"),
+    ("tool", r"Copy|Paste|Delete|Cut|Bold|Italic|Underline"),
+    ("telluser", r"Tell\s*User"),
+    ("terminate", r"Terminate"),
+)
+
+# "[REGEX <pattern> |] <keyword>"; the prefix only counts at the start of the entry
+_ENTRY = re.compile(
+    r"(?:^\s*REGEX\s+(?P<reg>[^|]*?)\s*\|\s*)?"
+    r"\b(?:" + "|".join(f"(?P<{kind}>{pattern})" for kind, pattern in _KEYWORDS) + r")(?![A-Za-z])",
+    re.IGNORECASE | re.ASCII,
+)
+
+# The add-on grammar: "READ ..." or "REGEX <pattern> | <KEYWORD> ...", keywords in upper case
+_GRAMMAR_KEYWORDS = (
+    ("selectanddrag", "SELECTANDDRAG"),
+    ("select", "SELECT"),
+    ("format", "FORMAT"),
+    ("set", "SET"),
+    ("toolaction", "TOOLACTION"),
+    ("telluser", "TELLUSER"),
+    ("terminate", "TERMINATE"),
+)
+_GRAMMAR_ENTRY = re.compile(
+    r"(?:(?P<read>(?i:READ))\b|REGEX\s+(?P<reg>[^|]+?)\s*\|\s*(?:"
+    + "|".join(f"(?P<{kind}>{keyword})" for kind, keyword in _GRAMMAR_KEYWORDS) + r")(?![A-Za-z]))",
+    re.ASCII,
+)
+
+# Arguments, matched right after the keyword
+# A range: the CLI's 0-based "(col, row[, col, row])" or cell references "A1[:B5]"
+_RANGE = re.compile(
+    r"\s*(?:\(\s*(\d+)\s*,\s*(\d+)\s*(?:,\s*(\d+)\s*,\s*(\d+)\s*)?\)"
+    r"|\(?\s*([A-Z]+)(-?\d+)(?:\s*:\s*([A-Z]+)(-?\d+))?\s*\)?)",
+    re.IGNORECASE,
+)
+_QUOTED = re.compile(r"""\s*\(\s*(["'])(.*?)\1\s*\)""", re.DOTALL)
+_PARENS = re.compile(r"\s*\(\s*(.*?)\s*\)", re.DOTALL)
+_EMPTY_PARENS = re.compile(r"\s*\(\s*\)")
+_REST = re.compile(r"\s*:?\s*(.*?)\s*$", re.DOTALL)
+# "<action> IF <condition>" after a call's closing parenthesis or cell reference
+_CONDITION = re.compile(r"\s+IF\s+(.+?)\s*$", re.DOTALL)
+
+# CLI Format(...) parameters
+_STYLE_WORDS = re.compile(r"bold|italic|underline", re.IGNORECASE)
+_COLOR_PARAM = re.compile(r'color\s*[=:]\s*["\']?([#\w]+)["\']?', re.IGNORECASE)
+
+# Entries of an action string: ";" and newlines split them, except inside a quoted string
+# or a parenthesized argument list closed on the same line
+_ENTRIES = re.compile(r'(?:"[^"\n]*"|\([^()\n]*\)|[^;\n])+')
+
+cell_ref_pattern = re.compile(r"([A-Z]+)(-?\d+)")
+
+
+def parse_cell_range(cell_range: str):
+    """
+    Split "C1:D5" into ("C", "1", "D", "5"). A single reference "C1" runs to the last row,
+    ("C", "1", "C", "-1"), as the add-on reads it.
+    """
+    parts = cell_range.split(":")
+    if len(parts) == 1:
+        col1, row1 = cell_ref_pattern.match(parts[0].strip()).groups()
+        return col1, row1, col1, "-1"
+    elif len(parts) == 2:
+        col1, row1 = cell_ref_pattern.match(parts[0].strip()).groups()
+        col2, row2 = cell_ref_pattern.match(parts[1].strip()).groups()
+        return col1, row1, col2, row2
+    return None
+
+
+def parse_format_params(param_str: str):
+    params = {
+        "style": None,
+        "color": None,
+        "size": None,
+        "alignment": None,
+        "wrap": None,
+        "value_format": None,
+        "border": {}
+    }
+
+    parts = [p.strip() for p in re.split(r",(?![^{]*\})", param_str)]  # split by comma not in {}
+
+    for part in parts:
+        if part.startswith("style: "):
+            params["style"] = part[len("style: "):]
+        elif part.startswith("color: "):
+            params["color"] = part[len("color: "):]
+        elif part.startswith("size: "):
+            params["size"] = int(part[len("size: "):])
+        elif part.startswith("alignment: "):
+            params["alignment"] = part[len("alignment: "):]
+        elif part.startswith("wrap: "):
+            wrap_value = part[len("wrap: "):]
+            params["wrap"] = wrap_value == "True"
+        elif part.startswith("value_format: "):
+            params["value_format"] = part[len("value_format: "):]
+        elif part.startswith("border: {") and part.endswith("}"):
+            border_str = part[len("border: {"): -1]
+            border_parts = [bp.strip() for bp in border_str.split(",")]
+            for bp in border_parts:
+                side, val = bp.split(":")
+                params["border"][side.strip()] = val.strip() == "True"
+
+    return params
+
+
+def _condition(text: str, pos: int) -> Optional[str]:
+    match = _CONDITION.match(text, pos)
+    return match.group(1) if match else None
+
+
+def _range(keyword: str, text: str, pos: int, single: bool = True):
+    """
+    (col1, row1, col2, row2, end) of a range argument in either syntax, or None.
+
+    Args:
+        keyword: The action keyword as written; the grammar's are upper case
+        text: The entry
+        pos: Where the argument starts
+        single: Whether one cell or index pair is accepted
+    """
+    match = _RANGE.match(text, pos)
+    if match is None:
+        return None
+    col1, row1, col2, row2, ref1, ref_row1, ref2, ref_row2 = match.groups()
+    if col1 is not None:
+        if col2 is None:
+            if not single:
+                return None
+            col2, row2 = col1, row1
+        return (get_column_letter(int(col1) + 1), str(int(row1) + 2),
+                get_column_letter(int(col2) + 1), str(int(row2) + 2), match.end())
+    if ref2 is None:
+        if not single:
+            return None
+        # In the grammar a lone reference runs down the column; a CLI "Select B3" is one cell
+        ref2, ref_row2 = (ref1, "-1") if keyword.isupper() else (ref1, ref_row1)
+    return ref1.upper(), ref_row1, ref2.upper(), ref_row2, match.end()
+
+
+def _text(keyword: str, text: str, pos: int, call_only: bool = False):
+    """
+    (text, end) of a free-text argument: "Set("x")", "Set(x)" or the grammar's "SET x".
+
+    With call_only, a CLI keyword without parentheses ("This will set the column to zero.")
+    gives None instead of the rest of the line.
+    """
+    if not keyword.isupper():
+        match = _QUOTED.match(text, pos) or _PARENS.match(text, pos)
+        if match:
+            return match.group(match.lastindex), match.end()
+        if call_only:
+            return None
+    match = _REST.match(text, pos)
+    return match.group(1), match.end()
+
+
+def _format(keyword: str, text: str, pos: int):
+    """
+    (Format fields, end): the grammar's "style: bold, color: #FF0000" or the CLI's
+    "(bold, color=#FF0000)"; None for a CLI keyword without parentheses.
+    """
+    if keyword.isupper():
+        match = _REST.match(text, pos)
+        return parse_format_params(match.group(1)), match.end()
+    match = _PARENS.match(text, pos)
+    if not match:
+        return None
+    params = match.group(1)
+    styles = [word.lower() for word in _STYLE_WORDS.findall(params)]
+    color = _COLOR_PARAM.search(params)
+    return {"style": " ".join(dict.fromkeys(styles)) or None, "color": color.group(1) if color else None}, match.end()
+
+
+# Builders: (keyword, text, end of keyword, REGEX pattern) -> action, or None if the arguments do not parse
+
+def _build_select(keyword, text, pos, reg):
+    cells = _range(keyword, text, pos)
+    if cells is None:
+        return None
+    col1, row1, col2, row2, end = cells
+    return Select(reg=reg or _condition(text, end), col1=col1, row1=row1, col2=col2, row2=row2)
+
+
+def _build_select_and_drag(keyword, text, pos, reg):
+    cells = _range(keyword, text, pos, single=False)
+    if cells is None:
+        return None
+    col1, row1, col2, row2, end = cells
+    return SelectAndDrag(reg=reg or _condition(text, end), col1=col1, row1=row1, col2=col2, row2=row2)
+
+
+def _build_read(keyword, text, pos, reg):
+    cells = _range(keyword, text, pos)
+    if cells is None:
+        return None
+    col1, row1, col2, row2, _ = cells
+    return Read(col1=col1, row1=row1, col2=col2, row2=row2)
+
+
+# Set, Format and Tool Action need their parentheses in the CLI syntax; the bare words are
+# too common in prose to count, as for the tools below
+
+def _build_set(keyword, text, pos, reg):
+    argument = _text(keyword, text, pos, call_only=True)
+    if argument is None:
+        return None
+    value, end = argument
+    return Set(reg=reg or _condition(text, end), text=value)
+
+
+def _build_format(keyword, text, pos, reg):
+    argument = _format(keyword, text, pos)
+    if argument is None:
+        return None
+    fields, end = argument
+    return Format(reg=reg or _condition(text, end), **fields)
+
+
+def _build_tool_action(keyword, text, pos, reg):
+    argument = _text(keyword, text, pos, call_only=True)
+    if argument is None:
+        return None
+    tool, end = argument
+    return ToolAction(reg=reg or _condition(text, end), tool=tool.strip("\"'"))
+
+
+def _build_tool(keyword, text, pos, reg):
+    # Copy(), Bold(), ...; the bare word is too common in prose to count
+    match = _EMPTY_PARENS.match(text, pos)
+    if match is None:
+        return None
+    return ToolAction(reg=reg or _condition(text, match.end()), tool=keyword.lower())
+
+
+def _build_tell_user(keyword, text, pos, reg):
+    # As for Terminate, a lower-case "tell user" is prose
+    if keyword.islower():
+        return None
+    message, _ = _text(keyword, text, pos)
+    return TellUser(reg=reg, message=message)
+
+
+def _build_terminate(keyword, text, pos, reg):
+    # "... and terminate." ends a sentence; the action is written "Terminate" or "TERMINATE"
+    if keyword.islower():
+        return None
+    return Terminate(reg=reg)
+
+
+_BUILDERS = {
+    "selectanddrag": _build_select_and_drag,
+    "select": _build_select,
+    "set": _build_set,
+    "interface": lambda keyword, text, pos, reg: InterfaceAction(name="format"),
+    "format": _build_format,
+    "read": _build_read,
+    "toolaction": _build_tool_action,
+    "interface_menu": lambda keyword, text, pos, reg: InterfaceAction(name="menu"),
+    "tool": _build_tool,
+    "telluser": _build_tell_user,
+    "terminate": _build_terminate,
+}
+
+
+def _parse_grammar(entry: str, text: str) -> Action:
+    """parse_action(strict=True): the entry must start with READ or "REGEX <pattern> | <KEYWORD>"."""
+    match = _GRAMMAR_ENTRY.match(text)
+    if match is None:
+        raise ActionStrParseError(f"Invalid action entry: {entry}")
+    kind = match.lastgroup
+    # The grammar's READ is case-insensitive; its lone cell reference still runs down the column
+    keyword = match.group(kind).upper()
+    try:
+        action = _BUILDERS[kind](keyword, text, match.end(), match.group("reg"))
+    except (ValueError, AttributeError) as e:
+        raise ActionStrParseError(f"Invalid action entry: {entry} ({e})")
+    if action is None:
+        raise ActionStrParseError(f"Invalid action entry: {entry}")
+    return action
+
+
+def parse_action(entry: str, strict: bool = False) -> Action:
+    """
+    Parse one action in either syntax.
+
+    The first action keyword whose arguments parse wins, so text around the call
+    ("Action: Select(0, 0, 4, 0)") is ignored; interface steps ("Format Cells") only
+    when the entry names no other action.
+
+    Args:
+        entry: One action, e.g. "REGEX ^9 | SELECT C1:C-1" or "Select(2, 0, 2, 99) IF cell value > 90"
+        strict: Only accept the add-on grammar, with the entry starting at READ or REGEX
+
+    Returns:
+        The action model; the REGEX pattern or IF condition is in its reg field
+
+    Raises:
+        ActionStrParseError: If no action can be read from the entry
+    """
+    text = entry.strip()
+    if not text:
+        raise ActionStrParseError("Empty action entry provided.")
+    if strict:
+        return _parse_grammar(entry, text)
+    interface = None
+    match = _ENTRY.search(text)
+    while match is not None:
+        kind = match.lastgroup
+        try:
+            action = _BUILDERS[kind](match.group(kind), text, match.end(), match.group("reg"))
+        except (ValueError, AttributeError) as e:
+            raise ActionStrParseError(f"Invalid action entry: {entry} ({e})")
+        if type(action) is InterfaceAction:
+            # "Copy/Paste/Delete/...: Copy()" names the menu, then the action
+            interface = interface or action
+        elif action is not None:
+            return action
+        match = _ENTRY.search(text, match.end())
+    if interface is not None:
+        return interface
+    raise ActionStrParseError(f"Invalid action entry: {entry}")
+
+
+def split_actions(action_string: str) -> List[str]:
+    """Split an action string into its entries on ";" and newlines."""
+    return [entry.strip() for entry in _ENTRIES.findall(action_string) if entry.strip()]
+
+
+def parse_actions(action_string: str, strict: bool = False) -> List[Action]:
+    """
+    Parse every action of a ";"- or newline-separated action string.
+
+    Args:
+        action_string: The entries
+        strict: Only accept the add-on grammar (see parse_action)
+
+    Raises:
+        ActionStrParseError: If any entry cannot be parsed
+    """
+    return [parse_action(entry, strict) for entry in split_actions(action_string)]
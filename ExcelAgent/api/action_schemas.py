@@ -1,6 +1,6 @@
 from fastapi import FastAPI
 from pydantic import BaseModel
-from typing import List, Optional, Type, Dict
+from typing import Any, List, Optional, Type, Dict
 import re
 
 app = FastAPI()
@@ -9,6 +9,7 @@ app = FastAPI()
 class Action(BaseModel):
     type: str  # Defines the type of action (e.g., "Select", "Set", etc.)
     reg: Optional[str] = None  # Regular expression (optional)
+    batch: Optional[Dict[str, Any]] = None  # One-call Range setter matrix (see batch_compiler.py)
 
     def to_string(self):
         base_string = f"{self.type.upper()} {self._format_params()}"
@@ -0,0 +1,101 @@
+"""
+Admission Control - Bounded concurrency and queueing for server endpoints
+At most `max_concurrency` requests run at once and at most `max_queue` wait for a
+slot. A request arriving at a full queue is rejected at once with 429, and one that
+waits longer than `queue_timeout` is rejected with 503. Both carry a Retry-After
+estimated from recent service times, so clients back off instead of timing out.
+"""
+
+import asyncio
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from .exceptions import ServerOverloadedError
+
+
+class AdmissionController:
+    """
+    Async admission control: a concurrency limit plus a bounded, time-limited wait queue.
+    """
+
+    def __init__(self, max_concurrency: int = 8, max_queue: int = 32, queue_timeout: float = 20.0):
+        """
+        Args:
+            max_concurrency: Requests processed at the same time
+            max_queue: Requests allowed to wait for a slot (0: reject as soon as all slots are busy)
+            queue_timeout: Seconds a request may wait before it is rejected with 503
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.active = 0
+        self.waiting = 0
+        self.stats = {"admitted": 0, "queued": 0, "rejected_queue_full": 0, "rejected_timeout": 0}
+        # Exponentially weighted mean service time, for Retry-After
+        self._service_time = 1.0
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        """Build from EXCEL_AGENT_MAX_CONCURRENCY, EXCEL_AGENT_MAX_QUEUE and EXCEL_AGENT_QUEUE_TIMEOUT."""
+        return cls(
+            max_concurrency=int(os.environ.get("EXCEL_AGENT_MAX_CONCURRENCY", 8)),
+            max_queue=int(os.environ.get("EXCEL_AGENT_MAX_QUEUE", 32)),
+            queue_timeout=float(os.environ.get("EXCEL_AGENT_QUEUE_TIMEOUT", 20.0)),
+        )
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free: the queue ahead drained at the current service rate."""
+        waves = (self.waiting + 1) / self.max_concurrency
+        return max(1, math.ceil(waves * self._service_time))
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        Hold a processing slot for the duration of the block.
+
+        Raises:
+            ServerOverloadedError: The queue is full (429) or the wait timed out (503)
+        """
+        if self._semaphore is None:
+            # Created lazily so it binds to the server's event loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        if self._semaphore.locked():
+            if self.waiting >= self.max_queue:
+                self.stats["rejected_queue_full"] += 1
+                raise ServerOverloadedError(429, self.retry_after(), "Too many requests queued")
+            self.stats["queued"] += 1
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.stats["rejected_timeout"] += 1
+                raise ServerOverloadedError(503, self.retry_after(), "Timed out waiting for a free worker")
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+
+        self.stats["admitted"] += 1
+        self.active += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._service_time = 0.8 * self._service_time + 0.2 * (time.perf_counter() - start)
+            self._semaphore.release()
+
+    def metrics(self) -> Dict:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "mean_service_seconds": round(self._service_time, 3),
+            **self.stats,
+        }
@@ -0,0 +1,161 @@
+"""
+Batch Compiler - Turn parsed actions into one-call-per-range operations for the add-on
+The add-on's executor formats and sets cells one getCell() call at a time, and Apps
+Script charges each call. When the request carries a sheet snapshot, the REGEX mask
+of every Format/Set action is evaluated here. The action is annotated with a 2-D
+matrix for the matching Range setter (setFontWeights, setBackgrounds, setValues...),
+with null for cells the mask leaves alone. The executor then applies it with one
+call, plus one read when the mask is partial. Actions that cannot be compiled keep
+no batch and run through the per-cell code as before.
+"""
+
+import re
+from typing import Dict, List, Optional
+
+from .read_resolver import SheetSnapshot
+from .schemas import Format, Select, SelectAndDrag, Set, ToolAction
+
+# Format style -> (Range setter, Range getter, Format field holding the value or a constant)
+FORMAT_BATCH_METHODS = {
+    "bold": ("setFontWeights", "getFontWeights", "=bold"),
+    "italic": ("setFontStyles", "getFontStyles", "=italic"),
+    "underline": ("setFontLines", "getFontLines", "=underline"),
+    "strikethrough": ("setFontLines", "getFontLines", "=line-through"),
+    "backgroundcolor": ("setBackgrounds", "getBackgrounds", "color"),
+    "fontcolor": ("setFontColors", "getFontColors", "color"),
+    "fontsize": ("setFontSizes", "getFontSizes", "size"),
+    "horizontalalignment": ("setHorizontalAlignments", "getHorizontalAlignments", "alignment"),
+    "verticalalignment": ("setVerticalAlignments", "getVerticalAlignments", "alignment"),
+    "wraptext": ("setWraps", "getWraps", "wrap"),
+    "numberformat": ("setNumberFormats", "getNumberFormats", "value_format"),
+}
+
+# A cell whose value the compiler cannot know (a formula result, a paste)
+_UNKNOWN = object()
+
+
+def js_string(value) -> str:
+    """String(value) as the add-on's regExp.test(cellValue) sees it."""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class _SheetState:
+    """The snapshot plus the values earlier actions in the same plan have written."""
+
+    def __init__(self, snapshot: SheetSnapshot):
+        self.snapshot = snapshot
+        self.overrides: Dict[tuple, object] = {}
+
+    def values(self, bounds) -> List[list]:
+        top, left, _, _ = bounds
+        matrix = self.snapshot.values(bounds)
+        if self.overrides:
+            for i, row in enumerate(matrix):
+                for j in range(len(row)):
+                    row[j] = self.overrides.get((top + i, left + j), row[j])
+        return matrix
+
+    def write(self, bounds, mask, value):
+        top, left, _, _ = bounds
+        for i, row in enumerate(mask):
+            for j, hit in enumerate(row):
+                if hit:
+                    self.overrides[(top + i, left + j)] = value
+
+    def forget(self, bounds):
+        top, left, bottom, right = bounds
+        for row in range(top, bottom + 1):
+            for col in range(left, right + 1):
+                self.overrides[(row, col)] = _UNKNOWN
+
+
+def _mask(pattern: Optional[str], values: List[list]) -> Optional[List[list]]:
+    """
+    Which cells regExp.test() would match (None if the pattern cannot be evaluated here).
+    """
+    if not pattern:
+        return [[True] * len(row) for row in values]
+    try:
+        regex = re.compile(pattern)
+    except re.error:
+        # JavaScript-only syntax: leave the action to the client
+        return None
+    mask = []
+    for row in values:
+        if any(value is _UNKNOWN for value in row):
+            return None
+        mask.append([regex.search(js_string(value)) is not None for value in row])
+    return mask
+
+
+def _format_batch(action: Format, mask: List[list]) -> Optional[dict]:
+    methods = FORMAT_BATCH_METHODS.get((action.style or "").lower())
+    if methods is None:
+        return None
+    setter, getter, source = methods
+    value = source[1:] if source.startswith("=") else getattr(action, source)
+    if value is None:
+        return None
+    return {
+        "setter": setter,
+        "getter": getter,
+        "values": [[value if hit else None for hit in row] for row in mask],
+    }
+
+
+def compile_batches(actions: List, snapshot: SheetSnapshot, max_cells: int = 100000) -> List:
+    """
+    Annotate Format and Set actions with batch matrices, simulating the plan in order.
+
+    Args:
+        actions: Parsed actions, in execution order
+        snapshot: Sheet values before the plan runs
+        max_cells: Largest selection compiled (bigger ones stay per-cell to bound the payload)
+
+    Returns:
+        The same actions; compiled ones carry a `batch` dict
+    """
+    state = _SheetState(snapshot)
+    bounds = None
+    for action in actions:
+        if isinstance(action, (Select, SelectAndDrag)):
+            bounds = snapshot.bounds(action) if snapshot.covers(action) else None
+            if isinstance(action, SelectAndDrag) and bounds is not None:
+                state.forget(bounds)
+            continue
+        if bounds is None or not isinstance(action, (Format, Set, ToolAction)):
+            continue
+        if isinstance(action, ToolAction):
+            # Already one setValues per range in the executor; only the values become unknown
+            if action.tool.lower() != "copy":
+                state.forget(bounds)
+            continue
+
+        top, left, bottom, right = bounds
+        if (bottom - top + 1) * (right - left + 1) > max_cells:
+            if isinstance(action, Set):
+                state.forget(bounds)
+            continue
+        mask = _mask(action.reg, state.values(bounds))
+        if mask is None:
+            if isinstance(action, Set):
+                state.forget(bounds)
+            continue
+
+        if isinstance(action, Format):
+            action.batch = _format_batch(action, mask)
+        else:
+            is_formula = action.text.strip().startswith("=")
+            action.batch = {
+                "setter": "setValues",
+                "getter": "getFormulas",
+                "values": [[action.text if hit else None for hit in row] for row in mask],
+            }
+            state.write(bounds, mask, _UNKNOWN if is_formula else action.text)
+    return actions
@@ -5,5 +5,23 @@ class MyAppError(Exception):
 class ActionStrParseError(MyAppError):
     pass
 
+class PartialActionsError(ActionStrParseError):
+    """
+    Raised when a later round of a multi-round response cannot be parsed; carries the
+    actions of the earlier rounds, which the conversation already records as made.
+    """
+
+    def __init__(self, message: str, actions: list):
+        super().__init__(message)
+        self.actions = actions
+
 class GeminiApiError(MyAppError):
     pass
+
+class ServerOverloadedError(MyAppError):
+    """Raised when a request cannot be admitted; carries the HTTP status and Retry-After seconds."""
+
+    def __init__(self, status_code: int, retry_after: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
@@ -4,10 +4,14 @@ from typing import Dict, Any
 from ..utils.utils import get_logger
 from .schemas import *
 
+from ..chat import clients
 from .singular_agent import SingularAgent
 from .action_reverse_parse import parse_action_string
+from .admission import AdmissionController
+from .batch_compiler import compile_batches
+from .read_resolver import SheetSnapshot, respond_resolving_reads
 
-from .exceptions import ActionStrParseError
+from .exceptions import ActionStrParseError, PartialActionsError, ServerOverloadedError
 
 logger = get_logger(__name__)
 
@@ -15,6 +19,13 @@ router = APIRouter()
 
 singular_agent = SingularAgent()
 
+# Bounds concurrent LLM calls and the queue in front of them (EXCEL_AGENT_MAX_CONCURRENCY etc.)
+admission = AdmissionController.from_env()
+
+# Keep a pooled provider connection for every request that may run at once
+if admission.max_concurrency > clients.client_registry.pool_maxsize:
+    clients.configure_client_pools(pool_maxsize=admission.max_concurrency)
+
 # Echo message back
 @router.post("/echo", response_model=MessageResponse)
 def process_message(request: MessageRequest):
@@ -25,7 +36,7 @@ def process_message(request: MessageRequest):
 # Takes a subtask instruction
 # Returns an action sequence
 @router.post("/subtask-process", response_model=ActionsResponse)
-def process_message(request: SubtaskInstructionRequest):
+async def process_message(request: SubtaskInstructionRequest):
     subtask_instruction = request.message
     first_n_rows_of_sheet = request.first_n_rows_of_sheet
     read_context = request.read_context
@@ -42,12 +53,40 @@ def process_message(request: SubtaskInstructionRequest):
     # REGEX ^.*$ | SELECT C1:C-1 \n REGEX ^\?.*$ | FORMAT style: backgroundcolor, color: yellow
     # use parse_action_string to parse it into list of actions, ready to be sent to front-end
 
+    # With a sheet snapshot, READs are answered here and the model re-prompted in the same request
+    snapshot = SheetSnapshot.from_request(request.sheet_snapshot)
+    resolved_reads = None
+
     # Optional: replace the below with calling 3 agent LLMs
-    actions_response = singular_agent.singular_agent_response(subtask_instruction, first_n_rows_of_sheet, read_context)
-    logger.info("Actions response: " + str(actions_response))
     success = True
-    try: 
-        actions = parse_action_string(actions_response)
+    try:
+        async with admission.slot():
+            if snapshot is not None:
+                actions, resolved_reads = await respond_resolving_reads(
+                    singular_agent, subtask_instruction, first_n_rows_of_sheet, read_context,
+                    request.session_id, snapshot
+                )
+                logger.info("Resolved %d READ actions from the sheet snapshot", resolved_reads)
+                # Masks evaluated here let the add-on apply each action with one call per range
+                actions = compile_batches(actions, snapshot)
+            else:
+                actions_response = await singular_agent.singular_agent_response_async(
+                    subtask_instruction, first_n_rows_of_sheet, read_context, session_id=request.session_id
+                )
+                logger.info("Actions response: " + str(actions_response))
+                actions = parse_action_string(actions_response)
+    except ServerOverloadedError as e:
+        logger.warning("Rejected subtask (%d): %s", e.status_code, e)
+        return JSONResponse(
+            status_code=e.status_code,
+            content={"role": "assistant", "message": str(e), "actions": []},
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except PartialActionsError as e:
+        # The agent's history already holds the earlier rounds' edits; the client must still make them
+        logger.error("Error parsing actions (keeping %d from earlier rounds): %s", len(e.actions), e)
+        success = False
+        actions = compile_batches(e.actions, snapshot)
     except ActionStrParseError as e:
         logger.error("Error parsing actions: " + str(e))
         success = False
@@ -55,7 +94,17 @@ def process_message(request: SubtaskInstructionRequest):
     actions_response = ActionsResponse(
         role="assistant",
         message="success" if success else "error",
-        actions=actions
+        actions=actions,
+        resolved_reads=resolved_reads,
     )
     return actions_response
 
+# Conversation history size per session
+@router.get("/sessions/metrics")
+def session_metrics():
+    return JSONResponse(content=singular_agent.sessions.metrics())
+
+# Admission control state: active and queued requests, rejections
+@router.get("/admission/metrics")
+def admission_metrics():
+    return JSONResponse(content=admission.metrics())
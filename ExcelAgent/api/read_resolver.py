@@ -0,0 +1,170 @@
+"""
+Read Resolver - Answer READ actions on the server from a shipped sheet snapshot
+The add-on can send the sheet's used range (or the ranges it expects to be read)
+with the request. READ actions the model issues are then resolved in-process and
+the model is re-prompted with the results, so the client receives one final action
+list instead of making a round trip per READ. READs the snapshot cannot answer are
+returned to the client as before.
+"""
+
+from typing import List, Optional, Tuple
+
+from openpyxl.utils import column_index_from_string, get_column_letter, range_boundaries
+
+from .action_reverse_parse import parse_action_string
+from .exceptions import ActionStrParseError, PartialActionsError
+from .schemas import Read, SelectAndDrag, Set, TellUser, Terminate, ToolAction
+
+# Actions that change cell values: a READ after them in the same response must see the live sheet
+VALUE_CHANGING_ACTIONS = (Set, ToolAction, SelectAndDrag)
+
+# Same safety limit as the add-on's client-side READ loop
+MAX_READ_ROUNDS = 10
+
+
+def _format_cell(value) -> str:
+    """Render a cell the way applyRead in GoogleAdd-on/ActionExecuter.js does (String(cell))."""
+    if value is None or value == "":
+        return "(empty)"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class SheetSnapshot:
+    """
+    Cell values of one or more rectangular ranges of the active sheet.
+    """
+
+    def __init__(self, ranges: List[Tuple[str, List[list]]]):
+        """
+        Args:
+            ranges: (A1 range such as "A1:K200", row-major values) pairs
+        """
+        self.blocks = []
+        for a1_range, values in ranges:
+            min_col, min_row, _, _ = range_boundaries(a1_range)
+            rows = len(values)
+            cols = max((len(row) for row in values), default=0)
+            self.blocks.append((min_row, min_col, min_row + rows - 1, min_col + cols - 1, values))
+        # Shipping the used range makes its bottom the sheet's last row (sheet.getLastRow())
+        self.last_row = max((block[2] for block in self.blocks), default=0)
+
+    @classmethod
+    def from_request(cls, snapshot) -> Optional["SheetSnapshot"]:
+        """Build from the request's sheet_snapshot field (None if nothing was shipped)."""
+        if not snapshot:
+            return None
+        return cls([(item.range, item.values) for item in snapshot])
+
+    def bounds(self, action) -> Tuple[int, int, int, int]:
+        """
+        (first row, first col, last row, last col) of a READ or SELECT, resolving row -1 like getRangeFromSelect.
+        """
+        col1 = column_index_from_string(action.col1)
+        col2 = column_index_from_string(action.col2 or action.col1)
+        row1 = int(action.row1)
+        row2 = action.row2
+        if row2 in (None, ""):
+            row2 = row1
+        row2 = self.last_row if str(row2) == "-1" else int(row2)
+        return min(row1, row2), min(col1, col2), max(row1, row2), max(col1, col2)
+
+    def block_for(self, bounds):
+        top, left, bottom, right = bounds
+        for block in self.blocks:
+            if block[0] <= top and block[1] <= left and bottom <= block[2] and right <= block[3]:
+                return block
+        return None
+
+    def covers(self, action) -> bool:
+        try:
+            return self.block_for(self.bounds(action)) is not None
+        except (ValueError, TypeError):
+            return False
+
+    def read_message(self, read: Read) -> str:
+        """The message applyRead would produce for this READ: "READ A1:B2: a, b | c, d"."""
+        top, left, bottom, right = bounds = self.bounds(read)
+        rows = [", ".join(_format_cell(cell) for cell in row) for row in self.values(bounds)]
+        notation = f"{get_column_letter(left)}{top}"
+        if (top, left) != (bottom, right):
+            notation += f":{get_column_letter(right)}{bottom}"
+        return f"READ {notation}: " + " | ".join(rows)
+
+
+    def values(self, bounds) -> List[list]:
+        """Row-major values inside bounds (which must be covered); cells past a short row are None."""
+        block_top, block_left, _, _, values = self.block_for(bounds)
+        top, left, bottom, right = bounds
+        matrix = []
+        for row in range(top, bottom + 1):
+            row_values = values[row - block_top]
+            matrix.append([
+                row_values[col - block_left] if col - block_left < len(row_values) else None
+                for col in range(left, right + 1)
+            ])
+        return matrix
+
+
+def _resolvable(actions, snapshot: SheetSnapshot, carried=()) -> bool:
+    """
+    Whether the snapshot can answer a round's READs.
+
+    Args:
+        actions: The round's actions
+        snapshot: The sheet as shipped with the request
+        carried: Actions of earlier rounds, not yet applied by the client
+    """
+    reads = [action for action in actions if isinstance(action, Read)]
+    if not reads or not all(snapshot.covers(read) for read in reads):
+        return False
+    # The snapshot is the sheet before this request; values changed before a READ, in this
+    # round or an earlier one, are not in it
+    first_read = next(i for i, action in enumerate(actions) if isinstance(action, Read))
+    return not any(isinstance(action, VALUE_CHANGING_ACTIONS) for action in list(carried) + actions[:first_read])
+
+
+async def respond_resolving_reads(agent, subtask_instruction: str, first_n_rows_of_sheet, read_context: Optional[str],
+                                  session_id: Optional[str], snapshot: SheetSnapshot,
+                                  max_rounds: int = MAX_READ_ROUNDS):
+    """
+    Prompt the agent, answering its READs from the snapshot and re-prompting until none remain.
+
+    Mirrors fetchAndProcessActions: after a round with READs the next message is
+    "Processing read content" with the READ results as read_context. Other actions
+    from those rounds (except TellUser/Terminate, which the client would have
+    overwritten) are kept, in order, ahead of the final round's actions.
+
+    Returns:
+        (actions for the client, number of READs resolved on the server)
+
+    Raises:
+        ActionStrParseError: If the first response cannot be parsed
+        PartialActionsError: If a later one cannot; it carries the earlier rounds' actions,
+            which the client still has to apply
+    """
+    carried = []
+    resolved = 0
+    message = subtask_instruction
+    for _ in range(max_rounds):
+        response_text = await agent.singular_agent_response_async(
+            message, first_n_rows_of_sheet, read_context, session_id=session_id
+        )
+        try:
+            actions = parse_action_string(response_text)
+        except ActionStrParseError as e:
+            if not carried:
+                raise
+            raise PartialActionsError(str(e), carried)
+        if not _resolvable(actions, snapshot, carried):
+            return carried + actions, resolved
+
+        read_messages = [snapshot.read_message(action) for action in actions if isinstance(action, Read)]
+        resolved += len(read_messages)
+        carried += [action for action in actions if not isinstance(action, (Read, TellUser, Terminate))]
+        read_context = "\n".join(read_messages)
+        message = "Processing read content"
+    return carried, resolved
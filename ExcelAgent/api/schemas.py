@@ -14,12 +14,18 @@ class MessageResponse(BaseModel):
 
 ############################################## Subtask Instruction
 
+class SnapshotRange(BaseModel):
+    range: str = Field(description="A1 notation of the range, e.g. A1:K200")
+    values: List[List[Union[str, int, float, bool, None]]]
+
 class SubtaskInstructionRequest(BaseModel):
     role: str
     message: str
     #TODO: feed first_n_rows_of_sheet into LLM, adjust prompt accordingly
     first_n_rows_of_sheet: List[List[Union[str, int, float, bool, None]]] = Field(default=None)
     read_context: Optional[str] = Field(default=None, description="Context from previous Read actions that were executed")
+    session_id: Optional[str] = Field(default=None, description="Client session; each session keeps its own conversation history")
+    sheet_snapshot: Optional[List[SnapshotRange]] = Field(default=None, description="Sheet values for resolving READ actions on the server")
 
 class Action(BaseModel):
     type: str  # Defines the type of action (e.g., "Select", "Set", etc.)
@@ -34,5 +40,6 @@ class ActionsResponse(BaseModel):
     role: str = Field(default=None)
     message: str = Field(default=None)
     actions: List[Union[Select, SelectAndDrag, Format, Set, ToolAction, TellUser, Terminate, Read]]  = Field(default=None)
+    resolved_reads: Optional[int] = Field(default=None, description="READ actions answered from the sheet snapshot")
 
 
@@ -0,0 +1,206 @@
+"""
+Session Store - Bounded per-session conversation memory for the server
+Each client session keeps its own history. Only the newest turns that fit a token
+window are sent to the model. Older turns are dropped or, if a summarizer is
+configured, folded into a running summary. Idle sessions expire and the least
+recently used ones are evicted when the store is full.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from ..chat.chat import ChatLog
+from ..utils.utils import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_SESSION_ID = "default"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (4 characters per token), matching the retry scheduler's estimate."""
+    return len(text or "") // 4
+
+
+class Session:
+    """
+    One client's conversation.
+
+    Attributes:
+        session_id: Client-supplied identifier
+        turns: (user message, assistant message) pairs inside the window, oldest first
+        summary: Summary of the turns that left the window ("" if none or no summarizer)
+        tokens: Estimated tokens of the turns in the window
+        total_turns: Turns recorded over the session's lifetime
+        dropped_turns: Turns that left the window
+        last_access: Clock time of the last request
+    """
+
+    def __init__(self, session_id: str, now: float):
+        self.session_id = session_id
+        self.turns: List[tuple] = []
+        self.summary = ""
+        self.tokens = 0
+        self.total_turns = 0
+        self.dropped_turns = 0
+        self.created = now
+        self.last_access = now
+        self.lock = threading.Lock()
+        # Turns that left the window and wait to be folded into the summary, oldest first
+        self.unsummarized: List[tuple] = []
+        # Held while summarizing (not self.lock, which requests take to read the history)
+        self.summary_lock = threading.Lock()
+
+    def metrics(self, now: float) -> Dict:
+        return {
+            "turns": len(self.turns),
+            "total_turns": self.total_turns,
+            "dropped_turns": self.dropped_turns,
+            "tokens": self.tokens,
+            "summary_tokens": estimate_tokens(self.summary),
+            "idle_seconds": round(now - self.last_access, 1),
+        }
+
+
+def _anonymize(session_id: str) -> str:
+    """A stable, non-reversible label for a session id."""
+    return hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:12]
+
+
+class SessionStore:
+    """
+    Thread-safe store of Sessions with a sliding token window, idle TTL and LRU eviction.
+    """
+
+    def __init__(
+        self,
+        window_tokens: int = 8000,
+        max_sessions: int = 1000,
+        idle_ttl: Optional[float] = 1800.0,
+        summarizer: Optional[Callable[[str, List[tuple]], str]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            window_tokens: Token budget for the turns (and summary) sent with each request
+            max_sessions: Sessions kept before the least recently used one is evicted
+            idle_ttl: Seconds of inactivity after which a session expires (None: never)
+            summarizer: Optional callable (previous summary, dropped turns) -> new summary
+            clock: Monotonic clock, replaceable for testing
+        """
+        self.window_tokens = window_tokens
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.summarizer = summarizer
+        self.clock = clock
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.expired = 0
+        self.evicted = 0
+
+    def get(self, session_id: Optional[str]) -> Session:
+        """
+        Return the session for session_id, creating it if needed (None: the shared default session).
+        """
+        session_id = session_id or DEFAULT_SESSION_ID
+        now = self.clock()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = Session(session_id, now)
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+                    self.evicted += 1
+            self._sessions.move_to_end(session_id)
+            session.last_access = now
+            return session
+
+    def _expire(self, now: float):
+        if self.idle_ttl is None:
+            return
+        # Oldest first: stop at the first session that is still fresh
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_access <= self.idle_ttl:
+                break
+            self._sessions.popitem(last=False)
+            self.expired += 1
+
+    def build_chat(self, session: Session, system_prompt: str, user_message: str) -> ChatLog:
+        """
+        Assemble the chat for the next request: system prompt, summary, windowed turns, new message.
+        """
+        with session.lock:
+            turns = list(session.turns)
+            summary = session.summary
+        system_text = system_prompt
+        if summary:
+            system_text += "\n\nSUMMARY OF EARLIER TURNS IN THIS SESSION: " + summary
+        chat = ChatLog([["system", [{"type": "text", "text": system_text}]]])
+        for user_text, assistant_text in turns:
+            chat = chat.append("user", [{"type": "text", "text": user_text}])
+            chat = chat.append("assistant", [{"type": "text", "text": assistant_text}])
+        return chat.append("user", [{"type": "text", "text": user_message}])
+
+    def record(self, session: Session, user_message: str, assistant_message: str):
+        """
+        Add a turn and slide the window: the oldest turns leave it (and are summarized, if configured).
+
+        The summarizer runs after session.lock is released, so other requests on the session
+        do not wait for it; summaries of one session are still made one at a time, in order.
+        """
+        with session.lock:
+            session.turns.append((user_message, assistant_message))
+            session.total_turns += 1
+            session.tokens += estimate_tokens(user_message) + estimate_tokens(assistant_message)
+
+            dropped = []
+            # Always keep the newest turn, even if it alone exceeds the window
+            while len(session.turns) > 1 and session.tokens + estimate_tokens(session.summary) > self.window_tokens:
+                user_text, assistant_text = session.turns.pop(0)
+                session.tokens -= estimate_tokens(user_text) + estimate_tokens(assistant_text)
+                dropped.append((user_text, assistant_text))
+            session.dropped_turns += len(dropped)
+            if not dropped or self.summarizer is None:
+                return
+            session.unsummarized.extend(dropped)
+
+        with session.summary_lock:
+            with session.lock:
+                dropped, session.unsummarized = session.unsummarized, []
+                summary = session.summary
+            if not dropped:
+                # A concurrent record() summarized them already
+                return
+            try:
+                summary = self.summarizer(summary, dropped)
+            except Exception as e:
+                # Keep serving with the previous summary; the turns are gone either way
+                logger.warning("Session %s: summarizing dropped turns failed: %s", session.session_id, e)
+                return
+            with session.lock:
+                session.summary = summary
+
+    def metrics(self) -> Dict:
+        """
+        Per-session history sizes and store-wide counters.
+
+        Sessions are listed under a truncated hash of their id: the add-on's ids carry the
+        spreadsheet id and the user's key, which the endpoint must not publish.
+        """
+        now = self.clock()
+        with self._lock:
+            self._expire(now)
+            sessions = {_anonymize(session_id): session.metrics(now) for session_id, session in self._sessions.items()}
+            return {
+                "sessions": len(sessions),
+                "total_tokens": sum(metrics["tokens"] for metrics in sessions.values()),
+                "expired": self.expired,
+                "evicted": self.evicted,
+                "window_tokens": self.window_tokens,
+                "per_session": sessions,
+            }
@@ -1,8 +1,12 @@
+import asyncio
 import os
 from typing import List, Optional
 
-from ..chat.api import _detect_provider_from_url, _resolve_api_key, inference_chat
+from ..chat.api import _detect_provider_from_url, _resolve_api_key, inference_chat, inference_chat_async
+from .session_store import SessionStore
 from ..utils.utils import get_logger
+from ..utils.sheet_summary import summarize_frame
+from ..utils.workbook_loader import rows_to_frame
 
 logger = get_logger(__name__)
 
@@ -33,6 +37,9 @@ class SingularAgent:
         api_key: Optional[str] = None,
         api_url: Optional[str] = None,
         temperature: float = 0.0,
+        summary_token_budget: Optional[int] = None,
+        session_store: Optional[SessionStore] = None,
+        summarize_history: bool = False,
     ) -> None:
         self.script_dir = os.path.dirname(os.path.abspath(__file__))
         self.action_bnf_text = self._load_file("action_bnf.txt")
@@ -41,6 +48,8 @@ class SingularAgent:
         self.model_name = model_name
         self.api_url = api_url
         self.temperature = temperature
+        # When set, the sheet rows sent by the client are summarized within this many tokens
+        self.summary_token_budget = summary_token_budget
 
         if self.model_provider in (None, "", "auto"):
             self.model_provider = self._auto_detect_provider()
@@ -54,8 +63,10 @@ class SingularAgent:
         if not self.api_url:
             self.api_url = self.DEFAULT_API_URL_MAP.get(self.model_provider)
 
-        self.chat_history: List[List] = []
-        self.first_chat = True
+        # Per-session, windowed history; with summarize_history, turns leaving the window are summarized
+        self.sessions = session_store or SessionStore()
+        if summarize_history and self.sessions.summarizer is None:
+            self.sessions.summarizer = self._summarize_turns
         self.system_prompt = """
         Imagine that you are given a new pseudo-programming language whose syntax is specified through the attached bnf specification. Know that this programming language is used specifically to manipulate a given excel table. You're smart enough to understand how to use this language (since the essential keywords are all natural language) to program the code that will solve an excel task given by a user. You can assume that there exists an interpreter for this language that can execute your code correctly. Here's one example usage: 
 
@@ -93,17 +104,36 @@ Only issue the correct commands. Absolutely no explanations necessarily.
         with open(file_path, "r", encoding="utf-8") as file:
             return file.read()
 
-    def singular_agent_response(
-        self,
-        subtask_instruction: str,
-        first_n_rows_of_sheet: Optional[str] = None,
-        read_context: Optional[str] = None,
-    ) -> str:
-        first_rows_str = (
-            str(first_n_rows_of_sheet)
-            if first_n_rows_of_sheet is not None
-            else ""
+    def _summarize_turns(self, previous_summary: str, turns: List[tuple]) -> str:
+        """Fold turns that left the session window into the running summary with one LLM call."""
+        transcript = "\n".join(f"USER: {user}\nASSISTANT: {assistant}" for user, assistant in turns)
+        prompt = (
+            "Summarize this conversation between a user and a spreadsheet assistant in at most 150 words. "
+            "Keep the user's goals, the sheet layout learned so far and the commands already issued.\n"
         )
+        if previous_summary:
+            prompt += f"EARLIER SUMMARY: {previous_summary}\n"
+        prompt += f"NEW TURNS:\n{transcript}"
+        return inference_chat(
+            [["user", [{"type": "text", "text": prompt}]]],
+            self.model_name,
+            self.api_url,
+            self.api_key,
+            provider=self.model_provider,
+            temperature=self.temperature,
+        )
+
+    def _render_sheet_rows(self, first_n_rows_of_sheet) -> str:
+        """Render the client's sheet rows, as a bounded statistical summary when a token budget is set."""
+        if first_n_rows_of_sheet is None:
+            return ""
+        if self.summary_token_budget and isinstance(first_n_rows_of_sheet, list) and first_n_rows_of_sheet:
+            rows = [["" if cell is None else cell for cell in row] for row in first_n_rows_of_sheet]
+            return summarize_frame(rows_to_frame(rows), self.summary_token_budget)
+        return str(first_n_rows_of_sheet)
+
+    def _user_message(self, subtask_instruction: str, first_n_rows_of_sheet, read_context: Optional[str]) -> str:
+        first_rows_str = self._render_sheet_rows(first_n_rows_of_sheet)
         continuing_prompt = (
             f" NOW, user request is: [{subtask_instruction}]."
         )
@@ -117,21 +147,21 @@ Only issue the correct commands. Absolutely no explanations necessarily.
             )
 
         logger.info("Prompt prepared for model: %s", continuing_prompt)
+        return continuing_prompt
 
-        if self.first_chat:
-            self.chat_history.append(
-                ["system", [{"type": "text", "text": self.system_prompt}]]
-            )
-            self.first_chat = False
-        
-        user_message = continuing_prompt
-
-        self.chat_history.append(
-            ["user", [{"type": "text", "text": user_message}]]
-        )
+    def singular_agent_response(
+        self,
+        subtask_instruction: str,
+        first_n_rows_of_sheet: Optional[str] = None,
+        read_context: Optional[str] = None,
+        session_id: Optional[str] = None,
+    ) -> str:
+        session = self.sessions.get(session_id)
+        user_message = self._user_message(subtask_instruction, first_n_rows_of_sheet, read_context)
+        chat = self.sessions.build_chat(session, self.system_prompt, user_message)
 
         response_text = inference_chat(
-            self.chat_history,
+            chat,
             self.model_name,
             self.api_url,
             self.api_key,
@@ -139,10 +169,38 @@ Only issue the correct commands. Absolutely no explanations necessarily.
             temperature=self.temperature,
         )
 
-        self.chat_history.append(
-            ["assistant", [{"type": "text", "text": response_text}]]
+        self.sessions.record(session, user_message, response_text)
+
+        logger.info("Response from model: %s", response_text)
+        return response_text
+
+    async def singular_agent_response_async(
+        self,
+        subtask_instruction: str,
+        first_n_rows_of_sheet: Optional[str] = None,
+        read_context: Optional[str] = None,
+        session_id: Optional[str] = None,
+    ) -> str:
+        """Asyncio-native singular_agent_response, for serving many requests on one event loop."""
+        session = self.sessions.get(session_id)
+        user_message = self._user_message(subtask_instruction, first_n_rows_of_sheet, read_context)
+        chat = self.sessions.build_chat(session, self.system_prompt, user_message)
+
+        response_text = await inference_chat_async(
+            chat,
+            self.model_name,
+            self.api_url,
+            self.api_key,
+            provider=self.model_provider,
+            temperature=self.temperature,
         )
 
+        if self.sessions.summarizer is not None:
+            # Sliding the window may call the (blocking) summarizer
+            await asyncio.to_thread(self.sessions.record, session, user_message, response_text)
+        else:
+            self.sessions.record(session, user_message, response_text)
+
         logger.info("Response from model: %s", response_text)
         return response_text
 
@@ -1,9 +1,94 @@
-import requests
-import time
+import asyncio
+import importlib.util
+import json
 import os
 
+from . import clients
+from .retry import RetryScheduler
 
-def inference_chat(chat, model, api_url, token, provider="openai", temperature=0.0):
+# Optional process-wide response cache used by inference_chat (see configure_response_cache)
+_response_cache = None
+
+# Process-wide pacing/retry/circuit-breaker scheduler for provider calls (see configure_retry_scheduler)
+_retry_scheduler = RetryScheduler()
+
+# Optional HedgedRouter that serves inference_chat over several backends (see configure_router)
+_router = None
+
+
+def configure_response_cache(cache):
+    """
+    Set the default response cache for inference_chat.
+    
+    Args:
+        cache: ResponseCache instance, or None to disable caching
+    """
+    global _response_cache
+    _response_cache = cache
+
+
+def configure_retry_scheduler(scheduler):
+    """
+    Set the scheduler that paces and retries provider calls.
+    
+    Args:
+        scheduler: RetryScheduler instance, or None to make a single attempt per call
+    """
+    global _retry_scheduler
+    _retry_scheduler = scheduler
+
+
+def configure_router(router):
+    """
+    Route inference_chat / inference_chat_async through a HedgedRouter.
+    
+    While a router is configured, its backends decide the provider and model of every call;
+    the model/api_url/token arguments only take part in the cache key. Streaming calls
+    still go to the provider they name.
+    
+    Args:
+        router: ExcelAgent.chat.router.HedgedRouter instance, or None to call providers directly
+    """
+    global _router
+    _router = router
+
+
+def _estimate_chat_tokens(chat):
+    """Rough prompt size for the token buckets (4 characters per token)."""
+    return sum(len(_chat_text(content) or "") for _, content in chat) // 4
+
+
+def _scheduled(provider, chat, attempt):
+    """Run one-attempt callable `attempt` through the retry scheduler."""
+    if _retry_scheduler is None:
+        return attempt()
+    return _retry_scheduler.call(provider, attempt, estimated_tokens=_estimate_chat_tokens(chat))
+
+
+async def _scheduled_async(provider, chat, attempt):
+    """Async _scheduled; `attempt` returns an awaitable."""
+    if _retry_scheduler is None:
+        return await attempt()
+    return await _retry_scheduler.acall(provider, attempt, estimated_tokens=_estimate_chat_tokens(chat))
+
+
+def _scheduled_stream(provider, chat, open_stream):
+    """
+    Stream through the retry scheduler. An attempt succeeds once the first chunk arrives;
+    a stream that fails after that is not retried, since its text was already yielded.
+    """
+    def first_chunk():
+        stream = open_stream()
+        return stream, next(stream, None)
+
+    stream, first = _scheduled(provider, chat, first_chunk)
+    if first is None:
+        return
+    yield first
+    yield from stream
+
+
+def inference_chat(chat, model, api_url, token, provider="openai", temperature=0.0, cache=None, route=True):
     """
     Unified inference function supporting multiple LLM providers.
     
@@ -14,6 +99,9 @@ def inference_chat(chat, model, api_url, token, provider="openai", temperature=0
         token: API key/token (can be env var name or actual key)
         provider: 'gemini', 'openai', 'deepseek', 'claude', 'nvidia', or auto-detected
         temperature: Sampling temperature
+        cache: Optional ResponseCache (defaults to the one set by configure_response_cache).
+            Bypassed when temperature > 0.
+        route: Use the router set by configure_router, if any (the router itself passes False)
     """
     # Resolve API key if it's an environment variable name
     token = _resolve_api_key(token)
@@ -26,16 +114,143 @@ def inference_chat(chat, model, api_url, token, provider="openai", temperature=0
     
     provider = provider.lower()
     
+    cache = cache if cache is not None else _response_cache
+    cache_key = None
+    if cache is not None:
+        if temperature > 0:
+            # Sampled responses are not reproducible; never serve them from cache
+            cache.record_bypass()
+        else:
+            cache_key = cache.make_key(chat, model, api_url, provider, temperature)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+    
+    if route and _router is not None:
+        response = _router.inference(chat, temperature)
+    else:
+        response = _dispatch_inference(chat, model, api_url, token, provider, temperature)
+    
+    if cache_key is not None and response is not None:
+        cache.put(cache_key, response)
+    return response
+
+
+def _dispatch_inference(chat, model, api_url, token, provider, temperature):
+    """Route a request to the adapter for the (already resolved) provider, with retries."""
     if provider == "gemini" and not api_url:
-        return _inference_gemini(chat, model, token, temperature)
+        attempt = lambda: _inference_gemini(chat, model, token, temperature)
     elif provider in ["openai", "deepseek", "nvidia"] or (api_url and provider != "claude"):
         # Use OpenAI SDK for OpenAI-compatible APIs
-        return _inference_openai_sdk(chat, model, api_url, token, temperature)
+        attempt = lambda: _inference_openai_sdk(chat, model, api_url, token, temperature)
     elif provider == "claude":
-        return _inference_claude(chat, model, token, temperature)
+        attempt = lambda: _inference_claude(chat, model, token, temperature, api_url)
     else:
         # Fallback to OpenAI-compatible
-        return _inference_openai_sdk(chat, model, api_url, token, temperature)
+        attempt = lambda: _inference_openai_sdk(chat, model, api_url, token, temperature)
+    return _scheduled(provider, chat, attempt)
+
+
+async def inference_chat_async(chat, model, api_url, token, provider="openai", temperature=0.0, cache=None,
+                               route=True):
+    """
+    Asyncio-native variant of inference_chat, for issuing independent calls concurrently.
+    
+    Takes the same arguments and uses the same response cache as inference_chat.
+    
+    Returns:
+        The completion text
+    """
+    token = _resolve_api_key(token)
+    
+    if provider == "gemini" and api_url:
+        provider = _detect_provider_from_url(api_url)
+    elif not provider or provider == "auto":
+        provider = _detect_provider_from_url(api_url) if api_url else "gemini"
+    
+    provider = provider.lower()
+    
+    cache = cache if cache is not None else _response_cache
+    cache_key = None
+    if cache is not None:
+        if temperature > 0:
+            cache.record_bypass()
+        else:
+            cache_key = cache.make_key(chat, model, api_url, provider, temperature)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+    
+    if route and _router is not None:
+        response = await _router.ainference(chat, temperature)
+    else:
+        if provider == "gemini" and not api_url:
+            attempt = lambda: _inference_gemini_async(chat, model, token, temperature)
+        elif provider == "claude":
+            attempt = lambda: _inference_claude_async(chat, model, token, temperature, api_url)
+        else:
+            attempt = lambda: _inference_openai_async(chat, model, api_url, token, temperature)
+        response = await _scheduled_async(provider, chat, attempt)
+    
+    if cache_key is not None and response is not None:
+        cache.put(cache_key, response)
+    return response
+
+
+def inference_chat_stream(chat, model, api_url, token, provider="openai", temperature=0.0, cache=None):
+    """
+    Streaming variant of inference_chat: yields the completion text in chunks as it arrives.
+    
+    Takes the same arguments as inference_chat. A cache hit yields the whole cached
+    response as one chunk; a fully consumed stream is stored in the cache.
+    
+    Yields:
+        Text chunks of the completion
+    """
+    token = _resolve_api_key(token)
+    
+    if provider == "gemini" and api_url:
+        provider = _detect_provider_from_url(api_url)
+    elif not provider or provider == "auto":
+        provider = _detect_provider_from_url(api_url) if api_url else "gemini"
+    
+    provider = provider.lower()
+    
+    cache = cache if cache is not None else _response_cache
+    cache_key = None
+    if cache is not None:
+        if temperature > 0:
+            cache.record_bypass()
+        else:
+            cache_key = cache.make_key(chat, model, api_url, provider, temperature)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+    
+    if provider == "gemini" and not api_url:
+        open_stream = lambda: _stream_gemini(chat, model, token, temperature)
+    elif provider == "claude":
+        open_stream = lambda: _stream_claude(chat, model, token, temperature, api_url)
+    else:
+        open_stream = lambda: _stream_openai_sdk(chat, model, api_url, token, temperature)
+    stream = _scheduled_stream(provider, chat, open_stream)
+    
+    parts = []
+    for chunk in stream:
+        if chunk:
+            parts.append(chunk)
+            yield chunk
+    
+    if cache_key is not None:
+        cache.put(cache_key, "".join(parts))
+
+
+def _iter_sse_data(response):
+    """Yield the data payloads of a server-sent events response (requests, stream=True)."""
+    for line in response.iter_lines(decode_unicode=True):
+        if line and line.startswith("data:"):
+            yield line[len("data:"):].strip()
 
 
 def _resolve_api_key(api_key):
@@ -128,27 +343,69 @@ def _normalize_api_url(api_url):
     return api_url
 
 
-def _inference_gemini(chat, model, token, temperature):
-    """Inference using Google Gemini API via google-generativeai SDK."""
-    try:
-        import google.generativeai as genai
-    except ImportError:
-        raise ImportError("google-generativeai package required for Gemini. Install: pip install google-generativeai")
+def _chat_text(content):
+    """Extract the text of a chat message (a string or a list of {'type', 'text'} dicts)."""
+    if isinstance(content, list):
+        return " ".join([item.get("text", "") for item in content if item.get("type") == "text"])
+    return content
+
+
+def _openai_messages(chat):
+    """Convert chat format to OpenAI messages format."""
+    return [{"role": role, "content": _chat_text(content)} for role, content in chat]
+
+
+def _chat_completions_url(api_url):
+    """Full chat-completions endpoint for the requests-based OpenAI-compatible adapter."""
+    if not api_url:
+        return "https://api.openai.com/v1/chat/completions"
+    api_url_normalized = _normalize_api_url(api_url)
+    if not api_url_normalized.endswith('/chat/completions'):
+        api_url_normalized = api_url_normalized.rstrip('/') + '/chat/completions'
+    return api_url_normalized
+
+
+def _claude_headers(token):
+    return {
+        "Content-Type": "application/json",
+        "x-api-key": token,
+        "anthropic-version": "2023-06-01"
+    }
+
+
+def _claude_payload(chat, model, temperature):
+    """Convert chat format to a Claude messages request body (system prompt is a separate field)."""
+    system_message = None
+    messages = []
+    for role, content in chat:
+        text = _chat_text(content)
+        if role == "system":
+            system_message = text
+        else:
+            messages.append({"role": role, "content": text})
     
-    genai.configure(api_key=token)
+    data = {
+        "model": model,
+        "messages": messages,
+        "max_tokens": 2048,
+        "temperature": temperature
+    }
+    if system_message:
+        data["system"] = system_message
+    return data
+
+
+def _gemini_chat_session(genai, chat, model, token, temperature):
+    """
+    Convert chat format to a Gemini chat session.
     
-    # Convert chat format to Gemini format
-    # chat is list of [role, content] where content is list of dicts with 'type' and 'text'
+    Returns:
+        (chat_session, last_message, generation_config)
+    """
     system_instruction = None
     messages = []
-    
     for role, content in chat:
-        # Extract text from content
-        if isinstance(content, list):
-            text = " ".join([item.get("text", "") for item in content if item.get("type") == "text"])
-        else:
-            text = content
-            
+        text = _chat_text(content)
         if role == "system":
             system_instruction = text
         else:
@@ -156,22 +413,28 @@ def _inference_gemini(chat, model, token, temperature):
             gemini_role = "model" if role == "assistant" else "user"
             messages.append({"role": gemini_role, "parts": [text]})
     
-    # Create model with system instruction
-    model_instance = genai.GenerativeModel(
-        model, 
-        system_instruction=system_instruction
-    )
+    # Reuse the model object for this key/model/system instruction (configures the key on change)
+    model_instance = clients.client_registry.gemini_model(token, model, system_instruction)
     
-    # Start chat with history
+    # Start chat with history and send the last message
     chat_session = model_instance.start_chat(history=messages[:-1] if len(messages) > 1 else [])
-    
-    # Send the last message
     last_message = messages[-1]["parts"][0] if messages else ""
     
     generation_config = genai.types.GenerationConfig(
         temperature=temperature,
         max_output_tokens=2048,
     )
+    return chat_session, last_message, generation_config
+
+
+def _inference_gemini(chat, model, token, temperature):
+    """Inference using Google Gemini API via google-generativeai SDK."""
+    try:
+        import google.generativeai as genai
+    except ImportError:
+        raise ImportError("google-generativeai package required for Gemini. Install: pip install google-generativeai")
+    
+    chat_session, last_message, generation_config = _gemini_chat_session(genai, chat, model, token, temperature)
     
     try:
         response = chat_session.send_message(last_message, generation_config=generation_config)
@@ -186,51 +449,31 @@ def _inference_openai_sdk(chat, model, api_url, token, temperature):
     Inference using OpenAI SDK for OpenAI-compatible APIs (OpenAI, DeepSeek, NVIDIA, etc.).
     Falls back to requests if OpenAI SDK is not available.
     """
-    try:
-        from openai import OpenAI
-    except ImportError:
+    if importlib.util.find_spec("openai") is None:
         # Fallback to requests-based implementation if OpenAI SDK not available
         return _inference_openai_requests(chat, model, api_url, token, temperature)
     
     # Normalize API URL for OpenAI SDK
     base_url = _normalize_api_url(api_url) if api_url else None
     
-    # Initialize OpenAI client
-    client_kwargs = {
-        "api_key": token,
-    }
-    if base_url:
-        client_kwargs["base_url"] = base_url
+    # Reuse a pooled client for this endpoint and key
+    client = clients.client_registry.openai_client(base_url, token)
     
-    client = OpenAI(**client_kwargs)
+    messages = _openai_messages(chat)
     
-    # Convert chat format to OpenAI messages format
-    messages = []
-    for role, content in chat:
-        # Extract text from content
-        if isinstance(content, list):
-            text = " ".join([item.get("text", "") for item in content if item.get("type") == "text"])
-        else:
-            text = content
-        messages.append({"role": role, "content": text})
-    
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            response = client.chat.completions.create(
-                model=model,
-                messages=messages,
-                max_tokens=2048,
-                temperature=temperature,
-                seed=1234
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            print(f"OpenAI SDK Error (attempt {attempt + 1}/{max_retries}): {e}")
-            if attempt < max_retries - 1:
-                time.sleep(2)
-            else:
-                raise
+    # One attempt; retries are scheduled by the caller (see _scheduled)
+    try:
+        response = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=2048,
+            temperature=temperature,
+            seed=1234
+        )
+        return response.choices[0].message.content
+    except Exception as e:
+        print(f"OpenAI SDK Error: {e}")
+        raise
 
 
 def _inference_openai_requests(chat, model, api_url, token, temperature):
@@ -238,98 +481,198 @@ def _inference_openai_requests(chat, model, api_url, token, temperature):
     Fallback inference using requests for OpenAI-compatible APIs.
     Used when OpenAI SDK is not available.
     """
-    # Normalize API URL - ensure it has /chat/completions endpoint
-    if api_url:
-        api_url_normalized = _normalize_api_url(api_url)
-        if not api_url_normalized.endswith('/chat/completions'):
-            api_url_normalized = api_url_normalized.rstrip('/') + '/chat/completions'
-    else:
-        api_url_normalized = "https://api.openai.com/v1/chat/completions"
+    api_url_normalized = _chat_completions_url(api_url)
     
     headers = {
         "Content-Type": "application/json",
         "Authorization": f"Bearer {token}"
     }
 
-    # Convert chat format to OpenAI messages format
-    messages = []
-    for role, content in chat:
-        # Extract text from content
-        if isinstance(content, list):
-            text = " ".join([item.get("text", "") for item in content if item.get("type") == "text"])
-        else:
-            text = content
-        messages.append({"role": role, "content": text})
-
     data = {
         "model": model,
-        "messages": messages,
+        "messages": _openai_messages(chat),
         "max_tokens": 2048,
         "temperature": temperature,
         "seed": 1234
     }
 
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            res = requests.post(api_url_normalized, headers=headers, json=data, timeout=60)
-            res.raise_for_status()
-            res_json = res.json()
-            res_content = res_json['choices'][0]['message']['content']
-            return res_content
-        except Exception as e:
-            print(f"Network Error (attempt {attempt + 1}/{max_retries}): {e}")
-            if attempt < max_retries - 1:
-                time.sleep(2)
-            else:
-                try:
-                    print(f"Response: {res.json()}")
-                except:
-                    print("Request Failed - no response available")
-                raise
-
-
-def _inference_claude(chat, model, token, temperature):
+    session = clients.client_registry.session("openai", api_url_normalized, token)
+    try:
+        res = session.post(api_url_normalized, headers=headers, json=data, timeout=60)
+        res.raise_for_status()
+        res_json = res.json()
+        res_content = res_json['choices'][0]['message']['content']
+        return res_content
+    except Exception as e:
+        print(f"Network Error: {e}")
+        raise
+
+
+def _inference_claude(chat, model, token, temperature, api_url=None):
     """Inference using Anthropic Claude API."""
-    headers = {
-        "Content-Type": "application/json",
-        "x-api-key": token,
-        "anthropic-version": "2023-06-01"
-    }
+    api_url = api_url or "https://api.anthropic.com/v1/messages"
+    headers = _claude_headers(token)
+    data = _claude_payload(chat, model, temperature)
     
-    # Convert chat format to Claude format
-    system_message = None
-    messages = []
+    session = clients.client_registry.session("claude", api_url, token)
+    try:
+        res = session.post(
+            api_url,
+            headers=headers,
+            json=data,
+            timeout=60
+        )
+        res.raise_for_status()
+        res_json = res.json()
+        return res_json['content'][0]['text']
+    except Exception as e:
+        print(f"Claude API Error: {e}")
+        raise
+
+
+def _stream_gemini(chat, model, token, temperature):
+    """Streaming inference using the Gemini SDK."""
+    try:
+        import google.generativeai as genai
+    except ImportError:
+        raise ImportError("google-generativeai package required for Gemini. Install: pip install google-generativeai")
     
-    for role, content in chat:
-        # Extract text from content
-        if isinstance(content, list):
-            text = " ".join([item.get("text", "") for item in content if item.get("type") == "text"])
-        else:
-            text = content
-            
-        if role == "system":
-            system_message = text
-        else:
-            messages.append({"role": role, "content": text})
+    chat_session, last_message, generation_config = _gemini_chat_session(genai, chat, model, token, temperature)
+    try:
+        response = chat_session.send_message(last_message, generation_config=generation_config, stream=True)
+        for chunk in response:
+            yield chunk.text
+    except Exception as e:
+        print(f"Gemini API Error: {e}")
+        raise
+
+
+def _stream_openai_sdk(chat, model, api_url, token, temperature):
+    """Streaming inference for OpenAI-compatible APIs; falls back to requests without the SDK."""
+    if importlib.util.find_spec("openai") is None:
+        yield from _stream_openai_requests(chat, model, api_url, token, temperature)
+        return
+    
+    base_url = _normalize_api_url(api_url) if api_url else None
+    client = clients.client_registry.openai_client(base_url, token)
     
+    try:
+        stream = client.chat.completions.create(
+            model=model,
+            messages=_openai_messages(chat),
+            max_tokens=2048,
+            temperature=temperature,
+            seed=1234,
+            stream=True
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    except Exception as e:
+        print(f"OpenAI SDK Error: {e}")
+        raise
+
+
+def _stream_openai_requests(chat, model, api_url, token, temperature):
+    """Streaming inference using requests for OpenAI-compatible APIs."""
+    api_url_normalized = _chat_completions_url(api_url)
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {token}"
+    }
     data = {
         "model": model,
-        "messages": messages,
+        "messages": _openai_messages(chat),
         "max_tokens": 2048,
-        "temperature": temperature
+        "temperature": temperature,
+        "seed": 1234,
+        "stream": True
     }
     
-    if system_message:
-        data["system"] = system_message
+    session = clients.client_registry.session("openai", api_url_normalized, token)
+    with session.post(api_url_normalized, headers=headers, json=data, timeout=60, stream=True) as res:
+        res.raise_for_status()
+        for payload in _iter_sse_data(res):
+            if payload == "[DONE]":
+                break
+            choices = json.loads(payload).get("choices") or [{}]
+            content = choices[0].get("delta", {}).get("content")
+            if content:
+                yield content
+
+
+def _stream_claude(chat, model, token, temperature, api_url=None):
+    """Streaming inference using the Anthropic messages API (server-sent events)."""
+    api_url = api_url or "https://api.anthropic.com/v1/messages"
+    data = _claude_payload(chat, model, temperature)
+    data["stream"] = True
     
+    session = clients.client_registry.session("claude", api_url, token)
     try:
-        res = requests.post(
-            "https://api.anthropic.com/v1/messages",
-            headers=headers,
-            json=data,
-            timeout=60
+        with session.post(api_url, headers=_claude_headers(token), json=data, timeout=60, stream=True) as res:
+            res.raise_for_status()
+            for payload in _iter_sse_data(res):
+                event = json.loads(payload)
+                if event.get("type") == "content_block_delta":
+                    text = event.get("delta", {}).get("text")
+                    if text:
+                        yield text
+                elif event.get("type") == "message_stop":
+                    break
+    except Exception as e:
+        print(f"Claude API Error: {e}")
+        raise
+
+
+async def _inference_gemini_async(chat, model, token, temperature):
+    """Async inference using the Gemini SDK."""
+    try:
+        import google.generativeai as genai
+    except ImportError:
+        raise ImportError("google-generativeai package required for Gemini. Install: pip install google-generativeai")
+    
+    chat_session, last_message, generation_config = _gemini_chat_session(genai, chat, model, token, temperature)
+    try:
+        response = await chat_session.send_message_async(last_message, generation_config=generation_config)
+        return response.text
+    except Exception as e:
+        print(f"Gemini API Error: {e}")
+        raise
+
+
+async def _inference_openai_async(chat, model, api_url, token, temperature):
+    """
+    Async inference for OpenAI-compatible APIs using AsyncOpenAI.
+    Runs the requests-based adapter in a worker thread if the SDK is not available.
+    """
+    if importlib.util.find_spec("openai") is None:
+        return await asyncio.to_thread(_inference_openai_requests, chat, model, api_url, token, temperature)
+    
+    base_url = _normalize_api_url(api_url) if api_url else None
+    client = clients.client_registry.async_openai_client(base_url, token)
+    messages = _openai_messages(chat)
+    
+    try:
+        response = await client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=2048,
+            temperature=temperature,
+            seed=1234
         )
+        return response.choices[0].message.content
+    except Exception as e:
+        print(f"OpenAI SDK Error: {e}")
+        raise
+
+
+async def _inference_claude_async(chat, model, token, temperature, api_url=None):
+    """Async inference using the Anthropic messages API over httpx."""
+    api_url = api_url or "https://api.anthropic.com/v1/messages"
+    client = clients.client_registry.async_http_client("claude", api_url, token)
+    try:
+        res = await client.post(api_url, headers=_claude_headers(token), json=_claude_payload(chat, model, temperature))
+        res.raise_for_status()
         res_json = res.json()
         return res_json['content'][0]['text']
     except Exception as e:
@@ -0,0 +1,183 @@
+"""
+Response Cache - Content-addressed cache of LLM completions
+Two tiers: an in-process LRU in front of an optional SQLite store that survives restarts.
+Keys hash the provider, model, endpoint, temperature and normalized chat, so rerunning
+the same instruction over the same workbook does not go over the network again.
+Only deterministic requests (temperature == 0) are cached.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+def normalize_chat(chat):
+    """
+    Flatten a chat history into (role, text) pairs the way the provider adapters do.
+
+    Args:
+        chat: List of [role, content] where content is a string or a list of {"type", "text"} dicts
+
+    Returns:
+        List of [role, text]
+    """
+    normalized = []
+    for role, content in chat:
+        if isinstance(content, list):
+            text = " ".join([item.get("text", "") for item in content if item.get("type") == "text"])
+        else:
+            text = content
+        normalized.append([role, text])
+    return normalized
+
+
+class ResponseCache:
+    """
+    In-memory LRU + optional SQLite response cache with TTL and size-based eviction.
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        max_memory_entries: int = 256,
+        max_disk_bytes: int = 64 * 1024 * 1024,
+        ttl_seconds: Optional[float] = 7 * 24 * 3600,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            db_path: SQLite file for the persistent tier (None: memory only)
+            max_memory_entries: Maximum number of responses kept in the in-process LRU
+            max_disk_bytes: Maximum total size of responses kept in SQLite
+            ttl_seconds: Entries older than this are treated as misses (None: never expire)
+        """
+        self.db_path = db_path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_seconds = ttl_seconds
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, created REAL NOT NULL, "
+                "last_access REAL NOT NULL, size INTEGER NOT NULL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(chat, model, api_url, provider, temperature) -> str:
+        """Hash a request into a cache key."""
+        payload = json.dumps(
+            {
+                "provider": provider,
+                "model": model,
+                "api_url": api_url,
+                "temperature": temperature,
+                "messages": normalize_chat(chat),
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - created > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a response, checking memory first and then SQLite.
+
+        Returns:
+            The cached response, or None on a miss
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                response, created = entry
+                if not self._expired(created):
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return response
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    response, created = row
+                    if not self._expired(created):
+                        self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+                        self._db.commit()
+                        self._remember(key, response, created)
+                        self.disk_hits += 1
+                        return response
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, response: str):
+        """Store a response in both tiers and evict to stay within limits."""
+        now = time.time()
+        with self._lock:
+            self._remember(key, response, now)
+            if self._db is not None:
+                size = len(response.encode("utf-8"))
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, response, created, last_access, size) VALUES (?, ?, ?, ?, ?)",
+                    (key, response, now, now, size),
+                )
+                self._evict_disk()
+                self._db.commit()
+
+    def _remember(self, key: str, response: str, created: float):
+        self._memory[key] = (response, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        if self.ttl_seconds is not None:
+            self._db.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl_seconds,))
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+        # Drop least recently used rows until under budget
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY last_access ASC").fetchall():
+            if total <= self.max_disk_bytes:
+                break
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypassed += 1
+
+    def stats(self) -> dict:
+        """Return hit/miss counters."""
+        with self._lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "memory_entries": len(self._memory),
+            }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -1,26 +1,110 @@
 import copy
+import threading
+from itertools import islice
 
 #TODO modify for our use
 
+
+class ChatLog:
+    """
+    Immutable chat history with O(1) append and O(1) snapshots.
+
+    Iterates like the list of [role, content] the provider adapters expect. Snapshots
+    share one backing list: append() extends it in place when the snapshot is its
+    newest version, and copies only when an older snapshot branches off (e.g. a
+    speculative step appending to the same history). Entries are shared, not copied,
+    so message content must not be mutated after it is added.
+    """
+
+    __slots__ = ("_store", "_length", "_lock")
+
+    def __init__(self, entries=()):
+        """
+        Args:
+            entries: Initial [role, content] messages
+        """
+        self._store = [(role, content) for role, content in entries]
+        self._length = len(self._store)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def _view(cls, store, length, lock):
+        log = cls.__new__(cls)
+        log._store = store
+        log._length = length
+        log._lock = lock
+        return log
+
+    def append(self, role, content):
+        """
+        Return a new ChatLog with one more message; this one is unchanged.
+
+        Args:
+            role: 'system', 'user' or 'assistant'
+            content: A string or a list of {"type", "text"} dicts
+        """
+        with self._lock:
+            if len(self._store) == self._length:
+                self._store.append((role, content))
+                return self._view(self._store, self._length + 1, self._lock)
+        # Another snapshot already extended the shared list: branch off a copy
+        return ChatLog(self._store[:self._length]).append(role, content)
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        return islice(self._store, self._length)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("ChatLog index out of range")
+        return self._store[index]
+
+    def __eq__(self, other):
+        if isinstance(other, (ChatLog, list, tuple)):
+            return len(self) == len(other) and all(
+                list(mine) == list(theirs) for mine, theirs in zip(self, other)
+            )
+        return NotImplemented
+
+    def __repr__(self):
+        return f"ChatLog({list(self)!r})"
+
+    def to_list(self):
+        """Plain [[role, content], ...] copy of the messages."""
+        return [[role, content] for role, content in self]
+
 def init_action_chat():
     operation_history = []
     sysetm_prompt = "You are a helpful AI PC operating assistant. You need to help me operate the PC to complete the user\'s instruction."
     operation_history.append(["system", [{"type": "text", "text": sysetm_prompt}]])
-    return operation_history
+    return ChatLog(operation_history)
+
+
+def init_manager_chat():
+    operation_history = []
+    sysetm_prompt = "You are a helpful AI PC operating assistant. You need to plan the steps that complete the user\'s instruction."
+    operation_history.append(["system", [{"type": "text", "text": sysetm_prompt}]])
+    return ChatLog(operation_history)
 
 
 def init_reflect_chat():
     operation_history = []
     sysetm_prompt = "You are a helpful AI PC operating assistant."
     operation_history.append(["system", [{"type": "text", "text": sysetm_prompt}]])
-    return operation_history
+    return ChatLog(operation_history)
 
 
 def init_memory_chat():
     operation_history = []
     sysetm_prompt = "You are a helpful AI PC operating assistant."
     operation_history.append(["system", [{"type": "text", "text": sysetm_prompt}]])
-    return operation_history
+    return ChatLog(operation_history)
 
 
 def add_response_old(role, prompt, chat_history, image=None):
@@ -36,15 +120,16 @@ def add_response_old(role, prompt, chat_history, image=None):
 
 
 def add_response(role, prompt, chat_history, image=[]):
-    new_chat_history = copy.deepcopy(chat_history)
+    # Structural sharing instead of a deep copy: O(1) per turn, chat_history is left unchanged
+    if not isinstance(chat_history, ChatLog):
+        chat_history = ChatLog(chat_history)
     content = [
         {
         "type": "text", 
         "text": prompt
         },
     ]
-    new_chat_history.append([role, content])
-    return new_chat_history
+    return chat_history.append(role, content)
 
 def print_status(chat_history):
     print("*"*100)
@@ -0,0 +1,236 @@
+"""
+Client Registry - Pooled, reused provider clients for chat/api.py
+Keeps keep-alive requests.Sessions, OpenAI SDK clients and Gemini model objects alive
+across calls so each LLM request does not pay connection (TLS) and client setup again.
+Async clients are kept per event loop, since their connections belong to the loop.
+"""
+
+import asyncio
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+def _key_fingerprint(api_key: Optional[str]) -> str:
+    """Identify an API key without keeping the secret itself in registry keys."""
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+
+class ClientRegistry:
+    """
+    Thread-safe registry of reusable provider clients keyed by provider, base URL and API key.
+    """
+
+    def __init__(self, pool_connections: int = 4, pool_maxsize: int = 16, max_gemini_models: int = 16):
+        """
+        Initialize the registry.
+
+        Args:
+            pool_connections: Number of per-host connection pools kept by each requests.Session
+            pool_maxsize: Maximum keep-alive connections per host (sessions and OpenAI clients)
+            max_gemini_models: Maximum number of cached Gemini model objects (LRU)
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.max_gemini_models = max_gemini_models
+        self._sessions = {}
+        self._openai_clients = {}
+        self._gemini_models: "OrderedDict[tuple, object]" = OrderedDict()
+        self._gemini_configured_key = None
+        # event loop -> {key: async client}; entries go away with their loop
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def session(self, provider: str, base_url: Optional[str], api_key: Optional[str] = None) -> requests.Session:
+        """
+        Get a keep-alive requests.Session for a provider endpoint.
+
+        Args:
+            provider: Provider name (e.g. 'openai', 'claude')
+            base_url: Endpoint the session talks to
+            api_key: API key the requests are made with
+
+        Returns:
+            requests.Session with a sized connection pool
+        """
+        key = (provider, base_url, _key_fingerprint(api_key))
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._sessions[key] = session
+            return session
+
+    def openai_client(self, base_url: Optional[str], api_key: Optional[str]):
+        """
+        Get a reusable OpenAI SDK client for an OpenAI-compatible endpoint.
+
+        Args:
+            base_url: API base URL (None for the OpenAI default)
+            api_key: API key
+
+        Returns:
+            openai.OpenAI instance
+        """
+        from openai import OpenAI, DefaultHttpxClient
+        import httpx
+
+        key = (base_url, _key_fingerprint(api_key))
+        with self._lock:
+            client = self._openai_clients.get(key)
+            if client is None:
+                client_kwargs = {
+                    "api_key": api_key,
+                    # Retries are scheduled by chat/retry.py
+                    "max_retries": 0,
+                    "http_client": DefaultHttpxClient(
+                        limits=httpx.Limits(
+                            max_connections=self.pool_maxsize, max_keepalive_connections=self.pool_maxsize
+                        )
+                    ),
+                }
+                if base_url:
+                    client_kwargs["base_url"] = base_url
+                client = OpenAI(**client_kwargs)
+                self._openai_clients[key] = client
+            return client
+
+    def _loop_clients(self) -> dict:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            return self._async_clients.setdefault(loop, {})
+
+    def async_openai_client(self, base_url: Optional[str], api_key: Optional[str]):
+        """
+        Get a reusable AsyncOpenAI client for the running event loop.
+
+        Args:
+            base_url: API base URL (None for the OpenAI default)
+            api_key: API key
+
+        Returns:
+            openai.AsyncOpenAI instance
+        """
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+        import httpx
+
+        loop_clients = self._loop_clients()
+        key = ("openai", base_url, _key_fingerprint(api_key))
+        client = loop_clients.get(key)
+        if client is None:
+            client_kwargs = {
+                "api_key": api_key,
+                "max_retries": 0,
+                "http_client": DefaultAsyncHttpxClient(
+                    limits=httpx.Limits(max_connections=self.pool_maxsize, max_keepalive_connections=self.pool_maxsize)
+                ),
+            }
+            if base_url:
+                client_kwargs["base_url"] = base_url
+            client = loop_clients[key] = AsyncOpenAI(**client_kwargs)
+        return client
+
+    def async_http_client(self, provider: str, base_url: Optional[str], api_key: Optional[str] = None):
+        """
+        Get a keep-alive httpx.AsyncClient for a provider endpoint on the running event loop.
+
+        Args:
+            provider: Provider name (e.g. 'claude')
+            base_url: Endpoint the client talks to
+            api_key: API key the requests are made with
+
+        Returns:
+            httpx.AsyncClient instance
+        """
+        import httpx
+
+        loop_clients = self._loop_clients()
+        key = (provider, base_url, _key_fingerprint(api_key))
+        client = loop_clients.get(key)
+        if client is None:
+            client = loop_clients[key] = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.pool_maxsize, max_keepalive_connections=self.pool_maxsize),
+                timeout=60,
+            )
+        return client
+
+    async def aclose(self):
+        """Close the async clients of the running event loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            loop_clients = self._async_clients.pop(loop, {})
+        for client in loop_clients.values():
+            if hasattr(client, "aclose"):
+                await client.aclose()  # httpx.AsyncClient
+            else:
+                await client.close()  # openai.AsyncOpenAI
+
+    def gemini_model(self, api_key: Optional[str], model: str, system_instruction: Optional[str]):
+        """
+        Get a reusable Gemini GenerativeModel for a (key, model, system instruction) triple.
+
+        genai.configure is process-global, so it is only called again when the key changes.
+
+        Args:
+            api_key: Gemini API key
+            model: Model name
+            system_instruction: System prompt bound to the model object
+
+        Returns:
+            google.generativeai.GenerativeModel instance
+        """
+        import google.generativeai as genai
+
+        key = (_key_fingerprint(api_key), model, system_instruction)
+        with self._lock:
+            if self._gemini_configured_key != api_key:
+                genai.configure(api_key=api_key)
+                self._gemini_configured_key = api_key
+                # Models are bound to the previously configured client
+                self._gemini_models.clear()
+            model_instance = self._gemini_models.get(key)
+            if model_instance is None:
+                model_instance = genai.GenerativeModel(model, system_instruction=system_instruction)
+                self._gemini_models[key] = model_instance
+                while len(self._gemini_models) > self.max_gemini_models:
+                    self._gemini_models.popitem(last=False)
+            else:
+                self._gemini_models.move_to_end(key)
+            return model_instance
+
+    def close(self):
+        """Close all pooled connections."""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            for client in self._openai_clients.values():
+                client.close()
+            self._sessions.clear()
+            self._openai_clients.clear()
+            self._gemini_models.clear()
+
+
+# Process-wide registry used by chat/api.py
+client_registry = ClientRegistry()
+
+
+def configure_client_pools(pool_connections: int = 4, pool_maxsize: int = 16, max_gemini_models: int = 16):
+    """
+    Replace the process-wide registry with one using the given pool sizes.
+
+    Args:
+        pool_connections: Number of per-host connection pools per requests.Session
+        pool_maxsize: Maximum keep-alive connections per host
+        max_gemini_models: Maximum number of cached Gemini model objects
+    """
+    global client_registry
+    client_registry.close()
+    client_registry = ClientRegistry(pool_connections, pool_maxsize, max_gemini_models)
@@ -1,7 +1,8 @@
-from ExcelAgent.utils.utils import read_excel_file
+from ExcelAgent.utils.sheet_state import render_sheet_state
+from ExcelAgent.utils.sheet_diff import diff_snapshots
 
-def get_manager_initial_prompt(instruction, excel_file_path, thought_history, summary_history, action_history, completed_content, add_info):
-    excel_file = read_excel_file(excel_file_path)
+def get_manager_initial_prompt(instruction, excel_file_path, thought_history, summary_history, action_history, completed_content, add_info, sheet_state=None, token_budget=None):
+    excel_file = render_sheet_state(excel_file_path, sheet_state, token_budget=token_budget)
     
     prompt = "### Background ###\n"
     prompt += f"The user has provided the following instruction: \"{instruction}\".\n"
@@ -13,14 +14,15 @@ def get_manager_initial_prompt(instruction, excel_file_path, thought_history, su
 
     prompt += "### Output Requirements ###\n"
     prompt += "Provide a list of subtasks with clear and concise descriptions. Each subtask should be formatted as a short sentence. Ensure that the overall set of subtasks, when executed in order, would complete the user's instruction.\n"
+    prompt += "End each subtask with the columns it reads or changes in brackets, as column letters or header names (e.g. [columns: A, C]), or [columns: all] if it works on whole rows or the entire sheet. Subtasks on different columns may be carried out at the same time, so keep work on separate columns in separate subtasks.\n"
     prompt += "For example:\n"
-    prompt += "1. Select the range from A1 to D10.\n"
-    prompt += "2. Apply left alignment to all selected cells.\n"
-    prompt += "3. Filter out rows containing the keyword 'abc'.\n"
-    prompt += "4. Summarize the data in a new text cell.\n\n"
+    prompt += "1. Select the range from A1 to D10. [columns: A, B, C, D]\n"
+    prompt += "2. Apply left alignment to all selected cells. [columns: A, B, C, D]\n"
+    prompt += "3. Filter out rows containing the keyword 'abc'. [columns: all]\n"
+    prompt += "4. Summarize the data in a new text cell. [columns: all]\n\n"
 
     prompt += "### Your Output ###\n"
-    prompt += "List the subtasks only, one per line, numbered in order.\n"
+    prompt += "List the subtasks only, one per line, numbered in order, each with its columns.\n"
 
     if add_info != "":
         prompt += "### Hint ###\n"
@@ -31,11 +33,29 @@ def get_manager_initial_prompt(instruction, excel_file_path, thought_history, su
     return prompt
 
 before_action_excel_file = ""
+before_action_snapshot = None
 
-def get_action_prompt(subtask_instruction, excel_file_path, thought_history, summary_history, action_history, last_summary, last_action, reflection_thought, add_info, error_flag, completed_content, memory, use_som, icon_caption, location_info):
-    global before_action_excel_file
-    excel_file = read_excel_file(excel_file_path)
+def record_before_action_state(excel_file, sheet_state=None):
+    """
+    Remember the sheet the next action is decided on, for the reflection prompt's before/after comparison.
+
+    Args:
+        excel_file: Rendered sheet text
+        sheet_state: Optional sheet-state provider to snapshot for the cell-level diff
+    """
+    global before_action_excel_file, before_action_snapshot
     before_action_excel_file = excel_file
+    before_action_snapshot = sheet_state.snapshot() if sheet_state is not None else None
+    if sheet_state is not None:
+        # Subtasks running concurrently on their own sheets each compare against their own state
+        sheet_state.before_action = (before_action_excel_file, before_action_snapshot)
+
+
+def get_action_prompt(subtask_instruction, excel_file_path, thought_history, summary_history, action_history, last_summary, last_action, reflection_thought, add_info, error_flag, completed_content, memory, use_som, icon_caption, location_info, sheet_state=None, token_budget=None, record_before_state=True, max_actions=1):
+    excel_file = render_sheet_state(excel_file_path, sheet_state, token_budget=token_budget)
+    # A speculative prompt must not replace the state the in-flight reflection compares against
+    if record_before_state:
+        record_before_action_state(excel_file, sheet_state)
     
     prompt = "### Background ###\n"
     prompt += f"You are an Excel operating assistant. The current user instruction is: \"{subtask_instruction}\".\n"
@@ -78,7 +98,11 @@ def get_action_prompt(subtask_instruction, excel_file_path, thought_history, sum
         prompt += "\n\n"
 
     prompt += "### Task Requirements ###\n"
-    prompt += "Based on the current state and the above history, decide the next single operation to perform on the Excel file. "
+    if max_actions > 1:
+        prompt += f"Based on the current state and the above history, decide the next operations to perform on the Excel file: up to {max_actions} actions, executed in order as one step and reviewed together afterwards. "
+        prompt += "Plan every action you can already decide from the current state, and end the plan where you need to see a result before continuing. "
+    else:
+        prompt += "Based on the current state and the above history, decide the next single operation to perform on the Excel file. "
     prompt += "For certain items that require selection, such as font and font size, direct input is more efficient than scrolling through choices."
     prompt += "You must choose one of the actions below, optionally with an IF condition:\n\n"
     
@@ -94,6 +118,7 @@ def get_action_prompt(subtask_instruction, excel_file_path, thought_history, sum
     prompt += "3. Select Input Field: Select the input field (the formula bar at the top of Excel) for entering text into a cell.\n\n"
     
     prompt += "4. Set: Type a specified text into the input field. The text to set should be provided as a parameter. "
+    prompt += "Text starting with '=' is entered as an Excel formula (cell references are sheet addresses, where row 2 is DataFrame row 0) and the sheet then shows its computed value. "
     prompt += "Optionally, include an IF condition (e.g., IF input field is empty).\n\n"
     
     prompt += "5. Copy/Paste/Delete/...: Choose a tool from the right-click context menu to perform operations such as copy, paste, delete, etc. "
@@ -109,7 +134,10 @@ def get_action_prompt(subtask_instruction, excel_file_path, thought_history, sum
     prompt += "### Output Format ###\n"
     prompt += "Your output must be divided into the following three sections:\n"
     prompt += "1. ### Thought ###\n   Describe your reasoning for the chosen operation based on the current state and history.\n"
-    prompt += "2. ### Action ###\n   Specify the single operation you will perform. Use the exact action name from the list above and include any parameters in parentheses. "
+    if max_actions > 1:
+        prompt += "2. ### Action ###\n   Specify the operations you will perform, in order, separated by ' ; ' (e.g. 'Select(0, 0, 4, 0) ; Format(bold)'). A Tell User or Terminate action ends the plan. Use the exact action names from the list above and include any parameters in parentheses. "
+    else:
+        prompt += "2. ### Action ###\n   Specify the single operation you will perform. Use the exact action name from the list above and include any parameters in parentheses. "
     prompt += "If using an IF statement, include it at the end in the format 'IF [condition]'.\n"
     prompt += "3. ### Summary ###\n   Provide a brief natural language summary of what this operation will accomplish (e.g., 'Select cells A1:D10 and apply left alignment').\n\n"
     
@@ -118,19 +146,34 @@ def get_action_prompt(subtask_instruction, excel_file_path, thought_history, sum
     return prompt
 
 
-def get_reflect_prompt(subtask_inst, excel_file_path, summary, action, add_info):
-    excel_file = read_excel_file(excel_file_path)
+def get_reflect_prompt(subtask_inst, excel_file_path, summary, action, add_info, sheet_state=None, use_diff=True, token_budget=None):
+    after_snapshot = sheet_state.snapshot() if (use_diff and sheet_state is not None) else None
+    before_excel_file, before_snapshot = before_action_excel_file, before_action_snapshot
+    if sheet_state is not None and sheet_state.before_action is not None:
+        before_excel_file, before_snapshot = sheet_state.before_action
     
     prompt = "### Background ###\n"    
     prompt += f"You are an Excel operating assistant reviewing the outcome of the recent operation for the instruction: \"{subtask_inst}\".\n"
     
-    prompt += "### Before the Operation ###\n"
-    prompt += f"Before Excel file status: {before_action_excel_file}\n\n"
-    prompt += "Assume that the Excel file was in its previous state prior to the operation.\n\n"
-    
-    prompt += "### After the Operation ###\n"
-    prompt += f"After Excel file status: {excel_file}\n\n"
-    prompt += "The operation has been executed. The Excel file now reflects the changes made.\n\n"
+    if before_snapshot is not None and after_snapshot is not None:
+        # Compact change list instead of two full sheet dumps
+        sheet_diff = diff_snapshots(before_snapshot, after_snapshot)
+        after_df = after_snapshot.df
+        prompt += "### Changes Made by the Operation ###\n"
+        prompt += f"Sheet after the operation: {after_df.shape[0]} rows × {after_df.shape[1]} columns; Columns: {list(after_df.columns)}\n"
+        prompt += "Cell addresses use Excel notation (row 1 is the header row, DataFrame row 0 is Excel row 2).\n"
+        prompt += sheet_diff.render() + "\n\n"
+        prompt += "The operation has been executed. The list above is every difference between the before and after states.\n\n"
+    else:
+        excel_file = render_sheet_state(excel_file_path, sheet_state, token_budget=token_budget)
+        
+        prompt += "### Before the Operation ###\n"
+        prompt += f"Before Excel file status: {before_excel_file}\n\n"
+        prompt += "Assume that the Excel file was in its previous state prior to the operation.\n\n"
+        
+        prompt += "### After the Operation ###\n"
+        prompt += f"After Excel file status: {excel_file}\n\n"
+        prompt += "The operation has been executed. The Excel file now reflects the changes made.\n\n"
    
     prompt += "### Operation Details ###\n"
     prompt += f"Operation Thought: {summary.split(' to ')[0].strip()}\n"
@@ -1,9 +1,56 @@
-from ExcelAgent.chat.prompt import get_action_prompt, get_reflect_prompt, get_process_prompt
-from ExcelAgent.chat.api import inference_chat
-from ExcelAgent.chat.chat import init_action_chat, init_reflect_chat, init_memory_chat, add_response
+import asyncio
+import re
+
+from ExcelAgent.chat.prompt import (
+    get_manager_initial_prompt, get_action_prompt, get_reflect_prompt, get_process_prompt, get_memory_prompt
+)
+from ExcelAgent.chat.api import inference_chat, inference_chat_async, inference_chat_stream
+from ExcelAgent.chat.stream_parser import SectionStreamParser, clean_action
+from ExcelAgent.chat.chat import init_manager_chat, init_action_chat, init_reflect_chat, init_memory_chat, add_response
 from ExcelAgent.agents.agent_state import AgentState
 
-def action_agent_response(subtask_inst, excel_file_path, agent_state: AgentState, add_info):
+SUMMARY_HEADER = re.compile(r"### (?:Summary|Operation) ###")
+SUBTASK_LINE = re.compile(r"^\s*\d+\s*[.)]\s*(.+?)\s*$", re.MULTILINE)
+
+
+def manager_agent_response(instruction, excel_file_path, agent_state: AgentState, add_info, sheet_state=None):
+    """
+    Ask the manager agent to decompose an instruction into subtasks.
+
+    Returns:
+        The numbered subtasks in order, with their "[columns: ...]" annotations
+        (see ExcelAgent/agents/subtask_scheduler.py); [instruction] if none are listed
+    """
+    prompt_manager = get_manager_initial_prompt(
+        instruction,
+        excel_file_path,
+        agent_state.thought_history,
+        agent_state.summary_history,
+        agent_state.action_history,
+        agent_state.completed_requirements,
+        add_info,
+        sheet_state=sheet_state,
+        token_budget=agent_state.summary_token_budget,
+    )
+    chat_manager = init_manager_chat()
+    chat_manager = add_response("user", prompt_manager, chat_manager)
+    output_manager = inference_chat(
+        chat_manager,
+        agent_state.vl_model_version,
+        agent_state.api_url,
+        agent_state.api_token,
+        provider=agent_state.model_provider,
+        temperature=agent_state.temperature
+    )
+    status = "#" * 50 + " Manager " + "#" * 50
+    print(status)
+    print(output_manager)
+    print('#' * len(status))
+    return SUBTASK_LINE.findall(output_manager) or [instruction]
+
+
+def _action_chat(subtask_inst, excel_file_path, agent_state: AgentState, add_info, sheet_state=None,
+                 record_before_state=True):
     last_summary = agent_state.summary_history[-1] if agent_state.summary_history else ""
     last_action = agent_state.action_history[-1] if agent_state.action_history else ""
     prompt_action = get_action_prompt(
@@ -22,19 +69,18 @@ def action_agent_response(subtask_inst, excel_file_path, agent_state: AgentState
         agent_state.use_som,
         agent_state.icon_caption,
         agent_state.location_info,
+        sheet_state=sheet_state,
+        token_budget=agent_state.summary_token_budget,
+        record_before_state=record_before_state,
+        max_actions=agent_state.max_actions,
     )
 
     chat_action = init_action_chat()
-    chat_action = add_response("user", prompt_action, chat_action)
+    return add_response("user", prompt_action, chat_action)
 
-    output_action = inference_chat(
-        chat_action, 
-        agent_state.vl_model_version, 
-        agent_state.api_url, 
-        agent_state.api_token,
-        provider=agent_state.model_provider,
-        temperature=agent_state.temperature
-    )
+
+def _parse_action_output(output_action):
+    """Split an action-agent completion into (thought, summary, action)."""
     thought = (
         output_action.split("### Thought ###")[-1]
         .split("### Action ###")[0]
@@ -43,19 +89,67 @@ def action_agent_response(subtask_inst, excel_file_path, agent_state: AgentState
         .replace("  ", " ")
         .strip()
     )
+    # The prompt asks for a Summary section; older prompts called it Operation
     action = (
-        output_action.split("### Action ###")[-1]
-        .split("### Operation ###")[0]
+        re.split(SUMMARY_HEADER, output_action.split("### Action ###")[-1])[0]
         .replace("\n", " ")
         .replace("  ", " ")
         .strip()
     )
     summary = (
-        output_action.split("### Operation ###")[-1]
+        re.split(SUMMARY_HEADER, output_action)[-1]
         .replace("\n", " ")
         .replace("  ", " ")
         .strip()
     )
+    return thought, summary, action
+
+
+def action_agent_response(subtask_inst, excel_file_path, agent_state: AgentState, add_info, sheet_state=None,
+                          stream=False, on_action=None):
+    """
+    Ask the action agent for the next operation.
+
+    With stream=True the completion is streamed and on_action(action) is called as soon as
+    the Action section is complete, before the model has finished writing its Summary.
+    Returns (thought, summary, action).
+    """
+    chat_action = _action_chat(subtask_inst, excel_file_path, agent_state, add_info, sheet_state)
+
+    early_action = None
+    if stream:
+        def on_section(name, text):
+            nonlocal early_action
+            if name.lower() == "action" and early_action is None:
+                early_action = clean_action(text)
+                if on_action is not None:
+                    on_action(early_action)
+
+        parser = SectionStreamParser(on_section=on_section)
+        for chunk in inference_chat_stream(
+            chat_action,
+            agent_state.vl_model_version,
+            agent_state.api_url,
+            agent_state.api_token,
+            provider=agent_state.model_provider,
+            temperature=agent_state.temperature
+        ):
+            parser.feed(chunk)
+        parser.close()
+        output_action = parser.text
+    else:
+        output_action = inference_chat(
+            chat_action, 
+            agent_state.vl_model_version, 
+            agent_state.api_url, 
+            agent_state.api_token,
+            provider=agent_state.model_provider,
+            temperature=agent_state.temperature
+        )
+    thought, summary, action = _parse_action_output(output_action)
+    if early_action is not None:
+        # Report exactly the action that was already handed to on_action
+        action = early_action
     chat_action = add_response("assistant", output_action, chat_action)
     status = "#" * 50 + " Decision " + "#" * 50
     print(status)
@@ -64,8 +158,9 @@ def action_agent_response(subtask_inst, excel_file_path, agent_state: AgentState
 
     return thought, summary, action
 
-def reflect_agent_response(subtask_inst, thought, summary, action, excel_file_path, agent_state: AgentState, add_info):
-    prompt_reflect = get_reflect_prompt(subtask_inst, excel_file_path, summary, action, add_info)
+def reflect_agent_response(subtask_inst, thought, summary, action, excel_file_path, agent_state: AgentState, add_info, sheet_state=None):
+    prompt_reflect = get_reflect_prompt(subtask_inst, excel_file_path, summary, action, add_info, sheet_state=sheet_state,
+                                        token_budget=agent_state.summary_token_budget)
     chat_reflect = init_reflect_chat()
     chat_reflect = add_response("user", prompt_reflect, chat_reflect)
 
@@ -90,6 +185,7 @@ def reflect_agent_response(subtask_inst, thought, summary, action, excel_file_pa
     print(output_reflect)
     print('#' * len(status))
 
+    agent_state.reflection_accepted = 'A' in reflect or not ('B' in reflect or 'C' in reflect)
     if 'A' in reflect:
         agent_state.thought_history.append(thought)
         agent_state.summary_history.append(summary)
@@ -162,4 +258,117 @@ def reflect_agent_response(subtask_inst, thought, summary, action, excel_file_pa
             output_planning.split("### Completed contents ###")[-1].replace("\n", " ").strip()
         )
 
-    return reflection_thought
\ No newline at end of file
+    return reflection_thought
+
+
+async def _bounded(limiter, coro):
+    """Await coro while holding the optional asyncio.Semaphore that caps concurrent LLM calls."""
+    if limiter is None:
+        return await coro
+    async with limiter:
+        return await coro
+
+
+def _agent_inference_async(chat, agent_state: AgentState, limiter=None):
+    return _bounded(limiter, inference_chat_async(
+        chat,
+        agent_state.vl_model_version,
+        agent_state.api_url,
+        agent_state.api_token,
+        provider=agent_state.model_provider,
+        temperature=agent_state.temperature
+    ))
+
+
+def _print_output(title, output):
+    status = "#" * 50 + f" {title} " + "#" * 50
+    print(status)
+    print(output)
+    print('#' * len(status))
+
+
+async def memory_agent_response_async(agent_state: AgentState, limiter=None):
+    """Ask the memory agent for important content and add it to agent_state.memory."""
+    chat_mem = init_memory_chat()
+    chat_mem = add_response("user", get_memory_prompt(agent_state.insight), chat_mem)
+    output_memory = await _agent_inference_async(chat_mem, agent_state, limiter)
+    _print_output("Memory", output_memory)
+    output_memory = (
+        output_memory.split("### Important content ###")[-1].split("\n\n")[0].strip() + "\n"
+    )
+    if "None" not in output_memory and output_memory not in agent_state.memory:
+        agent_state.memory += output_memory
+    return output_memory
+
+
+async def reflect_agent_response_async(subtask_inst, thought, summary, action, excel_file_path, agent_state: AgentState,
+                                       add_info, sheet_state=None, limiter=None):
+    """
+    Async reflect_agent_response with the same effect on agent_state.
+
+    The planning prompt only depends on the executed step, so planning is requested
+    alongside the reflection instead of after it; its answer is discarded when the
+    reflection rejects the step (B/C).
+    """
+    prompt_reflect = get_reflect_prompt(subtask_inst, excel_file_path, summary, action, add_info, sheet_state=sheet_state,
+                                        token_budget=agent_state.summary_token_budget)
+    chat_reflect = init_reflect_chat()
+    chat_reflect = add_response("user", prompt_reflect, chat_reflect)
+
+    prompt_planning = get_process_prompt(
+        subtask_inst,
+        agent_state.thought_history + [thought],
+        agent_state.summary_history + [summary],
+        agent_state.action_history + [action],
+        agent_state.completed_requirements,
+        add_info,
+    )
+    chat_planning = init_memory_chat()
+    chat_planning = add_response("user", prompt_planning, chat_planning)
+
+    output_reflect, output_planning = await asyncio.gather(
+        _agent_inference_async(chat_reflect, agent_state, limiter),
+        _agent_inference_async(chat_planning, agent_state, limiter),
+    )
+    _print_output("Reflection", output_reflect)
+    reflection_thought = (
+        output_reflect.split("### Thought ###")[-1]
+        .split("### Answer ###")[0]
+        .replace("\n", " ")
+        .strip()
+    )
+    reflect = output_reflect.split("### Answer ###")[-1].replace("\n", " ").strip()
+
+    agent_state.reflection_accepted = 'A' in reflect or not ('B' in reflect or 'C' in reflect)
+    if agent_state.reflection_accepted:
+        agent_state.thought_history.append(thought)
+        agent_state.summary_history.append(summary)
+        agent_state.action_history.append(action)
+        _print_output("Planning", output_planning)
+        agent_state.completed_requirements = (
+            output_planning.split("### Completed contents ###")[-1].replace("\n", " ").strip()
+        )
+        if 'A' in reflect:
+            agent_state.error_flag = False
+    else:
+        agent_state.error_flag = True
+
+    return reflection_thought
+
+
+async def action_agent_response_async(subtask_inst, excel_file_path, agent_state: AgentState, add_info,
+                                      sheet_state=None, limiter=None, speculative=False):
+    """
+    Async action_agent_response.
+
+    With speculative=True the prompt does not replace the before-action state that an
+    in-flight reflection compares against (see prompt.record_before_action_state), and
+    the decision is printed only once it is used.
+    Returns (thought, summary, action, output_action).
+    """
+    chat_action = _action_chat(subtask_inst, excel_file_path, agent_state, add_info, sheet_state,
+                               record_before_state=not speculative)
+    output_action = await _agent_inference_async(chat_action, agent_state, limiter)
+    if not speculative:
+        _print_output("Decision", output_action)
+    return _parse_action_output(output_action) + (output_action,)
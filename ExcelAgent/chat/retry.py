@@ -0,0 +1,348 @@
+"""
+Retry Scheduler - Rate-limit-aware retries for LLM provider calls
+Per-provider request and token buckets pace calls before they are sent; failed calls
+are retried with exponential backoff and full jitter (so concurrent callers do not
+retry in lockstep), honouring Retry-After on 429/503 responses; a per-provider
+circuit breaker stops sending requests to a provider that keeps failing (rate limiting
+alone does not open it).
+"""
+
+import asyncio
+import email.utils
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+# HTTP statuses worth retrying: timeouts, rate limits and server-side failures
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a provider whose circuit breaker is open."""
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Backoff settings.
+
+    Attributes:
+        max_attempts: Total attempts per call, including the first
+        base_delay: Backoff for the first retry in seconds (doubles per attempt)
+        max_delay: Upper bound for a single backoff
+        max_retry_after: Upper bound for an honoured Retry-After
+    """
+    max_attempts: int = 4
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+    max_retry_after: float = 120.0
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None, rng=random) -> float:
+        """
+        Delay before retry number `attempt` (1-based).
+
+        Uses "full jitter" (uniform between 0 and the exponential cap). A server-provided
+        Retry-After is a lower bound, with a little jitter on top to spread the retries.
+        """
+        cap = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        if retry_after is not None:
+            return min(retry_after, self.max_retry_after) + rng.uniform(0, self.base_delay)
+        return rng.uniform(0, cap)
+
+
+@dataclass
+class ProviderLimits:
+    """
+    Client-side rate limits for one provider (None: unlimited).
+
+    Attributes:
+        requests_per_minute: Request bucket refill rate
+        tokens_per_minute: Token bucket refill rate (prompt tokens, estimated)
+    """
+    requests_per_minute: Optional[float] = None
+    tokens_per_minute: Optional[float] = None
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. reserve() debits immediately and returns how long the
+    caller must wait, so concurrent callers are spaced out instead of all waking at once.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None, clock=time.monotonic):
+        """
+        Args:
+            rate_per_minute: Refill rate
+            capacity: Burst size (defaults to one minute of refill)
+            clock: Monotonic clock, replaceable for testing
+        """
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.clock = clock
+        self._level = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1.0) -> float:
+        """
+        Take `amount` from the bucket.
+
+        Returns:
+            Seconds to wait before the reserved amount is actually available
+        """
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = self.clock()
+            self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+            self._updated = now
+            self._level -= amount
+            return 0.0 if self._level >= 0 else -self._level / self.rate
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after `failure_threshold` consecutive failures; after `reset_timeout`
+    one trial call is let through (half-open), which closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may be sent now."""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and self.clock() - self._opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._trial_in_flight = False
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self._opened_at = self.clock()
+            self._trial_in_flight = False
+
+    def retry_in(self) -> float:
+        """Seconds until the open circuit lets a trial call through."""
+        with self._lock:
+            if self.state != "open":
+                return 0.0
+            return max(self.reset_timeout - (self.clock() - self._opened_at), 0.0)
+
+
+def _parse_retry_after(headers) -> Optional[float]:
+    """Read Retry-After (seconds or HTTP date) or OpenAI's retry-after-ms from response headers."""
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+        return max(when.timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_error(error: Exception) -> Tuple[bool, Optional[float]]:
+    """
+    Decide whether a provider error is worth retrying.
+
+    Understands requests/httpx HTTP errors, OpenAI SDK errors and google.api_core
+    errors without importing them, by looking at status codes and response headers.
+
+    Returns:
+        (retryable, retry_after seconds or None)
+    """
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None)
+    if status is None and response is not None:
+        status = getattr(response, "status_code", None)
+    if status is None and isinstance(getattr(error, "code", None), int):
+        status = error.code  # google.api_core.exceptions
+    if status is not None:
+        headers = getattr(response, "headers", None)
+        return status in RETRYABLE_STATUS, _parse_retry_after(headers)
+
+    # No HTTP status: connection resets, timeouts, DNS failures
+    name = type(error).__name__
+    transient = ("ConnectionError", "ConnectError", "Timeout", "TimeoutError", "APIConnectionError",
+                 "APITimeoutError", "RemoteProtocolError", "ReadError", "ChunkedEncodingError")
+    return any(part in name for part in transient), None
+
+
+class RetryScheduler:
+    """
+    Shared scheduler for provider calls: pacing, retries and circuit breaking per provider.
+    """
+
+    def __init__(self, policy: Optional[RetryPolicy] = None, limits: Optional[Dict[str, ProviderLimits]] = None,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0, seed: Optional[int] = None):
+        """
+        Args:
+            policy: Backoff settings
+            limits: Client-side rate limits per provider name
+            failure_threshold: Consecutive failures that open a provider's circuit
+            reset_timeout: Seconds an open circuit waits before a trial call
+            seed: Seed for the jitter (None: random)
+        """
+        self.policy = policy or RetryPolicy()
+        self.limits = limits or {}
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._rng = random.Random(seed)
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "retries": 0, "rate_limited": 0, "circuit_rejections": 0, "paced_seconds": 0.0,
+                      "backoff_seconds": 0.0}
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(provider)
+            if breaker is None:
+                breaker = self._breakers[provider] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return breaker
+
+    def _bucket(self, provider: str, kind: str) -> Optional[TokenBucket]:
+        limits = self.limits.get(provider)
+        rate = getattr(limits, f"{kind}_per_minute", None) if limits else None
+        if not rate:
+            return None
+        with self._lock:
+            bucket = self._buckets.get((provider, kind))
+            if bucket is None:
+                bucket = self._buckets[(provider, kind)] = TokenBucket(rate)
+            return bucket
+
+    def _pacing_delay(self, provider: str, estimated_tokens: int) -> float:
+        delay = 0.0
+        requests_bucket = self._bucket(provider, "requests")
+        if requests_bucket is not None:
+            delay = max(delay, requests_bucket.reserve(1))
+        tokens_bucket = self._bucket(provider, "tokens")
+        if tokens_bucket is not None and estimated_tokens:
+            delay = max(delay, tokens_bucket.reserve(estimated_tokens))
+        return delay
+
+    def _admit(self, provider: str):
+        breaker = self.breaker(provider)
+        if not breaker.allow():
+            with self._lock:
+                self.stats["circuit_rejections"] += 1
+            raise CircuitOpenError(
+                f"{provider}: circuit open after repeated failures; retry in {breaker.retry_in():.1f}s"
+            )
+        return breaker
+
+    def _on_failure(self, provider: str, breaker: CircuitBreaker, error: Exception, attempt: int) -> float:
+        """Record a failed attempt; return the backoff before the next one or re-raise."""
+        retryable, retry_after = classify_error(error)
+        if not retryable:
+            # The request itself is wrong (400/401/404...); the provider is healthy
+            breaker.record_success()
+            raise error
+        status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+        if status == 429:
+            # Throttled, not broken: back off without counting towards the circuit breaker
+            breaker.record_success()
+            with self._lock:
+                self.stats["rate_limited"] += 1
+        else:
+            breaker.record_failure()
+        if attempt >= self.policy.max_attempts or breaker.state == "open":
+            raise error
+        delay = self.policy.backoff(attempt, retry_after, self._rng)
+        with self._lock:
+            self.stats["retries"] += 1
+            self.stats["backoff_seconds"] += delay
+        print(f"{provider} request failed (attempt {attempt}/{self.policy.max_attempts}): {error}; "
+              f"retrying in {delay:.2f}s")
+        return delay
+
+    def call(self, provider: str, fn: Callable, estimated_tokens: int = 0, sleep=time.sleep):
+        """
+        Run fn() with pacing, retries and circuit breaking.
+
+        Args:
+            provider: Provider name (buckets and breaker are per provider)
+            fn: Zero-argument callable making one attempt
+            estimated_tokens: Prompt size for the token bucket
+            sleep: Sleep function (replaceable for testing)
+
+        Returns:
+            fn's result
+        """
+        with self._lock:
+            self.stats["calls"] += 1
+        attempt = 0
+        while True:
+            attempt += 1
+            breaker = self._admit(provider)
+            delay = self._pacing_delay(provider, estimated_tokens if attempt == 1 else 0)
+            if delay:
+                with self._lock:
+                    self.stats["paced_seconds"] += delay
+                sleep(delay)
+            try:
+                result = fn()
+            except Exception as e:
+                sleep(self._on_failure(provider, breaker, e, attempt))
+                continue
+            breaker.record_success()
+            return result
+
+    async def acall(self, provider: str, fn: Callable, estimated_tokens: int = 0):
+        """
+        Async counterpart of call(); fn() must return an awaitable for one attempt.
+        """
+        with self._lock:
+            self.stats["calls"] += 1
+        attempt = 0
+        while True:
+            attempt += 1
+            breaker = self._admit(provider)
+            delay = self._pacing_delay(provider, estimated_tokens if attempt == 1 else 0)
+            if delay:
+                with self._lock:
+                    self.stats["paced_seconds"] += delay
+                await asyncio.sleep(delay)
+            try:
+                result = await fn()
+            except Exception as e:
+                await asyncio.sleep(self._on_failure(provider, breaker, e, attempt))
+                continue
+            breaker.record_success()
+            return result
@@ -0,0 +1,221 @@
+"""
+Hedged Router - Tail-latency hedging and failover across several LLM backends
+Sends a request to the first backend; if it has not answered within that backend's
+observed p95 latency, sends the same request to the next backend and returns whichever
+answers first, cancelling the other. Errors fail over to the next backend. Per-backend
+latency histograms drive the hedge delay and are exposed for monitoring.
+"""
+
+import asyncio
+import bisect
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from . import clients
+from .api import inference_chat_async
+
+
+@dataclass
+class Backend:
+    """
+    One (provider, model) endpoint.
+
+    Attributes:
+        provider: Provider name as accepted by inference_chat
+        model: Model name
+        api_url: Endpoint URL (None for the provider default / Gemini SDK)
+        token: API key or env var name
+    """
+    provider: str
+    model: str
+    api_url: Optional[str] = None
+    token: Optional[str] = None
+
+    @property
+    def name(self) -> str:
+        return f"{self.provider}:{self.model}"
+
+
+class LatencyHistogram:
+    """
+    Log-bucketed latency histogram (5 ms .. ~10 min, 25% wide buckets) with quantile estimates.
+    """
+
+    BOUNDS = [0.005 * 1.25 ** i for i in range(53)]
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.BOUNDS, seconds)] += 1
+            self.count += 1
+            self.total += seconds
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate the q-quantile by interpolating inside the bucket that contains it.
+
+        Returns:
+            Seconds, or None if nothing was observed
+        """
+        with self._lock:
+            if not self.count:
+                return None
+            rank = q * self.count
+            seen = 0
+            for i, bucket_count in enumerate(self.counts):
+                if bucket_count and seen + bucket_count >= rank:
+                    lower = self.BOUNDS[i - 1] if i > 0 else 0.0
+                    upper = self.BOUNDS[i] if i < len(self.BOUNDS) else self.BOUNDS[-1]
+                    return lower + (upper - lower) * (rank - seen) / bucket_count
+                seen += bucket_count
+            return self.BOUNDS[-1]
+
+    def summary(self) -> Dict:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+class HedgedRouter:
+    """
+    Route chat requests over an ordered list of backends with hedging and failover.
+    """
+
+    def __init__(self, backends: List[Backend], hedge_quantile: float = 0.95, default_hedge_delay: float = 2.0,
+                 min_hedge_delay: float = 0.05, min_samples: int = 20):
+        """
+        Args:
+            backends: Backends in order of preference (at least one)
+            hedge_quantile: Latency quantile of a backend after which the next one is hedged in
+            default_hedge_delay: Hedge delay until a backend has min_samples observations
+            min_hedge_delay: Lower bound for the hedge delay
+            min_samples: Observations needed before the histogram drives the delay
+        """
+        if not backends:
+            raise ValueError("HedgedRouter needs at least one backend")
+        self.backends = list(backends)
+        self.hedge_quantile = hedge_quantile
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.min_samples = min_samples
+        self.histograms = {backend.name: LatencyHistogram() for backend in self.backends}
+        self.stats = {"requests": 0, "hedges": 0, "hedge_wins": 0, "failovers": 0, "errors": 0}
+        self.wins = {backend.name: 0 for backend in self.backends}
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+    def hedge_delay(self, backend: Backend) -> float:
+        """How long to wait for `backend` before hedging to the next one."""
+        histogram = self.histograms[backend.name]
+        if histogram.count < self.min_samples:
+            return self.default_hedge_delay
+        return max(histogram.quantile(self.hedge_quantile), self.min_hedge_delay)
+
+    async def _call(self, backend: Backend, chat, temperature: float):
+        # Only completed calls are observed; a cancelled loser's latency is unknown
+        start = time.perf_counter()
+        result = await inference_chat_async(chat, backend.model, backend.api_url, backend.token,
+                                            provider=backend.provider, temperature=temperature, route=False)
+        self.histograms[backend.name].observe(time.perf_counter() - start)
+        return result
+
+    async def ainference(self, chat, temperature: float = 0.0) -> str:
+        """
+        Get a completion from the first backend to answer successfully.
+
+        Args:
+            chat: List of [role, content]
+            temperature: Sampling temperature
+
+        Returns:
+            The completion text
+        """
+        self.stats["requests"] += 1
+        pending: Dict[asyncio.Task, Backend] = {}
+        next_backend = 0
+        last_error = None
+
+        def launch():
+            nonlocal next_backend
+            backend = self.backends[next_backend]
+            next_backend += 1
+            pending[asyncio.ensure_future(self._call(backend, chat, temperature))] = backend
+            return backend
+
+        try:
+            newest = launch()
+            while pending:
+                can_hedge = next_backend < len(self.backends)
+                timeout = self.hedge_delay(newest) if can_hedge else None
+                done, _ = await asyncio.wait(list(pending), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # The newest request is slower than usual: hedge to the next backend
+                    self.stats["hedges"] += 1
+                    newest = launch()
+                    continue
+
+                for task in done:
+                    backend = pending.pop(task)
+                    if task.exception() is None:
+                        self.wins[backend.name] += 1
+                        if backend is not self.backends[0] and not last_error:
+                            self.stats["hedge_wins"] += 1
+                        return task.result()
+                    last_error = task.exception()
+                    self.stats["errors"] += 1
+                    print(f"Backend {backend.name} failed: {last_error}")
+
+                if not pending and next_backend < len(self.backends):
+                    self.stats["failovers"] += 1
+                    newest = launch()
+            raise last_error
+        finally:
+            # Cancel the losers (or everything, if the caller was cancelled)
+            for task in pending:
+                task.cancel()
+
+    def inference(self, chat, temperature: float = 0.0) -> str:
+        """Synchronous ainference, run on the router's own event loop (keeps async clients warm)."""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+            return self._loop.run_until_complete(self.ainference(chat, temperature))
+
+    def close(self):
+        """Close the async clients of the router's event loop and the loop itself."""
+        with self._loop_lock:
+            if self._loop is None:
+                return
+            self._loop.run_until_complete(clients.client_registry.aclose())
+            self._loop.close()
+            self._loop = None
+
+    def summary(self) -> str:
+        """Human-readable per-backend latency and routing counters."""
+        lines = [
+            f"Router: {self.stats['requests']} requests, {self.stats['hedges']} hedged, "
+            f"{self.stats['hedge_wins']} won by a hedge, {self.stats['failovers']} failovers, "
+            f"{self.stats['errors']} backend errors"
+        ]
+        for backend in self.backends:
+            summary = self.histograms[backend.name].summary()
+            if summary["count"]:
+                lines.append(
+                    f"  {backend.name}: {summary['count']} ok, {self.wins[backend.name]} won, "
+                    f"p50 {summary['p50']:.3f}s, p95 {summary['p95']:.3f}s, p99 {summary['p99']:.3f}s"
+                )
+            else:
+                lines.append(f"  {backend.name}: no successful calls")
+        return "\n".join(lines)
@@ -0,0 +1,99 @@
+"""
+Stream Parser - Incremental parser for '### Section ###' formatted model output
+Consumes a completion chunk by chunk and reports each section as soon as the next
+section header (or the end of the stream) closes it, so the Action can be executed
+while the model is still writing its Summary.
+"""
+
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+# A complete header; a partially received one ("### Summ") does not match yet
+_HEADER = re.compile(r"###[ \t]*([A-Za-z][A-Za-z ]{0,40}?)[ \t]*###")
+# Longest text a header can span, so a partial one at the end of the buffer is rescanned
+_MAX_HEADER_LEN = 56
+# Enumerators the prompt's output format invites ("2. ### Action ###")
+_TRAILING_ENUMERATOR = re.compile(r"\s*\d+\.\s*$")
+
+
+def clean_action(text: str) -> str:
+    """Normalize an Action section the way action_agent_response does."""
+    return text.replace("\n", " ").replace("  ", " ").strip()
+
+
+class SectionStreamParser:
+    """
+    Incremental '### Section ###' parser.
+
+    Example:
+        parser = SectionStreamParser(on_section=lambda name, text: ...)
+        for chunk in inference_chat_stream(...):
+            parser.feed(chunk)
+        parser.close()
+    """
+
+    def __init__(self, on_section: Optional[Callable[[str, str], None]] = None):
+        """
+        Args:
+            on_section: Called with (section name, raw text) when a section closes
+        """
+        self.on_section = on_section
+        self.sections: Dict[str, str] = {}
+        self._buffer = ""
+        self._scan_from = 0
+        self._current: Optional[str] = None
+        self._body_start = 0
+        self._closed = False
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far."""
+        return self._buffer
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        """
+        Consume a chunk of the completion.
+
+        Args:
+            chunk: Next piece of text
+
+        Returns:
+            Sections closed by this chunk, as (name, text) pairs
+        """
+        self._buffer += chunk
+        closed = []
+        while True:
+            match = _HEADER.search(self._buffer, self._scan_from)
+            if match is None:
+                # A header may straddle chunks; rescan the tail next time
+                self._scan_from = max(self._scan_from, len(self._buffer) - _MAX_HEADER_LEN)
+                break
+            if self._current is not None:
+                closed.append(self._close(self._buffer[self._body_start:match.start()]))
+            self._current = match.group(1).strip()
+            self._body_start = match.end()
+            self._scan_from = match.end()
+        return closed
+
+    def close(self) -> List[Tuple[str, str]]:
+        """
+        Mark the end of the stream, closing the last open section.
+
+        Returns:
+            The section closed by the end of the stream (empty if none was open)
+        """
+        if self._closed:
+            return []
+        self._closed = True
+        if self._current is None:
+            return []
+        return [self._close(self._buffer[self._body_start:])]
+
+    def _close(self, body: str) -> Tuple[str, str]:
+        text = _TRAILING_ENUMERATOR.sub("", body).strip()
+        name = self._current
+        self.sections[name] = text
+        self._current = None
+        if self.on_section is not None:
+            self.on_section(name, text)
+        return name, text
@@ -3,10 +3,18 @@ Action Executor - Executes parsed actions on local Excel files
 Provides a bridge between agent action strings and actual Excel file manipulation
 """
 
-import re
 import pandas as pd
-from typing import Optional, Tuple, List
+from typing import Optional, Tuple, List, Set
+from ..api import action_schemas as actions
+from ..api.action_parser import InterfaceAction, parse_action
+from ..api.exceptions import ActionStrParseError
 from .action_interpret import Action as ExcelAction
+from .predicates import compile_predicate
+from . import styles
+from .utils import sheet_cache
+from .sheet_state import LiveSheetState
+from .sheet_merge import merge_views
+
 
 
 class ActionExecutor:
@@ -25,6 +33,18 @@ class ActionExecutor:
         self.excel_file_path = excel_file_path
         self.excel_action = ExcelAction(excel_file_path)
         self.last_operation_result = ""
+        # Action model -> handler; conditions travel in the model's reg field
+        self._handlers = {
+            actions.Select: self._handle_select,
+            actions.SelectAndDrag: self._handle_select_and_drag,
+            actions.Set: self._handle_set,
+            actions.Format: self._handle_format,
+            actions.Read: self._handle_read,
+            actions.ToolAction: self._handle_tool,
+            actions.TellUser: self._handle_tell_user,
+            actions.Terminate: self._handle_terminate,
+            InterfaceAction: self._handle_interface,
+        }
         
     def parse_and_execute(self, action_string: str) -> Tuple[bool, str]:
         """
@@ -37,117 +57,129 @@ class ActionExecutor:
             Tuple of (success: bool, result_message: str)
         """
         action_string = action_string.strip()
+        try:
+            action = parse_action(action_string)
+        except ActionStrParseError:
+            # If we can't parse the action, log it and return False
+            print(f"⚠️ Warning: Could not parse action format: {action_string}")
+            return False, f"Could not parse action: {action_string}"
+        return self.execute(action)
+    
+    def execute(self, action: actions.Action) -> Tuple[bool, str]:
+        """
+        Execute a parsed action (see ExcelAgent/api/action_parser.py).
         
-        # Handle Tell User actions
-        if "Tell User" in action_string or "TellUser" in action_string:
-            return True, "User interaction required"
+        Args:
+            action: The action model; its reg field is the condition restricting it
             
-        # Handle Terminate actions
-        if "Terminate" in action_string:
-            return True, "Task terminated"
-        
-        # Parse and execute Select actions with 4 parameters (range)
-        select_match = re.search(r'Select\s*\(\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*\)', action_string, re.IGNORECASE)
-        if select_match:
-            col1_idx, row1_idx, col2_idx, row2_idx = map(int, select_match.groups())
-            return self._execute_select(col1_idx, row1_idx, col2_idx, row2_idx)
-        
-        # Parse and execute Select actions with 2 parameters (single cell)
-        select_single_match = re.search(r'Select\s*\(\s*(\d+)\s*,\s*(\d+)\s*\)', action_string, re.IGNORECASE)
-        if select_single_match:
-            col_idx, row_idx = map(int, select_single_match.groups())
-            return self._execute_select(col_idx, row_idx, col_idx, row_idx)
-        
-        # Parse Select with Excel-style references (e.g., "Select A1:B5")
-        select_excel_match = re.search(r'Select\s+([A-Z]+)(\d+)(?::([A-Z]+)(\d+))?', action_string, re.IGNORECASE)
-        if select_excel_match:
-            col1, row1, col2, row2 = select_excel_match.groups()
-            col1_idx = self._column_to_index(col1)
-            row1_idx = int(row1) - 1
-            col2_idx = self._column_to_index(col2) if col2 else col1_idx
-            row2_idx = int(row2) - 1 if row2 else row1_idx
-            return self._execute_select(col1_idx, row1_idx, col2_idx, row2_idx)
-        
-        # Parse and execute SelectAndDrag actions
-        drag_match = re.search(r'(?:Select\s*and\s*Drag|SelectAndDrag)\s*\(\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*\)', action_string, re.IGNORECASE)
-        if drag_match:
-            col1_idx, row1_idx, col2_idx, row2_idx = map(int, drag_match.groups())
-            return self._execute_select_and_drag(col1_idx, row1_idx, col2_idx, row2_idx)
-        
-        # Parse and execute Set actions
-        set_match = re.search(r'Set\s*\(\s*["\'](.+?)["\']\s*\)', action_string, re.IGNORECASE | re.DOTALL)
-        if set_match:
-            text = set_match.group(1)
-            return self._execute_set(text)
-        
-        # Parse Set without quotes
-        set_no_quote_match = re.search(r'Set\s*\(\s*([^)]+)\s*\)', action_string, re.IGNORECASE)
-        if set_no_quote_match:
-            text = set_no_quote_match.group(1).strip()
-            return self._execute_set(text)
-        
-        # Parse and execute Format actions
-        format_match = re.search(r'Format\s*\(\s*(.+?)\s*\)', action_string, re.IGNORECASE)
-        if format_match:
-            format_params = format_match.group(1)
-            return self._execute_format(format_params)
-        
-        # Parse and execute Read actions
-        read_match = re.search(r'Read\s+([A-Z]+)(\d+)(?::([A-Z]+)(\d+))?', action_string, re.IGNORECASE)
-        if read_match:
-            col1, row1, col2, row2 = read_match.groups()
-            col1_idx = self._column_to_index(col1)
-            row1_idx = int(row1) - 1
-            col2_idx = self._column_to_index(col2) if col2 else col1_idx
-            row2_idx = int(row2) - 1 if row2 else row1_idx
-            return self._execute_read(col1_idx, row1_idx, col2_idx, row2_idx)
+        Returns:
+            Tuple of (success: bool, result_message: str)
+        """
+        handler = self._handlers.get(type(action))
+        if handler is None:
+            return False, f"Unsupported action: {action.type}"
+        return handler(action)
+    
+    def execute_plan(self, plan: List[actions.Action]) -> Tuple[bool, str]:
+        """
+        Execute several actions in order as one transaction.
         
-        # Parse Read with numeric indices
-        read_numeric_match = re.search(r'Read\s*\(\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*\)', action_string, re.IGNORECASE)
-        if read_numeric_match:
-            col1_idx, row1_idx, col2_idx, row2_idx = map(int, read_numeric_match.groups())
-            return self._execute_read(col1_idx, row1_idx, col2_idx, row2_idx)
+        The plan stops at the first Tell User or Terminate. If an action fails, the changes
+        of the actions before it are undone in memory (see rollback()) and the selection is
+        restored, so a plan is applied entirely or not at all.
         
-        # Parse Read with 2 parameters (single cell)
-        read_single_match = re.search(r'Read\s*\(\s*(\d+)\s*,\s*(\d+)\s*\)', action_string, re.IGNORECASE)
-        if read_single_match:
-            col_idx, row_idx = map(int, read_single_match.groups())
-            return self._execute_read(col_idx, row_idx, col_idx, row_idx)
+        Args:
+            plan: Parsed actions
+            
+        Returns:
+            Tuple of (success: bool, result_message: str)
+        """
+        checkpoint = self.excel_action.checkpoint()
+        results = []
+        for number, action in enumerate(plan, 1):
+            success, result = self.execute(action)
+            if not success:
+                if number > 1:
+                    self.excel_action.rollback(checkpoint)
+                    result += f" (action {number} of {len(plan)}; the plan was rolled back)"
+                return False, result
+            results.append(result)
+            if isinstance(action, (actions.TellUser, actions.Terminate)):
+                break
+        if len(results) == 1:
+            return True, results[0]
+        return True, "; ".join(f"{number}. {result}" for number, result in enumerate(results, 1))
+    
+    def _condition(self, action: actions.Action) -> Optional[str]:
+        """The condition an action is restricted to, or None for every cell."""
+        condition = action.reg
+        try:
+            if condition and compile_predicate(condition).matches_all:
+                condition = None
+        except ValueError:
+            # Reported when the action evaluates it
+            pass
+        return condition or None
+    
+    def _range_indices(self, action) -> Tuple[int, int, int, int]:
+        """
+        0-based DataFrame (col1, row1, col2, row2) of an action's sheet range.
+        Row -1 is the last row; the header row maps to the first data row.
+        """
+        last_row = max(len(self.excel_action.df) - 1, 0)
         
-        # Parse and execute Tool actions (copy, paste, delete, etc.)
-        tool_match = re.search(r'(Copy|Paste|Delete|Cut|Bold|Italic|Underline)\s*\(\s*\)', action_string, re.IGNORECASE)
-        if tool_match:
-            tool_name = tool_match.group(1).lower()
-            return self._execute_tool(tool_name)
+        def row_index(row: str) -> int:
+            row = int(row)
+            return last_row if row == -1 else max(row - 2, 0)
         
-        # Handle "Format Cells" and similar formatting dialog actions
-        # These are no-ops since Select already applies highlighting
-        if re.search(r'Format\s+Cells|Apply\s+Formatting|Background\s+Color', action_string, re.IGNORECASE):
-            # The formatting was already applied during Select, so just return success
+        return (self._column_to_index(action.col1), row_index(action.row1),
+                self._column_to_index(action.col2 or action.col1), row_index(action.row2 or action.row1))
+    
+    def _handle_select(self, action: actions.Select) -> Tuple[bool, str]:
+        return self._execute_select(*self._range_indices(action), self._condition(action))
+    
+    def _handle_select_and_drag(self, action: actions.SelectAndDrag) -> Tuple[bool, str]:
+        return self._execute_select_and_drag(*self._range_indices(action), self._condition(action))
+    
+    def _handle_set(self, action: actions.Set) -> Tuple[bool, str]:
+        return self._execute_set(action.text, self._condition(action))
+    
+    def _handle_format(self, action: actions.Format) -> Tuple[bool, str]:
+        return self._execute_format(action, self._condition(action))
+    
+    def _handle_read(self, action: actions.Read) -> Tuple[bool, str]:
+        return self._execute_read(*self._range_indices(action))
+    
+    def _handle_tool(self, action: actions.ToolAction) -> Tuple[bool, str]:
+        return self._execute_tool(action.tool.lower(), self._condition(action))
+    
+    def _handle_tell_user(self, action: actions.TellUser) -> Tuple[bool, str]:
+        return True, "User interaction required"
+    
+    def _handle_terminate(self, action: actions.Terminate) -> Tuple[bool, str]:
+        return True, "Task terminated"
+    
+    def _handle_interface(self, action: InterfaceAction) -> Tuple[bool, str]:
+        """
+        "Format Cells", "Right Click" and similar interface steps.
+        These are no-ops since Select already applies highlighting.
+        """
+        if action.name == "format":
             if self.excel_action.selected_range:
                 return True, "Formatting already applied during selection (cells are highlighted in yellow)"
-            else:
-                return False, "No cells selected for formatting"
-        
-        # Handle generic dialog/menu actions that don't need implementation
-        if re.search(r'Copy/Paste/Delete/\.\.\.|Right\s*Click|Context\s+Menu', action_string, re.IGNORECASE):
-            # These are interface actions that don't translate to file operations
-            # If there's a selected range, consider it successful
-            if self.excel_action.selected_range:
-                return True, "Selection is already highlighted and formatted"
-            else:
-                return True, "Menu action acknowledged (no file changes needed)"
-        
-        # If we can't parse the action, log it and return False
-        print(f"⚠️ Warning: Could not parse action format: {action_string}")
-        return False, f"Could not parse action: {action_string}"
+            return False, "No cells selected for formatting"
+        # Menu steps don't translate to file operations
+        if self.excel_action.selected_range:
+            return True, "Selection is already highlighted and formatted"
+        return True, "Menu action acknowledged (no file changes needed)"
     
     def _column_to_index(self, col_letter: str) -> int:
         """Convert Excel column letter to 0-based index."""
         from openpyxl.utils import column_index_from_string
         return column_index_from_string(col_letter) - 1
     
-    def _execute_select(self, col1_idx: int, row1_idx: int, col2_idx: int, row2_idx: int) -> Tuple[bool, str]:
+    def _execute_select(self, col1_idx: int, row1_idx: int, col2_idx: int, row2_idx: int,
+                        condition: Optional[str] = None) -> Tuple[bool, str]:
         """
         Execute a Select action on the Excel file.
         
@@ -156,6 +188,7 @@ class ActionExecutor:
             row1_idx: Starting row index (0-based DataFrame index from agent)
             col2_idx: Ending column index (0-based DataFrame index from agent)
             row2_idx: Ending row index (0-based DataFrame index from agent)
+            condition: Only select the cells meeting this condition (optional)
             
         Returns:
             Tuple of (success: bool, result_message: str)
@@ -165,19 +198,11 @@ class ActionExecutor:
             # action_interpret.select expects Excel-style references (1-based)
             # DataFrame row 0 maps to Excel row 2 (row 1 is header)
             # DataFrame column 0 maps to Excel column 1
-            result = self.excel_action.select(col1_idx + 1, row1_idx + 2, col2_idx + 1, row2_idx + 2)
+            result = self.excel_action.select(col1_idx + 1, row1_idx + 2, col2_idx + 1, row2_idx + 2, condition=condition)
             self.last_operation_result = result
             
-            # Apply highlighting to the selected range using openpyxl
-            from openpyxl.styles import PatternFill
-            yellow_fill = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
-            
-            for row in range(row1_idx, row2_idx + 1):
-                for col in range(col1_idx, col2_idx + 1):
-                    # openpyxl uses 1-based indexing
-                    # DataFrame row r (0-based) maps to Excel row r+2 (row 1 is header)
-                    cell = self.excel_action.active_sheet.cell(row=row+2, column=col+1)
-                    cell.fill = yellow_fill
+            # Highlight the selected cells (a conditional-formatting rule when the Select had a condition)
+            self.excel_action.format_selection(fill=styles.solid_fill(styles.HIGHLIGHT_COLOR))
             
             return True, result
         except Exception as e:
@@ -187,7 +212,8 @@ class ActionExecutor:
             traceback.print_exc()
             return False, error_msg
     
-    def _execute_select_and_drag(self, col1_idx: int, row1_idx: int, col2_idx: int, row2_idx: int) -> Tuple[bool, str]:
+    def _execute_select_and_drag(self, col1_idx: int, row1_idx: int, col2_idx: int, row2_idx: int,
+                                 condition: Optional[str] = None) -> Tuple[bool, str]:
         """
         Execute a SelectAndDrag action (auto-fill).
         
@@ -196,6 +222,7 @@ class ActionExecutor:
             row1_idx: Starting row index (0-based DataFrame index from agent)
             col2_idx: Ending column index (0-based DataFrame index from agent)
             row2_idx: Ending row index (0-based DataFrame index from agent)
+            condition: Only fill target cells meeting this condition (optional)
             
         Returns:
             Tuple of (success: bool, result_message: str)
@@ -204,7 +231,8 @@ class ActionExecutor:
             # Convert 0-based DataFrame indices to 1-based Excel row/column numbers
             # DataFrame row 0 maps to Excel row 2 (row 1 is header)
             # DataFrame column 0 maps to Excel column 1
-            result = self.excel_action.select_and_drag(col1_idx + 1, row1_idx + 2, col2_idx + 1, row2_idx + 2)
+            result = self.excel_action.select_and_drag(col1_idx + 1, row1_idx + 2, col2_idx + 1, row2_idx + 2,
+                                                       condition=condition)
             self.last_operation_result = result
             return True, result
         except Exception as e:
@@ -214,12 +242,13 @@ class ActionExecutor:
             traceback.print_exc()
             return False, error_msg
     
-    def _execute_set(self, text: str) -> Tuple[bool, str]:
+    def _execute_set(self, text: str, condition: Optional[str] = None) -> Tuple[bool, str]:
         """
         Execute a Set action (set cell value).
         
         Args:
             text: The text/value to set in the selected cells
+            condition: Only set selected cells meeting this condition (optional)
             
         Returns:
             Tuple of (success: bool, result_message: str)
@@ -227,7 +256,7 @@ class ActionExecutor:
         try:
             # First select the input field, then set the value
             self.excel_action.select_input_field()
-            result = self.excel_action.set_input(text)
+            result = self.excel_action.set_input(text, condition=condition)
             self.last_operation_result = result
             return True, result
         except Exception as e:
@@ -235,52 +264,35 @@ class ActionExecutor:
             print(error_msg)
             return False, error_msg
     
-    def _execute_format(self, format_params: str) -> Tuple[bool, str]:
+    def _execute_format(self, action: actions.Format, condition: Optional[str] = None) -> Tuple[bool, str]:
         """
         Execute a Format action (apply formatting to selected cells).
         
         Args:
-            format_params: Format parameters (e.g., "bold", "color=#FF0000")
+            action: The Format action; style words (bold, italic, underline, fontcolor) and color are applied
+            condition: Only format selected cells meeting this condition (optional)
             
         Returns:
             Tuple of (success: bool, result_message: str)
         """
         try:
-            # Parse format parameters
-            params = {}
-            if "bold" in format_params.lower():
-                params["bold"] = True
-            if "italic" in format_params.lower():
-                params["italic"] = True
-            if "underline" in format_params.lower():
-                params["underline"] = True
-            
-            # Color parsing
-            color_match = re.search(r'color\s*=\s*["\']?([#\w]+)["\']?', format_params, re.IGNORECASE)
-            if color_match:
-                params["color"] = color_match.group(1)
+            style = (action.style or "").lower()
+            bold, italic, underline = "bold" in style, "italic" in style, "underline" in style
+            # A color is the background's unless the grammar's fontcolor style asks for the text's
+            font_color = action.color if "fontcolor" in style else None
             
-            # Apply formatting using openpyxl
+            # Apply formatting using openpyxl, with one shared style object per format
             if self.excel_action.selected_range:
-                from openpyxl.styles import Font, PatternFill
-                
-                start_row, start_col, end_row, end_col = self.excel_action.selected_range
+                font = fill = None
+                if bold or italic or underline or font_color:
+                    font = styles.font(bold=bold, italic=italic, underline="single" if underline else None,
+                                       color=font_color)
+                if action.color and not font_color:
+                    fill = styles.solid_fill(action.color)
+                if font is not None or fill is not None:
+                    self.excel_action.format_selection(condition, font=font, fill=fill)
                 
-                for row in range(start_row, end_row + 1):
-                    for col in range(start_col, end_col + 1):
-                        cell = self.excel_action.active_sheet.cell(row=row+1, column=col+1)
-                        
-                        if params.get("bold"):
-                            cell.font = Font(bold=True)
-                        if params.get("italic"):
-                            cell.font = Font(italic=True)
-                        if params.get("underline"):
-                            cell.font = Font(underline="single")
-                        if params.get("color"):
-                            color = params["color"].replace("#", "")
-                            cell.fill = PatternFill(start_color=color, end_color=color, fill_type="solid")
-                
-                result = f"Applied formatting: {format_params}"
+                result = f"Applied formatting: {action._format_params()}"
                 self.last_operation_result = result
                 return True, result
             else:
@@ -349,12 +361,13 @@ class ActionExecutor:
             traceback.print_exc()
             return False, error_msg
     
-    def _execute_tool(self, tool_name: str) -> Tuple[bool, str]:
+    def _execute_tool(self, tool_name: str, condition: Optional[str] = None) -> Tuple[bool, str]:
         """
         Execute a tool action (copy, paste, delete, etc.).
         
         Args:
             tool_name: Name of the tool (e.g., "copy", "paste", "delete")
+            condition: Only act on selected cells meeting this condition (optional)
             
         Returns:
             Tuple of (success: bool, result_message: str)
@@ -372,7 +385,7 @@ class ActionExecutor:
             method_name = tool_method_map.get(tool_name)
             if method_name:
                 method = getattr(self.excel_action, method_name)
-                result = method(tool_name)
+                result = method(tool_name, condition=condition)
                 self.last_operation_result = result
                 return True, result
             else:
@@ -395,12 +408,64 @@ class ActionExecutor:
         """
         try:
             result = self.excel_action.save(output_path)
+            # The file on disk changed; drop any parsed copies or prompt renderings of it
+            sheet_cache.invalidate(output_path or self.excel_file_path)
             return True, result
         except Exception as e:
             error_msg = f"Error saving file: {str(e)}"
             print(error_msg)
             return False, error_msg
     
+    def checkpoint(self):
+        """
+        Mark the current state of the sheet, e.g. before an agent step, for rollback().
+        Edits from before the mark can no longer be rolled back (their journal is released).
+        """
+        checkpoint = self.excel_action.checkpoint()
+        self.excel_action.journal.release(checkpoint[0])
+        return checkpoint
+    
+    def rollback(self, checkpoint, save: bool = True) -> Tuple[bool, str]:
+        """
+        Undo every edit made since a checkpoint() in memory, without reading the file again.
+        
+        Args:
+            checkpoint: Value returned by checkpoint()
+            save: Whether to save the file afterwards, if anything was undone
+            
+        Returns:
+            Tuple of (success: bool, result_message: str)
+        """
+        try:
+            undone = self.excel_action.rollback(checkpoint)
+        except ValueError as e:
+            return False, f"Cannot roll back: {e}"
+        if undone and save:
+            save_success, save_result = self.save()
+            if not save_success:
+                return False, save_result
+        return True, f"Undid {undone} logged changes"
+    
+    def fork(self) -> "ActionExecutor":
+        """
+        Get an executor on an isolated copy of the file as last saved, e.g. for a subtask
+        that runs concurrently with others. Its edits are brought back with merge().
+        """
+        return ActionExecutor(self.excel_file_path)
+    
+    def merge(self, views: List["ActionExecutor"]) -> List[Optional[Set[Tuple[int, int]]]]:
+        """
+        Apply the edits made through fork()s to this executor's sheet, in order (not saved).
+        
+        Args:
+            views: Executors from fork(); this executor must not have been edited since
+            
+        Returns:
+            For each view, the sheet cells (row, column), 1-based, whose value or formatting it changed;
+            None for a view that added or removed rows or columns, which is not merged
+        """
+        return merge_views(self.excel_action, [view.excel_action for view in views])
+    
     def get_df(self):
         """Get the current DataFrame."""
         return self.excel_action.df
@@ -409,6 +474,10 @@ class ActionExecutor:
         """Get the current openpyxl workbook."""
         return self.excel_action.workbook
     
+    def get_sheet_state(self) -> LiveSheetState:
+        """Get a sheet-state provider that renders the live in-memory sheet for prompts."""
+        return LiveSheetState(self.excel_action)
+    
     def get_sheet_summary(self, num_rows: int = 10) -> str:
         """
         Get a summary of the current sheet state.
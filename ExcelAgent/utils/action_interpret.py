@@ -5,9 +5,24 @@ import re
 import os
 from typing import Union, List, Tuple, Optional, Dict, Any
 import numpy as np
+from .workbook_loader import load_workbook_frame
+from .predicates import compile_predicate
+from .formula_engine import FormulaEngine, parse_formula
+from .undo_journal import UndoJournal
+from . import styles
 
 # Interpretation of actions on Excel Spreadsheets using pandas and openpyxl
 
+# Conditional formatting rule types -> comparison the threshold is tested with
+CONDITIONAL_RULES = {
+    "greater_than": ">",
+    "greater_than_or_equal": ">=",
+    "less_than": "<",
+    "less_than_or_equal": "<=",
+    "equal_to": "=",
+    "not_equal_to": "!=",
+}
+
 class Action:
     def __init__(self, file_path: str):
         """
@@ -17,16 +32,291 @@ class Action:
             file_path: Path to the Excel file
         """
         self.file_path = file_path
-        # Load with pandas for data manipulation, explicitly specifying the engine
-        self.df = pd.read_excel(file_path, engine='openpyxl')  # or 'xlrd' for .xls files
-        # Load with openpyxl for formatting and other Excel-specific operations
-        self.workbook = openpyxl.load_workbook(file_path)
+        # Parse once with openpyxl (formatting and other Excel-specific operations) and
+        # derive the pandas DataFrame used for data manipulation from the same cells
+        self.workbook, self.df = load_workbook_frame(file_path)
         self.active_sheet = self.workbook.active
         self.selected_range = None
+        # Cells of selected_range that passed the Select's condition (None when unconditioned)
+        self.selection_mask = None
+        self.selection_condition = None
         self.clipboard = None
+        self.clipboard_mask = None
+        # Clipboard offset (row, col) -> Formula, for copied formula cells
+        self.clipboard_formulas = None
         self.input_field_content = ""
         self.input_field_selected = False
+        # Change tracking: DataFrame cells (row_idx, col_idx) modified since the last save.
+        # save() only writes these back to the workbook unless the sheet shape changed.
+        self._dirty_cells = set()
+        # What each edit overwrote, for rollback() to undo in memory
+        self.journal = UndoJournal()
+        self._load_formulas()
+        self._mark_synced()
+        
+    # Attributes that describe the user's interaction (selection, clipboard, input field) rather than the sheet
+    INTERACTION_STATE = ("selected_range", "selection_mask", "selection_condition", "clipboard", "clipboard_mask",
+                         "clipboard_formulas", "input_field_content", "input_field_selected")
+    
+    def interaction_state(self) -> Dict[str, Any]:
+        """The selection, clipboard and input field, for reload() or rollback() to restore."""
+        return {name: getattr(self, name) for name in self.INTERACTION_STATE}
+    
+    def checkpoint(self) -> Tuple[int, Dict[str, Any]]:
+        """Mark the current sheet and interaction state, for rollback() to return to."""
+        return self.journal.checkpoint(), self.interaction_state()
+    
+    def rollback(self, checkpoint: Tuple[int, Dict[str, Any]]) -> int:
+        """
+        Undo the edits made since a checkpoint() in memory (unlike reload(), the file is not read).
+        
+        Cell values, formulas, cell formatting and conditional-formatting rules return to
+        what they were, and the selection and clipboard are restored. The restored cells
+        are written by the next save().
+        
+        Args:
+            checkpoint: Value returned by checkpoint()
+            
+        Returns:
+            Number of journal entries undone
+            
+        Raises:
+            ValueError: If the journal was released or reset (by reload()) since the checkpoint
+        """
+        position, interaction = checkpoint
+        undone = self.journal.rollback(self, position)
+        for name, value in interaction.items():
+            setattr(self, name, value)
+        return undone
+    
+    def reload(self, interaction: Optional[Dict[str, Any]] = None):
+        """
+        Discard unsaved changes by reading the file again.
+        
+        Args:
+            interaction: interaction_state() to restore; the current selection and clipboard are kept if None
+        """
+        self.workbook, self.df = load_workbook_frame(self.file_path)
+        self.active_sheet = self.workbook.active
+        self._load_formulas()
+        self._mark_synced()
+        for name, value in (interaction or {}).items():
+            setattr(self, name, value)
+        
+    def _load_formulas(self):
+        """Take over the formulas of the DataFrame's sheet and fill in their current values."""
+        self.formulas = FormulaEngine(self)
+        if self.formulas.load(self.workbook.worksheets[0]):
+            self.formulas.recalculate_all()
+        # Loading is not an edit to undo, and older entries refer to the replaced sheet
+        self.journal.release()
+    
+    def _mark_synced(self):
+        """Record the DataFrame layout that the workbook currently mirrors and reset tracking."""
+        self._dirty_cells.clear()
+        self._synced_df_id = id(self.df)
+        self._synced_shape = self.df.shape
+    
+    def _needs_full_sync(self) -> bool:
+        """
+        Check whether the DataFrame changed in a way cell tracking cannot describe
+        (replaced outright, or rows/columns added or removed).
+        """
+        return id(self.df) != self._synced_df_id or self.df.shape != self._synced_shape
+    
+    def _set_cell(self, row_idx: int, col_idx: int, value: Any):
+        """
+        Set a DataFrame cell and mark it dirty so the next save writes it to the workbook.
         
+        Args:
+            row_idx: Zero-indexed DataFrame row index
+            col_idx: Zero-indexed column index
+            value: New cell value
+        """
+        self._set_cells(np.array([row_idx]), np.array([col_idx]), value)
+    
+    def _set_cells(self, rows: np.ndarray, cols: np.ndarray, values: Any):
+        """
+        Vectorized _set_cell: write many cells with one assignment per column and mark them dirty.
+        
+        What the cells held is logged in the journal first. A column whose dtype has to be
+        widened is replaced, and the old column is kept as is instead of being copied.
+        
+        Args:
+            rows: Zero-indexed DataFrame row indices
+            cols: Zero-indexed column indices, aligned with rows
+            values: One value for every cell, or an array aligned with rows
+        """
+        per_cell = isinstance(values, np.ndarray)
+        order = np.argsort(cols, kind="stable")
+        rows, cols = rows[order], cols[order]
+        if per_cell:
+            values = values[order]
+        columns, starts = np.unique(cols, return_index=True)
+        ends = list(starts[1:]) + [len(cols)]
+        for col_idx, start, end in zip(columns.tolist(), starts.tolist(), ends):
+            column_values = values[start:end] if per_cell else values
+            column = self.df.iloc[:, col_idx]
+            widened = None
+            if column.dtype != object and not self._numeric_values(column_values):
+                # Text in a numeric column: widen it first rather than rely on pandas' implicit upcast
+                widened = column.astype(object)
+            elif column.dtype != object:
+                if per_cell and column_values.dtype == object:
+                    # Numbers held in an object array (computed formula values)
+                    column_values = pd.to_numeric(column_values)
+                if column.dtype.kind in "iu" and np.asarray(column_values).dtype.kind == "f":
+                    # Likewise for fractions in an integer column
+                    widened = column.astype(float)
+            self.journal.record_values(col_idx, rows[start:end], column, replaced=widened is not None)
+            if widened is not None:
+                self.df.isetitem(col_idx, widened)
+            self.df.iloc[rows[start:end], col_idx] = column_values
+        self._dirty_cells.update(zip(rows.tolist(), cols.tolist()))
+    
+    def _values_changed(self, rows: np.ndarray, cols: np.ndarray):
+        """After plain values were written to cells: drop their formulas and recalculate the formulas reading them."""
+        self.formulas.remove(rows, cols)
+        self.formulas.recalculate(rows, cols)
+    
+    def _write_values(self, rows: np.ndarray, cols: np.ndarray, values: Any):
+        """_set_cells for an edit: the cells stop being formulas and dependent formulas are updated."""
+        self._set_cells(rows, cols, values)
+        self._values_changed(rows, cols)
+    
+    def _write_formula(self, formula, rows: np.ndarray, cols: np.ndarray):
+        """Put a parsed formula in cells and compute them and the formulas reading them."""
+        self.formulas.place(formula, rows, cols)
+        self.formulas.recalculate(rows, cols)
+    
+    def _stored_value(self, row_idx: int, col_idx: int) -> Any:
+        """What the workbook cell holds: the formula of a formula cell, else the DataFrame value."""
+        formula = self.formulas.formula_text(row_idx, col_idx)
+        return formula if formula is not None else self.df.iat[row_idx, col_idx]
+    
+    @staticmethod
+    def _numeric_values(values: Any) -> bool:
+        """Whether values (a scalar or an array) can be stored in a numeric column."""
+        if isinstance(values, np.ndarray):
+            return pd.api.types.infer_dtype(values, skipna=True) in ("integer", "floating", "mixed-integer-float", "decimal", "empty")
+        return values is None or (isinstance(values, (int, float, np.number)) and not isinstance(values, bool))
+    
+    def _range_mask(self, condition: Optional[str], start_row: int, start_col: int,
+                    end_row: int, end_col: int) -> np.ndarray:
+        """
+        Evaluate a condition over a range of cells.
+        
+        Args:
+            condition: Condition text (see predicates.compile_predicate), or None for every cell
+            start_row, start_col, end_row, end_col: Zero-indexed inclusive bounds
+            
+        Returns:
+            Boolean array of the range's shape; cells past the DataFrame's edge are tested as empty
+        """
+        shape = (max(end_row - start_row + 1, 0), max(end_col - start_col + 1, 0))
+        if not condition:
+            return np.ones(shape, dtype=bool)
+        predicate = compile_predicate(condition)
+        block = self.df.iloc[start_row:end_row + 1, start_col:end_col + 1]
+        if block.shape == shape:
+            return predicate.mask(block)
+        mask = np.full(shape, predicate.matches_empty())
+        mask[:block.shape[0], :block.shape[1]] = predicate.mask(block)
+        return mask
+    
+    def selected_cells(self, condition: Optional[str] = None, clip: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Cells of the current selection that pass its Select condition and `condition`.
+        
+        Args:
+            condition: Extra condition for this action (e.g. an action's REGEX)
+            clip: Drop cells outside the DataFrame (for value changes; formatting keeps them)
+            
+        Returns:
+            Tuple of (rows, cols) zero-indexed DataFrame indices, in row-major order
+        """
+        start_row, start_col, end_row, end_col = self.selected_range
+        mask = self._range_mask(condition, start_row, start_col, end_row, end_col)
+        if self.selection_mask is not None:
+            mask &= self.selection_mask
+        rows, cols = np.nonzero(mask)
+        rows, cols = rows + start_row, cols + start_col
+        if clip:
+            inside = (rows < len(self.df)) & (cols < len(self.df.columns))
+            rows, cols = rows[inside], cols[inside]
+        return rows, cols
+    
+    def selected_sheet_cells(self, condition: Optional[str] = None):
+        """Yield the openpyxl cells of selected_cells(condition), including cells past the DataFrame."""
+        rows, cols = self.selected_cells(condition, clip=False)
+        for r, c in zip(rows.tolist(), cols.tolist()):
+            # DataFrame row r is Excel row r+2 (row 1 is header)
+            yield self.active_sheet.cell(row=r + 2, column=c + 1)
+    
+    def _selection_ref(self) -> str:
+        """The selected range in A1 notation on the sheet, e.g. 'C2:C101'."""
+        start_row, start_col, end_row, end_col = self.selected_range
+        return f"{self._get_cell_address(start_row, start_col)}:{self._get_cell_address(end_row, end_col)}"
+    
+    def format_selection(self, condition: Optional[str] = None, font: Optional[openpyxl.styles.Font] = None,
+                         fill: Optional[openpyxl.styles.PatternFill] = None) -> bool:
+        """
+        Apply a font and/or fill to the selected cells that meet the Select condition and `condition`.
+        
+        When there is a condition and Excel can express it, a single conditional-formatting
+        rule is added for the whole range. Otherwise the matching cells share one style
+        object, applied per cell.
+        
+        Args:
+            condition: Extra condition for this action (optional)
+            font: Font to apply
+            fill: Fill to apply
+            
+        Returns:
+            True if the formatting became a conditional-formatting rule
+        """
+        conditions = [c for c in (self.selection_condition, condition)
+                      if c and not compile_predicate(c).matches_all]
+        if conditions:
+            top_left = self._get_cell_address(self.selected_range[0], self.selected_range[1])
+            formulas = [compile_predicate(c).excel_formula(top_left) for c in conditions]
+            if all(formulas):
+                formula = formulas[0] if len(formulas) == 1 else f"AND({','.join(formulas)})"
+                self.journal.record_rules(self.active_sheet)
+                styles.add_conditional_format(self.active_sheet, self._selection_ref(), formula, font=font, fill=fill)
+                return True
+        self._apply_style(condition, font=font, fill=fill)
+        return False
+    
+    def _apply_style(self, condition: Optional[str] = None, **style):
+        """styles.apply_style() on the selected sheet cells meeting `condition`, logged in the journal."""
+        cells = list(self.selected_sheet_cells(condition))
+        self.journal.record_styles(cells)
+        styles.apply_style(cells, **style)
+    
+    def _sync_full(self):
+        """Write every DataFrame cell to the workbook (used when the sheet shape changed)."""
+        # Clear any extra rows beyond the DataFrame size
+        # Get the current max row in the sheet
+        max_row = self.active_sheet.max_row
+        df_rows = len(self.df)
+        
+        # Delete any rows beyond the DataFrame size (but keep header row)
+        if max_row > df_rows + 1:  # +1 for header row
+            self.active_sheet.delete_rows(df_rows + 2, max_row - df_rows - 1)
+        
+        # Sync DataFrame data to workbook cells
+        for r in range(len(self.df)):
+            for c in range(len(self.df.columns)):
+                cell = self.active_sheet.cell(row=r+2, column=c+1)  # +2 because row 1 is header
+                cell.value = self._stored_value(r, c)
+    
+    def _sync_dirty(self):
+        """Write only the cells modified since the last save to the workbook."""
+        for r, c in self._dirty_cells:
+            cell = self.active_sheet.cell(row=r+2, column=c+1)  # +2 because row 1 is header
+            cell.value = self._stored_value(r, c)
+    
     def save(self, output_path: Optional[str] = None):
         try:
             save_path = output_path if output_path else self.file_path
@@ -38,20 +328,12 @@ class Action:
             # First, sync DataFrame data to the openpyxl workbook
             # This ensures the workbook has the latest data before we save
             try:
-                # Clear any extra rows beyond the DataFrame size
-                # Get the current max row in the sheet
-                max_row = self.active_sheet.max_row
-                df_rows = len(self.df)
-                
-                # Delete any rows beyond the DataFrame size (but keep header row)
-                if max_row > df_rows + 1:  # +1 for header row
-                    self.active_sheet.delete_rows(df_rows + 2, max_row - df_rows - 1)
-                
-                # Sync DataFrame data to workbook cells
-                for r in range(len(self.df)):
-                    for c in range(len(self.df.columns)):
-                        cell = self.active_sheet.cell(row=r+2, column=c+1)  # +2 because row 1 is header
-                        cell.value = self.df.iloc[r, c]
+                # Only cells touched since the last save need syncing, unless the
+                # DataFrame was replaced or resized
+                if self._needs_full_sync():
+                    self._sync_full()
+                else:
+                    self._sync_dirty()
                 
                 # Update header row if needed
                 for c, col_name in enumerate(self.df.columns):
@@ -61,6 +343,7 @@ class Action:
                 
                 # Save with openpyxl (preserves formatting like highlighting)
                 self.workbook.save(save_path)
+                self._mark_synced()
                 print("Saved with openpyxl successfully")
             except Exception as e:
                 print(f"Error saving with openpyxl: {e}")
@@ -71,6 +354,9 @@ class Action:
                     # Reload workbook after pandas save to keep references in sync
                     self.workbook = openpyxl.load_workbook(save_path)
                     self.active_sheet = self.workbook.active
+                    self._mark_synced()
+                    # Logged styles refer to the old workbook's style tables
+                    self.journal.release()
                 except Exception as e2:
                     print(f"Error saving with pandas fallback: {e2}")
                     raise
@@ -146,6 +432,10 @@ class Action:
         
         # Store the selection
         self.selected_range = (start_row, start_col, end_row, end_col)
+        self.selection_mask = None
+        self.selection_condition = condition
+        if condition:
+            self.selection_mask = self._range_mask(condition, start_row, start_col, end_row, end_col)
         
         # Check if it's a whole column selection
         if (start_row == 0 and end_row >= len(self.df) - 1):
@@ -163,11 +453,10 @@ class Action:
             end_address = self._get_cell_address(end_row, end_col)
             selection_type = f"Range {start_address}:{end_address}"
         
-        # Apply condition if specified
+        # Later actions on the selection only touch the cells that met the condition
         if condition:
-            # Here we would implement condition filtering
-            # This is a simplified version
-            return f"Selected {selection_type} with condition: {condition}"
+            matched = int(self.selection_mask.sum())
+            return f"Selected {selection_type} with condition: {condition} ({matched} matching cells)"
         
         return f"Selected {selection_type}"
     
@@ -197,49 +486,79 @@ class Action:
 
         is_numeric = isinstance(source_value, (int, float, np.number))
         
+        # With a condition, only target cells whose current value meets it are filled
+        allowed = None
+        if condition:
+            allowed = self._range_mask(condition, source_row, source_col, target_row, target_col)
+        
+        target_address = self._get_cell_address(target_row, target_col)
+        
+        # A formula fills the range with its relative references shifted, as in Excel
+        formula = self.formulas.formulas.get((source_row, source_col))
+        if formula is not None:
+            rows, cols = np.mgrid[source_row:target_row + 1, source_col:target_col + 1]
+            keep = (rows != source_row) | (cols != source_col)  # Skip the source cell
+            keep &= (rows < len(self.df)) & (cols < len(self.df.columns))
+            if allowed is not None:
+                keep &= allowed
+            self._write_formula(formula, rows[keep], cols[keep])
+            if condition:
+                return f"Filled formula from {source_address} to {target_address} with condition: {condition}"
+            return f"Filled formula from {source_address} to {target_address}"
+        
+        filled = []
+        filled_values = []
+        
+        def fill(r, c, value):
+            if allowed is None or allowed[r - source_row, c - source_col]:
+                filled.append((r, c))
+                filled_values.append(value)
+        
         # Determine fill direction and pattern
         if source_row == target_row:  # Horizontal fill
             # Check if source is a number and implement a sequence
             if is_numeric:
                 for c in range(source_col + 1, target_col + 1):
                     increment = c - source_col
-                    self.df.iloc[source_row, c] = source_value + increment
+                    fill(source_row, c, source_value + increment)
             else:  # Copy the same value
                 for c in range(source_col + 1, target_col + 1):
-                    self.df.iloc[source_row, c] = source_value
+                    fill(source_row, c, source_value)
         
         elif source_col == target_col:  # Vertical fill
             # Check if source is a number and implement a sequence
             if is_numeric:
                 for r in range(source_row + 1, target_row + 1):
                     increment = r - source_row
-                    self.df.iloc[r, source_col] = source_value + increment
+                    fill(r, source_col, source_value + increment)
             else:  # Copy the same value
                 for r in range(source_row + 1, target_row + 1):
-                    self.df.iloc[r, source_col] = source_value
+                    fill(r, source_col, source_value)
         
         elif source_col == target_col:  # Vertical fill
             # Check if source is a number and implement a sequence
             if isinstance(source_value, (int, float)):
                 for r in range(source_row + 1, target_row + 1):
                     increment = r - source_row
-                    self.df.iloc[r, source_col] = source_value + increment
+                    fill(r, source_col, source_value + increment)
             else:  # Copy the same value
                 for r in range(source_row + 1, target_row + 1):
-                    self.df.iloc[r, source_col] = source_value
+                    fill(r, source_col, source_value)
         
         else:  # Both horizontal and vertical fill
             for r in range(source_row, target_row + 1):
                 for c in range(source_col, target_col + 1):
                     if r == source_row and c == source_col:
                         continue  # Skip the source cell
-                    self.df.iloc[r, c] = source_value
+                    fill(r, c, source_value)
         
-        target_address = self._get_cell_address(target_row, target_col)
+        if filled:
+            rows, cols = np.array(filled).T
+            values = np.empty(len(filled_values), dtype=object)
+            values[:] = filled_values
+            self._write_values(rows, cols, values)
         
-        # Apply condition if specified
         if condition:
-            # Here we would implement conditional filling
             return f"Filled from {source_address} to {target_address} with condition: {condition}"
         
         return f"Filled from {source_address} to {target_address}"
@@ -257,54 +576,63 @@ class Action:
         if self.selected_range:
             start_row, start_col, _, _ = self.selected_range
             if start_row <= len(self.df) - 1 and start_col <= len(self.df.columns) - 1:
-                self.input_field_content = str(self.df.iloc[start_row, start_col])
+                formula = self.formulas.formula_text(start_row, start_col)
+                self.input_field_content = formula if formula is not None else str(self.df.iloc[start_row, start_col])
         
         return "Input field selected"
     
-    def set_input(self, text: str) -> str:
+    def set_input(self, text: str, condition: Optional[str] = None) -> str:
         """
         Type something into the input field.
         
         Args:
             text: Text to enter into the input field
+            condition: Only set selected cells meeting this condition (optional)
             
         Returns:
             Confirmation message
+            
+        Raises:
+            ValueError: If the input field is not selected
         """
         if not self.input_field_selected:
-            return "Error: Input field is not selected"
+            raise ValueError("Input field is not selected")
         
         self.input_field_content = text
         
-        # If there's a cell selection, update its value
+        # If there's a cell selection, update the cells that pass its conditions
         if self.selected_range:
             start_row, start_col, end_row, end_col = self.selected_range
+            rows, cols = self.selected_cells(condition)
             
             # Determine if it's a formula
             is_formula = text.startswith("=")
             
-            # Handle simple formulas (basic implementation)
+            # Formulas are evaluated here, with references relative to the selection's top-left
+            # cell; one the engine does not support is stored as text for Excel to calculate
             if is_formula:
-                for r in range(start_row, end_row + 1):
-                    for c in range(start_col, end_col + 1):
-                        if r < len(self.df) and c < len(self.df.columns):
-                            self.df.iloc[r, c] = text
+                try:
+                    formula = parse_formula(text, (start_row, start_col))
+                except ValueError as e:
+                    self._write_values(rows, cols, text)
+                    return f"Formula '{text}' entered in selected range (not evaluated: {e})"
+                self._write_formula(formula, rows, cols)
+                if len(rows) == 1:
+                    return f"Formula '{text}' entered in cell {self._get_cell_address(rows[0], cols[0])} (value: {self.df.iat[rows[0], cols[0]]})"
                 return f"Formula '{text}' entered in selected range"
             
             # For regular text/values
             try:
                 # Try to convert to number if possible
-                numeric_value = pd.to_numeric(text)
-                for r in range(start_row, end_row + 1):
-                    for c in range(start_col, end_col + 1):
-                        if r < len(self.df) and c < len(self.df.columns):
-                            self.df.iloc[r, c] = numeric_value
-            except:
+                value = pd.to_numeric(text)
+            except (ValueError, TypeError):
                 # Otherwise treat as text
-                for r in range(start_row, end_row + 1):
-                    for c in range(start_col, end_col + 1):
-                        if r < len(self.df) and c < len(self.df.columns):
-                            self.df.iloc[r, c] = text
+                value = text
+            self._write_values(rows, cols, value)
+            if condition or self.selection_mask is not None:
+                start_address = self._get_cell_address(start_row, start_col)
+                end_address = self._get_cell_address(end_row, end_col)
+                return f"Set value '{text}' in {len(rows)} matching cells of {start_address}:{end_address}"
         
         start_address = self._get_cell_address(start_row, start_col)
         if start_row == end_row and start_col == end_col:
@@ -313,61 +641,52 @@ class Action:
             end_address = self._get_cell_address(end_row, end_col)
             return f"Set value '{text}' in range {start_address}:{end_address}"
     
-    def select_top_menu_tool(self, tool_name: str, parameters: Optional[Dict[str, Any]] = None) -> str:
+    def select_top_menu_tool(self, tool_name: str, parameters: Optional[Dict[str, Any]] = None,
+                             condition: Optional[str] = None) -> str:
         """
         Select a tool from the top menu.
         
         Args:
             tool_name: Name of the tool to select
             parameters: Optional parameters for the tool
+            condition: Only format selected cells meeting this condition (optional)
             
         Returns:
             Description of the action taken
+            
+        Raises:
+            ValueError: If nothing is selected or a tool lacks its parameters
         """
         if not self.selected_range:
-            return "Error: No range selected for formatting"
+            raise ValueError("No range selected for formatting")
         
         start_row, start_col, end_row, end_col = self.selected_range
         
         # Handle different top menu tools
         if tool_name.lower() == "bold":
             # Apply bold formatting in openpyxl
-            for r in range(start_row + 1, end_row + 2):  # +1 for 1-indexing in openpyxl
-                for c in range(start_col + 1, end_col + 2):
-                    cell = self.active_sheet.cell(row=r, column=c)
-                    cell.font = openpyxl.styles.Font(bold=True)
+            self.format_selection(condition, font=styles.font(bold=True))
             return "Applied bold formatting to selected range"
         
         elif tool_name.lower() == "italic":
             # Apply italic formatting
-            for r in range(start_row + 1, end_row + 2):
-                for c in range(start_col + 1, end_col + 2):
-                    cell = self.active_sheet.cell(row=r, column=c)
-                    cell.font = openpyxl.styles.Font(italic=True)
+            self.format_selection(condition, font=styles.font(italic=True))
             return "Applied italic formatting to selected range"
         
         elif tool_name.lower() == "conditional_formatting":
             if not parameters:
-                return "Error: Conditional formatting requires parameters"
+                raise ValueError("Conditional formatting requires parameters")
             
             # Basic implementation of conditional formatting
             rule_type = parameters.get("rule_type", "")
             threshold = parameters.get("threshold", 0)
             
-            if rule_type == "greater_than":
-                # Use pandas for demonstration
-                for r in range(start_row, end_row + 1):
-                    for c in range(start_col, end_col + 1):
-                        if r < len(self.df) and c < len(self.df.columns):
-                            try:
-                                if float(self.df.iloc[r, c]) > threshold:
-                                    # Mark in openpyxl
-                                    cell = self.active_sheet.cell(row=r+1, column=c+1)
-                                    cell.fill = openpyxl.styles.PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
-                            except:
-                                pass  # Skip non-numeric cells
+            if rule_type in CONDITIONAL_RULES:
+                # A native rule over the range; non-numeric cells never match
+                rule = f"{CONDITIONAL_RULES[rule_type]} {threshold}"
+                self.format_selection(rule, fill=styles.solid_fill(styles.HIGHLIGHT_COLOR))
                 
-                return f"Applied conditional formatting for values > {threshold}"
+                return f"Applied conditional formatting for values {rule}"
             
             return f"Applied {rule_type} conditional formatting"
         
@@ -383,74 +702,98 @@ class Action:
             format_code = parameters.get("format", "General")
             
             # Apply number formatting
-            for r in range(start_row + 1, end_row + 2):
-                for c in range(start_col + 1, end_col + 2):
-                    cell = self.active_sheet.cell(row=r, column=c)
-                    cell.number_format = format_code
+            self._apply_style(condition, number_format=format_code)
             
             return f"Applied number format '{format_code}' to selected range"
         
         else:
             return f"Selected tool: {tool_name} (not implemented in this demo)"
     
-    def select_context_menu_tool(self, tool_name: str) -> str:
+    def select_context_menu_tool(self, tool_name: str, condition: Optional[str] = None) -> str:
         """
         Select a tool from the right-click context menu.
         
+        Copy, delete and clear_formatting act on the selected cells that pass the
+        selection's condition and `condition`. Paste writes the clipboard's rectangle
+        from the selection's top-left cell, skipping cells that were not copied and
+        target cells failing `condition`.
+        
         Args:
             tool_name: Name of the tool to select
+            condition: Only act on cells meeting this condition (optional)
             
         Returns:
             Description of the action taken
+            
+        Raises:
+            ValueError: If nothing is selected, or on a paste with nothing copied
         """
         if not self.selected_range:
-            return "Error: No selection for context menu action"
+            raise ValueError("No selection for context menu action")
         
         start_row, start_col, end_row, end_col = self.selected_range
         
         if tool_name.lower() == "copy":
-            # Create a copy of the selected data
-            self.clipboard = []
-            for r in range(start_row, end_row + 1):
-                row_data = []
-                for c in range(start_col, end_col + 1):
-                    if r < len(self.df) and c < len(self.df.columns):
-                        row_data.append(self.df.iloc[r, c])
-                self.clipboard.append(row_data)
+            # Create a copy of the selected data (clipped to the sheet's data)
+            block = self.df.iloc[start_row:end_row + 1, start_col:end_col + 1]
+            self.clipboard = block.to_numpy(dtype=object).tolist()
+            self.clipboard_mask = None
+            height, width = block.shape
+            self.clipboard_formulas = {(r - start_row, c - start_col): formula
+                                       for (r, c), formula in self.formulas.formulas.items()
+                                       if 0 <= r - start_row < height and 0 <= c - start_col < width}
+            if condition or self.selection_mask is not None:
+                rows, cols = self.selected_cells(condition)
+                self.clipboard_mask = np.zeros(block.shape, dtype=bool)
+                self.clipboard_mask[rows - start_row, cols - start_col] = True
+                return f"Copied {len(rows)} matching cells to clipboard"
             
             return "Copied selection to clipboard"
         
         elif tool_name.lower() == "paste":
             if not self.clipboard:
-                return "Error: Nothing to paste"
+                raise ValueError("Nothing to paste")
             
             # Paste from the starting position of the selection
-            for r_offset, row_data in enumerate(self.clipboard):
-                for c_offset, value in enumerate(row_data):
-                    r = start_row + r_offset
-                    c = start_col + c_offset
-                    if r < len(self.df) and c < len(self.df.columns):
-                        self.df.iloc[r, c] = value
+            values = np.array(self.clipboard, dtype=object).reshape(len(self.clipboard), -1)
+            height, width = values.shape
+            mask = self._range_mask(condition, start_row, start_col, start_row + height - 1, start_col + width - 1)
+            if self.clipboard_mask is not None:
+                mask &= self.clipboard_mask
+            rows, cols = np.nonzero(mask)
+            inside = (rows + start_row < len(self.df)) & (cols + start_col < len(self.df.columns))
+            rows, cols = rows[inside], cols[inside]
+            if not self.clipboard_formulas:
+                self._write_values(rows + start_row, cols + start_col, values[rows, cols])
+                return "Pasted data from clipboard"
+            
+            # Copied formulas are pasted as formulas, their relative references shifted to the new place
+            copied = [self.clipboard_formulas.get(cell) for cell in zip(rows.tolist(), cols.tolist())]
+            plain = np.array([formula is None for formula in copied], dtype=bool)
+            self._set_cells(rows[plain] + start_row, cols[plain] + start_col, values[rows[plain], cols[plain]])
+            self.formulas.remove(rows[plain] + start_row, cols[plain] + start_col)
+            placed = {}
+            for index in np.nonzero(~plain)[0].tolist():
+                placed.setdefault(id(copied[index]), (copied[index], []))[1].append(index)
+            for formula, indices in placed.values():
+                self.formulas.place(formula, rows[indices] + start_row, cols[indices] + start_col)
+            self.formulas.recalculate(rows + start_row, cols + start_col)
             
             return "Pasted data from clipboard"
         
         elif tool_name.lower() == "delete":
             # Delete contents of selected cells
-            for r in range(start_row, end_row + 1):
-                for c in range(start_col, end_col + 1):
-                    if r < len(self.df) and c < len(self.df.columns):
-                        self.df.iloc[r, c] = None
+            rows, cols = self.selected_cells(condition)
+            self._write_values(rows, cols, None)
             
             return "Deleted contents of selected cells"
         
         elif tool_name.lower() == "clear_formatting":
-            # Clear formatting from selected cells
-            for r in range(start_row + 1, end_row + 2):
-                for c in range(start_col + 1, end_col + 2):
-                    cell = self.active_sheet.cell(row=r, column=c)
-                    cell.font = openpyxl.styles.Font()
-                    cell.fill = openpyxl.styles.PatternFill()
-                    cell.number_format = "General"
+            # Clear formatting from selected cells, and the conditional rules inside the selection
+            self._apply_style(condition, font=styles.DEFAULT_FONT, fill=styles.NO_FILL, number_format="General")
+            if not condition and self.selection_mask is None:
+                self.journal.record_rules(self.active_sheet)
+                styles.remove_conditional_formats(self.active_sheet, self._selection_ref())
             
             return "Cleared formatting from selected cells"
         
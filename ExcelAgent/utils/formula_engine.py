@@ -0,0 +1,1208 @@
+"""
+Formula Engine - Evaluate sheet formulas in memory and keep their values current
+A formula typed with Set is parsed once into a Formula: its text as written at an origin
+cell. Every cell holding it (the selected range, cells filled by Select and Drag, pasted
+cells) reads it with the relative references shifted by the cell's distance from the
+origin, as Excel does. The DataFrame holds the computed values, so prompts, Reads and
+reflections see numbers instead of formula strings; the workbook gets the formula text.
+
+The engine records which cells every formula cell reads. After an edit only the formula
+cells depending on the changed cells, directly or through other formulas, are evaluated
+again, in dependency order. Cells that hold the same Formula and become ready together
+(typically a column filled by one drag) are evaluated as NumPy arrays; cells the
+vectorized path does not cover (text operands, errors, some functions) are evaluated one
+by one with the same results.
+
+Supported: numbers, text, TRUE/FALSE, cell references and ranges with $ anchors, the
+operators + - * / ^ & % = <> < > <= >=, and SUM, AVERAGE, COUNT, COUNTA, MIN, MAX, IF,
+IFERROR, AND, OR, NOT, ROUND, ABS, VLOOKUP and CONCATENATE. parse_formula() rejects
+anything else, and such formulas are left for Excel to calculate.
+"""
+
+import math
+import operator
+import re
+import warnings
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+from openpyxl.utils import column_index_from_string, get_column_letter
+
+from .utils import get_logger
+
+logger = get_logger(__name__)
+
+# Error values a formula can produce, as Excel displays them
+ERRORS = ("#DIV/0!", "#VALUE!", "#REF!", "#NAME?", "#N/A", "#NUM!")
+# Value of cells caught in a circular reference (what Google Sheets shows), so Reads and
+# reflections see the problem instead of a plausible number
+CIRCULAR = "#REF!"
+
+# Ranges up to this many cells are recorded cell by cell in the dependency graph; larger
+# ones (SUM(B2:B5000)) are kept as rectangles and tested against the changed cells
+SMALL_RANGE = 64
+# Fewest cells of one Formula worth evaluating as arrays
+VECTOR_MIN = 8
+
+_TOKEN = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<string>"(?:[^"]|"")*")
+  | (?P<error>\#(?:DIV/0!|VALUE!|REF!|NAME\?|N/A|NUM!))
+  | (?P<ref>(\$?)([A-Za-z]{1,3})(\$?)([0-9]+)(?::(\$?)([A-Za-z]{1,3})(\$?)([0-9]+))?)(?![A-Za-z0-9_(!.])
+  | (?P<number>(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][-+]?[0-9]+)?)
+  | (?P<name>[A-Za-z_][A-Za-z0-9_.]*)
+  | (?P<op><=|>=|<>|[-+*/^&=<>%(),])
+""", re.VERBOSE)
+
+_COMPARISONS = {"=": operator.eq, "<>": operator.ne, "<": operator.lt,
+                ">": operator.gt, "<=": operator.le, ">=": operator.ge}
+
+# Function name -> (fewest, most) arguments
+_ARITY = {
+    "SUM": (1, None), "AVERAGE": (1, None), "COUNT": (1, None), "COUNTA": (1, None),
+    "MIN": (1, None), "MAX": (1, None), "IF": (2, 3), "IFERROR": (2, 2), "AND": (1, None),
+    "OR": (1, None), "NOT": (1, 1), "ROUND": (2, 2), "ABS": (1, 1), "VLOOKUP": (3, 4),
+    "CONCATENATE": (1, None),
+}
+
+# A reference end: (row, col, row_absolute, col_absolute), in DataFrame coordinates as
+# written at the Formula's origin (row -1 is the header row)
+End = Tuple[int, int, bool, bool]
+Cell = Tuple[int, int]
+
+
+class FormulaError(Exception):
+    """An Excel error value raised while evaluating; code is what the cell shows."""
+
+    def __init__(self, code: str):
+        super().__init__(code)
+        self.code = code
+
+
+class _Scalar(Exception):
+    """The vectorized path cannot evaluate this group; evaluate it cell by cell."""
+
+
+class Formula:
+    """A parsed formula and the cell it was written at."""
+
+    __slots__ = ("text", "origin", "tree", "references", "_parts")
+
+    def __init__(self, text: str, origin: Cell, tree, references: List[Tuple[End, End]], parts: list):
+        self.text = text
+        self.origin = origin
+        self.tree = tree
+        # Every reference and range as (first end, last end)
+        self.references = references
+        # Text pieces and references, for text_at()
+        self._parts = parts
+
+    def offset(self, row: int, col: int) -> Cell:
+        return row - self.origin[0], col - self.origin[1]
+
+    def text_at(self, row: int, col: int) -> str:
+        """The formula as it reads in cell (row, col) of the DataFrame."""
+        dr, dc = self.offset(row, col)
+        if not dr and not dc:
+            return self.text
+        pieces = []
+        for part in self._parts:
+            if isinstance(part, str):
+                pieces.append(part)
+            else:
+                pieces.append(":".join(_end_text(_place(end, dr, dc), end) for end in part))
+        return "".join(pieces)
+
+
+def _place(end: End, dr, dc):
+    """Coordinates of a reference end in a cell (dr, dc) away from the origin."""
+    row, col, row_absolute, col_absolute = end
+    return (row if row_absolute else row + dr), (col if col_absolute else col + dc)
+
+
+def _end_text(placed: Cell, end: End) -> str:
+    row, col = placed
+    if row < -1 or col < 0:
+        return "#REF!"
+    return f"{'$' if end[3] else ''}{get_column_letter(col + 1)}{'$' if end[2] else ''}{row + 2}"
+
+
+def _end(col_absolute: str, col: str, row_absolute: str, row: str) -> End:
+    return int(row) - 2, column_index_from_string(col.upper()) - 1, bool(row_absolute), bool(col_absolute)
+
+
+def _tokenize(text: str):
+    """(kind, value, source text) of every token of a formula body."""
+    tokens = []
+    position = 0
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if match is None:
+            raise ValueError(f"Unsupported formula syntax at '{text[position:]}'")
+        position = match.end()
+        kind = match.lastgroup
+        if kind == "space":
+            continue
+        source = match.group(0)
+        if kind == "ref":
+            groups = match.groups()[4:12]
+            first = _end(*groups[0:4])
+            value = (first, _end(*groups[4:8]) if groups[4 + 1] else first)
+        elif kind == "string":
+            value = source[1:-1].replace('""', '"')
+        elif kind == "number":
+            value = float(source) if re.search(r"[.eE]", source) else int(source)
+        elif kind == "name":
+            value = source.upper()
+        else:
+            value = source
+        tokens.append((kind, value, source))
+    return tokens
+
+
+class _Parser:
+    """Recursive descent over the tokens, with Excel's operator precedence."""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None, None)
+
+    def take(self, *ops):
+        kind, value, _ = self.peek()
+        if kind == "op" and value in ops:
+            self.position += 1
+            return value
+        return None
+
+    def expect(self, op):
+        if self.take(op) is None:
+            raise ValueError(f"Expected '{op}' in formula")
+
+    def parse(self):
+        tree = self.comparison()
+        if self.position != len(self.tokens):
+            raise ValueError(f"Unexpected '{self.peek()[2]}' in formula")
+        return tree
+
+    def binary(self, operand, ops):
+        tree = operand()
+        while True:
+            op = self.take(*ops)
+            if op is None:
+                return tree
+            tree = ("op", op, tree, operand())
+
+    def comparison(self):
+        return self.binary(self.concatenation, tuple(_COMPARISONS))
+
+    def concatenation(self):
+        return self.binary(self.additive, ("&",))
+
+    def additive(self):
+        return self.binary(self.term, ("+", "-"))
+
+    def term(self):
+        return self.binary(self.power, ("*", "/"))
+
+    def power(self):
+        return self.binary(self.unary, ("^",))
+
+    def unary(self):
+        op = self.take("-", "+")
+        if op is not None:
+            operand = self.unary()
+            return ("neg", operand) if op == "-" else operand
+        tree = self.primary()
+        while self.take("%") is not None:
+            tree = ("pct", tree)
+        return tree
+
+    def primary(self):
+        kind, value, source = self.peek()
+        self.position += 1
+        if kind in ("number", "string"):
+            return ("const", value)
+        if kind == "error":
+            return ("error", value)
+        if kind == "ref":
+            first, last = value
+            return ("ref", first) if first is last else ("range", first, last)
+        if kind == "name":
+            if value in ("TRUE", "FALSE") and self.peek()[1] != "(":
+                return ("const", value == "TRUE")
+            if value not in _ARITY:
+                raise ValueError(f"Unsupported function {value} in formula")
+            self.expect("(")
+            args = []
+            if self.take(")") is None:
+                args.append(self.comparison())
+                while self.take(",") is not None:
+                    args.append(self.comparison())
+                self.expect(")")
+            fewest, most = _ARITY[value]
+            if len(args) < fewest or (most is not None and len(args) > most):
+                raise ValueError(f"Wrong number of arguments to {value}")
+            return ("call", value, args)
+        if kind == "op" and value == "(":
+            tree = self.comparison()
+            self.expect(")")
+            return tree
+        raise ValueError(f"Unexpected '{source}' in formula" if source else "Incomplete formula")
+
+
+def _tokens_key(tokens, origin: Cell):
+    """Tokens with references relative to origin: equal keys mean one formula filled across cells."""
+    key = []
+    for kind, value, source in tokens:
+        if kind == "ref":
+            value = tuple((row if row_absolute else row - origin[0], col if col_absolute else col - origin[1],
+                           row_absolute, col_absolute) for row, col, row_absolute, col_absolute in value)
+            key.append(value)
+        else:
+            key.append(source)
+    return tuple(key)
+
+
+def parse_formula(text: str, origin: Cell, tokens=None) -> Formula:
+    """
+    Parse a formula.
+
+    Args:
+        text: Formula text, starting with "="
+        origin: Zero-indexed DataFrame (row, column) the text is written for
+        tokens: _tokenize() of the text after "=", if already done
+
+    Raises:
+        ValueError: If the formula uses syntax or functions the engine does not evaluate
+    """
+    if tokens is None:
+        tokens = _tokenize(text[1:])
+    if not tokens:
+        raise ValueError("Empty formula")
+    tree = _Parser(tokens).parse()
+    parts = ["="]
+    references = []
+    for kind, value, source in tokens:
+        if kind == "ref":
+            parts.append(value if value[0] is not value[1] else (value[0],))
+            references.append(value)
+        else:
+            parts.append(source if kind != "name" else value)
+    return Formula(text, origin, tree, references, _join_text(parts))
+
+
+def _join_text(parts: list) -> list:
+    """Merge neighbouring text pieces."""
+    joined = []
+    for part in parts:
+        if isinstance(part, str) and joined and isinstance(joined[-1], str):
+            joined[-1] += part
+        else:
+            joined.append(part)
+    return joined
+
+
+# ---------------------------------------------------------------------------
+# Scalar semantics
+# ---------------------------------------------------------------------------
+
+def _python(value):
+    """A DataFrame value as a formula sees it: None for blanks, errors raised."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        if value in ERRORS:
+            raise FormulaError(value)
+        return value
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return None if math.isnan(value) else float(value)
+    if pd.isna(value):
+        return None
+    return value
+
+
+def _number(value):
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str) and value.strip():
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    raise FormulaError("#VALUE!")
+
+
+def _text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() and abs(value) < 1e15 else format(value, ".15g")
+    return str(value)
+
+
+def _truth(value) -> bool:
+    if value is None:
+        return False
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return value != 0
+    if isinstance(value, str) and value.upper() in ("TRUE", "FALSE"):
+        return value.upper() == "TRUE"
+    raise FormulaError("#VALUE!")
+
+
+def _kind(value) -> int:
+    """Excel's ordering across types: numbers < text < logicals."""
+    if isinstance(value, bool):
+        return 2
+    if isinstance(value, str):
+        return 1
+    return 0
+
+
+def _compare(op: str, first, second) -> bool:
+    if first is None:
+        first = {0: 0, 1: "", 2: False}[_kind(second)] if second is not None else 0
+    if second is None:
+        second = {0: 0, 1: "", 2: False}[_kind(first)]
+    kinds = _kind(first), _kind(second)
+    if kinds[0] != kinds[1]:
+        first, second = kinds
+    elif kinds[0] == 1:
+        first, second = first.lower(), second.lower()
+    return _COMPARISONS[op](first, second)
+
+
+def _arithmetic(op: str, first, second):
+    first, second = _number(first), _number(second)
+    if op == "+":
+        return first + second
+    if op == "-":
+        return first - second
+    if op == "*":
+        return first * second
+    if op == "/":
+        if second == 0:
+            raise FormulaError("#DIV/0!")
+        return first / second
+    if first == 0 and second < 0:
+        raise FormulaError("#DIV/0!")
+    try:
+        result = float(first) ** second
+    except OverflowError:
+        raise FormulaError("#NUM!")
+    if isinstance(result, complex) or math.isinf(result):
+        raise FormulaError("#NUM!")
+    return result
+
+
+def _round(value, digits):
+    """Excel's ROUND: halves away from zero, on the number as displayed."""
+    digits = int(_number(digits))
+    value = _number(value)
+    rounded = Decimal(repr(float(value))).quantize(Decimal(1).scaleb(-digits), rounding=ROUND_HALF_UP)
+    return float(rounded)
+
+
+def _lookup_key(value):
+    """Key under which VLOOKUP matches a value exactly (case-insensitive text, numbers by value)."""
+    if isinstance(value, bool):
+        return ("logical", value)
+    if isinstance(value, str):
+        return ("text", value.lower())
+    return ("number", float(value))
+
+
+def _result(value):
+    """A computed value as it is stored in the DataFrame."""
+    if value is None:
+        return 0
+    if isinstance(value, float) and value.is_integer() and abs(value) < 2 ** 53:
+        return int(value)
+    return value
+
+
+# ---------------------------------------------------------------------------
+# Engine
+# ---------------------------------------------------------------------------
+
+def _count_inside(rows: np.ndarray, cols: np.ndarray, rects: np.ndarray) -> np.ndarray:
+    """For each rectangle (top, left, bottom, right), how many of the cells lie inside it."""
+    if len(rows) <= 32:
+        inside = np.zeros(len(rects), dtype=np.int64)
+        for row, col in zip(rows.tolist(), cols.tolist()):
+            inside += ((rects[:, 0] <= row) & (row <= rects[:, 2]) & (rects[:, 1] <= col) & (col <= rects[:, 3]))
+        return inside
+    # Inclusion-exclusion over a 2-D prefix sum of the cells
+    top, left = min(rows.min(), rects[:, 0].min()), min(cols.min(), rects[:, 1].min())
+    height, width = rows.max() - top + 1, cols.max() - left + 1
+    grid = np.zeros((height + 1, width + 1), dtype=np.int64)
+    np.add.at(grid, (rows - top + 1, cols - left + 1), 1)
+    grid = grid.cumsum(axis=0).cumsum(axis=1)
+    r1 = np.clip(rects[:, 0] - top, 0, height)
+    c1 = np.clip(rects[:, 1] - left, 0, width)
+    r2 = np.clip(rects[:, 2] - top + 1, 0, height)
+    c2 = np.clip(rects[:, 3] - left + 1, 0, width)
+    return grid[r2, c2] - grid[r1, c2] - grid[r2, c1] + grid[r1, c1]
+
+
+def _cell_arrays(cells: Iterable[Cell]) -> Tuple[np.ndarray, np.ndarray]:
+    cells = list(cells)
+    return (np.fromiter((cell[0] for cell in cells), dtype=np.int64, count=len(cells)),
+            np.fromiter((cell[1] for cell in cells), dtype=np.int64, count=len(cells)))
+
+
+# Marks a cell without a held-back value
+_NOT_HELD = object()
+
+
+class FormulaEngine:
+    """
+    The formulas of an Action's sheet and the cells they depend on.
+
+    Values are read from and written to action.df (writes go through action._set_cells,
+    so they are saved like any other edit), and the formulas each cell held before
+    place() or remove() are logged in action.journal.
+    """
+
+    def __init__(self, action):
+        self.action = action
+        # DataFrame cell -> Formula it holds
+        self.formulas: Dict[Cell, Formula] = {}
+        # Formula cell -> (cells it reads, rectangles of the large ranges it reads)
+        self._precedents: Dict[Cell, Tuple[Set[Cell], List[Tuple[int, int, int, int]]]] = {}
+        # Cell -> formula cells reading it (large ranges excluded)
+        self._dependents: Dict[Cell, Set[Cell]] = defaultdict(set)
+        # Formula cells reading large ranges, and those ranges as an array (built on demand)
+        self._large: Set[Cell] = set()
+        self._large_index = None
+        # Exact-match VLOOKUP tables, valid until the next write
+        self._lookup_tables = {}
+        # Values computed but not yet written to the DataFrame
+        self._unwritten: Dict[Cell, object] = {}
+
+    # -- registration ------------------------------------------------------
+
+    def load(self, sheet) -> List[Cell]:
+        """
+        Take over the formulas in a worksheet's data cells that the engine can evaluate.
+
+        Cells written as one formula filled across a range share a Formula, so they are
+        evaluated together. Other formulas keep the value cached in the file.
+
+        Returns:
+            DataFrame cells that now hold a Formula
+        """
+        height, width = self.action.df.shape
+        shared = {}
+        placed = defaultdict(list)
+        for (row, col), cell in sheet._cells.items():
+            value = cell.value
+            if row < 2 or row - 2 >= height or col > width or not (isinstance(value, str) and value.startswith("=")):
+                continue
+            origin = (row - 2, col - 1)
+            try:
+                tokens = _tokenize(value[1:])
+                key = _tokens_key(tokens, origin)
+                formula = shared.get(key)
+                if formula is None:
+                    formula = shared[key] = parse_formula(value, origin, tokens)
+            except ValueError:
+                continue
+            placed[id(formula)].append((formula, origin))
+        cells = []
+        for entries in placed.values():
+            formula = entries[0][0]
+            rows = np.array([origin[0] for _, origin in entries])
+            cols = np.array([origin[1] for _, origin in entries])
+            self.place(formula, rows, cols)
+            cells.extend(origin for _, origin in entries)
+        return cells
+
+    def place(self, formula: Formula, rows: np.ndarray, cols: np.ndarray):
+        """Put a Formula in cells (replacing what they held); values are computed by recalculate()."""
+        cells = list(zip(rows.tolist(), cols.tolist()))
+        self.action.journal.record_formulas(cells, [self.formulas.get(cell) for cell in cells])
+        if self.formulas:
+            for cell in cells:
+                if cell in self.formulas:
+                    self._unlink(cell)
+        # Cells each reference points to, computed for all the cells at once
+        dr, dc = rows - formula.origin[0], cols - formula.origin[1]
+        singles = [set() for _ in cells]
+        large = [[] for _ in cells]
+        for first, last in formula.references:
+            r1, c1, _ = np.broadcast_arrays(*_place(first, dr, dc), dr)
+            if first is last:
+                for precedents, precedent in zip(singles, zip(r1.tolist(), c1.tolist())):
+                    precedents.add(precedent)
+                continue
+            r2, c2, _ = np.broadcast_arrays(*_place(last, dr, dc), dr)
+            bounds = zip(np.minimum(r1, r2).tolist(), np.minimum(c1, c2).tolist(),
+                         np.maximum(r1, r2).tolist(), np.maximum(c1, c2).tolist())
+            for index, (top, left, bottom, right) in enumerate(bounds):
+                if (bottom - top + 1) * (right - left + 1) <= SMALL_RANGE:
+                    singles[index].update((r, c) for r in range(top, bottom + 1) for c in range(left, right + 1))
+                else:
+                    large[index].append((top, left, bottom, right))
+        for cell, precedents, rects in zip(cells, singles, large):
+            self.formulas[cell] = formula
+            for precedent in precedents:
+                self._dependents[precedent].add(cell)
+            self._precedents[cell] = (precedents, rects)
+            if rects:
+                self._large.add(cell)
+                self._large_index = None
+
+    def remove(self, rows: np.ndarray, cols: np.ndarray):
+        """Forget the formulas in these cells (they now hold plain values)."""
+        if not self.formulas:
+            return
+        removed = [cell for cell in dict.fromkeys(zip(rows.tolist(), cols.tolist())) if cell in self.formulas]
+        self.action.journal.record_formulas(removed, [self.formulas[cell] for cell in removed])
+        for cell in removed:
+            del self.formulas[cell]
+            self._unlink(cell)
+
+    def _unlink(self, cell: Cell):
+        singles, large = self._precedents.pop(cell)
+        for precedent in singles:
+            dependents = self._dependents.get(precedent)
+            if dependents is not None:
+                dependents.discard(cell)
+                if not dependents:
+                    del self._dependents[precedent]
+        if large:
+            self._large.discard(cell)
+            self._large_index = None
+
+    def formula_text(self, row: int, col: int) -> Optional[str]:
+        """The formula in a DataFrame cell, as Excel shows it, or None."""
+        formula = self.formulas.get((row, col))
+        return formula.text_at(row, col) if formula is not None else None
+
+    # -- recalculation -----------------------------------------------------
+
+    def _large_readers(self, cells: Iterable[Cell]) -> Set[Cell]:
+        """Formula cells with a large range containing any of the cells."""
+        if not self._large:
+            return set()
+        if self._large_index is None:
+            owners, rects = [], []
+            for owner in self._large:
+                for rect in self._precedents[owner][1]:
+                    owners.append(owner)
+                    rects.append(rect)
+            self._large_index = (owners, np.array(rects, dtype=np.int64))
+        owners, rects = self._large_index
+        if not cells:
+            return set()
+        hits = np.nonzero(_count_inside(*_cell_arrays(cells), rects))[0]
+        return {owners[index] for index in hits.tolist()}
+
+    def _affected(self, cells: Set[Cell]) -> Set[Cell]:
+        """Formula cells among the cells, and every formula cell depending on them."""
+        pending = {cell for cell in cells if cell in self.formulas}
+        frontier = cells
+        while frontier:
+            reached = set()
+            for cell in frontier:
+                dependents = self._dependents.get(cell)
+                if dependents:
+                    reached.update(dependents)
+            reached.update(self._large_readers(frontier))
+            frontier = reached - pending
+            pending |= frontier
+        return pending
+
+    def recalculate(self, rows: np.ndarray, cols: np.ndarray) -> int:
+        """
+        Update the formula cells affected by a change to these cells.
+
+        Args:
+            rows: Zero-indexed DataFrame rows of cells whose value or formula changed
+            cols: Zero-indexed columns, aligned with rows
+
+        Returns:
+            Number of formula cells evaluated
+        """
+        if not self.formulas:
+            return 0
+        return self._evaluate_cells(self._affected(set(zip(rows.tolist(), cols.tolist()))))
+
+    def recalculate_all(self) -> int:
+        """Evaluate every formula cell."""
+        return self._evaluate_cells(set(self.formulas))
+
+    def _evaluate_cells(self, pending: Set[Cell]) -> int:
+        """Evaluate formula cells in dependency order (Kahn's algorithm, one wave of ready cells at a time)."""
+        total = len(pending)
+        # Pending cells each one reads; a large range counts the pending cells inside it
+        waiting = {cell: len(self._precedents[cell][0] & pending) for cell in pending}
+        owners = [cell for cell in pending if cell in self._large for _ in self._precedents[cell][1]]
+        if owners:
+            rects = np.array([rect for cell in dict.fromkeys(owners) for rect in self._precedents[cell][1]],
+                             dtype=np.int64)
+            for owner, count in zip(owners, _count_inside(*_cell_arrays(pending), rects).tolist()):
+                waiting[owner] += count
+        ready = [cell for cell, count in waiting.items() if count == 0]
+        while ready:
+            self._evaluate_wave(ready)
+            pending.difference_update(ready)
+            wave, ready = ready, []
+            for cell in wave:
+                for dependent in self._dependents.get(cell, ()):
+                    if dependent in pending:
+                        waiting[dependent] -= 1
+                        if waiting[dependent] == 0:
+                            ready.append(dependent)
+            if owners:
+                for owner, count in zip(owners, _count_inside(*_cell_arrays(wave), rects).tolist()):
+                    if count and owner in pending:
+                        waiting[owner] -= count
+                        if waiting[owner] == 0:
+                            ready.append(owner)
+        self._flush()
+        if pending:
+            logger.warning("Circular reference among %d formula cells; their value is %s", len(pending), CIRCULAR)
+            rows, cols = _cell_arrays(pending)
+            self._write(rows, cols, np.full(len(rows), CIRCULAR, dtype=object))
+        return total
+
+    def _evaluate_wave(self, cells: List[Cell]):
+        groups = defaultdict(list)
+        for cell in cells:
+            groups[id(self.formulas[cell])].append(cell)
+        for group in groups.values():
+            formula = self.formulas[group[0]]
+            if len(group) >= VECTOR_MIN:
+                rows, cols = _cell_arrays(group)
+                self._flush()
+                try:
+                    self._write(rows, cols, self._vector_values(formula, rows, cols))
+                    continue
+                except _Scalar:
+                    pass
+            # Held back until something reads the DataFrame directly, so a chain of formulas
+            # (a running total) is not written to the DataFrame one cell at a time
+            for row, col in group:
+                self._unwritten[(row, col)] = self.evaluate(formula, row, col)
+
+    def _flush(self):
+        """Write the values held back by _evaluate_wave()."""
+        if self._unwritten:
+            rows, cols = _cell_arrays(self._unwritten)
+            values = np.empty(len(rows), dtype=object)
+            values[:] = list(self._unwritten.values())
+            self._unwritten = {}
+            self._write(rows, cols, values)
+
+    def _write(self, rows: np.ndarray, cols: np.ndarray, values: np.ndarray):
+        self.action._set_cells(rows, cols, values)
+        self._lookup_tables.clear()
+
+    # -- scalar evaluation -------------------------------------------------
+
+    def evaluate(self, formula: Formula, row: int, col: int):
+        """The value of a Formula in one cell, as stored in the DataFrame (errors as their code)."""
+        try:
+            return _result(self._eval(formula.tree, *formula.offset(row, col)))
+        except FormulaError as e:
+            return e.code
+
+    def _cell(self, row: int, col: int):
+        if row < -1 or col < 0:
+            raise FormulaError("#REF!")
+        df = self.action.df
+        if col >= len(df.columns):
+            return None
+        if row == -1:
+            return _python(df.columns[col])
+        if row >= len(df):
+            return None
+        if self._unwritten:
+            value = self._unwritten.get((row, col), _NOT_HELD)
+            if value is not _NOT_HELD:
+                return _python(value)
+        return _python(df.iat[row, col])
+
+    def _rect(self, node, dr, dc) -> Tuple[int, int, int, int]:
+        first, last = (node[1], node[1]) if node[0] == "ref" else (node[1], node[2])
+        (r1, c1), (r2, c2) = _place(first, dr, dc), _place(last, dr, dc)
+        if min(r1, r2) < -1 or min(c1, c2) < 0:
+            raise FormulaError("#REF!")
+        return min(r1, r2), min(c1, c2), max(r1, r2), max(c1, c2)
+
+    def _range_values(self, node, dr, dc) -> List:
+        """Values of a range, row by row; cells past the DataFrame's edge are blank."""
+        r1, c1, r2, c2 = self._rect(node, dr, dc)
+        self._flush()
+        df = self.action.df
+        width = c2 - c1 + 1
+        values = []
+        if r1 == -1:
+            values.extend(self._cell(-1, col) for col in range(c1, c2 + 1))
+            r1 = 0
+        block = df.iloc[r1:r2 + 1, c1:c2 + 1].to_numpy(dtype=object)
+        if block.shape[1] == width:
+            values.extend(_python(value) for value in block.ravel().tolist())
+        else:
+            for row in block.tolist():
+                values.extend(_python(value) for value in row)
+                values.extend([None] * (width - len(row)))
+        values.extend([None] * (width * (r2 - r1 + 1 - block.shape[0])))
+        return values
+
+    def _eval(self, node, dr, dc):
+        kind = node[0]
+        if kind == "const":
+            return node[1]
+        if kind == "ref":
+            return self._cell(*_place(node[1], dr, dc))
+        if kind == "op":
+            op = node[1]
+            first, second = self._eval(node[2], dr, dc), self._eval(node[3], dr, dc)
+            if op in _COMPARISONS:
+                return _compare(op, first, second)
+            if op == "&":
+                return _text(first) + _text(second)
+            return _arithmetic(op, first, second)
+        if kind == "neg":
+            return -_number(self._eval(node[1], dr, dc))
+        if kind == "pct":
+            return _number(self._eval(node[1], dr, dc)) / 100
+        if kind == "call":
+            return getattr(self, "_fn_" + node[1].lower())(node[2], dr, dc)
+        if kind == "error":
+            raise FormulaError(node[1])
+        # A range outside a function
+        raise FormulaError("#VALUE!")
+
+    def _arguments(self, args, dr, dc):
+        """(value, came from a range) for every argument, ranges flattened."""
+        for arg in args:
+            if arg[0] in ("range", "ref"):
+                for value in self._range_values(arg, dr, dc):
+                    yield value, True
+            else:
+                yield self._eval(arg, dr, dc), False
+
+    def _numbers(self, args, dr, dc) -> List:
+        """The numbers SUM, AVERAGE, MIN and MAX use: numbers in ranges, any number-like direct argument."""
+        numbers = []
+        for value, in_range in self._arguments(args, dr, dc):
+            if in_range:
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    numbers.append(value)
+            else:
+                numbers.append(_number(value))
+        return numbers
+
+    def _fn_sum(self, args, dr, dc):
+        return sum(self._numbers(args, dr, dc))
+
+    def _fn_average(self, args, dr, dc):
+        numbers = self._numbers(args, dr, dc)
+        if not numbers:
+            raise FormulaError("#DIV/0!")
+        return sum(numbers) / len(numbers)
+
+    def _fn_min(self, args, dr, dc):
+        return min(self._numbers(args, dr, dc), default=0)
+
+    def _fn_max(self, args, dr, dc):
+        return max(self._numbers(args, dr, dc), default=0)
+
+    def _fn_count(self, args, dr, dc):
+        count = 0
+        for value, in_range in self._arguments(args, dr, dc):
+            if isinstance(value, (int, float)) and not (in_range and isinstance(value, bool)):
+                count += 1
+            elif not in_range and isinstance(value, str):
+                try:
+                    _number(value)
+                    count += 1
+                except FormulaError:
+                    pass
+        return count
+
+    def _fn_counta(self, args, dr, dc):
+        return sum(1 for value, in_range in self._arguments(args, dr, dc) if value is not None or not in_range)
+
+    def _fn_if(self, args, dr, dc):
+        if _truth(self._eval(args[0], dr, dc)):
+            return self._eval(args[1], dr, dc)
+        return self._eval(args[2], dr, dc) if len(args) > 2 else False
+
+    def _fn_iferror(self, args, dr, dc):
+        try:
+            return self._eval(args[0], dr, dc)
+        except FormulaError:
+            return self._eval(args[1], dr, dc)
+
+    def _logicals(self, args, dr, dc) -> List[bool]:
+        values = [_truth(value) for value, in_range in self._arguments(args, dr, dc)
+                  if not in_range or (value is not None and not isinstance(value, str))]
+        if not values:
+            raise FormulaError("#VALUE!")
+        return values
+
+    def _fn_and(self, args, dr, dc):
+        return all(self._logicals(args, dr, dc))
+
+    def _fn_or(self, args, dr, dc):
+        return any(self._logicals(args, dr, dc))
+
+    def _fn_not(self, args, dr, dc):
+        return not _truth(self._eval(args[0], dr, dc))
+
+    def _fn_round(self, args, dr, dc):
+        return _round(self._eval(args[0], dr, dc), self._eval(args[1], dr, dc))
+
+    def _fn_abs(self, args, dr, dc):
+        return abs(_number(self._eval(args[0], dr, dc)))
+
+    def _fn_concatenate(self, args, dr, dc):
+        return "".join(_text(self._eval(arg, dr, dc)) for arg in args)
+
+    def _fn_vlookup(self, args, dr, dc):
+        wanted = self._eval(args[0], dr, dc)
+        if args[1][0] not in ("range", "ref"):
+            raise FormulaError("#VALUE!")
+        r1, c1, r2, c2 = self._rect(args[1], dr, dc)
+        index = int(_number(self._eval(args[2], dr, dc)))
+        approximate = _truth(self._eval(args[3], dr, dc)) if len(args) > 3 else True
+        if index < 1:
+            raise FormulaError("#VALUE!")
+        if index > c2 - c1 + 1:
+            raise FormulaError("#REF!")
+        if wanted is None:
+            raise FormulaError("#N/A")
+        if approximate:
+            # The table is sorted ascending: the last row whose key does not exceed the value
+            found = None
+            for row in range(r1, r2 + 1):
+                key = self._cell(row, c1)
+                if key is None or _kind(key) != _kind(wanted):
+                    continue
+                if _compare(">", key, wanted):
+                    break
+                found = row
+        else:
+            found = self._lookup_table((r1, c1, r2)).get(_lookup_key(wanted))
+        if found is None:
+            raise FormulaError("#N/A")
+        return self._cell(found, c1 + index - 1)
+
+    def _lookup_table(self, column: Tuple[int, int, int]) -> Dict:
+        """Key -> first row, for the first column of an exact-match VLOOKUP table."""
+        self._flush()
+        table = self._lookup_tables.get(column)
+        if table is None:
+            row_start, col, row_end = column
+            table = {}
+            for row in range(row_start, row_end + 1):
+                try:
+                    key = self._cell(row, col)
+                except FormulaError:
+                    continue
+                if key is not None:
+                    table.setdefault(_lookup_key(key), row)
+            self._lookup_tables[column] = table
+        return table
+
+    # -- vectorized evaluation ---------------------------------------------
+
+    def _vector_values(self, formula: Formula, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        """Values of a Formula in many cells at once; raises _Scalar where that is not exact."""
+        dr, dc = rows - formula.origin[0], cols - formula.origin[1]
+        with np.errstate(all="ignore"):
+            values = self._vector(formula.tree, dr, dc)
+        if isinstance(values, np.ndarray) and values.dtype.kind == "f":
+            values = np.nan_to_num(values, nan=0.0)
+            if not np.isfinite(values).all():
+                raise _Scalar()
+            if (np.mod(values, 1) == 0).all() and (np.abs(values) < 2 ** 53).all():
+                return values.astype(np.int64)
+            return values
+        if isinstance(values, np.ndarray) and values.dtype.kind == "b":
+            return values.astype(object)
+        if isinstance(values, np.ndarray):
+            return np.array([_result(value) for value in values.tolist()], dtype=object)
+        result = np.empty(len(rows), dtype=object)
+        result[:] = [_result(values)] * len(rows)
+        return result
+
+    def _numeric_column(self, col: int) -> np.ndarray:
+        """A column as floats (NaN for blanks); raises _Scalar if it holds anything but numbers."""
+        column = self.action.df.iloc[:, col]
+        if column.dtype.kind in "iuf":
+            return column.to_numpy(dtype=float)
+        if pd.api.types.infer_dtype(column, skipna=True) not in ("integer", "floating", "mixed-integer-float", "empty"):
+            raise _Scalar()
+        return pd.to_numeric(column).to_numpy(dtype=float, na_value=np.nan)
+
+    def _gather(self, row, col) -> np.ndarray:
+        """Numbers at (row, col) for every cell of the group; either may be a scalar."""
+        height, width = self.action.df.shape
+        rows, cols = np.broadcast_arrays(np.asarray(row), np.asarray(col))
+        if rows.min() < 0 or cols.min() < 0:
+            raise _Scalar()
+        values = np.full(rows.shape, np.nan)
+        for column in np.unique(cols).tolist():
+            if column >= width:
+                continue
+            data = self._numeric_column(column)
+            at = (cols == column) & (rows < height)
+            values[at] = data[rows[at]]
+        return values
+
+    def _vector_ref(self, end: End, dr, dc):
+        row, col = _place(end, dr, dc)
+        if end[2] and end[3]:
+            try:
+                return self._cell(row, col)
+            except FormulaError:
+                raise _Scalar()
+        return self._gather(row, col)
+
+    def _block(self, node, dr, dc):
+        """
+        A range argument: a list of values if it is the same range in every cell,
+        else an (n cells, range size) array of numbers for ranges that move with the cell.
+        """
+        first, last = (node[1], node[1]) if node[0] == "ref" else (node[1], node[2])
+        if first[2] and first[3] and last[2] and last[3]:
+            try:
+                return self._range_values(node, 0, 0)
+            except FormulaError:
+                raise _Scalar()
+        if first[2:] != (False, False) or last[2:] != (False, False):
+            raise _Scalar()
+        r1, r2 = sorted((first[0], last[0]))
+        c1, c2 = sorted((first[1], last[1]))
+        if (r2 - r1 + 1) * (c2 - c1 + 1) > SMALL_RANGE:
+            raise _Scalar()
+        return np.stack([self._gather(row + dr, col + dc) for row in range(r1, r2 + 1)
+                         for col in range(c1, c2 + 1)], axis=1)
+
+    def _numeric(self, value):
+        """An operand as numbers: blanks are 0; text raises _Scalar."""
+        if isinstance(value, np.ndarray):
+            if value.dtype.kind == "f":
+                return np.nan_to_num(value, nan=0.0)
+            if value.dtype.kind in "biu":
+                return value.astype(float)
+            raise _Scalar()
+        if isinstance(value, str):
+            raise _Scalar()
+        try:
+            return _number(value)
+        except FormulaError:
+            raise _Scalar()
+
+    def _vector(self, node, dr, dc):
+        kind = node[0]
+        if kind == "const":
+            return node[1]
+        if kind == "ref":
+            return self._vector_ref(node[1], dr, dc)
+        if kind == "neg":
+            return -self._numeric(self._vector(node[1], dr, dc))
+        if kind == "pct":
+            return self._numeric(self._vector(node[1], dr, dc)) / 100
+        if kind == "op":
+            op = node[1]
+            if op == "&":
+                raise _Scalar()
+            first = self._numeric(self._vector(node[2], dr, dc))
+            second = self._numeric(self._vector(node[3], dr, dc))
+            if op in _COMPARISONS:
+                return _COMPARISONS[op](first, second)
+            if op == "/" and np.any(np.asarray(second) == 0):
+                raise _Scalar()
+            if op == "^":
+                if np.any((np.asarray(first) == 0) & (np.asarray(second) < 0)):
+                    raise _Scalar()
+                result = np.power(np.asarray(first, dtype=float), second)
+            else:
+                result = {"+": np.add, "-": np.subtract, "*": np.multiply, "/": np.true_divide}[op](first, second)
+            if not np.isfinite(result).all():
+                raise _Scalar()
+            return result
+        if kind == "call":
+            handler = getattr(self, "_vec_" + node[1].lower(), None)
+            if handler is None:
+                raise _Scalar()
+            return handler(node[2], dr, dc)
+        raise _Scalar()
+
+    def _aggregate_parts(self, args, dr, dc):
+        """(per-cell number arrays, numbers common to every cell) of aggregate arguments."""
+        blocks, common = [], []
+        for arg in args:
+            if arg[0] in ("range", "ref"):
+                block = self._block(arg, dr, dc)
+                if isinstance(block, list):
+                    for value in block:
+                        if isinstance(value, (int, float)) and not isinstance(value, bool):
+                            common.append(value)
+                else:
+                    blocks.append(block)
+            else:
+                value = self._numeric(self._vector(arg, dr, dc))
+                if isinstance(value, np.ndarray):
+                    blocks.append(np.broadcast_to(value, dr.shape)[:, None])
+                else:
+                    common.append(value)
+        return blocks, common
+
+    def _vec_sum(self, args, dr, dc):
+        blocks, common = self._aggregate_parts(args, dr, dc)
+        total = np.full(dr.shape, float(sum(common)))
+        for block in blocks:
+            total += np.nansum(block, axis=1)
+        return total
+
+    def _vec_count(self, args, dr, dc):
+        for arg in args:
+            if arg[0] not in ("range", "ref"):
+                raise _Scalar()
+        blocks, common = self._aggregate_parts(args, dr, dc)
+        count = np.full(dr.shape, float(len(common)))
+        for block in blocks:
+            count += (~np.isnan(block)).sum(axis=1)
+        return count
+
+    def _vec_average(self, args, dr, dc):
+        blocks, common = self._aggregate_parts(args, dr, dc)
+        total = np.full(dr.shape, float(sum(common)))
+        count = np.full(dr.shape, float(len(common)))
+        for block in blocks:
+            total += np.nansum(block, axis=1)
+            count += (~np.isnan(block)).sum(axis=1)
+        if (count == 0).any():
+            raise _Scalar()
+        return total / count
+
+    def _extreme(self, args, dr, dc, reduce):
+        blocks, common = self._aggregate_parts(args, dr, dc)
+        columns = blocks + [np.tile(np.array(common, dtype=float), (len(dr), 1))]
+        with warnings.catch_warnings():
+            # Cells without any number give NaN (and a warning); MIN and MAX are 0 there
+            warnings.simplefilter("ignore", RuntimeWarning)
+            return np.nan_to_num(reduce(np.concatenate(columns, axis=1), axis=1), nan=0.0)
+
+    def _vec_min(self, args, dr, dc):
+        return self._extreme(args, dr, dc, np.nanmin)
+
+    def _vec_max(self, args, dr, dc):
+        return self._extreme(args, dr, dc, np.nanmax)
+
+    def _condition(self, value):
+        if isinstance(value, np.ndarray):
+            if value.dtype.kind == "b":
+                return value
+            return self._numeric(value) != 0
+        try:
+            return _truth(value)
+        except FormulaError:
+            raise _Scalar()
+
+    def _vec_if(self, args, dr, dc):
+        condition = np.broadcast_to(self._condition(self._vector(args[0], dr, dc)), dr.shape)
+        branches = [self._vector(arg, dr, dc) for arg in args[1:]] + ([False] if len(args) == 2 else [])
+        numeric = True
+        for index, value in enumerate(branches):
+            if isinstance(value, np.ndarray) and value.dtype.kind == "f":
+                branches[index] = np.nan_to_num(value, nan=0.0)
+            elif isinstance(value, (str, bool, np.ndarray)):
+                numeric = False
+        if numeric:
+            return np.where(condition, *branches)
+        # Text or logical results: one Python value per cell
+        first, second = (np.broadcast_to(np.asarray(value, dtype=object), dr.shape) for value in branches)
+        return np.where(condition, first, second)
+
+    def _vec_round(self, args, dr, dc):
+        digits = self._vector(args[1], dr, dc)
+        if isinstance(digits, np.ndarray):
+            raise _Scalar()
+        digits = int(self._numeric(digits))
+        values = np.asarray(self._numeric(self._vector(args[0], dr, dc)), dtype=float)
+        scale = 10.0 ** digits
+        scaled = np.abs(values) * scale
+        rounded = np.sign(values) * np.floor(scaled + 0.5) / scale
+        # Values within rounding noise of a half are rounded exactly, as _round() does
+        near = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-9 * np.maximum(1.0, scaled)
+        if near.any():
+            rounded = np.broadcast_to(rounded, near.shape).copy()
+            broadcast = np.broadcast_to(values, near.shape)
+            rounded[near] = [_round(value, digits) for value in broadcast[near].tolist()]
+        return rounded
+
+    def _vec_abs(self, args, dr, dc):
+        return np.abs(self._numeric(self._vector(args[0], dr, dc)))
+
+    def _logical_vectors(self, args, dr, dc):
+        values = []
+        for arg in args:
+            if arg[0] == "range":
+                raise _Scalar()
+            values.append(self._condition(self._vector(arg, dr, dc)))
+        return values
+
+    def _vec_and(self, args, dr, dc):
+        return np.logical_and.reduce([np.broadcast_to(value, dr.shape) for value in self._logical_vectors(args, dr, dc)])
+
+    def _vec_or(self, args, dr, dc):
+        return np.logical_or.reduce([np.broadcast_to(value, dr.shape) for value in self._logical_vectors(args, dr, dc)])
+
+    def _vec_not(self, args, dr, dc):
+        return np.logical_not(self._condition(self._vector(args[0], dr, dc)))
+
+    def _vec_vlookup(self, args, dr, dc):
+        table = args[1]
+        if table[0] != "range" or not all(table[1][2:] + table[2][2:]) or len(args) < 4:
+            raise _Scalar()
+        index, approximate = self._vector(args[2], dr, dc), self._vector(args[3], dr, dc)
+        if isinstance(index, np.ndarray) or isinstance(approximate, np.ndarray) or approximate not in (False, 0):
+            raise _Scalar()
+        try:
+            r1, c1, r2, c2 = self._rect(table, 0, 0)
+        except FormulaError:
+            raise _Scalar()
+        index = int(self._numeric(index))
+        if not 1 <= index <= c2 - c1 + 1 or args[0][0] != "ref" or all(args[0][1][2:]):
+            raise _Scalar()
+        # The looked-up values may be text, so they are read as Python values
+        row, col = _place(args[0][1], dr, dc)
+        rows, cols = np.broadcast_arrays(np.asarray(row), np.asarray(col))
+        try:
+            wanted = [self._cell(r, c) for r, c in zip(rows.tolist(), cols.tolist())]
+            lookup = self._lookup_table((r1, c1, r2))
+            found = [lookup.get(_lookup_key(value)) if value is not None else None for value in wanted]
+            if any(row is None for row in found):
+                raise _Scalar()
+            values = np.empty(len(found), dtype=object)
+            values[:] = [self._cell(row, c1 + index - 1) for row in found]
+            return values
+        except FormulaError:
+            raise _Scalar()
@@ -0,0 +1,296 @@
+"""
+Predicates - Compile REGEX and comparison conditions into vectorized cell masks
+A condition attached to an action ("REGEX ^9[0-9]$ | FORMAT ...", "Select(2, 0, 2, 99) IF
+cell value > 90") is parsed once into a Predicate and cached. The Predicate evaluates a
+block of the DataFrame one column at a time with pandas string methods and NumPy
+comparisons, and returns a boolean mask with the block's shape. Conditions that Excel
+can express are also translated to a formula for native conditional-formatting rules.
+"""
+
+import functools
+import operator
+import re
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+# Comparison operators accepted in conditions
+_OPERATORS = {
+    ">=": operator.ge,
+    "<=": operator.le,
+    "==": operator.eq,
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<>": operator.ne,
+    ">": operator.gt,
+    "<": operator.lt,
+}
+
+# Wording around the condition itself: "IF cell value > 10", "value >= 3"
+_PREFIX = re.compile(r"^(?:IF\s+)?(?:(?:the\s+)?cell\s+)?(?:value\s+)?", re.IGNORECASE)
+_REGEX = re.compile(r"^(?:REGEX|matches(?:\s+pattern)?)\s+(.+)$", re.IGNORECASE | re.DOTALL)
+_COMPARISON = re.compile(r"^(>=|<=|==|!=|<>|=|>|<)\s*(.+)$", re.DOTALL)
+_BETWEEN = re.compile(r"^between\s+(\S+)\s+and\s+(\S+)$", re.IGNORECASE)
+_STATE = re.compile(r"^is\s+(not\s+)?(empty|blank|numeric|a\s+number)$", re.IGNORECASE)
+
+# Regex syntax with no literal meaning; a pattern free of these (after escapes) is plain text
+_REGEX_SYNTAX = set(".^$*+?{}[]|()\\")
+
+# Excel formula comparison operators
+_EXCEL_OPERATORS = {">=": ">=", "<=": "<=", "==": "=", "=": "=", "!=": "<>", "<>": "<>", ">": ">", "<": "<"}
+
+
+def _cell_text(value) -> str:
+    """String(value) as the add-on's regExp.test(cellValue) sees it; empty cells are ""."""
+    if value is None or (pd.api.types.is_scalar(value) and pd.isna(value)):
+        return ""
+    if isinstance(value, (bool, np.bool_)):
+        return "true" if value else "false"
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _as_text(column: pd.Series) -> np.ndarray:
+    """Render a column with _cell_text, vectorized for the dtypes the workbook loader produces."""
+    if pd.api.types.is_bool_dtype(column) and not column.hasnans:
+        return np.where(column.to_numpy(dtype=bool), "true", "false").astype(object)
+    if pd.api.types.is_integer_dtype(column) and not column.hasnans:
+        return column.astype(str).to_numpy(dtype=object)
+    if pd.api.types.is_float_dtype(column):
+        numbers = column.to_numpy(dtype=float)
+        text = column.astype(str).to_numpy(dtype=object)
+        whole = np.isfinite(numbers) & (np.mod(numbers, 1) == 0) & (np.abs(numbers) < 2 ** 53)
+        text[whole] = numbers[whole].astype(np.int64).astype(str)
+        text[np.isnan(numbers)] = ""
+        return text
+    if pd.api.types.infer_dtype(column, skipna=True) in ("string", "empty"):
+        return column.where(column.notna(), "").to_numpy(dtype=object)
+    return column.map(_cell_text).to_numpy(dtype=object)
+
+
+def _as_number(column: pd.Series) -> np.ndarray:
+    """Numeric view of a column; cells that are not numbers become NaN."""
+    if pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column):
+        return column.to_numpy(dtype=float, na_value=np.nan)
+    return pd.to_numeric(column, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+
+
+def _number(text: str):
+    """The operand as a float, or None if it is not numeric."""
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+class Predicate:
+    """
+    A compiled condition. Build with compile_predicate() so each condition is parsed once.
+    """
+
+    def __init__(self, source: str, column_mask: Callable[[pd.Series], np.ndarray], matches_all: bool = False,
+                 formula: Optional[Callable[[str], str]] = None):
+        """
+        Args:
+            source: The condition as written
+            column_mask: Evaluates the condition over one column, returning a boolean array
+            matches_all: The condition holds for every cell (e.g. the grammar's REGEX ^.*$)
+            formula: Builds the equivalent Excel formula for a cell reference, if there is one
+        """
+        self.source = source
+        self.matches_all = matches_all
+        self._column_mask = column_mask
+        self._formula = formula
+
+    def mask(self, block: pd.DataFrame) -> np.ndarray:
+        """
+        Evaluate the condition over every cell of a DataFrame block.
+
+        Args:
+            block: Cells to test (typically df.iloc[rows, cols])
+
+        Returns:
+            Boolean array with the block's shape
+        """
+        if block.shape[1] == 0:
+            return np.zeros(block.shape, dtype=bool)
+        return np.column_stack([self._column_mask(block.iloc[:, j]) for j in range(block.shape[1])])
+
+    def matches_empty(self) -> bool:
+        """Whether an empty cell satisfies the condition (for cells past the DataFrame's edge)."""
+        return bool(self.mask(pd.DataFrame([[None]], dtype=object))[0, 0])
+
+    def excel_formula(self, cell: str) -> Optional[str]:
+        """
+        The condition as an Excel formula, for a conditional-formatting rule.
+
+        Args:
+            cell: Reference of the rule range's top-left cell (e.g. "C2"); Excel shifts it per cell
+
+        Returns:
+            Formula text without the leading "=", or None if Excel cannot express the condition
+        """
+        return self._formula(cell) if self._formula else None
+
+    def __repr__(self):
+        return f"Predicate({self.source!r})"
+
+
+def _excel_string(text: str) -> str:
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _excel_number(number: float) -> str:
+    return str(int(number)) if number.is_integer() else repr(number)
+
+
+def _literal(pattern: str) -> Optional[str]:
+    """The text a regex matches literally, or None if it uses any regex syntax."""
+    text = []
+    chars = iter(pattern)
+    for char in chars:
+        if char == "\\":
+            char = next(chars, "")
+            if char not in _REGEX_SYNTAX:
+                # \d, \w and friends are classes, not literals
+                return None
+        elif char in _REGEX_SYNTAX:
+            return None
+        text.append(char)
+    return "".join(text)
+
+
+def _regex_formula(pattern: str) -> Optional[Callable[[str], str]]:
+    """
+    Translate the anchored/unanchored literal patterns models mostly write
+    (^text$, ^text, text$, text, ^$) into case-sensitive Excel text functions.
+    """
+    if pattern == "^$":
+        return lambda cell: f"LEN({cell})=0"
+    starts = pattern.startswith("^")
+    ends = pattern.endswith("$") and not pattern.endswith("\\$")
+    body = pattern[1 if starts else 0:len(pattern) - 1 if ends else len(pattern)]
+    # ".*" at an open end adds nothing: ^abc.*$ is ^abc
+    if starts and body.endswith(".*"):
+        body, ends = body[:-2], False
+    if ends and body.startswith(".*"):
+        body, starts = body[2:], False
+    literal = _literal(body)
+    if not literal:
+        return None
+    text, size = _excel_string(literal), len(literal)
+    if starts and ends:
+        return lambda cell: f"EXACT({cell},{text})"
+    if starts:
+        return lambda cell: f"EXACT(LEFT({cell},{size}),{text})"
+    if ends:
+        return lambda cell: f"EXACT(RIGHT({cell},{size}),{text})"
+    return lambda cell: f"ISNUMBER(FIND({text},{cell}))"
+
+
+def _regex_predicate(source: str, pattern: str) -> Predicate:
+    try:
+        regex = re.compile(pattern)
+    except re.error as e:
+        raise ValueError(f"Invalid REGEX condition {pattern!r}: {e}")
+    if pattern in ("^.*$", ".*", "^.*"):
+        # The grammar's "no condition"; skip rendering the cells
+        return Predicate(source, lambda column: np.ones(len(column), dtype=bool), matches_all=True)
+
+    def search(text: np.ndarray) -> np.ndarray:
+        # Like regExp.test(), the pattern may match anywhere unless it is anchored
+        return pd.Series(text, dtype=object).str.contains(regex, regex=True).to_numpy(dtype=bool)
+
+    def column_mask(column):
+        if column.dtype == object and pd.api.types.infer_dtype(column, skipna=True) not in ("string", "empty"):
+            # Mixed cells: 1, 1.0 and True hash alike but render differently
+            return search(_as_text(column))
+        # Match each distinct value once; sheet columns repeat values heavily
+        codes, uniques = pd.factorize(column, use_na_sentinel=False)
+        return search(_as_text(pd.Series(uniques, dtype=column.dtype)))[codes]
+    return Predicate(source, column_mask, formula=_regex_formula(pattern))
+
+
+def _comparison_predicate(source: str, symbol: str, operand: str) -> Predicate:
+    compare = _OPERATORS[symbol]
+    operand = operand.strip()
+    number = _number(operand)
+    if number is not None:
+        def column_mask(column):
+            values = _as_number(column)
+            with np.errstate(invalid="ignore"):
+                # Cells that are not numbers never match, as the old float() loop skipped them
+                return compare(values, number) & ~np.isnan(values)
+        # --cell converts numeric text like the mask does; blanks and text never match
+        excel_operator = _EXCEL_OPERATORS[symbol]
+        return Predicate(source, column_mask,
+                         formula=lambda cell: f'AND({cell}<>"",IFERROR(--{cell}{excel_operator}{_excel_number(number)},FALSE))')
+
+    if compare not in (operator.eq, operator.ne):
+        raise ValueError(f"Condition {source!r} compares text with {symbol}; only = and != apply to text")
+    text = operand.strip("\"'")
+    negate = compare is operator.ne
+    return Predicate(source, lambda column: compare(_as_text(column), text).astype(bool),
+                     formula=lambda cell: ("NOT({})" if negate else "{}").format(f"EXACT({cell},{_excel_string(text)})"))
+
+
+def _parse(condition: str) -> Predicate:
+    stripped = _PREFIX.sub("", condition.strip(), count=1).strip()
+
+    match = _REGEX.match(stripped)
+    if match:
+        return _regex_predicate(condition, match.group(1).strip())
+
+    match = _COMPARISON.match(stripped)
+    if match:
+        return _comparison_predicate(condition, *match.groups())
+
+    match = _BETWEEN.match(stripped)
+    if match:
+        low, high = (_number(bound) for bound in match.groups())
+        if low is None or high is None:
+            raise ValueError(f"Condition {condition!r} needs numeric bounds")
+
+        def column_mask(column):
+            values = _as_number(column)
+            with np.errstate(invalid="ignore"):
+                return (values >= low) & (values <= high)
+        return Predicate(condition, column_mask,
+                         formula=lambda cell: f'AND({cell}<>"",IFERROR(AND(--{cell}>={_excel_number(low)},--{cell}<={_excel_number(high)}),FALSE))')
+
+    match = _STATE.match(stripped)
+    if match:
+        negate, state = match.group(1) is not None, match.group(2).lower()
+        if state in ("empty", "blank"):
+            test = lambda column: _as_text(column) == ""
+            formula = "LEN({0})=0"
+        else:
+            test = lambda column: ~np.isnan(_as_number(column))
+            formula = 'AND({0}<>"",ISNUMBER(--{0}))'
+        return Predicate(condition, lambda column: np.asarray(test(column), dtype=bool) ^ negate,
+                         formula=lambda cell: ("NOT({})" if negate else "{}").format(formula.format(cell)))
+
+    # Anything else is the REGEX grammar's bare pattern
+    return _regex_predicate(condition, condition.strip())
+
+
+@functools.lru_cache(maxsize=256)
+def compile_predicate(condition: str) -> Predicate:
+    """
+    Parse a condition once. Accepted forms (optionally prefixed with "IF", "cell", "value"):
+    "REGEX <pattern>", "matches <pattern>", "> 10" (and >=, <, <=, =, ==, !=, <>),
+    "= text", "between 1 and 5", "is empty", "is not empty", "is numeric". Anything
+    else is treated as a regular expression.
+
+    Args:
+        condition: The condition text
+
+    Returns:
+        Cached Predicate
+
+    Raises:
+        ValueError: If the condition is not a valid comparison or regular expression
+    """
+    return _parse(condition)
@@ -0,0 +1,128 @@
+"""
+Sheet Cache - In-process cache of parsed workbook sheets and rendered sheet summaries
+Entries are keyed on file identity (absolute path, mtime, size) so an edited file is
+never served stale, evicted in LRU order under an entry-count and memory budget, and
+dropped explicitly when the agent writes the file.
+"""
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+import pandas as pd
+
+
+def file_identity(path: str) -> Tuple[str, int, int]:
+    """
+    Identify the current contents of a file without reading it.
+
+    Args:
+        path: Path to the file
+
+    Returns:
+        Tuple of (absolute path, mtime in nanoseconds, size in bytes)
+    """
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate the memory held by a cached value in bytes."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, dict):
+        return sum(estimate_size(v) for v in value.values())
+    return sys.getsizeof(value)
+
+
+class SheetSnapshotCache:
+    """
+    Thread-safe LRU cache bounded by number of entries and approximate bytes.
+
+    Keys are tuples whose first element is a file identity from file_identity(),
+    followed by whatever distinguishes the cached value (e.g. render parameters).
+    """
+
+    def __init__(self, max_entries: int = 32, max_bytes: int = 256 * 1024 * 1024):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of cached values
+            max_bytes: Approximate memory budget across all cached values
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_create(self, path: str, params: Tuple, factory: Callable[[], Any]) -> Any:
+        """
+        Return the cached value for the file's current contents, creating it on a miss.
+
+        Args:
+            path: Path of the file the value is derived from
+            params: Extra key parts (e.g. ("render", max_rows, max_cols))
+            factory: Callable producing the value on a miss
+
+        Returns:
+            The cached or newly created value
+        """
+        key = (file_identity(path),) + tuple(params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        # Build outside the lock so a slow parse does not block other readers
+        value = factory()
+        self.put(key, value)
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        """Insert a value and evict least recently used entries until within budget."""
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._total_bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_size
+
+    def invalidate(self, path: Optional[str] = None):
+        """
+        Drop cached values for a file, or everything when no path is given.
+
+        Args:
+            path: Path of the file whose values should be dropped
+        """
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self._total_bytes = 0
+                return
+            abs_path = os.path.abspath(path)
+            for key in [k for k in self._entries if k[0][0] == abs_path]:
+                self._total_bytes -= self._entries.pop(key)[1]
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and current occupancy."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+            }
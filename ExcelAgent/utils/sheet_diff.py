@@ -0,0 +1,227 @@
+"""
+Sheet Diff - Compact before/after comparison of a sheet for the reflection prompt
+Captures lightweight snapshots of a sheet (values plus formatting of styled cells and
+conditional-formatting rules) and reports changed cells, inserted/deleted rows and
+columns, and formatting changes.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from openpyxl.utils import get_column_letter
+
+from .styles import conditional_format_rules
+
+
+def _style_signature(cell) -> Tuple:
+    """Summarize the formatting attributes the agent can change on a cell."""
+    font = cell.font
+    fill = cell.fill
+    fill_color = fill.fgColor.rgb if fill is not None and fill.fill_type else None
+    return (
+        bool(font.b),
+        bool(font.i),
+        font.u,
+        bool(font.strike),
+        fill_color if isinstance(fill_color, str) else None,
+        cell.number_format,
+    )
+
+
+def _describe_style(signature: Optional[Tuple]) -> str:
+    if signature is None:
+        return "default"
+    bold, italic, underline, strike, fill_color, number_format = signature
+    parts = []
+    if bold:
+        parts.append("bold")
+    if italic:
+        parts.append("italic")
+    if underline:
+        parts.append("underline")
+    if strike:
+        parts.append("strikethrough")
+    if fill_color:
+        parts.append(f"fill #{fill_color[-6:]}")
+    if number_format and number_format != "General":
+        parts.append(f"format '{number_format}'")
+    return ", ".join(parts) if parts else "default"
+
+
+@dataclass
+class SheetSnapshot:
+    """Point-in-time copy of a sheet's values and per-cell formatting."""
+
+    df: pd.DataFrame
+    # Sheet (row, column), 1-based as in openpyxl -> style signature, only for styled cells
+    styles: Dict[Tuple[int, int], Tuple] = field(default_factory=dict)
+    # (range, formula, description) of each conditional-formatting rule
+    rules: List[Tuple[str, str, str]] = field(default_factory=list)
+
+    @classmethod
+    def capture(cls, df: pd.DataFrame, sheet=None) -> "SheetSnapshot":
+        """
+        Snapshot a DataFrame and (optionally) the formatting of an openpyxl sheet.
+
+        The DataFrame is copied, and every cell in the sheet's cell store is checked for a
+        style, so the cost grows with the sheet's size; only cells with a non-default style
+        are kept in the snapshot.
+
+        Args:
+            df: DataFrame holding the sheet values
+            sheet: openpyxl worksheet holding the formatting
+
+        Returns:
+            SheetSnapshot
+        """
+        styles = {}
+        rules = []
+        if sheet is not None:
+            for (row, col), cell in sheet._cells.items():
+                if cell.has_style:
+                    signature = _style_signature(cell)
+                    if signature != (False, False, None, False, None, "General"):
+                        styles[(row, col)] = signature
+            rules = conditional_format_rules(sheet)
+        return cls(df=df.copy(), styles=styles, rules=rules)
+
+
+@dataclass
+class SheetDiff:
+    """Differences between two snapshots of the same sheet."""
+
+    changed_cells: List[Tuple[str, Any, Any]] = field(default_factory=list)
+    inserted_rows: int = 0
+    deleted_rows: int = 0
+    inserted_columns: List[str] = field(default_factory=list)
+    deleted_columns: List[str] = field(default_factory=list)
+    renamed_columns: List[Tuple[str, str]] = field(default_factory=list)
+    format_changes: List[Tuple[str, str, str]] = field(default_factory=list)
+    added_rules: List[Tuple[str, str, str]] = field(default_factory=list)
+    removed_rules: List[Tuple[str, str, str]] = field(default_factory=list)
+    total_changed_cells: int = 0
+    total_format_changes: int = 0
+
+    def is_empty(self) -> bool:
+        return not (
+            self.total_changed_cells
+            or self.inserted_rows
+            or self.deleted_rows
+            or self.inserted_columns
+            or self.deleted_columns
+            or self.renamed_columns
+            or self.total_format_changes
+            or self.added_rules
+            or self.removed_rules
+        )
+
+    def render(self) -> str:
+        """Render the diff as a compact change list for prompts."""
+        if self.is_empty():
+            return "No changes detected between the before and after states."
+
+        lines = []
+        if self.inserted_rows:
+            lines.append(f"Rows inserted: {self.inserted_rows}")
+        if self.deleted_rows:
+            lines.append(f"Rows deleted: {self.deleted_rows}")
+        if self.inserted_columns:
+            lines.append(f"Columns inserted: {self.inserted_columns}")
+        if self.deleted_columns:
+            lines.append(f"Columns deleted: {self.deleted_columns}")
+        for old, new in self.renamed_columns:
+            lines.append(f"Header renamed: {old!r} -> {new!r}")
+        if self.total_changed_cells:
+            lines.append(f"Changed cells ({self.total_changed_cells}):")
+            for address, before, after in self.changed_cells:
+                lines.append(f"  {address}: {before!r} -> {after!r}")
+            if self.total_changed_cells > len(self.changed_cells):
+                lines.append(f"  ... and {self.total_changed_cells - len(self.changed_cells)} more changed cells")
+        if self.total_format_changes:
+            lines.append(f"Formatting changes ({self.total_format_changes}):")
+            for address, before, after in self.format_changes:
+                lines.append(f"  {address}: {before} -> {after}")
+            if self.total_format_changes > len(self.format_changes):
+                lines.append(f"  ... and {self.total_format_changes - len(self.format_changes)} more formatting changes")
+        for label, rules in (("added", self.added_rules), ("removed", self.removed_rules)):
+            if rules:
+                lines.append(f"Conditional formatting {label} ({len(rules)}):")
+                for cell_range, formula, description in rules:
+                    lines.append(f"  {cell_range} where ={formula}: {description}")
+        return "\n".join(lines)
+
+
+def _cell_address(row_idx: int, col_idx: int) -> str:
+    # DataFrame row 0 maps to Excel row 2 (row 1 is header)
+    return f"{get_column_letter(col_idx + 1)}{row_idx + 2}"
+
+
+def _to_python(value: Any) -> Any:
+    if isinstance(value, np.generic):
+        return value.item()
+    if value is not None and not isinstance(value, str) and pd.isna(value):
+        return None
+    return value
+
+
+def diff_snapshots(before: SheetSnapshot, after: SheetSnapshot, max_items: int = 50) -> SheetDiff:
+    """
+    Compare two snapshots of a sheet.
+
+    Cell values are compared with vectorized pandas operations over the overlapping
+    region; rows and columns beyond the overlap are reported as inserted/deleted.
+
+    Args:
+        before: Snapshot taken before the operation
+        after: Snapshot taken after the operation
+        max_items: Maximum number of individual cell/format changes to list
+
+    Returns:
+        SheetDiff
+    """
+    diff = SheetDiff()
+    old_df, new_df = before.df, after.df
+
+    old_cols, new_cols = [str(c) for c in old_df.columns], [str(c) for c in new_df.columns]
+    common_cols = min(len(old_cols), len(new_cols))
+    for i in range(common_cols):
+        if old_cols[i] != new_cols[i]:
+            diff.renamed_columns.append((old_cols[i], new_cols[i]))
+    diff.inserted_columns = new_cols[common_cols:]
+    diff.deleted_columns = old_cols[common_cols:]
+
+    common_rows = min(len(old_df), len(new_df))
+    diff.inserted_rows = max(0, len(new_df) - len(old_df))
+    diff.deleted_rows = max(0, len(old_df) - len(new_df))
+
+    if common_rows and common_cols:
+        old_block = old_df.iloc[:common_rows, :common_cols].to_numpy(dtype=object)
+        new_block = new_df.iloc[:common_rows, :common_cols].to_numpy(dtype=object)
+        both_missing = pd.isna(old_block) & pd.isna(new_block)
+        changed = (old_block != new_block) & ~both_missing
+        rows, cols = np.nonzero(changed)
+        diff.total_changed_cells = len(rows)
+        for r, c in zip(rows[:max_items], cols[:max_items]):
+            diff.changed_cells.append(
+                (_cell_address(r, c), _to_python(old_block[r, c]), _to_python(new_block[r, c]))
+            )
+
+    format_changes = []
+    for coord in before.styles.keys() | after.styles.keys():
+        old_style, new_style = before.styles.get(coord), after.styles.get(coord)
+        if old_style != new_style:
+            format_changes.append((coord, old_style, new_style))
+    format_changes.sort()
+    diff.total_format_changes = len(format_changes)
+    for (row, col), old_style, new_style in format_changes[:max_items]:
+        diff.format_changes.append(
+            (f"{get_column_letter(col)}{row}", _describe_style(old_style), _describe_style(new_style))
+        )
+
+    old_rules, new_rules = set(before.rules), set(after.rules)
+    diff.added_rules = [rule for rule in after.rules if rule not in old_rules][:max_items]
+    diff.removed_rules = [rule for rule in before.rules if rule not in new_rules][:max_items]
+
+    return diff
@@ -0,0 +1,178 @@
+"""
+Sheet Merge - Bring the edits of an isolated copy of a sheet back into the original
+Subtasks that run concurrently each edit their own Action loaded from the saved file
+(a view). merge_views() applies what the views changed on the first sheet (cell values,
+formulas, cell formatting and conditional-formatting rules) to the Action they were
+loaded next to, which must not have been edited since the file was saved.
+"""
+
+from copy import copy
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+from openpyxl.styles.cell_style import StyleArray
+
+from . import styles
+from .formula_engine import parse_formula
+from .utils import get_logger
+
+logger = get_logger(__name__)
+
+
+def _rules(sheet):
+    """(range, rule) of every conditional-formatting rule of a sheet."""
+    return [(str(formatting.sqref), rule) for formatting in sheet.conditional_formatting for rule in formatting.rules]
+
+
+def _same_rule(first, second) -> bool:
+    return first[0] == second[0] and first[1].formula == second[1].formula and first[1].dxf == second[1].dxf
+
+
+# Style of a cell that has none (or does not exist yet)
+_UNSTYLED = StyleArray()
+
+
+def _style_array(cell) -> StyleArray:
+    return cell._style if cell is not None and cell._style is not None else _UNSTYLED
+
+
+@dataclass
+class ViewChanges:
+    """What one view changed, relative to the sheet it was loaded next to."""
+
+    # Zero-indexed DataFrame cells and their new values
+    rows: np.ndarray
+    cols: np.ndarray
+    values: np.ndarray
+    # Zero-indexed DataFrame cell -> the view's Formula there (None: it no longer holds one)
+    formulas: Dict[Tuple[int, int], Any] = field(default_factory=dict)
+    # Sheet (row, column) -> the view's cell, for cells whose formatting changed
+    formatted: Dict[Tuple[int, int], Any] = field(default_factory=dict)
+    added_rules: List[Tuple[str, Any]] = field(default_factory=list)
+    removed_rules: List[Tuple[str, Any]] = field(default_factory=list)
+
+    @property
+    def cells(self) -> Set[Tuple[int, int]]:
+        """Sheet cells (row, column), 1-based as in openpyxl, whose value, formula or formatting changed."""
+        formulas = {(row + 2, col + 1) for row, col in self.formulas}
+        return set(zip((self.rows + 2).tolist(), (self.cols + 1).tolist())) | formulas | set(self.formatted)
+
+
+def view_changes(target, view) -> ViewChanges:
+    """
+    Compare a view with the Action it was loaded next to.
+
+    Raises:
+        ValueError: If the view added or removed rows or columns
+    """
+    if view.df.shape != target.df.shape or list(view.df.columns) != list(target.df.columns):
+        raise ValueError(f"the sheet changed shape ({target.df.shape} -> {view.df.shape})")
+
+    before = target.df.to_numpy(dtype=object)
+    after = view.df.to_numpy(dtype=object)
+    same = (before == after) | (pd.isna(before) & pd.isna(after))
+    rows, cols = np.nonzero(~same)
+    changes = ViewChanges(rows, cols, after[rows, cols])
+
+    target_formulas, view_formulas = target.formulas.formulas, view.formulas.formulas
+    for cell in set(target_formulas) | set(view_formulas):
+        before, formula = target_formulas.get(cell), view_formulas.get(cell)
+        if formula is None or before is None:
+            if formula is not before:
+                changes.formulas[cell] = formula
+        elif (before.text, before.origin) != (formula.text, formula.origin) and \
+                before.text_at(*cell) != formula.text_at(*cell):
+            changes.formulas[cell] = formula
+
+    # Both workbooks started with the same style tables, so equal style indices mean equal styles
+    target_cells = target.active_sheet._cells
+    for position, cell in view.active_sheet._cells.items():
+        existing = target_cells.get(position)
+        if _style_array(existing) != _style_array(cell):
+            changes.formatted[position] = cell
+
+    target_rules = _rules(target.active_sheet)
+    view_rules = _rules(view.active_sheet)
+    changes.added_rules = [entry for entry in view_rules if not any(_same_rule(entry, other) for other in target_rules)]
+    changes.removed_rules = [entry for entry in target_rules if not any(_same_rule(entry, other) for other in view_rules)]
+    return changes
+
+
+def _apply_rules(sheet, changes: ViewChanges):
+    for formatting in list(sheet.conditional_formatting):
+        kept = [rule for rule in formatting.rules
+                if not any(_same_rule((str(formatting.sqref), rule), removed) for removed in changes.removed_rules)]
+        if not kept:
+            # ConditionalFormattingList has no public removal
+            del sheet.conditional_formatting._cf_rules[formatting]
+        elif len(kept) != len(formatting.rules):
+            formatting.rules[:] = kept
+    # Oldest first, so the view's most recent rule ends up with the highest precedence again
+    for cell_range, rule in sorted(changes.added_rules, key=lambda entry: -entry[1].priority):
+        dxf = rule.dxf
+        styles.add_conditional_format(sheet, cell_range, ";".join(rule.formula or []),
+                                      font=dxf.font if dxf is not None else None,
+                                      fill=dxf.fill if dxf is not None else None)
+
+
+def apply_changes(target, changes: ViewChanges):
+    """Apply view_changes() to the Action they were computed against (or one merged into since)."""
+    if len(changes.rows):
+        target._set_cells(changes.rows, changes.cols, changes.values)
+    if changes.formulas:
+        # One parsed copy per view Formula, so cells filled together stay evaluated together
+        placed = {}
+        for cell, formula in changes.formulas.items():
+            key = id(formula) if formula is not None else None
+            placed.setdefault(key, (formula, []))[1].append(cell)
+        for formula, cells in placed.values():
+            rows, cols = np.array(cells, dtype=np.int64).reshape(-1, 2).T
+            if formula is None:
+                target.formulas.remove(rows, cols)
+            else:
+                target.formulas.place(parse_formula(formula.text, formula.origin), rows, cols)
+    if len(changes.rows) or changes.formulas:
+        rows, cols = np.array(list(changes.formulas), dtype=np.int64).reshape(-1, 2).T
+        target.formulas.recalculate(np.concatenate([changes.rows, rows]), np.concatenate([changes.cols, cols]))
+    target.journal.record_styles([target.active_sheet.cell(row=row, column=col) for row, col in changes.formatted])
+    for (row, col), cell in changes.formatted.items():
+        existing = target.active_sheet.cell(row=row, column=col)
+        existing.font = copy(cell.font)
+        existing.fill = copy(cell.fill)
+        existing.border = copy(cell.border)
+        existing.alignment = copy(cell.alignment)
+        existing.protection = copy(cell.protection)
+        existing.number_format = cell.number_format
+    if changes.added_rules or changes.removed_rules:
+        target.journal.record_rules(target.active_sheet)
+        _apply_rules(target.active_sheet, changes)
+
+
+def merge_views(target, views) -> List[Optional[Set[Tuple[int, int]]]]:
+    """
+    Apply the edits of several views, in order, to the Action they were loaded next to.
+
+    Every view is compared with the unmerged target first, so a view only contributes
+    what it changed itself. Where two views changed the same cell, the later one wins.
+
+    Args:
+        target: The ExcelAgent.utils.action_interpret.Action to update
+        views: Actions loaded from the same saved file and edited since
+
+    Returns:
+        For each view, the sheet cells (row, column) whose value or formatting it changed;
+        None for a view that added or removed rows or columns, which is not merged
+    """
+    all_changes = []
+    for view in views:
+        try:
+            all_changes.append(view_changes(target, view))
+        except ValueError as e:
+            logger.warning("Cannot merge view: %s", e)
+            all_changes.append(None)
+    for changes in all_changes:
+        if changes is not None:
+            apply_changes(target, changes)
+    return [changes.cells if changes is not None else None for changes in all_changes]
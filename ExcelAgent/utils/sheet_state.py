@@ -0,0 +1,98 @@
+"""
+Sheet State - Providers of the current spreadsheet contents for prompt rendering
+FileSheetState reads the workbook from disk; LiveSheetState renders the in-memory
+DataFrame and workbook held by an Action, so prompts reflect edits before they are saved.
+"""
+
+from typing import Dict, Optional
+
+import pandas as pd
+
+from .sheet_diff import SheetSnapshot
+from .sheet_summary import summarize_sheets
+from .utils import read_excel_file, render_excel_sheets
+from .workbook_loader import sheet_to_frame
+
+
+class FileSheetState:
+    """Sheet state read from the Excel file on disk (the original prompt behaviour)."""
+
+    def __init__(self, excel_file_path: str):
+        """
+        Args:
+            excel_file_path: Path to the Excel file
+        """
+        self.excel_file_path = excel_file_path
+        # (rendered sheet, snapshot) the last action was decided on; see prompt.record_before_action_state
+        self.before_action = None
+
+    def render(self, max_rows: int = 100, max_cols: int = 50, token_budget: Optional[int] = None) -> str:
+        """Render the workbook as the formatted string used in prompts."""
+        return read_excel_file(self.excel_file_path, max_rows=max_rows, max_cols=max_cols, token_budget=token_budget)
+
+    def snapshot(self):
+        """File-backed state does not keep snapshots; reflection falls back to full dumps."""
+        return None
+
+
+class LiveSheetState:
+    """Sheet state backed by a live Action; rendering never touches disk."""
+
+    def __init__(self, action):
+        """
+        Args:
+            action: The ExcelAgent.utils.action_interpret.Action being edited
+        """
+        self.action = action
+        # (rendered sheet, snapshot) the last action was decided on; see prompt.record_before_action_state
+        self.before_action = None
+        self._other_sheets: Dict[str, pd.DataFrame] = {}
+        self._other_sheets_workbook = None
+
+    def sheets(self) -> Dict[str, pd.DataFrame]:
+        """
+        Return every sheet as a DataFrame, in workbook order.
+
+        The first sheet is the Action's live DataFrame. Other sheets are not edited
+        through Action, so they are converted from the workbook once and reused.
+        Formula cells in those sheets have no cached value in memory and read as empty.
+        """
+        workbook = self.action.workbook
+        if self._other_sheets_workbook is not workbook:
+            # The workbook object is replaced when Action falls back to a pandas save
+            self._other_sheets = {ws.title: sheet_to_frame(ws) for ws in workbook.worksheets[1:]}
+            self._other_sheets_workbook = workbook
+
+        sheets = {workbook.worksheets[0].title: self.action.df}
+        sheets.update(self._other_sheets)
+        return sheets
+
+    def render(self, max_rows: int = 100, max_cols: int = 50, token_budget: Optional[int] = None) -> str:
+        """Render the in-memory workbook as the formatted string used in prompts."""
+        if token_budget:
+            return summarize_sheets(self.action.file_path, self.sheets(), token_budget)
+        return render_excel_sheets(self.action.file_path, self.sheets(), max_rows, max_cols)
+
+    def snapshot(self) -> SheetSnapshot:
+        """Capture the live values and formatting for a later before/after diff."""
+        return SheetSnapshot.capture(self.action.df, self.action.active_sheet)
+
+
+def render_sheet_state(excel_file_path: str, sheet_state=None, max_rows: int = 100, max_cols: int = 50,
+                       token_budget: Optional[int] = None) -> str:
+    """
+    Render the sheet for a prompt, preferring a provider over reading the file.
+
+    Args:
+        excel_file_path: Path to the Excel file (used when no provider is given)
+        sheet_state: Optional FileSheetState/LiveSheetState
+        max_rows: Maximum number of rows to include
+        max_cols: Maximum number of columns to include
+        token_budget: If set, render a statistical summary bounded by this many tokens
+
+    Returns:
+        Formatted string representation of the sheet
+    """
+    if sheet_state is None:
+        sheet_state = FileSheetState(excel_file_path)
+    return sheet_state.render(max_rows=max_rows, max_cols=max_cols, token_budget=token_budget)
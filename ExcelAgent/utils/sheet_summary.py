@@ -0,0 +1,186 @@
+"""
+Sheet Summary - Token-budgeted statistical summary of a sheet for prompts
+Instead of dumping the first N rows, profiles every column (type, nulls, cardinality,
+range, top values) with vectorized pandas passes and adds a stratified row sample
+sized to fit the remaining budget, so prompt size is bounded regardless of sheet size.
+"""
+
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+# Rough characters-per-token ratio for English and tabular text
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate the number of tokens in a string."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _clip(value, width: int = 40) -> str:
+    text = str(value)
+    return text if len(text) <= width else text[: width - 3] + "..."
+
+
+def _coerce_numeric(series: pd.Series) -> pd.Series:
+    """Convert an object column of numeric strings (e.g. from Apps Script) to numbers."""
+    if series.dtype != object:
+        return series
+    non_null = series.dropna()
+    if non_null.empty:
+        return series
+    converted = pd.to_numeric(non_null, errors="coerce")
+    if converted.isna().any():
+        return series
+    return pd.to_numeric(series, errors="coerce")
+
+
+def profile_column(series: pd.Series, top_k: int = 3) -> Dict:
+    """
+    Profile one column.
+
+    Args:
+        series: Column values
+        top_k: Number of most frequent values to report
+
+    Returns:
+        Dict with type, nulls, unique, min/max (when ordered) and top values
+    """
+    series = _coerce_numeric(series)
+    non_null = series.dropna()
+    profile = {
+        "type": pd.api.types.infer_dtype(non_null, skipna=True) if len(non_null) else "empty",
+        "nulls": int(len(series) - len(non_null)),
+        "unique": int(non_null.nunique()),
+    }
+    if len(non_null) and (pd.api.types.is_numeric_dtype(non_null) or pd.api.types.is_datetime64_any_dtype(non_null)):
+        if not pd.api.types.is_bool_dtype(non_null):
+            profile["min"] = non_null.min()
+            profile["max"] = non_null.max()
+    elif len(non_null) and profile["type"] == "string":
+        lengths = non_null.str.len()
+        profile["min_len"] = int(lengths.min())
+        profile["max_len"] = int(lengths.max())
+    if top_k and len(non_null) and profile["unique"] < len(non_null):
+        counts = non_null.value_counts().head(top_k)
+        profile["top"] = [(value, int(count)) for value, count in counts.items()]
+    return profile
+
+
+def _render_profile(name, profile: Dict) -> str:
+    parts = [f"type={profile['type']}", f"nulls={profile['nulls']}", f"unique={profile['unique']}"]
+    if "min" in profile:
+        parts.append(f"min={_clip(profile['min'])}")
+        parts.append(f"max={_clip(profile['max'])}")
+    if "min_len" in profile:
+        parts.append(f"len={profile['min_len']}..{profile['max_len']}")
+    if profile.get("top"):
+        top = ", ".join(
+            f"{_clip(value, 24)!r}×{count}" if isinstance(value, str) else f"{_clip(value, 24)}×{count}"
+            for value, count in profile["top"]
+        )
+        parts.append(f"top=[{top}]")
+    return f"  - {_clip(name)}: " + "; ".join(parts)
+
+
+def stratified_sample(df: pd.DataFrame, n: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Sample n rows spread evenly over the sheet: one random row from each of n
+    equal-size position strata, always including the first and last row.
+
+    Args:
+        df: DataFrame to sample
+        n: Number of rows
+        seed: Random seed for reproducible prompts
+
+    Returns:
+        Sampled rows in sheet order (original index preserved)
+    """
+    if n >= len(df):
+        return df
+    if n <= 0:
+        return df.iloc[:0]
+    rng = np.random.default_rng(seed)
+    edges = np.linspace(0, len(df), n + 1).astype(int)
+    positions = edges[:-1] + (rng.random(n) * np.maximum(edges[1:] - edges[:-1], 1)).astype(int)
+    positions[0] = 0
+    if n > 1:
+        positions[-1] = len(df) - 1
+    return df.iloc[np.unique(positions)]
+
+
+def summarize_frame(df: pd.DataFrame, token_budget: int = 1500, top_k: int = 3) -> str:
+    """
+    Summarize a sheet within an approximate token budget.
+
+    The column profile is rendered first (dropping top values, then trailing columns
+    if it alone exceeds the budget); the rest of the budget goes to a stratified
+    row sample whose size is found by binary search.
+
+    Args:
+        df: Sheet values
+        token_budget: Approximate maximum number of tokens for the summary
+        top_k: Number of most frequent values per column
+
+    Returns:
+        Summary text
+    """
+    if df.empty:
+        return "(Empty sheet)"
+
+    header = f"Shape: {df.shape[0]} rows × {df.shape[1]} columns"
+    profiles = [(name, profile_column(df[name], top_k)) for name in df.columns]
+    profile_lines = [_render_profile(name, profile) for name, profile in profiles]
+    if estimate_tokens("\n".join([header] + profile_lines)) > token_budget * 0.6:
+        profile_lines = [
+            _render_profile(name, {k: v for k, v in profile.items() if k != "top"}) for name, profile in profiles
+        ]
+
+    lines = [header, "Column profile:"]
+    used = estimate_tokens("\n".join(lines))
+    for i, line in enumerate(profile_lines):
+        cost = estimate_tokens(line) + 1
+        if used + cost > token_budget * 0.8:
+            lines.append(f"  ... {len(profile_lines) - i} more columns not profiled")
+            break
+        lines.append(line)
+        used += cost
+    summary = "\n".join(lines)
+
+    remaining = token_budget - estimate_tokens(summary)
+    low, high, best = 1, min(len(df), 200), ""
+    while low <= high:
+        n = (low + high) // 2
+        sample = stratified_sample(df, n)
+        text = f"Stratified sample of {len(sample)} rows (index = DataFrame row):\n" + sample.to_string(
+            index=True, max_colwidth=24
+        )
+        if estimate_tokens(text) + 1 <= remaining:
+            best, low = text, n + 1
+        else:
+            high = n - 1
+    return summary + ("\n" + best if best else "")
+
+
+def summarize_sheets(excel_file_path: str, sheets: Dict[str, pd.DataFrame], token_budget: int = 1500) -> str:
+    """
+    Summarize every sheet of a workbook, splitting the token budget evenly between sheets.
+
+    Args:
+        excel_file_path: Path shown in the header of the summary
+        sheets: Mapping of sheet name to DataFrame, in workbook order
+        token_budget: Approximate maximum number of tokens for the whole workbook
+
+    Returns:
+        Summary text
+    """
+    result = [f"Excel file: {excel_file_path}", f"Number of sheets: {len(sheets)}", ""]
+    per_sheet = max(token_budget // max(len(sheets), 1) - 20, 50)
+    for sheet_name, df in sheets.items():
+        result.append(f"Sheet: '{sheet_name}'")
+        result.append("-" * 50)
+        result.append(summarize_frame(df, per_sheet))
+        result.append("")
+    return "\n".join(result)
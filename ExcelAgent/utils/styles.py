@@ -0,0 +1,178 @@
+"""
+Styles - Shared style objects and native conditional-formatting rules for the local executor
+Formatting a range used to build a new Font/PatternFill for every cell, which openpyxl then
+hashed to find its style id. Here each style object is created once (cached by its
+arguments) and registered with the workbook through the first cell; the remaining cells
+receive its style id directly. Conditioned formatting is emitted as a single conditional-
+formatting rule for the range, so its cost and the saved file's size do not depend on
+the number of cells.
+"""
+
+import functools
+from typing import Iterable, List, Optional, Tuple
+
+from openpyxl.formatting.rule import FormulaRule
+from openpyxl.styles import Font, PatternFill
+from openpyxl.styles.cell_style import StyleArray
+from openpyxl.worksheet.cell_range import CellRange
+
+# Fill used to highlight selections
+HIGHLIGHT_COLOR = "FFFF00"
+
+# Styles of an unformatted cell, for clearing formatting
+DEFAULT_FONT = Font()
+NO_FILL = PatternFill()
+
+
+@functools.lru_cache(maxsize=None)
+def font(bold: bool = False, italic: bool = False, underline: Optional[str] = None,
+         color: Optional[str] = None) -> Font:
+    """
+    Shared Font object.
+
+    Args:
+        bold: Bold weight
+        italic: Italic style
+        underline: None or an openpyxl underline style such as "single"
+        color: Hex font color ("#FF0000" or "FF0000"), default if None
+    """
+    return Font(bold=bold, italic=italic, underline=underline, color=color.lstrip("#") if color else None)
+
+
+@functools.lru_cache(maxsize=None)
+def solid_fill(color: str) -> PatternFill:
+    """Shared solid PatternFill for a hex color ("#FFFF00" or "FFFF00")."""
+    color = color.lstrip("#")
+    return PatternFill(start_color=color, end_color=color, fill_type="solid")
+
+
+def apply_style(cells: Iterable, font: Optional[Font] = None, fill: Optional[PatternFill] = None,
+                number_format: Optional[str] = None) -> int:
+    """
+    Give cells of one worksheet the same font, fill and/or number format.
+
+    The first cell goes through openpyxl's setters, which add each style to the
+    workbook's style tables; the other cells get the resulting ids copied into their
+    style arrays instead of hashing the style objects once per cell.
+
+    Args:
+        cells: openpyxl cells of the same worksheet
+        font: Font to set (unchanged if None)
+        fill: Fill to set (unchanged if None)
+        number_format: Number format code to set (unchanged if None)
+
+    Returns:
+        Number of cells styled
+    """
+    cells = iter(cells)
+    first = next(cells, None)
+    if first is None:
+        return 0
+    if font is not None:
+        first.font = font
+    if fill is not None:
+        first.fill = fill
+    if number_format is not None:
+        first.number_format = number_format
+    style = first._style
+    count = 1
+    for cell in cells:
+        target = cell._style
+        if target is None:
+            # Unstyled cells read back from a file openpyxl wrote have no style array yet
+            target = cell._style = StyleArray()
+        if font is not None:
+            target.fontId = style.fontId
+        if fill is not None:
+            target.fillId = style.fillId
+        if number_format is not None:
+            target.numFmtId = style.numFmtId
+        count += 1
+    return count
+
+
+def add_conditional_format(sheet, cell_range: str, formula: str, font: Optional[Font] = None,
+                           fill: Optional[PatternFill] = None) -> bool:
+    """
+    Add a formula-based conditional-formatting rule over a range.
+
+    The new rule takes precedence over existing ones, as a later per-cell format would
+    overwrite an earlier one. Adding an identical rule again is a no-op.
+
+    Args:
+        sheet: openpyxl worksheet
+        cell_range: A1 range the rule covers, e.g. "C2:C101"
+        formula: Excel formula relative to the range's top-left cell, without "="
+        font: Font applied where the formula is true
+        fill: Fill applied where the formula is true
+
+    Returns:
+        True if a rule was added
+    """
+    rule = FormulaRule(formula=[formula], font=font, fill=fill)
+    for formatting in sheet.conditional_formatting:
+        if str(formatting.sqref) == cell_range and any(
+            existing.formula == rule.formula and existing.dxf == rule.dxf for existing in formatting.rules
+        ):
+            return False
+    for formatting in sheet.conditional_formatting:
+        for existing in formatting.rules:
+            existing.priority += 1
+    sheet.conditional_formatting.add(cell_range, rule)
+    rule.priority = 1
+    return True
+
+
+def remove_conditional_formats(sheet, cell_range: str) -> int:
+    """
+    Remove the conditional-formatting rules that lie entirely inside a range.
+
+    Args:
+        sheet: openpyxl worksheet
+        cell_range: A1 range being cleared
+
+    Returns:
+        Number of rules removed
+    """
+    target = CellRange(cell_range)
+    inside = [
+        formatting for formatting in sheet.conditional_formatting
+        if all(part.issubset(target) for part in formatting.sqref.ranges)
+    ]
+    for formatting in inside:
+        # ConditionalFormattingList has no public removal
+        del sheet.conditional_formatting._cf_rules[formatting]
+    return sum(len(formatting.rules) for formatting in inside)
+
+
+def describe_rule(rule) -> str:
+    """Short description of what a conditional-formatting rule applies ("bold, fill #FFFF00")."""
+    parts = []
+    dxf_font = rule.dxf.font if rule.dxf is not None else None
+    dxf_fill = rule.dxf.fill if rule.dxf is not None else None
+    if dxf_font is not None:
+        if dxf_font.b:
+            parts.append("bold")
+        if dxf_font.i:
+            parts.append("italic")
+        if dxf_font.u:
+            parts.append("underline")
+    if dxf_fill is not None and dxf_fill.fill_type:
+        color = dxf_fill.fgColor.rgb
+        if isinstance(color, str):
+            parts.append(f"fill #{color[-6:]}")
+    return ", ".join(parts) if parts else "default"
+
+
+def conditional_format_rules(sheet) -> List[Tuple[str, str, str]]:
+    """
+    Every conditional-formatting rule of a sheet.
+
+    Returns:
+        (range, formula, description) for each rule, in precedence order
+    """
+    rules = []
+    for formatting in sheet.conditional_formatting:
+        for rule in formatting.rules:
+            rules.append((rule.priority, str(formatting.sqref), ";".join(rule.formula or []), describe_rule(rule)))
+    return [entry[1:] for entry in sorted(rules)]
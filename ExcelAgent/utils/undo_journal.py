@@ -0,0 +1,158 @@
+"""
+Undo Journal - Record what the edits of an Action overwrite, so they can be undone in memory
+Every change to the sheet (cell values, formulas, cell styles, conditional-formatting
+rules) logs what it replaces before it happens. rollback() undoes the entries recorded
+since a checkpoint() in reverse order, in time proportional to the cells they changed,
+without reading the file again.
+"""
+
+from collections import OrderedDict
+from typing import Any, List, Optional
+
+import numpy as np
+from openpyxl.styles.cell_style import StyleArray
+
+
+class UndoJournal:
+    """
+    Log of the sheet state an Action's edits replaced.
+
+    Positions returned by checkpoint() count every entry ever recorded, so they stay valid
+    when older entries are released.
+    """
+
+    def __init__(self):
+        self._entries: List[tuple] = []
+        # Position of _entries[0]
+        self._start = 0
+        # Set while undoing, so the writes rollback() makes are not recorded again
+        self._replaying = False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def checkpoint(self) -> int:
+        """The current position, for rollback() and release()."""
+        return self._start + len(self._entries)
+
+    def release(self, position: Optional[int] = None):
+        """Drop the entries recorded before a position (all of them if None); they can no longer be undone."""
+        end = self.checkpoint() if position is None else position
+        del self._entries[:max(end - self._start, 0)]
+        self._start = max(self._start, end)
+
+    # -- recording ---------------------------------------------------------
+
+    def record_values(self, col_idx: int, rows: np.ndarray, column, replaced: bool):
+        """
+        Before cells of one DataFrame column are written.
+
+        Args:
+            col_idx: Zero-indexed column index
+            rows: Zero-indexed DataFrame rows about to be written
+            column: The column (a Series) before the write
+            replaced: Whether the write replaces the column (e.g. to widen its dtype). The old
+                Series is then kept as it is, since the DataFrame no longer writes into it;
+                otherwise only the overwritten values are copied.
+        """
+        if self._replaying:
+            return
+        old = None if replaced else column.to_numpy()[rows]
+        self._entries.append(("values", col_idx, np.array(rows), old, column if replaced else None))
+
+    def record_formulas(self, cells: list, previous: list):
+        """Before formulas are placed in or removed from cells: the Formula each held (None: none)."""
+        if self._replaying or not cells:
+            return
+        self._entries.append(("formulas", cells, previous))
+
+    def record_styles(self, cells: list):
+        """Before openpyxl cells are restyled: the contents of their style arrays."""
+        if self._replaying or not cells:
+            return
+        # Raw bytes copy several times faster than StyleArray objects
+        saved = [(cell.row, cell.column, cell._style.tobytes() if cell._style is not None else None) for cell in cells]
+        self._entries.append(("styles", saved))
+
+    def record_rules(self, sheet):
+        """Before conditional-formatting rules of a worksheet are added or removed."""
+        if self._replaying:
+            return
+        rules = sheet.conditional_formatting
+        # ConditionalFormattingList keeps range -> rule list; adding may extend a list in place
+        ranges = [(formatting, list(formatting_rules), [rule.priority for rule in formatting_rules])
+                  for formatting, formatting_rules in rules._cf_rules.items()]
+        self._entries.append(("rules", ranges, rules.max_priority))
+
+    # -- undoing -----------------------------------------------------------
+
+    def rollback(self, action, position: int) -> int:
+        """
+        Undo the entries recorded since a checkpoint, newest first.
+
+        Restored cells are marked dirty on the Action, so its next save writes them.
+
+        Args:
+            action: The ExcelAgent.utils.action_interpret.Action the entries were recorded on
+            position: A checkpoint() of this journal
+
+        Returns:
+            Number of entries undone
+
+        Raises:
+            ValueError: If the entries after the checkpoint were already released
+        """
+        if position < self._start:
+            raise ValueError(f"journal position {position} was released (oldest kept: {self._start})")
+        undone = self._entries[position - self._start:]
+        del self._entries[position - self._start:]
+        self._replaying = True
+        try:
+            for entry in reversed(undone):
+                getattr(self, f"_undo_{entry[0]}")(action, *entry[1:])
+        finally:
+            self._replaying = False
+        if undone:
+            # Lookup tables may have been built from the undone values
+            action.formulas._lookup_tables.clear()
+        return len(undone)
+
+    @staticmethod
+    def _undo_values(action, col_idx: int, rows: np.ndarray, old: Any, column):
+        if column is not None:
+            action.df.isetitem(col_idx, column)
+        else:
+            action.df.iloc[rows, col_idx] = old
+        action._dirty_cells.update((row, col_idx) for row in rows.tolist())
+
+    @staticmethod
+    def _undo_formulas(action, cells: list, previous: list):
+        engine = action.formulas
+        groups = OrderedDict()
+        for cell, formula in zip(cells, previous):
+            groups.setdefault(id(formula), (formula, []))[1].append(cell)
+        for formula, group in groups.values():
+            rows, cols = np.array(group, dtype=np.int64).reshape(-1, 2).T
+            if formula is None:
+                engine.remove(rows, cols)
+            else:
+                engine.place(formula, rows, cols)
+            # Values are restored by the value entries; the cells are saved with their formula text
+            action._dirty_cells.update(group)
+
+    @staticmethod
+    def _undo_styles(action, saved: list):
+        sheet = action.active_sheet
+        for row, col, style in saved:
+            sheet.cell(row=row, column=col)._style = StyleArray(style) if style is not None else StyleArray()
+
+    @staticmethod
+    def _undo_rules(action, ranges: list, max_priority: int):
+        rules = action.active_sheet.conditional_formatting
+        rules._cf_rules = OrderedDict()
+        for formatting, formatting_rules, priorities in ranges:
+            for rule, priority in zip(formatting_rules, priorities):
+                rule.priority = priority
+            formatting.rules = formatting_rules
+            rules._cf_rules[formatting] = formatting_rules
+        rules.max_priority = max_priority
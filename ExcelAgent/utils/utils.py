@@ -5,6 +5,9 @@ import requests
 import time
 import pandas as pd
 
+from .sheet_cache import SheetSnapshotCache
+from .sheet_summary import summarize_sheets
+
 log_dir = "logs"
 if not os.path.exists(log_dir):
     os.makedirs(log_dir)
@@ -25,20 +28,75 @@ def get_logger(scope):
 
 logger = get_logger(__name__)
 
+# Shared cache of parsed workbooks and prompt renderings (see read_excel_file)
+sheet_cache = SheetSnapshotCache()
+
 
 def encode_image(image_path):
     with open(image_path, "rb") as image_file:
         return base64.b64encode(image_file.read()).decode('utf-8')
 
 
-def read_excel_file(excel_file_path, max_rows=100, max_cols=50):
+def _parse_excel_sheets(excel_file_path):
+    """Parse every sheet of an Excel file in a single pass."""
+    return pd.read_excel(excel_file_path, sheet_name=None)
+
+
+def render_excel_sheets(excel_file_path, sheets, max_rows=100, max_cols=50):
+    """
+    Render parsed sheets as the formatted string used in prompts.
+    
+    Args:
+        excel_file_path: Path shown in the header of the rendering
+        sheets: Mapping of sheet name to DataFrame, in workbook order
+        max_rows: Maximum number of rows to include (to avoid overly long prompts)
+        max_cols: Maximum number of columns to include
+    
+    Returns:
+        A formatted string representation of the sheets
+    """
+    result = []
+    result.append(f"Excel file: {excel_file_path}")
+    result.append(f"Number of sheets: {len(sheets)}")
+    result.append("")
+    
+    for sheet_name, df in sheets.items():
+        result.append(f"Sheet: '{sheet_name}'")
+        result.append("-" * 50)
+        
+        # Limit the size
+        original_shape = df.shape
+        df = df.iloc[:max_rows, :max_cols]
+        
+        # Convert to string representation
+        if df.empty:
+            result.append("(Empty sheet)")
+        else:
+            result.append(f"Shape: {original_shape[0]} rows × {original_shape[1]} columns")
+            if original_shape[0] > max_rows or original_shape[1] > max_cols:
+                result.append(f"(Showing first {min(max_rows, original_shape[0])} rows and {min(max_cols, original_shape[1])} columns)")
+            result.append("")
+            result.append(df.to_string(index=True, max_rows=max_rows, max_cols=max_cols))
+        
+        result.append("")
+        result.append("")
+    
+    return "\n".join(result)
+
+
+def read_excel_file(excel_file_path, max_rows=100, max_cols=50, token_budget=None):
     """
     Read an Excel file and return its content as a formatted string.
     
+    Parsed sheets and renderings are cached in sheet_cache, keyed on the file's
+    path, mtime and size, so repeated prompts for an unchanged file do not re-parse it.
+    
     Args:
         excel_file_path: Path to the Excel file
         max_rows: Maximum number of rows to include (to avoid overly long prompts)
         max_cols: Maximum number of columns to include
+        token_budget: If set, return a statistical summary bounded by this many
+            tokens (see sheet_summary) instead of the first max_rows rows
     
     Returns:
         A formatted string representation of the Excel file content
@@ -47,40 +105,17 @@ def read_excel_file(excel_file_path, max_rows=100, max_cols=50):
         if not os.path.exists(excel_file_path):
             return f"Error: Excel file not found at path: {excel_file_path}"
         
-        # Read all sheets from the Excel file
-        excel_file = pd.ExcelFile(excel_file_path)
-        sheet_names = excel_file.sheet_names
-        
-        result = []
-        result.append(f"Excel file: {excel_file_path}")
-        result.append(f"Number of sheets: {len(sheet_names)}")
-        result.append("")
-        
-        for sheet_name in sheet_names:
-            result.append(f"Sheet: '{sheet_name}'")
-            result.append("-" * 50)
-            
-            # Read the sheet
-            df = pd.read_excel(excel_file_path, sheet_name=sheet_name)
-            
-            # Limit the size
-            original_shape = df.shape
-            df = df.iloc[:max_rows, :max_cols]
-            
-            # Convert to string representation
-            if df.empty:
-                result.append("(Empty sheet)")
-            else:
-                result.append(f"Shape: {original_shape[0]} rows × {original_shape[1]} columns")
-                if original_shape[0] > max_rows or original_shape[1] > max_cols:
-                    result.append(f"(Showing first {min(max_rows, original_shape[0])} rows and {min(max_cols, original_shape[1])} columns)")
-                result.append("")
-                result.append(df.to_string(index=True, max_rows=max_rows, max_cols=max_cols))
-            
-            result.append("")
-            result.append("")
+        def render():
+            sheets = sheet_cache.get_or_create(
+                excel_file_path, ("sheets",), lambda: _parse_excel_sheets(excel_file_path)
+            )
+            if token_budget:
+                return summarize_sheets(excel_file_path, sheets, token_budget)
+            return render_excel_sheets(excel_file_path, sheets, max_rows, max_cols)
         
-        return "\n".join(result)
+        return sheet_cache.get_or_create(
+            excel_file_path, ("render", excel_file_path, max_rows, max_cols, token_budget), render
+        )
     
     except Exception as e:
         logger.error(f"Error reading Excel file {excel_file_path}: {str(e)}")
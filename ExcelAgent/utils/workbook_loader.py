@@ -0,0 +1,155 @@
+"""
+Workbook Loader - Parses an Excel file once and derives the pandas view from it
+Builds the DataFrame straight from the openpyxl cell model so callers that need both
+the formatting model and the data do not parse the workbook XML twice.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import openpyxl
+import pandas as pd
+from openpyxl.cell.cell import TYPE_ERROR, TYPE_FORMULA, TYPE_NUMERIC
+from pandas.errors import EmptyDataError
+from pandas.io.parsers import TextParser
+
+
+def _convert_value(value: Any, data_type: str) -> Any:
+    """
+    Convert an openpyxl cell value to the scalar pandas' openpyxl reader would produce.
+
+    Args:
+        value: Raw cell value
+        data_type: openpyxl data type of the cell
+
+    Returns:
+        Cell value ("" for empty cells, which the parser turns into NaN)
+    """
+    if value is None:
+        return ""
+    elif data_type == TYPE_ERROR:
+        return np.nan
+    elif data_type == TYPE_NUMERIC:
+        int_value = int(value)
+        if int_value == value:
+            return int_value
+        return float(value)
+    return value
+
+
+def _convert_rows(sheet) -> Tuple[List[List[Any]], List[Tuple[int, int, str]]]:
+    """
+    Convert every worksheet row in a single pass.
+
+    Returns:
+        Tuple of (rows, formula_cells) where formula_cells lists (row, col, coordinate)
+        of cells whose cached result still has to be filled in
+    """
+    data = []
+    formula_cells = []
+    for row_number, row in enumerate(sheet.iter_rows()):
+        converted_row = []
+        for col_number, cell in enumerate(row):
+            if cell.data_type == TYPE_FORMULA:
+                formula_cells.append((row_number, col_number, cell.coordinate))
+                converted_row.append("")
+            else:
+                converted_row.append(_convert_value(cell.value, cell.data_type))
+        data.append(converted_row)
+    return data, formula_cells
+
+
+def _trim_rows(data: List[List[Any]]) -> List[List[Any]]:
+    """Trim trailing empty cells and rows and pad to a rectangle, as pandas does."""
+    last_row_with_data = -1
+    for row_number, converted_row in enumerate(data):
+        while converted_row and converted_row[-1] == "":
+            # trim trailing empty elements
+            converted_row.pop()
+        if converted_row:
+            last_row_with_data = row_number
+
+    # Trim trailing empty rows
+    data = data[: last_row_with_data + 1]
+
+    if data:
+        # extend rows to max width
+        max_width = max(len(data_row) for data_row in data)
+        data = [data_row + [""] * (max_width - len(data_row)) for data_row in data]
+    return data
+
+
+def _cached_formula_values(file_path: str, sheet_title: str, coordinates: List[str]) -> Dict[str, Any]:
+    """
+    Read the cached results of formula cells.
+
+    openpyxl only exposes either formulas or their cached values per load, so this
+    second (read-only, streaming) pass happens only for sheets that contain formulas.
+    """
+    wanted = set(coordinates)
+    values = {}
+    cached_workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+    try:
+        for row in cached_workbook[sheet_title].iter_rows():
+            for cell in row:
+                coordinate = getattr(cell, "coordinate", None)
+                if coordinate in wanted:
+                    values[coordinate] = (cell.value, cell.data_type)
+    finally:
+        cached_workbook.close()
+    return values
+
+
+def rows_to_frame(data: List[List[Any]]) -> pd.DataFrame:
+    """
+    Parse converted cell rows into a DataFrame using the first row as the header.
+
+    Args:
+        data: Rows of converted cell values
+
+    Returns:
+        DataFrame with pd.read_excel header and dtype semantics
+    """
+    data = _trim_rows(data)
+    try:
+        parser = TextParser(data, header=0, skip_blank_lines=False)
+        return parser.read()
+    except EmptyDataError:
+        # No Data, return an empty DataFrame
+        return pd.DataFrame()
+
+
+def sheet_to_frame(sheet, file_path: Optional[str] = None) -> pd.DataFrame:
+    """
+    Build a DataFrame from an openpyxl worksheet with pd.read_excel header and dtype semantics.
+
+    Args:
+        sheet: openpyxl worksheet (loaded with formulas, i.e. data_only=False)
+        file_path: Source file, used to look up cached formula results. Without it
+            formula cells are read as empty.
+
+    Returns:
+        DataFrame using the first row as the header
+    """
+    data, formula_cells = _convert_rows(sheet)
+    if formula_cells and file_path:
+        cached = _cached_formula_values(file_path, sheet.title, [coord for _, _, coord in formula_cells])
+        for row_number, col_number, coordinate in formula_cells:
+            value, data_type = cached.get(coordinate, (None, None))
+            data[row_number][col_number] = _convert_value(value, data_type)
+    return rows_to_frame(data)
+
+
+def load_workbook_frame(file_path: str) -> Tuple[openpyxl.Workbook, pd.DataFrame]:
+    """
+    Load an Excel file once and return both the openpyxl workbook and a DataFrame of its first sheet.
+
+    Args:
+        file_path: Path to the Excel file
+
+    Returns:
+        Tuple of (workbook, DataFrame) where the DataFrame matches pd.read_excel(file_path)
+    """
+    workbook = openpyxl.load_workbook(file_path)
+    # pd.read_excel reads the first sheet by default, which is not necessarily the active one
+    return workbook, sheet_to_frame(workbook.worksheets[0], file_path)
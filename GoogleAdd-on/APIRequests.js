@@ -2,6 +2,44 @@ var apiUrlBase = "https://1f34-199-79-156-167.ngrok-free.app";
 
 const FIRST_N_ROWS = 3;
 
+const MAX_OVERLOAD_RETRIES = 3;
+
+// Ship the used range so the server can answer READs itself (skipped for larger sheets)
+const MAX_SNAPSHOT_CELLS = 20000;
+
+function getSheetSnapshot(sheet) {
+  const range = sheet.getDataRange();
+  if (range.getNumRows() * range.getNumColumns() > MAX_SNAPSHOT_CELLS) {
+    return null;
+  }
+  const values = range.getValues().map(row => row.map(cell => cell instanceof Date ? String(cell) : cell));
+  return [{ range: range.getA1Notation(), values: values }];
+}
+
+// Retry when the server is saturated (429/503), waiting as long as its Retry-After asks
+function fetchWithRetryAfter(url, options) {
+  var response = UrlFetchApp.fetch(url, options);
+  for (var attempt = 0; attempt < MAX_OVERLOAD_RETRIES; attempt++) {
+    var code = response.getResponseCode();
+    if (code !== 429 && code !== 503) {
+      break;
+    }
+    // Header names keep the server's casing (uvicorn sends "retry-after")
+    var headers = response.getHeaders();
+    var name = Object.keys(headers).find(key => key.toLowerCase() === "retry-after");
+    var retryAfter = parseInt(name ? headers[name] : "", 10) || 2;
+    Logger.log("Server busy (" + code + "), retrying in " + retryAfter + "s");
+    Utilities.sleep(Math.min(retryAfter, 30) * 1000);
+    response = UrlFetchApp.fetch(url, options);
+  }
+  return response;
+}
+
+// One server-side conversation per user and spreadsheet
+function getSessionId() {
+  return SpreadsheetApp.getActiveSpreadsheet().getId() + ":" + Session.getTemporaryActiveUserKey();
+}
+
 function fetchAndProcessActions(message) {
   Logger.log("fetchAndProcessActions received message: " + message);
 
@@ -13,6 +51,7 @@ function fetchAndProcessActions(message) {
     .map(row => row.map(cell => String(cell)));
 
   const apiUrl = apiUrlBase + "/subtask-process";
+  const sessionId = getSessionId();
   var currentMessage = message;
   var tell_user_message = "";
   var readContext = "";
@@ -27,7 +66,14 @@ function fetchAndProcessActions(message) {
       role: "User",
       message: currentMessage,
       first_n_rows_of_sheet: firstNRows,
+      session_id: sessionId,
     };
+
+    // Taken every round: actions executed in earlier rounds may have changed the sheet
+    const snapshot = getSheetSnapshot(sheet);
+    if (snapshot) {
+      payload.sheet_snapshot = snapshot;
+    }
     
     // Add read_context if available
     if (readContext) {
@@ -47,7 +93,7 @@ function fetchAndProcessActions(message) {
     };
 
     try {
-      const response = UrlFetchApp.fetch(apiUrl, options);
+      const response = fetchWithRetryAfter(apiUrl, options);
       const text = response.getContentText();
       Logger.log("API raw response: " + text);
 
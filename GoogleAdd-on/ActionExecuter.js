@@ -11,9 +11,13 @@ function processSequentialActions(actions) {
         } else if (action.type === "ToolAction" && selectedRange) {
             applyToolAction(selectedRange, action);
         } else if (action.type === "Set" && selectedRange) {
-            applySet(selectedRange, action);
+            if (!(action.batch && applyBatch(selectedRange, action.batch))) {
+                applySet(selectedRange, action);
+            }
         } else if (action.type === "Format" && selectedRange) {
-            applyFormat(selectedRange, action);
+            if (!(action.batch && applyBatch(selectedRange, action.batch))) {
+                applyFormat(selectedRange, action);
+            }
         } else if (action.type === "SelectAndDrag" && selectedRange) {
           selectedRange = getRangeFromSelect(sheet, action);
           Logger.log("Selected range: " + selectedRange.getA1Notation());
@@ -58,6 +62,32 @@ function getRangeFromSelect(sheet, action) {
     return sheet.getRange(rangeA1);
 }
 
+// Apply a server-compiled batch: one Range setter call with a matrix, plus one read when
+// the REGEX mask left some cells (null entries) unchanged. Returns false if the matrix no
+// longer fits the range (the sheet changed since the snapshot); the caller then falls back.
+function applyBatch(range, batch) {
+    var values = batch.values;
+    if (!values.length || values.length !== range.getNumRows() || values[0].length !== range.getNumColumns()) {
+        Logger.log("Batch shape does not match " + range.getA1Notation() + ", applying per cell");
+        return false;
+    }
+    var partial = values.some(function(row) { return row.some(function(v) { return v === null; }); });
+    if (partial) {
+        var current = range[batch.getter]();
+        // Unchanged cells keep their formula rather than its value
+        var currentValues = batch.setter === "setValues" ? range.getValues() : null;
+        values = values.map(function(row, i) {
+            return row.map(function(v, j) {
+                if (v !== null) return v;
+                return currentValues && !current[i][j] ? currentValues[i][j] : current[i][j];
+            });
+        });
+    }
+    range[batch.setter](values);
+    Logger.log("Applied " + batch.setter + " to " + range.getA1Notation() + (partial ? " (masked)" : ""));
+    return true;
+}
+
 function applyFormat(range, action) {
     var regExp = action.reg ? new RegExp(action.reg) : null;
     var values = range.getValues();
@@ -139,15 +169,12 @@ function applySelectAndDrag(selectedRange, action) {
 
     Logger.log("Dragging formula: " + formula + " across " + numRows + " rows and " + numCols + " columns");
 
+    // One call for the whole range (the source cell gets its own formula back)
+    var formulas = [];
     for (var i = 0; i < numRows; i++) {
-        for (var j = 0; j < numCols; j++) {
-            // Skip original formula cell
-            if (i === 0 && j === 0) continue;
-
-            var targetCell = selectedRange.getCell(i + 1, j + 1);
-            targetCell.setFormulaR1C1(formula);
-        }
+        formulas.push(new Array(numCols).fill(formula));
     }
+    selectedRange.setFormulasR1C1(formulas);
 }
 
 var clipboard = null;
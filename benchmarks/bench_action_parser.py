@@ -0,0 +1,261 @@
+"""
+Benchmark for the single-pass action parser (ExcelAgent/api/action_parser.py).
+
+Parses a corpus of recorded action strings, CLI calls as the action agent writes them
+("Select(2, 0, 2, 99) IF cell value > 90", "Action: Copy()") and the add-on grammar's
+entries ("REGEX ^9[0-9]$ | FORMAT style: Bold"), `--repeat` times. Each string is also
+parsed the previous way: the ActionExecutor's cascade of re.search calls for CLI
+strings, and the old parse_action_entry for grammar entries. The script reports
+entries per second for both and checks that every string yields the same action, and
+that prose lines the model writes around its actions are still parse errors, in both
+the strict grammar and the CLI's lenient scan.
+
+Usage:
+    python benchmarks/bench_action_parser.py --repeat 2000
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from openpyxl.utils import column_index_from_string
+
+from ExcelAgent.api.action_parser import InterfaceAction, parse_action, parse_cell_range, parse_format_params
+from ExcelAgent.api.action_schemas import *
+from ExcelAgent.api.exceptions import ActionStrParseError
+
+CLI_CORPUS = [
+    "Select(0, 0, 4, 0)",
+    "Select(2, 3)",
+    "Select(2, 0, 2, 99) IF cell value > 90",
+    "REGEX ^9[0-9]$ | Select(2, 0, 2, 99)",
+    "Action: Select(1, 0, 1, 49)",
+    "Select( 3 , 10 , 5 , 20 )",
+    "Select and Drag(3, 0, 3, 49)",
+    "SelectAndDrag(4, 1, 4, 20) IF cell is numeric",
+    'Set("=SUM(B2:D2)")',
+    "Set(Total)",
+    'Set("Passed") IF cell value >= 60',
+    "Set('Grade 9')",
+    "Format(bold)",
+    'Format(bold, color="#FF0000")',
+    "Format(italic, underline)",
+    "Format(color=#FFFF00) IF cell value < 50",
+    "Read(0, 0, 3, 9)",
+    "Read(1, 4)",
+    "Copy()",
+    "Paste()",
+    "Delete() IF cell is empty",
+    "Bold()",
+    "Copy/Paste/Delete/...: Copy()",
+    "Format Cells",
+    "Right Click",
+    "Tell User(\"Which column holds the totals?\")",
+    "Terminate",
+]
+
+GRAMMAR_CORPUS = [
+    "READ A1:C1",
+    "READ C1:C-1",
+    "READ D2",
+    "REGEX ^.*$ | SELECT C2:C-1",
+    "REGEX ^9[0-9]$ | FORMAT style: Bold",
+    "REGEX ^\\?.*$ | FORMAT style: backgroundcolor, color: #FFFF00",
+    "REGEX ^.*$ | FORMAT style: fontcolor, color: #FF0000, size: 12, alignment: center, wrap: True",
+    "REGEX ^.*$ | FORMAT border: { top: True, bottom: False }, value_format: currency",
+    "REGEX ^A.* | SELECT A1:B-1",
+    "REGEX ^.*$ | SELECT L2",
+    "REGEX ^C.* | SELECTANDDRAG C2:D6",
+    "REGEX ^.*$ | SET =SUM(B2:D2)",
+    "REGEX ^$ | SET N/A",
+    "REGEX ^.*$ | TOOLACTION copy",
+    "REGEX ^.*$ | TOOLACTION pasteasvalues",
+    "REGEX ^.*$ | TELLUSER The names of the students in grade 9 that have a score greater than 90 are: John, Jane.",
+    "REGEX ^.*$ | TERMINATE",
+]
+
+# Explanations around actions; neither the add-on nor the CLI may turn them into actions
+PROSE_CORPUS = [
+    "Here is the plan: I will read the data and set values",
+    "This will set the column to zero.",
+    "Read the names first, then select the scores.",
+    "I will format the header row in bold and terminate.",
+    "REGEX ^.*$ | Select the whole column",
+    "REGEX ^.*$ | READ A1:A5",
+]
+
+
+# Previous parsers
+
+def cascade_parse(action_string):
+    """The ActionExecutor's cascade, returning what it would have executed."""
+    action_string = action_string.strip()
+    if "Tell User" in action_string or "TellUser" in action_string:
+        return ("telluser",)
+    if "Terminate" in action_string:
+        return ("terminate",)
+
+    condition = None
+    regex_match = re.match(r'^REGEX\s+([^|]+?)\s*\|\s*(.*)$', action_string, re.IGNORECASE | re.DOTALL)
+    if regex_match:
+        condition, action_string = regex_match.group(1).strip(), regex_match.group(2).strip()
+    else:
+        if_match = re.search(r'(\)|\b[A-Z]+\d+)\s+IF\s+(.+)$', action_string, re.DOTALL)
+        if if_match:
+            condition = if_match.group(2).strip()
+            action_string = action_string[:if_match.start()] + if_match.group(1)
+
+    match = re.search(r'Select\s*\(\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*\)', action_string, re.IGNORECASE)
+    if match:
+        return ("select", *map(int, match.groups()), condition)
+    match = re.search(r'Select\s*\(\s*(\d+)\s*,\s*(\d+)\s*\)', action_string, re.IGNORECASE)
+    if match:
+        col, row = map(int, match.groups())
+        return ("select", col, row, col, row, condition)
+    match = re.search(r'Select\s+([A-Z]+)(\d+)(?::([A-Z]+)(\d+))?', action_string, re.IGNORECASE)
+    if match:
+        return ("select-excel", *match.groups(), condition)
+    match = re.search(r'(?:Select\s*and\s*Drag|SelectAndDrag)\s*\(\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*\)',
+                      action_string, re.IGNORECASE)
+    if match:
+        return ("selectanddrag", *map(int, match.groups()), condition)
+    match = re.search(r'Set\s*\(\s*["\'](.+?)["\']\s*\)', action_string, re.IGNORECASE | re.DOTALL)
+    if match:
+        return ("set", match.group(1), condition)
+    match = re.search(r'Set\s*\(\s*([^)]+)\s*\)', action_string, re.IGNORECASE)
+    if match:
+        return ("set", match.group(1).strip(), condition)
+    match = re.search(r'Format\s*\(\s*(.+?)\s*\)', action_string, re.IGNORECASE)
+    if match:
+        params = match.group(1).lower()
+        color = re.search(r'color\s*=\s*["\']?([#\w]+)["\']?', match.group(1), re.IGNORECASE)
+        return ("format", "bold" in params, "italic" in params, "underline" in params,
+                color.group(1) if color else None, condition)
+    match = re.search(r'Read\s+([A-Z]+)(\d+)(?::([A-Z]+)(\d+))?', action_string, re.IGNORECASE)
+    if match:
+        return ("read-excel", *match.groups())
+    match = re.search(r'Read\s*\(\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*\)', action_string, re.IGNORECASE)
+    if match:
+        return ("read", *map(int, match.groups()))
+    match = re.search(r'Read\s*\(\s*(\d+)\s*,\s*(\d+)\s*\)', action_string, re.IGNORECASE)
+    if match:
+        col, row = map(int, match.groups())
+        return ("read", col, row, col, row)
+    match = re.search(r'(Copy|Paste|Delete|Cut|Bold|Italic|Underline)\s*\(\s*\)', action_string, re.IGNORECASE)
+    if match:
+        return ("tool", match.group(1).lower(), condition)
+    if re.search(r'Format\s+Cells|Apply\s+Formatting|Background\s+Color', action_string, re.IGNORECASE):
+        return ("interface", "format")
+    if re.search(r'Copy/Paste/Delete/\.\.\.|Right\s*Click|Context\s+Menu', action_string, re.IGNORECASE):
+        return ("interface", "menu")
+    return None
+
+
+def previous_parse_entry(entry):
+    """parse_action_entry as it was before action_parser.py."""
+    stripped_entry = entry.strip()
+    if re.match(r"^READ\b", stripped_entry, re.IGNORECASE):
+        _, cell_range = stripped_entry.split(None, 1)
+        col1, row1, col2, row2 = parse_cell_range(cell_range)
+        return Read(type="Read", col1=col1, row1=row1, col2=col2, row2=row2)
+    match = re.fullmatch(r"REGEX\s+([^|]+)\s*\|\s*(.*)", stripped_entry)
+    if not match:
+        raise ActionStrParseError(f"Invalid action entry: {entry}")
+    reg, action_part = match.groups()
+    reg, action_part = reg.strip(), action_part.strip()
+    if action_part.startswith("SELECTANDDRAG"):
+        _, cell_range = action_part.split(None, 1)
+        col1, row1, col2, row2 = parse_cell_range(cell_range)
+        return SelectAndDrag(type="SelectAndDrag", reg=reg, col1=col1, row1=row1, col2=col2, row2=row2)
+    elif action_part.startswith("SELECT"):
+        _, cell_range = action_part.split(None, 1)
+        col1, row1, col2, row2 = parse_cell_range(cell_range)
+        return Select(type="Select", reg=reg, col1=col1, row1=row1, col2=col2, row2=row2)
+    elif action_part.startswith("FORMAT"):
+        return Format(type="Format", reg=reg if reg else None, **parse_format_params(action_part[len("FORMAT"):].strip()))
+    elif action_part.startswith("SET"):
+        return Set(type="Set", reg=reg, text=action_part[len("SET"):].strip())
+    elif action_part.startswith("TOOLACTION"):
+        return ToolAction(type="ToolAction", reg=reg, tool=action_part[len("TOOLACTION"):].strip())
+    elif action_part.startswith("TELLUSER"):
+        return TellUser(type="TellUser", reg=reg, message=action_part[len("TELLUSER"):].strip())
+    elif action_part.startswith("TERMINATE"):
+        return Terminate(type="Terminate", reg=reg)
+    raise ActionStrParseError(f"Invalid action entry: {entry}")
+
+
+def as_call(action):
+    """The parsed model in the cascade's terms (0-based DataFrame indices)."""
+    def indices(a):
+        return (column_index_from_string(a.col1) - 1, int(a.row1) - 2,
+                column_index_from_string(a.col2) - 1, int(a.row2) - 2)
+    if isinstance(action, TellUser):
+        return ("telluser",)
+    if isinstance(action, Terminate):
+        return ("terminate",)
+    if isinstance(action, InterfaceAction):
+        return ("interface", action.name)
+    if isinstance(action, Read):
+        return ("read", *indices(action))
+    if isinstance(action, (Select, SelectAndDrag)):
+        return (action.type.lower(), *indices(action), action.reg)
+    if isinstance(action, Set):
+        return ("set", action.text, action.reg)
+    if isinstance(action, ToolAction):
+        return ("tool", action.tool, action.reg)
+    style = action.style or ""
+    return ("format", "bold" in style, "italic" in style, "underline" in style, action.color, action.reg)
+
+
+def rate(parse, corpus, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for entry in corpus:
+            parse(entry)
+    return repeat * len(corpus) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the compiled action parser against the regex cascade")
+    parser.add_argument("--repeat", type=int, default=2000, help="Passes over the corpus")
+    args = parser.parse_args()
+
+    def parse_grammar(entry):
+        return parse_action(entry, strict=True)
+
+    def rejects(parse, entry):
+        try:
+            parse(entry)
+        except (ActionStrParseError, ValueError, AttributeError):
+            return True
+        return False
+
+    mismatches = [entry for entry in CLI_CORPUS if cascade_parse(entry) != as_call(parse_action(entry))]
+    mismatches += [entry for entry in GRAMMAR_CORPUS
+                   if previous_parse_entry(entry).model_dump() != parse_grammar(entry).model_dump()]
+    mismatches += [entry for entry in PROSE_CORPUS
+                   if not (rejects(previous_parse_entry, entry) and rejects(parse_grammar, entry))]
+    # run.py's lenient scan must reject the same lines as the cascade
+    mismatches += [entry for entry in PROSE_CORPUS if rejects(parse_action, entry) != (cascade_parse(entry) is None)]
+
+    print(f"{len(CLI_CORPUS)} CLI strings, {len(GRAMMAR_CORPUS)} grammar entries, "
+          f"{len(PROSE_CORPUS)} prose lines, {args.repeat} passes")
+    print(f"{'corpus':<10}{'previous':>16}{'parser':>16}{'speedup':>10}")
+    for name, corpus, previous, parse in (("CLI", CLI_CORPUS, cascade_parse, parse_action),
+                                          ("grammar", GRAMMAR_CORPUS, previous_parse_entry, parse_grammar)):
+        old_rate = rate(previous, corpus, args.repeat)
+        new_rate = rate(parse, corpus, args.repeat)
+        print(f"{name:<10}{old_rate / 1e3:>11.1f}k e/s{new_rate / 1e3:>11.1f}k e/s{new_rate / old_rate:>9.1f}x")
+    for entry in mismatches:
+        print(f"MISMATCH: {entry}")
+    print("all entries parse the same, prose is rejected" if not mismatches else f"{len(mismatches)} entries differ")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmark for multi-action plans per LLM turn in the CLI agent loop (run.py --max_actions).
+
+A mock provider (benchmarks/stub_llm_server.py) plays the action agent for a fixed
+suite of tasks on a generated sheet. Each task is a scripted list of plans: the actions
+the agent can decide together, with a break wherever it has to see a result first (after
+a Read). With --max_actions 1 the mock answers one action per turn, as run.py asked
+before; with a larger --max_actions it answers the next plan. Reflections answer A and
+planning calls answer a fixed progress note.
+
+run.py is started once per task and mode, and the script reports the LLM calls (action,
+reflection and planning) each run made and checks that both modes leave the same workbook.
+
+Usage:
+    python benchmarks/bench_action_plans.py --max_actions 5 --latency 0.05
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import openpyxl
+import pandas as pd
+
+from stub_llm_server import StubLLMServer
+from ExcelAgent.utils.styles import conditional_format_rules
+
+ROWS = 20
+TASKS = {
+    "Bold the names, mark every note as checked and highlight scores above 90": [
+        ["Select(0, 0, 0, 19)", "Format(bold)", "Select(3, 0, 3, 19)", 'Set("checked")',
+         "Select(2, 0, 2, 19) IF cell value > 90", "Terminate"],
+    ],
+    "Copy the names into the notes column and bold them": [
+        ["Select(0, 0, 0, 19)", "Copy()", "Select(3, 0)", "Paste()", "Select(3, 0, 3, 19)", "Format(bold)", "Terminate"],
+    ],
+    "Italicize the grades of grade 9 students and fill empty notes with n/a": [
+        ["Select(1, 0, 1, 19)", "Format(italic) IF cell value = 9", "Select(3, 0, 3, 19)",
+         'Set("n/a") IF cell is empty', "Terminate"],
+    ],
+    "Check the first five scores, then color the failing ones red": [
+        ["Read(2, 0, 2, 4)"],
+        ["Select(2, 0, 2, 4) IF cell value < 50", "Format(color=#FF0000)", "Terminate"],
+    ],
+}
+
+
+def make_sheet(path):
+    pd.DataFrame({
+        "Name": [f"Student {i}" for i in range(ROWS)],
+        "Grade": [9 + i % 4 for i in range(ROWS)],
+        "Score": [(i * 37) % 100 for i in range(ROWS)],
+        "Note": ["" if i % 3 else "late" for i in range(ROWS)],
+    }).to_excel(path, index=False)
+
+
+def executed_actions(prompt):
+    """Actions already accepted, from the prompt's History of Operations."""
+    actions = []
+    for line in re.findall(r"^Step \d+: Operation: .*?; Action: (.*)$", prompt, re.MULTILINE):
+        actions.extend(entry.strip() for entry in line.split(" ; "))
+    return actions
+
+
+def responder(request):
+    prompt = request["messages"][-1]["content"]
+    if "### Answer ###" in prompt:
+        return "### Thought ###\nThe sheet changed as intended.\n### Answer ###\nA"
+    if "### Completed contents ###" in prompt:
+        return "### Completed contents ###\nThe operations so far were carried out."
+    instruction = re.search(r'The current user instruction is: "(.*?)"', prompt).group(1)
+    limit = re.search(r"up to (\d+) actions", prompt)
+    done = len(executed_actions(prompt))
+    for plan in TASKS[instruction]:
+        if done < len(plan):
+            remaining = plan[done:]
+            break
+        done -= len(plan)
+    actions = remaining[:int(limit.group(1))] if limit else remaining[:1]
+    return ("### Thought ###\nContinue the task.\n### Action ###\n" + " ; ".join(actions)
+            + "\n### Summary ###\nApply the next operations.")
+
+
+def workbook_state(path):
+    """Values, fonts, fills and conditional-formatting rules of the first sheet."""
+    sheet = openpyxl.load_workbook(path).active
+    cells = [(cell.coordinate, cell.value, cell.font.b, cell.font.i, cell.fill.fgColor.rgb)
+             for row in sheet.iter_rows() for cell in row]
+    return cells, conditional_format_rules(sheet)
+
+
+def run_task(server, tmp, instruction, max_actions):
+    workdir = tempfile.mkdtemp(dir=tmp)
+    path = os.path.join(workdir, "sheet.xlsx")
+    make_sheet(path)
+    start = server.request_count
+    subprocess.run(
+        [sys.executable, os.path.join(ROOT, "run.py"), "--instruction", instruction, "--excel_file_path", path,
+         "--model_provider", "openai", "--model_name", "stub", "--api_url", server.url + "/v1",
+         "--api_key", "bench", "--max_steps", "20", "--max_actions", str(max_actions)],
+        cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True,
+    )
+    return server.request_count - start, workbook_state(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark LLM calls per task with multi-action plans")
+    parser.add_argument("--max_actions", type=int, default=5, help="Actions per turn for the plan runs")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock provider latency")
+    args = parser.parse_args()
+
+    ok = True
+    totals = [0, 0]
+    with tempfile.TemporaryDirectory() as tmp, StubLLMServer(latency=args.latency, responder=responder) as server:
+        print(f"{'task':<74}{'1 action':>10}{f'{args.max_actions} actions':>11}")
+        for instruction in TASKS:
+            single_calls, single_state = run_task(server, tmp, instruction, 1)
+            plan_calls, plan_state = run_task(server, tmp, instruction, args.max_actions)
+            same = single_state == plan_state
+            ok = ok and same
+            totals[0] += single_calls
+            totals[1] += plan_calls
+            print(f"{instruction:<74}{single_calls:>10}{plan_calls:>11}{'' if same else '  WORKBOOKS DIFFER'}")
+    print(f"{'total':<74}{totals[0]:>10}{totals[1]:>11}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
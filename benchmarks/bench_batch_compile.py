@@ -0,0 +1,88 @@
+"""
+Benchmark for compiling action plans into range batches (ExcelAgent/api/batch_compiler.py).
+
+Builds a sheet snapshot with `--rows` rows, parses a plan that formats and sets a
+column through REGEX masks, and compiles it. Reports the compile time, the size
+of the batch matrices in the JSON response, and the Apps Script service calls the
+add-on's executor makes per action with and without batches. The call counts
+follow GoogleAdd-on/ActionExecuter.js: applyFormat makes a getCell() and a setter
+call per matching cell, and applySet makes getCell() and getValue() per cell plus
+a setter per match.
+
+Usage:
+    python benchmarks/bench_batch_compile.py --rows 5000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ExcelAgent.api.action_reverse_parse import parse_action_string
+from ExcelAgent.api.batch_compiler import compile_batches, js_string
+from ExcelAgent.api.read_resolver import SheetSnapshot
+from ExcelAgent.api.schemas import ActionsResponse, Format, Set
+
+PLAN = (
+    "REGEX ^.*$ | SELECT C2:C-1 ; "
+    "REGEX ^9[0-9]$ | FORMAT style: bold ; "
+    "REGEX ^[0-5][0-9]$ | FORMAT style: backgroundcolor, color: #F4CCCC ; "
+    "REGEX ^.*$ | SELECT D2:D-1 ; "
+    "REGEX ^$ | SET n/a ; "
+    "REGEX ^n/a$ | FORMAT style: fontcolor, color: #999999"
+)
+
+
+def per_cell_calls(action, values, mask):
+    """Service calls the per-cell executor makes for one action."""
+    cells = sum(len(row) for row in values)
+    hits = sum(sum(row) for row in mask)
+    if isinstance(action, Format):
+        return 1 + 2 * hits          # getValues + (getCell + setter) per match
+    return 2 * cells + hits          # (getCell + getValue) per cell + setter per match
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batch compilation of action plans")
+    parser.add_argument("--rows", type=int, default=5000)
+    args = parser.parse_args()
+
+    sheet = [["Name", "Grade", "Score", "Note"]]
+    sheet += [[f"Student {i}", 9 + i % 4, (i * 37) % 100, "" if i % 3 else "ok"] for i in range(1, args.rows + 1)]
+    snapshot = SheetSnapshot([(f"A1:D{len(sheet)}", sheet)])
+
+    actions = parse_action_string(PLAN)
+    start = time.perf_counter()
+    compile_batches(actions, snapshot)
+    compile_ms = (time.perf_counter() - start) * 1000
+    payload = ActionsResponse(role="assistant", message="success", actions=actions).model_dump_json()
+
+    print(f"{args.rows} rows: compiled in {compile_ms:.1f} ms, response {len(payload) / 1024:.0f} KiB")
+    print(f"{'action':<48}{'per-cell calls':>16}{'batched calls':>15}")
+    total_cell = total_batch = 0
+    for action in actions:
+        if not isinstance(action, (Format, Set)):
+            continue
+        values = action.batch["values"]
+        mask = [[value is not None for value in row] for row in values]
+        if isinstance(action, Set):
+            # The per-cell path reads the cells as they are before this Set
+            before = [[row[3]] for row in sheet[1:]]
+            mask = [[js_string(value) == "" for value in row] for row in before]
+        partial = not all(all(row) for row in mask)
+        batched = 1 + partial + (partial and action.batch["setter"] == "setValues")
+        cell = per_cell_calls(action, values, mask)
+        total_cell += cell
+        total_batch += batched
+        print(f"{action.to_string()[:46]:<48}{cell:>16}{batched:>15}")
+    print(f"{'total':<48}{total_cell:>16}{total_batch:>15}")
+    assert all(action.batch for action in actions if isinstance(action, (Format, Set))), "an action was not compiled"
+    json.loads(payload)
+
+
+if __name__ == "__main__":
+    main()
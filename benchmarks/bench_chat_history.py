@@ -0,0 +1,68 @@
+"""
+Micro-benchmark for building a chat history turn by turn (ExcelAgent/chat/chat.py).
+
+Appends n user/assistant turns whose user prompts embed a sheet dump, once with the
+previous deep-copying append (add_response_old) and once with add_response on a
+ChatLog, and reports the time to build the whole conversation. It also checks that
+the provider conversions in chat/api.py and the cache key see the same messages
+for both histories.
+
+Usage:
+    python benchmarks/bench_chat_history.py --turns 50 500
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ExcelAgent.chat import api
+from ExcelAgent.chat.cache import ResponseCache
+from ExcelAgent.chat.chat import add_response, add_response_old, init_action_chat
+
+
+def sheet_dump(rows=100, cols=8):
+    return "\n".join(",".join(f"r{r}c{c}:{r * c}" for c in range(cols)) for r in range(rows))
+
+
+def build(append, turns, prompt):
+    chat = init_action_chat()
+    if append is add_response_old:
+        chat = chat.to_list()
+    start = time.perf_counter()
+    for turn in range(turns):
+        chat = append("user", f"Step {turn}\n{prompt}", chat)
+        chat = append("assistant", f"### Action ###\nSelect(0, {turn}, 0, {turn})", chat)
+    return chat, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark deep-copying vs structurally shared chat histories")
+    parser.add_argument("--turns", type=int, nargs="+", default=[50, 500])
+    parser.add_argument("--rows", type=int, default=100, help="Rows in the sheet dump embedded in each prompt")
+    args = parser.parse_args()
+
+    prompt = sheet_dump(args.rows)
+    print(f"prompt size {len(prompt) / 1024:.1f} KiB")
+    print(f"{'turns':>6}{'deepcopy':>12}{'ChatLog':>12}{'speedup':>10}")
+    for turns in args.turns:
+        copied, copied_time = build(add_response_old, turns, prompt)
+        shared, shared_time = build(add_response, turns, prompt)
+        same = (
+            api._openai_messages(copied) == api._openai_messages(shared)
+            and api._claude_payload(copied, "m", 0.0) == api._claude_payload(shared, "m", 0.0)
+            and ResponseCache.make_key(copied, "m", None, "openai", 0.0)
+            == ResponseCache.make_key(shared, "m", None, "openai", 0.0)
+        )
+        if not same:
+            print(f"{turns}: provider conversions differ between the two histories")
+            sys.exit(1)
+        print(f"{turns:>6}{copied_time * 1000:>10.1f}ms{shared_time * 1000:>10.2f}ms"
+              f"{copied_time / shared_time:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
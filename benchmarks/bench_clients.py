@@ -0,0 +1,83 @@
+"""
+Micro-benchmark for per-call client overhead in chat/api.py.
+
+Runs the same chat against a local stub server (benchmarks/stub_llm_server.py)
+with per-call clients (a fresh OpenAI client / bare requests.post, the previous
+behaviour) and with the pooled clients from ExcelAgent.chat.clients, and reports
+mean latency per call and the number of TCP connections the server accepted.
+
+The stub speaks plain HTTP, so the numbers cover connection setup and client
+construction but not the TLS handshake a real provider adds on every new connection.
+
+Usage:
+    python benchmarks/bench_clients.py --calls 200
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_llm_server import StubLLMServer
+from ExcelAgent.chat import api, clients
+
+CHAT = [
+    ["system", [{"type": "text", "text": "You are a spreadsheet agent."}]],
+    ["user", [{"type": "text", "text": "Make the header row bold."}]],
+]
+
+
+def fresh_openai_call(base_url: str):
+    from openai import OpenAI
+
+    client = OpenAI(api_key="bench", base_url=base_url)
+    client.chat.completions.create(model="stub", messages=[{"role": "user", "content": "hi"}], temperature=0.0)
+    client.close()
+
+
+def bare_requests_call(url: str):
+    res = requests.post(url, json={"model": "stub", "messages": [{"role": "user", "content": "hi"}]}, timeout=60)
+    res.raise_for_status()
+    res.json()
+
+
+def timed(server: StubLLMServer, fn, calls: int):
+    fn()  # warm-up (imports, first connection)
+    connections_before = server.connections
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    elapsed = time.perf_counter() - start
+    return elapsed / calls * 1000, server.connections - connections_before
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-call client overhead")
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    with StubLLMServer() as server:
+        base_url = server.url + "/v1"
+        rows = [
+            ("openai sdk, new client", lambda: fresh_openai_call(base_url)),
+            ("openai sdk, pooled", lambda: api._inference_openai_sdk(CHAT, "stub", base_url, "bench", 0.0)),
+            ("requests.post", lambda: bare_requests_call(base_url + "/chat/completions")),
+            ("requests, pooled", lambda: api._inference_openai_requests(CHAT, "stub", base_url, "bench", 0.0)),
+            ("claude, pooled", lambda: api._inference_claude(CHAT, "stub", "bench", 0.0, server.url + "/v1/messages")),
+        ]
+
+        print(f"{'client':<26} {'ms/call':>9} {'connections':>12}")
+        for name, fn in rows:
+            ms, connections = timed(server, fn, args.calls)
+            print(f"{name:<26} {ms:>9.2f} {connections:>12}")
+    clients.client_registry.close()
+
+
+if __name__ == "__main__":
+    main()
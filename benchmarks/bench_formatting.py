@@ -0,0 +1,122 @@
+"""
+Benchmark for shared styles and conditional-formatting rules (ExcelAgent/utils/styles.py).
+
+Writes a `--rows` sheet (name, grade, score) and runs three formatting operations
+through the local executor, each on a freshly loaded Action:
+
+  - highlight a whole-column selection (static formatting)
+  - greater_than conditional formatting on the score column
+  - bold the names matching REGEX ^Student 1
+
+Each is also run the previous way, a new Font/PatternFill assigned to every
+cell (or every matching cell). The script reports the time of the operation and
+how much it grows the saved file.
+
+Usage:
+    python benchmarks/bench_formatting.py --rows 100000
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+from openpyxl.styles import Font, PatternFill
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ExcelAgent.utils.action_executor import ActionExecutor
+
+
+# Previous per-cell versions
+
+def per_cell_highlight(executor, rows):
+    executor.excel_action.select(2, 2, 3, rows + 1)
+    for row in range(rows):
+        for col in (1, 2):
+            cell = executor.excel_action.active_sheet.cell(row=row + 2, column=col + 1)
+            cell.fill = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
+
+
+def per_cell_greater_than(executor, rows):
+    action = executor.excel_action
+    action.select(3, 2, 3, rows + 1)
+    for r in range(rows):
+        try:
+            if float(action.df.iloc[r, 2]) > 90:
+                cell = action.active_sheet.cell(row=r + 2, column=3)
+                cell.fill = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
+        except (TypeError, ValueError):
+            pass
+
+
+def per_cell_regex_bold(executor, rows):
+    executor.excel_action.select(1, 2, 1, rows + 1)
+    for cell in executor.excel_action.selected_sheet_cells("^Student 1"):
+        cell.font = Font(bold=True)
+
+
+# Current versions
+
+def highlight(executor, rows):
+    executor.parse_and_execute(f"Select(1, 0, 2, {rows - 1})")
+
+
+def greater_than(executor, rows):
+    executor.excel_action.select(3, 2, 3, rows + 1)
+    executor.excel_action.select_top_menu_tool("conditional_formatting", {"rule_type": "greater_than", "threshold": 90})
+
+
+def regex_bold(executor, rows):
+    executor.excel_action.select(1, 2, 1, rows + 1)
+    executor.parse_and_execute("REGEX ^Student 1 | Format(bold)")
+
+
+OPERATIONS = [
+    ("highlight B:C", per_cell_highlight, highlight),
+    ("greater_than 90 on C", per_cell_greater_than, greater_than),
+    ("bold where ^Student 1 on A", per_cell_regex_bold, regex_bold),
+]
+
+
+def run(path, operation, rows, out_path):
+    with contextlib.redirect_stdout(io.StringIO()):
+        executor = ActionExecutor(path)
+        executor.excel_action.selected_range = None
+        start = time.perf_counter()
+        operation(executor, rows)
+        elapsed = time.perf_counter() - start
+        executor.save(out_path)
+    return elapsed, os.path.getsize(out_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-cell styles against shared styles and rules")
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sheet.xlsx")
+        pd.DataFrame({
+            "Name": [f"Student {i}" for i in range(args.rows)],
+            "Grade": [9 + i % 4 for i in range(args.rows)],
+            "Score": [(i * 37) % 100 for i in range(args.rows)],
+        }).to_excel(path, index=False)
+        _, base_size = run(path, lambda executor, rows: None, args.rows, os.path.join(tmp, "base.xlsx"))
+
+        print(f"{args.rows} rows, unformatted file {base_size / 1024:.0f} KiB")
+        print(f"{'operation':<30}{'per-cell':>12}{'+file':>11}{'now':>12}{'+file':>11}")
+        for name, old, new in OPERATIONS:
+            old_time, old_size = run(path, old, args.rows, os.path.join(tmp, "old.xlsx"))
+            new_time, new_size = run(path, new, args.rows, os.path.join(tmp, "new.xlsx"))
+            print(f"{name:<30}{old_time * 1000:>10.0f}ms{(old_size - base_size) / 1024:>7.0f} KiB"
+                  f"{new_time * 1000:>10.0f}ms{(new_size - base_size) / 1024:>7.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
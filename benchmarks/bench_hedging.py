@@ -0,0 +1,106 @@
+"""
+Benchmark for hedged routing and failover (ExcelAgent/chat/router.py).
+
+Two mock providers (benchmarks/stub_llm_server.py) stand in for two backends:
+a primary that is usually fast but has a heavy tail, and a steadier secondary.
+The script sends the same sequence of calls to the primary alone and through a
+HedgedRouter, reports p50/p95/p99 latency for both, and then makes the primary
+return 500s to check that calls fail over to the secondary.
+
+Usage:
+    python benchmarks/bench_hedging.py --calls 200
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_llm_server import StubLLMServer
+from ExcelAgent.chat import api, clients
+from ExcelAgent.chat.retry import RetryPolicy, RetryScheduler
+from ExcelAgent.chat.router import Backend, HedgedRouter
+
+CHAT = [["user", [{"type": "text", "text": "Make the header row bold."}]]]
+
+
+def quantiles(samples):
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+    return statistics.median(ordered), pick(0.95), pick(0.99)
+
+
+def heavy_tail(rng, fast, slow, slow_fraction):
+    return lambda: slow if rng.random() < slow_fraction else fast
+
+
+async def timed_calls(calls, call):
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        await call()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def run(args, primary, secondary):
+    primary_backend = Backend("openai", "primary", primary.url + "/v1", "bench")
+    secondary_backend = Backend("openai", "secondary", secondary.url + "/v1", "bench")
+
+    direct = await timed_calls(args.calls, lambda: api.inference_chat_async(
+        CHAT, primary_backend.model, primary_backend.api_url, "bench"))
+
+    router = HedgedRouter([primary_backend, secondary_backend], default_hedge_delay=args.default_hedge_delay)
+    hedged = await timed_calls(args.calls, lambda: router.ainference(CHAT))
+
+    print(f"{'':<14}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for name, samples in [("primary only", direct), ("hedged", hedged)]:
+        p50, p95, p99 = quantiles(samples)
+        print(f"{name:<14}{p50 * 1000:>7.0f}ms{p95 * 1000:>7.0f}ms{p99 * 1000:>7.0f}ms")
+    extra = router.stats["hedges"] / max(router.stats["requests"], 1)
+    print(f"hedge delay {router.hedge_delay(primary_backend) * 1000:.0f} ms, "
+          f"{extra:.0%} extra requests, {router.stats['hedge_wins']} won by the secondary")
+    print(router.summary())
+
+    # Failover: the primary starts failing outright
+    primary.latency = 0.0
+    primary.failures.extend([(500, {})] * 1000)
+    before = secondary.request_count
+    failover = await timed_calls(20, lambda: router.ainference(CHAT))
+    served = secondary.request_count - before
+    p50, _, _ = quantiles(failover)
+    print(f"failover: 20 calls with the primary returning 500s, {served} served by the secondary, "
+          f"p50 {p50 * 1000:.0f} ms")
+    await clients.client_registry.aclose()
+    return served == 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hedged routing across two stub backends")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--fast", type=float, default=0.05, help="Usual primary latency")
+    parser.add_argument("--slow", type=float, default=1.0, help="Primary tail latency")
+    parser.add_argument("--slow_fraction", type=float, default=0.1)
+    parser.add_argument("--secondary", type=float, default=0.15, help="Secondary latency")
+    parser.add_argument("--default_hedge_delay", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # No retries: the router, not the scheduler, decides what happens on a failure
+    api.configure_retry_scheduler(RetryScheduler(RetryPolicy(max_attempts=1), failure_threshold=10 ** 6))
+    rng = random.Random(args.seed)
+    with StubLLMServer(latency=heavy_tail(rng, args.fast, args.slow, args.slow_fraction)) as primary, \
+            StubLLMServer(latency=args.secondary) as secondary:
+        ok = asyncio.run(run(args, primary, secondary))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
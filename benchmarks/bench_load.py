@@ -0,0 +1,86 @@
+"""
+Benchmark for single-parse workbook loading in Action.__init__.
+
+Compares the previous loading path (pd.read_excel followed by openpyxl.load_workbook)
+with load_workbook_frame, which parses the file once. Each measurement runs in a
+fresh subprocess so peak RSS is attributable to the load alone.
+
+Usage:
+    python benchmarks/bench_load.py --rows 10000 100000 500000
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+import openpyxl
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import json, resource, sys, time
+sys.path.insert(0, {root!r})
+import openpyxl
+import pandas as pd
+from ExcelAgent.utils.workbook_loader import load_workbook_frame
+
+path, mode = sys.argv[1], sys.argv[2]
+start = time.perf_counter()
+if mode == "two_pass":
+    df = pd.read_excel(path, engine="openpyxl")
+    workbook = openpyxl.load_workbook(path)
+else:
+    workbook, df = load_workbook_frame(path)
+elapsed = time.perf_counter() - start
+peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{"seconds": elapsed, "peak_mb": peak_kb / 1024, "shape": list(df.shape)}}))
+"""
+
+
+def make_workbook(path: str, rows: int, cols: int = 6):
+    # write_only keeps generation of the large fixtures fast
+    rng = np.random.default_rng(0)
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append([f"col{c}" for c in range(cols)])
+    numbers = rng.integers(0, 1000, size=(rows, cols - 2)).tolist()
+    floats = rng.random(rows).round(4).tolist()
+    for r in range(rows):
+        sheet.append(numbers[r] + [floats[r], f"name{r % 997}"])
+    workbook.save(path)
+
+
+def measure(path: str, mode: str) -> dict:
+    code = CHILD.format(root=ROOT)
+    output = subprocess.run(
+        [sys.executable, "-c", code, path, mode], check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark single-parse workbook loading")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 500000])
+    parser.add_argument("--cols", type=int, default=6)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'two-pass (s)':>13} {'single (s)':>11} {'two-pass RSS (MB)':>18} {'single RSS (MB)':>16}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            path = os.path.join(tmp, f"bench_{rows}.xlsx")
+            make_workbook(path, rows, args.cols)
+            old = measure(path, "two_pass")
+            new = measure(path, "single")
+            assert old["shape"] == new["shape"]
+            print(
+                f"{rows:>8} {old['seconds']:>13.2f} {new['seconds']:>11.2f} "
+                f"{old['peak_mb']:>18.0f} {new['peak_mb']:>16.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
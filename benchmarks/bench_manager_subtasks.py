@@ -0,0 +1,131 @@
+"""
+Benchmark for manager decomposition with concurrent subtasks (run.py --manager).
+
+A mock provider (benchmarks/stub_llm_server.py) plays the manager, action, reflection and
+planning agents for one compound instruction on a generated sheet. The manager answers a
+fixed list of subtasks, four on separate columns and a fifth on the same column as an
+earlier one; each subtask is a scripted sequence of actions. In the serial run the manager
+annotates every subtask with [columns: all], so they run one after another; in the
+parallel run it names each subtask's column, so the independent ones run concurrently on
+views of the workbook that are merged into one save.
+
+run.py is started once per mode with --max_concurrency 4 (its 1 s output pause is
+disabled in both), and the script reports the wall-clock time and LLM calls of each run
+and checks that both leave the same workbook.
+
+Usage:
+    python benchmarks/bench_manager_subtasks.py --latency 0.2
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import openpyxl
+import pandas as pd
+
+from stub_llm_server import StubLLMServer
+from ExcelAgent.utils.styles import conditional_format_rules
+
+ROWS = 20
+INSTRUCTION = ("Bold the names, highlight scores above 90, italicize the grades of grade 9 students, "
+               "fill empty notes with n/a and color the failing scores red")
+# (subtask, column, scripted actions)
+SUBTASKS = [
+    ("Bold the names.", "Name", ["Select(0, 0, 0, 19)", "Format(bold)", "Terminate"]),
+    ("Highlight scores above 90.", "Score", ["Select(2, 0, 2, 19) IF cell value > 90", "Terminate"]),
+    ("Italicize the grades of grade 9 students.", "Grade",
+     ["Select(1, 0, 1, 19)", "Format(italic) IF cell value = 9", "Terminate"]),
+    ("Fill empty notes with n/a.", "Note", ["Select(3, 0, 3, 19)", 'Set("n/a") IF cell is empty', "Terminate"]),
+    ("Color the failing scores red.", "Score",
+     ["Select(2, 0, 2, 19) IF cell value < 50", "Format(color=#FF0000)", "Terminate"]),
+]
+SCRIPTS = {subtask: actions for subtask, _, actions in SUBTASKS}
+# Whether the manager names each subtask's column (parallel) or answers [columns: all] (serial)
+mode = {"columns": True}
+
+
+def make_sheet(path):
+    pd.DataFrame({
+        "Name": [f"Student {i}" for i in range(ROWS)],
+        "Grade": [9 + i % 4 for i in range(ROWS)],
+        "Score": [(i * 37) % 100 for i in range(ROWS)],
+        "Note": ["" if i % 3 else "late" for i in range(ROWS)],
+    }).to_excel(path, index=False)
+
+
+def responder(request):
+    prompt = request["messages"][-1]["content"]
+    if "decompose the above instruction" in prompt:
+        return "\n".join(f"{number}. {subtask} [columns: {column if mode['columns'] else 'all'}]"
+                         for number, (subtask, column, _) in enumerate(SUBTASKS, 1))
+    if "### Answer ###" in prompt:
+        return "### Thought ###\nThe sheet changed as intended.\n### Answer ###\nA"
+    if "### Completed contents ###" in prompt:
+        return "### Completed contents ###\nThe operations so far were carried out."
+    subtask = re.search(r'The current user instruction is: "(.*?)"', prompt).group(1)
+    executed = set(re.findall(r"^Step \d+: Operation: .*?; Action: (.*)$", prompt, re.MULTILINE))
+    script = SCRIPTS[subtask]
+    done = 0
+    while done < len(script) - 1 and script[done] in executed:
+        done += 1
+    return (f"### Thought ###\nContinue the task.\n### Action ###\n{script[done]}"
+            "\n### Summary ###\nApply the next operation.")
+
+
+def workbook_state(path):
+    """Values, fonts, fills and conditional-formatting rules of the first sheet."""
+    sheet = openpyxl.load_workbook(path).active
+    cells = [(cell.coordinate, cell.value, cell.font.b, cell.font.i,
+              cell.font.color.rgb if cell.font.color is not None else None, cell.fill.fgColor.rgb)
+             for row in sheet.iter_rows() for cell in row]
+    return cells, conditional_format_rules(sheet)
+
+
+def run(server, tmp, columns):
+    mode["columns"] = columns
+    workdir = tempfile.mkdtemp(dir=tmp)
+    path = os.path.join(workdir, "sheet.xlsx")
+    make_sheet(path)
+    # run.py pauses 1 s after each sequential step for readability; leave it out of the timing
+    launcher = (f"import runpy, sys, time; sys.path.insert(0, {ROOT!r}); time.sleep = lambda seconds: None; "
+                f"runpy.run_path({os.path.join(ROOT, 'run.py')!r}, run_name='__main__')")
+    start_calls = server.request_count
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", launcher, "--manager", "--instruction", INSTRUCTION, "--excel_file_path", path,
+         "--model_provider", "openai", "--model_name", "stub", "--api_url", server.url + "/v1",
+         "--api_key", "bench", "--max_steps", "5", "--max_concurrency", "4"],
+        cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True,
+    )
+    return time.perf_counter() - start, server.request_count - start_calls, workbook_state(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent subtasks of the manager agent")
+    parser.add_argument("--latency", type=float, default=0.2, help="Mock provider latency")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, StubLLMServer(latency=args.latency, responder=responder) as server:
+        serial_time, serial_calls, serial_state = run(server, tmp, columns=False)
+        parallel_time, parallel_calls, parallel_state = run(server, tmp, columns=True)
+    print(f"{len(SUBTASKS)} subtasks, {args.latency:.2f}s per LLM call")
+    print(f"{'mode':<10}{'wall':>9}{'LLM calls':>11}")
+    print(f"{'serial':<10}{serial_time:>8.2f}s{serial_calls:>11}")
+    print(f"{'parallel':<10}{parallel_time:>8.2f}s{parallel_calls:>11}")
+    print(f"speedup {serial_time / parallel_time:.2f}x")
+    same = serial_state == parallel_state
+    print("workbooks identical" if same else "WORKBOOKS DIFFER")
+    sys.exit(0 if same else 1)
+
+
+if __name__ == "__main__":
+    main()
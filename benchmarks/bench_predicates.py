@@ -0,0 +1,172 @@
+"""
+Benchmark for the vectorized predicate engine (ExcelAgent/utils/predicates.py).
+
+Builds a `--cells` sheet (10 columns of ints, 2-decimal floats with gaps, and text) in an
+Action and runs conditioned Set, Delete, Copy+Paste and a "> 99.9" highlight over the
+whole range. Each operation is also run the per-cell way:
+iloc reads, a regex or float() test per cell and _set_cell per write, the same
+loops the executor used before. The per-cell loops are timed on a `--baseline_cells`
+slice of the range and reported as throughput, since a full 1M-cell pass takes
+minutes. The script checks that both give the same sheet on that slice.
+
+Usage:
+    python benchmarks/bench_predicates.py --cells 1000000 --baseline_cells 50000
+"""
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+from openpyxl.styles import PatternFill
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ExcelAgent.utils import styles
+from ExcelAgent.utils.action_interpret import Action
+from ExcelAgent.utils.predicates import _cell_text
+
+COLUMNS = 10
+HIGHLIGHT = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
+
+
+def make_frame(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    data = {}
+    for j in range(COLUMNS):
+        if j % 3 == 0:
+            data[f"int{j}"] = rng.integers(0, 100, rows)
+        elif j % 3 == 1:
+            values = np.round(rng.random(rows) * 100, 2)
+            values[rng.random(rows) < 0.1] = np.nan
+            data[f"float{j}"] = values
+        else:
+            words = np.array(["alpha", "beta", "gamma", "delta", "?check", "90 days"], dtype=object)
+            data[f"text{j}"] = words[rng.integers(0, len(words), rows)]
+    return pd.DataFrame(data)
+
+
+def make_action(path: str, frame: pd.DataFrame, rows: int) -> Action:
+    action = Action(path)
+    action.df = frame.copy()
+    action._mark_synced()
+    action.select(1, 2, COLUMNS, rows + 1)
+    return action
+
+
+# Per-cell versions, as the loops in Action/ActionExecutor were written before the predicate engine
+
+def per_cell_set(action, pattern, text):
+    regex = re.compile(pattern)
+    start_row, start_col, end_row, end_col = action.selected_range
+    for r in range(start_row, end_row + 1):
+        for c in range(start_col, end_col + 1):
+            if regex.search(_cell_text(action.df.iloc[r, c])):
+                action._set_cell(r, c, text)
+
+
+def per_cell_delete(action, pattern):
+    per_cell_set(action, pattern, None)
+
+
+def per_cell_copy_paste(action, pattern, target_col):
+    regex = re.compile(pattern)
+    start_row, start_col, end_row, end_col = action.selected_range
+    clipboard = []
+    for r in range(start_row, end_row + 1):
+        clipboard.append([action.df.iloc[r, c] if regex.search(_cell_text(action.df.iloc[r, c])) else None
+                          for c in range(start_col, start_col + 2)])
+    for r_offset, row_data in enumerate(clipboard):
+        for c_offset, value in enumerate(row_data):
+            if value is not None:
+                action._set_cell(start_row + r_offset, target_col + c_offset, value)
+
+
+def per_cell_greater_than(action, threshold):
+    start_row, start_col, end_row, end_col = action.selected_range
+    hits = 0
+    for r in range(start_row, end_row + 1):
+        for c in range(start_col, end_col + 1):
+            try:
+                if float(action.df.iloc[r, c]) > threshold:
+                    action.active_sheet.cell(row=r + 2, column=c + 1).fill = HIGHLIGHT
+                    hits += 1
+            except (TypeError, ValueError):
+                pass
+    return hits
+
+
+def vectorized_copy_paste(action, pattern, target_col, rows):
+    action.select(1, 2, 2, rows + 1)
+    action.select_context_menu_tool("copy", condition=pattern)
+    action.select(target_col + 1, 2)
+    action.select_context_menu_tool("paste")
+
+
+OPERATIONS = [
+    # name, per-cell version, vectorized version (action, rows) -> None
+    ("Set where REGEX ^9[0-9]$", lambda a, rows: per_cell_set(a, r"^9[0-9]$", "high"),
+     lambda a, rows: a.set_input("high", condition=r"^9[0-9]$")),
+    ("Delete where REGEX ^\\?", lambda a, rows: per_cell_delete(a, r"^\?"),
+     lambda a, rows: a.select_context_menu_tool("delete", condition=r"^\?")),
+    ("Copy+Paste where REGEX ^[0-4]", lambda a, rows: per_cell_copy_paste(a, r"^[0-4]", 8),
+     lambda a, rows: vectorized_copy_paste(a, r"^[0-4]", 8, rows)),
+    # The conditional_formatting tool now emits one native rule instead (see bench_formatting.py);
+    # this row times the mask-plus-fill path format_selection() keeps for conditions Excel cannot express
+    ("> 99.9 highlight (mask + fill)", lambda a, rows: per_cell_greater_than(a, 99.9),
+     lambda a, rows: styles.apply_style(a.selected_sheet_cells("> 99.9"), fill=HIGHLIGHT)),
+]
+
+
+def run(operation, path, frame, rows):
+    action = make_action(path, frame, rows)
+    action.input_field_selected = True
+    start = time.perf_counter()
+    operation(action, rows)
+    return time.perf_counter() - start, action
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vectorized REGEX/comparison masks against per-cell loops")
+    parser.add_argument("--cells", type=int, default=1000000)
+    parser.add_argument("--baseline_cells", type=int, default=50000, help="Range size the per-cell loops are timed on")
+    args = parser.parse_args()
+    # The per-cell loops upcast int columns one cell at a time, which pandas warns about
+    warnings.simplefilter("ignore", FutureWarning)
+
+    rows = args.cells // COLUMNS
+    baseline_rows = args.baseline_cells // COLUMNS
+    frame = make_frame(rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.xlsx")
+        frame.head(1).to_excel(path, index=False)
+
+        print(f"{rows * COLUMNS} cells ({rows} x {COLUMNS}); per-cell loops timed on {baseline_rows * COLUMNS} cells")
+        print(f"{'operation':<34}{'per-cell':>16}{'vectorized':>16}{'full range':>12}{'speedup':>10}")
+        ok = True
+        for name, per_cell, vectorized in OPERATIONS:
+            small = frame.head(baseline_rows)
+            cell_time, cell_action = run(per_cell, path, small, baseline_rows)
+            _, check_action = run(vectorized, path, small, baseline_rows)
+            same = cell_action.df.astype(object).equals(check_action.df.astype(object))
+            same = same and {(c.row, c.column) for c in cell_action.active_sheet._cells.values() if c.fill.fill_type} == \
+                {(c.row, c.column) for c in check_action.active_sheet._cells.values() if c.fill.fill_type}
+            ok = ok and same
+
+            vector_time, _ = run(vectorized, path, frame, rows)
+            cell_rate = baseline_rows * COLUMNS / cell_time
+            vector_rate = rows * COLUMNS / vector_time
+            print(f"{name:<34}{cell_rate / 1e3:>11.0f}k c/s{vector_rate / 1e6:>11.1f}M c/s"
+                  f"{vector_time * 1000:>10.0f}ms{vector_rate / cell_rate:>9.0f}x"
+                  f"{'' if same else '  MISMATCH'}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
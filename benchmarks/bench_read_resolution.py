@@ -0,0 +1,107 @@
+"""
+Benchmark for resolving READ actions on the server (ExcelAgent/api/read_resolver.py).
+
+A mock provider (benchmarks/stub_llm_server.py) issues `--reads` rounds of READ
+actions before answering with the final actions. The add-on's client-side loop
+(fetchAndProcessActions: execute READs locally, post again with read_context) is
+replayed against /subtask-process, followed by a single request carrying a sheet
+snapshot. Each HTTP round trip adds `--rtt` seconds for the Apps Script -> ngrok
+hop. The script reports round trips and wall time for both, and checks that they
+end with the same actions.
+
+Usage:
+    python benchmarks/bench_read_resolution.py --reads 3 --rtt 0.3 --latency 0.5
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("NVIDIA_API_KEY", "bench")
+
+from fastapi.testclient import TestClient
+
+from stub_llm_server import StubLLMServer
+from main import app
+from ExcelAgent.api import message
+from ExcelAgent.api.read_resolver import SheetSnapshot
+from ExcelAgent.api.schemas import Read
+from ExcelAgent.api.singular_agent import SingularAgent
+
+SHEET = [["Name", "Grade", "Score"]] + [[f"Student {i}", 9 + i % 4, 60 + (i * 7) % 40] for i in range(1, 200)]
+RANGE = f"A1:C{len(SHEET)}"
+READS = ["READ A1:C1", "READ B1:B-1", "READ C1:C-1", "READ A1:A-1"]
+FINAL = "REGEX ^.*$ | SELECT C2:C-1 ; REGEX ^9[0-9]$ | FORMAT style: Bold ; REGEX ^.*$ | TELLUSER Done."
+
+
+def responder(reads):
+    def respond(request):
+        # Count the READ results the model has seen so far in this conversation
+        seen = sum(m["content"].count("PREVIOUS READ ACTION RESULTS") for m in request["messages"] if m["role"] == "user")
+        return READS[seen % len(READS)] if seen < reads else FINAL
+    return respond
+
+
+def client_side(http, rtt, session_id):
+    """fetchAndProcessActions: READs executed by the client, one round trip each."""
+    snapshot = SheetSnapshot([(RANGE, SHEET)])
+    payload = {"role": "User", "message": "Bold scores in the 90s", "first_n_rows_of_sheet": SHEET[:3],
+               "session_id": session_id}
+    round_trips = 0
+    for _ in range(10):
+        time.sleep(rtt)
+        data = http.post("/subtask-process", json=payload).json()
+        round_trips += 1
+        reads = [Read(**action) for action in data["actions"] if action["type"] == "Read"]
+        if not reads:
+            return data["actions"], round_trips
+        payload = dict(payload, message="Processing read content",
+                       read_context="\n".join(snapshot.read_message(read) for read in reads))
+    return data["actions"], round_trips
+
+
+def server_side(http, rtt, session_id):
+    """One request with the used range attached."""
+    payload = {"role": "User", "message": "Bold scores in the 90s", "first_n_rows_of_sheet": SHEET[:3],
+               "session_id": session_id, "sheet_snapshot": [{"range": RANGE, "values": SHEET}]}
+    time.sleep(rtt)
+    data = http.post("/subtask-process", json=payload).json()
+    return data["actions"], 1, data["resolved_reads"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark server-side READ resolution")
+    parser.add_argument("--reads", type=int, default=3, help="READ rounds before the final answer")
+    parser.add_argument("--rtt", type=float, default=0.3, help="Simulated client <-> server round trip")
+    parser.add_argument("--latency", type=float, default=0.5, help="Mock provider latency")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    with StubLLMServer(latency=args.latency, responder=responder(args.reads)) as provider:
+        message.singular_agent = SingularAgent(model_provider="openai", model_name="stub",
+                                               api_url=provider.url + "/v1", api_key="bench")
+        with TestClient(app) as http:
+            start = time.perf_counter()
+            client_actions, client_trips = client_side(http, args.rtt, "client")
+            client_time = time.perf_counter() - start
+            start = time.perf_counter()
+            server_actions, server_trips, resolved = server_side(http, args.rtt, "server")
+            server_time = time.perf_counter() - start
+
+    print(f"{args.reads} READ rounds, {args.rtt * 1000:.0f} ms round trip, {args.latency * 1000:.0f} ms model latency")
+    print(f"client-side READs: {client_trips} round trips, {client_time:.2f}s")
+    print(f"server-side READs: {server_trips} round trip, {server_time:.2f}s ({resolved} READs resolved)")
+    # Server-side actions also carry batch matrices (batch_compiler.py); compare the actions themselves
+    strip = lambda actions: [{k: v for k, v in action.items() if k != "batch"} for action in actions]
+    same = strip(client_actions) == strip(server_actions)
+    print("final actions match" if same else f"final actions differ:\n{client_actions}\n{server_actions}")
+    sys.exit(0 if same else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark for the reflection prompt size with and without the cell-level diff.
+
+For each workbook, builds the action prompt (which records the "before" state),
+applies a small edit through ActionExecutor, and builds the reflection prompt twice:
+with the full before/after sheet dumps and with the compact change list.
+
+Usage:
+    python benchmarks/bench_reflect_prompt.py --synthetic_rows 50000
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ExcelAgent.chat.prompt import get_action_prompt, get_reflect_prompt
+from ExcelAgent.utils.action_executor import ActionExecutor
+
+ACTIONS = ["Select(1, 0, 1, 2)", 'Set("Updated")']
+
+
+def make_workbook(path: str, rows: int, cols: int = 10):
+    rng = np.random.default_rng(0)
+    data = {f"col{c}": rng.integers(0, 1000, size=rows) for c in range(cols - 1)}
+    data["name"] = [f"name{i}" for i in range(rows)]
+    pd.DataFrame(data).to_excel(path, index=False, engine="openpyxl")
+
+
+def measure(path: str):
+    executor = ActionExecutor(path)
+    sheet_state = executor.get_sheet_state()
+    get_action_prompt("bench", path, [], [], [], "", "", "", "", False, "", "", False, False, False,
+                      sheet_state=sheet_state)
+    for action in ACTIONS:
+        executor.parse_and_execute(action)
+    full = get_reflect_prompt("bench", path, "Update cells", "; ".join(ACTIONS), "",
+                              sheet_state=sheet_state, use_diff=False)
+    diff = get_reflect_prompt("bench", path, "Update cells", "; ".join(ACTIONS), "",
+                              sheet_state=sheet_state, use_diff=True)
+    return len(full), len(diff)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark reflection prompt size")
+    parser.add_argument("--synthetic_rows", type=int, default=50000)
+    args = parser.parse_args()
+
+    print(f"{'workbook':<24} {'full dump (chars)':>18} {'diff (chars)':>13} {'~tokens saved':>14} {'reduction':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for name in ["example.xlsx", "example2.xlsx"]:
+            paths.append(shutil.copy(os.path.join(ROOT, name), os.path.join(tmp, name)))
+        synthetic = os.path.join(tmp, f"synthetic_{args.synthetic_rows}.xlsx")
+        make_workbook(synthetic, args.synthetic_rows)
+        paths.append(synthetic)
+
+        for path in paths:
+            full, diff = measure(path)
+            # ~4 characters per token is a reasonable estimate for English/tabular text
+            print(f"{os.path.basename(path):<24} {full:>18} {diff:>13} {(full - diff) // 4:>14} {full / diff:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Exercise the retry scheduler (ExcelAgent/chat/retry.py) against a stub provider
+(benchmarks/stub_llm_server.py) that returns 429s and 5xx responses.
+
+Each scenario prints what happened and whether it matched the expected behaviour:
+Retry-After is honoured, transient errors are retried with backoff, client errors
+are not retried, a failing provider trips the circuit breaker, concurrent callers
+rejected together do not retry in lockstep, and the request bucket paces calls.
+
+Usage:
+    python benchmarks/bench_retry.py
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_llm_server import StubLLMServer
+from ExcelAgent.chat import api, clients
+from ExcelAgent.chat.retry import CircuitOpenError, ProviderLimits, RetryPolicy, RetryScheduler
+
+CHAT = [["user", [{"type": "text", "text": "Make the header row bold."}]]]
+
+
+class FixedDelayPolicy(RetryPolicy):
+    """Fixed pause without jitter or Retry-After, like the old time.sleep(2) loops (shortened)."""
+
+    def backoff(self, attempt, retry_after=None, rng=None):
+        return 0.5
+
+
+def reset(server, scheduler):
+    api.configure_retry_scheduler(scheduler)
+    server.failures.clear()
+    server.request_times.clear()
+    server.request_count = 0
+
+
+def call(server, provider):
+    url = server.url + ("/v1/messages" if provider == "claude" else "/v1")
+    return api.inference_chat(CHAT, "stub", url, "bench", provider=provider)
+
+
+def retry_after(server, provider):
+    reset(server, RetryScheduler(RetryPolicy(base_delay=0.05), seed=0))
+    server.failures.extend([(429, {"Retry-After": "0.3"})] * 2)
+    start = time.monotonic()
+    call(server, provider)
+    elapsed = time.monotonic() - start
+    gaps = [b - a for a, b in zip(server.request_times, server.request_times[1:])]
+    ok = server.request_count == 3 and all(gap >= 0.3 for gap in gaps)
+    return ok, f"3 attempts, gaps {', '.join(f'{g:.2f}s' for g in gaps)} (Retry-After 0.3s), {elapsed:.2f}s total"
+
+
+def server_errors(server, provider):
+    reset(server, RetryScheduler(RetryPolicy(base_delay=0.1), seed=0))
+    server.failures.extend([(503, {}), (500, {})])
+    call(server, provider)
+    ok = server.request_count == 3
+    return ok, f"{server.request_count} attempts for 503, 500, 200"
+
+
+def client_error(server, provider):
+    reset(server, RetryScheduler(seed=0))
+    server.failures.append((400, {}))
+    try:
+        call(server, provider)
+        return False, "400 was not raised"
+    except CircuitOpenError:
+        return False, "circuit opened on a client error"
+    except Exception:
+        return server.request_count == 1, f"raised after {server.request_count} attempt(s)"
+
+
+def circuit_breaker(server, provider):
+    scheduler = RetryScheduler(RetryPolicy(max_attempts=3, base_delay=0.01), failure_threshold=3,
+                               reset_timeout=0.5, seed=0)
+    reset(server, scheduler)
+    server.failures.extend([(500, {})] * 3)
+    try:
+        call(server, provider)
+    except Exception:
+        pass
+    sent = server.request_count
+    start = time.monotonic()
+    try:
+        call(server, provider)
+        rejected = False
+    except CircuitOpenError:
+        rejected = True
+    reject_ms = (time.monotonic() - start) * 1000
+    time.sleep(0.5)
+    call(server, provider)  # half-open trial succeeds and closes the circuit
+    ok = sent == 3 and rejected and scheduler.breaker(provider).state == "closed"
+    return ok, (f"opened after {sent} failures, next call rejected in {reject_ms:.1f} ms without a request, "
+                f"closed again after a trial call")
+
+
+def lockstep(server, provider, callers=20):
+    def spread(scheduler):
+        reset(server, scheduler)
+        server.failures.extend([(429, {})] * callers)
+
+        async def run():
+            url = server.url + ("/v1/messages" if provider == "claude" else "/v1")
+            await asyncio.gather(*[
+                api.inference_chat_async(CHAT, "stub", url, "bench", provider=provider) for _ in range(callers)
+            ])
+            await clients.client_registry.aclose()
+
+        asyncio.run(run())
+        retries = sorted(server.request_times)[callers:]
+        return statistics.pstdev(retries) * 1000
+
+    # The previous behaviour: the same fixed pause before every retry
+    fixed = spread(RetryScheduler(FixedDelayPolicy(), seed=0))
+    jittered = spread(RetryScheduler(RetryPolicy(base_delay=1.0), seed=0))
+    ok = jittered > 5 * max(fixed, 1.0)
+    return ok, f"{callers} callers rejected together: retry spread {fixed:.1f} ms fixed vs {jittered:.1f} ms jittered"
+
+
+def pacing(server, provider, calls=20, rpm=600):
+    reset(server, RetryScheduler(limits={provider: ProviderLimits(requests_per_minute=rpm)}, seed=0))
+    # Start from an empty bucket so the steady-state rate is visible
+    api._retry_scheduler._bucket(provider, "requests").reserve(rpm)
+    start = time.monotonic()
+    for _ in range(calls):
+        call(server, provider)
+    elapsed = time.monotonic() - start
+    expected = calls / (rpm / 60)
+    ok = elapsed >= expected * 0.9
+    return ok, f"{calls} calls at {rpm}/min took {elapsed:.2f}s (>= {expected:.2f}s expected)"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exercise the retry scheduler against a failing stub")
+    parser.add_argument("--providers", nargs="+", default=["openai", "claude"])
+    args = parser.parse_args()
+
+    scenarios = [retry_after, server_errors, client_error, circuit_breaker, lockstep, pacing]
+    failed = 0
+    with StubLLMServer() as server:
+        for provider in args.providers:
+            for scenario in scenarios:
+                ok, detail = scenario(server, provider)
+                failed += not ok
+                print(f"{'PASS' if ok else 'FAIL'}  {provider:<7} {scenario.__name__:<16} {detail}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
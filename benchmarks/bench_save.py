@@ -0,0 +1,80 @@
+"""
+Benchmark for Action.save change tracking.
+
+Builds synthetic workbooks of increasing size, applies edits of increasing size
+through the Action API and times the DataFrame -> workbook sync step and the full
+save (sync + openpyxl serialization). The sync step should scale with the number
+of edited cells rather than the number of cells in the sheet.
+
+Usage:
+    python benchmarks/bench_save.py --rows 1000 10000 50000 --edits 1 100 1000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ExcelAgent.utils.action_interpret import Action
+
+
+def make_workbook(path: str, rows: int, cols: int = 8):
+    rng = np.random.default_rng(0)
+    data = {f"col{c}": rng.integers(0, 1000, size=rows) for c in range(cols)}
+    pd.DataFrame(data).to_excel(path, index=False, engine="openpyxl")
+
+
+def apply_edits(action: Action, edits: int):
+    # Set a contiguous block in the first column, one value per cell
+    action.select(1, 2, 1, edits + 1)
+    action.select_input_field()
+    action.set_input("42")
+
+
+def time_sync(action: Action, full: bool) -> float:
+    start = time.perf_counter()
+    if full:
+        action._sync_full()
+    else:
+        action._sync_dirty()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dirty-cell tracking in Action.save")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--edits", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--cols", type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'edits':>6} {'full sync (s)':>14} {'dirty sync (s)':>15} {'save (s)':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            path = os.path.join(tmp, f"bench_{rows}.xlsx")
+            make_workbook(path, rows, args.cols)
+            action = Action(path)
+            for edits in args.edits:
+                edits = min(edits, rows)
+
+                apply_edits(action, edits)
+                full = time_sync(action, full=True)
+
+                apply_edits(action, edits)
+                dirty = time_sync(action, full=False)
+
+                apply_edits(action, edits)
+                start = time.perf_counter()
+                action.save(os.path.join(tmp, "out.xlsx"))
+                save = time.perf_counter() - start
+
+                print(f"{rows:>8} {edits:>6} {full:>14.4f} {dirty:>15.5f} {save:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Load test for the /subtask-process endpoint (ExcelAgent/api/message.py).
+
+Serves main.app with uvicorn against a mock provider (benchmarks/stub_llm_server.py),
+each in its own process, and drives it with concurrent closed-loop clients. Each client sends requests one
+after another under its own session_id, and waits for Retry-After when rejected. The same load also runs against a sync
+copy of the endpoint that calls singular_agent_response from the threadpool (the
+previous implementation). The script reports throughput, p50/p99 latency of
+successful requests, and how many requests were rejected with 429/503 and how fast.
+
+Usage:
+    python benchmarks/bench_server_load.py --clients 100 --requests 5 --latency 0.5
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import socket
+import statistics
+import sys
+import time
+
+import httpx
+import uvicorn
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("NVIDIA_API_KEY", "bench")
+
+from stub_llm_server import StubLLMServer
+from main import app
+from ExcelAgent.api import message
+from ExcelAgent.chat import clients
+from ExcelAgent.api.action_reverse_parse import parse_action_string
+from ExcelAgent.api.admission import AdmissionController
+from ExcelAgent.api.schemas import ActionsResponse, SubtaskInstructionRequest
+from ExcelAgent.api.singular_agent import SingularAgent
+
+RESPONSE = "REGEX ^.*$ | SELECT C1:C-1 ; REGEX ^.*$ | TELLUSER Done."
+ROWS = [["Name", "Grade", "Score"], ["Ann", "9", "93"], ["Bob", "10", "88"]]
+
+
+@app.post("/subtask-process-sync", response_model=ActionsResponse)
+def process_message_sync(request: SubtaskInstructionRequest):
+    """The previous implementation: a sync endpoint holding a threadpool worker for the whole call."""
+    text = message.singular_agent.singular_agent_response(
+        request.message, request.first_n_rows_of_sheet, request.read_context, session_id=request.session_id
+    )
+    return ActionsResponse(role="assistant", message="success", actions=parse_action_string(text))
+
+
+def run_provider(latency, url_queue):
+    with StubLLMServer(latency=latency, response_text=RESPONSE) as provider:
+        url_queue.put(provider.url)
+        while True:
+            time.sleep(3600)
+
+
+def run_server(port, provider_url, args):
+    logging.disable(logging.WARNING)
+    message.singular_agent = SingularAgent(model_provider="openai", model_name="stub",
+                                           api_url=provider_url + "/v1", api_key="bench")
+    message.admission = AdmissionController(args.max_concurrency, args.max_queue, args.queue_timeout)
+    # The sync endpoint runs on up to 40 threadpool workers
+    clients.configure_client_pools(pool_maxsize=max(args.max_concurrency, 40))
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def drive(base_url, path, clients, requests_per_client, timeout):
+    results = []
+
+    async def client(index, http):
+        for turn in range(requests_per_client):
+            payload = {"role": "User", "message": f"Bold column C ({turn})", "first_n_rows_of_sheet": ROWS,
+                       "session_id": f"client-{index}"}
+            start = time.perf_counter()
+            try:
+                response = await http.post(base_url + path, json=payload)
+                status = response.status_code
+                if status in (429, 503):
+                    # Back off like the Apps Script client before the next request
+                    results.append((status, time.perf_counter() - start))
+                    await asyncio.sleep(float(response.headers.get("Retry-After", 1)))
+                    continue
+            except httpx.TimeoutException:
+                status = "timeout"
+            except httpx.TransportError as e:
+                status = type(e).__name__
+            results.append((status, time.perf_counter() - start))
+
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as http:
+        start = time.perf_counter()
+        await asyncio.gather(*[client(i, http) for i in range(clients)])
+        elapsed = time.perf_counter() - start
+    return results, elapsed
+
+
+def report(name, results, elapsed):
+    ok = sorted(latency for status, latency in results if status == 200)
+    rejected = [latency for status, latency in results if status in (429, 503)]
+    timeouts = sum(status == "timeout" for status, _ in results)
+    errors = sum(isinstance(status, str) and status != "timeout" for status, _ in results)
+    p99 = ok[min(int(0.99 * len(ok)), len(ok) - 1)] if ok else float("nan")
+    p50 = statistics.median(ok) if ok else float("nan")
+    reject_ms = statistics.median(rejected) * 1000 if rejected else 0.0
+    print(f"{name:<22}{len(ok) / elapsed:>8.1f}/s{p50 * 1000:>9.0f}ms{p99 * 1000:>9.0f}ms"
+          f"{len(ok):>6}{len(rejected):>8} ({reject_ms:.0f} ms){timeouts:>9}{errors:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test /subtask-process against a mock provider")
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=5, help="Requests per client")
+    parser.add_argument("--latency", type=float, default=0.5, help="Mock provider latency")
+    parser.add_argument("--max_concurrency", type=int, default=40, help="Default matches the threadpool size")
+    parser.add_argument("--max_queue", type=int, default=32)
+    parser.add_argument("--queue_timeout", type=float, default=10.0)
+    parser.add_argument("--timeout", type=float, default=30.0, help="Client timeout (Apps Script gives up eventually)")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    # Separate processes, so the load generator does not compete with the server for the GIL
+    context = multiprocessing.get_context("spawn")
+    url_queue = context.Queue()
+    provider = context.Process(target=run_provider, args=(args.latency, url_queue), daemon=True)
+    provider.start()
+    port = free_port()
+    server = context.Process(target=run_server, args=(port, url_queue.get(), args), daemon=True)
+    server.start()
+    base_url = f"http://127.0.0.1:{port}"
+    while True:
+        try:
+            httpx.get(base_url + "/health")
+            break
+        except httpx.TransportError:
+            time.sleep(0.1)
+
+    print(f"{args.clients} clients x {args.requests} requests, provider latency {args.latency * 1000:.0f} ms")
+    print(f"{'':<22}{'throughput':>10}{'p50':>11}{'p99':>11}{'ok':>6}{'rejected (median)':>19}{'timeouts':>9}{'errors':>7}")
+    for name, path in [("sync (threadpool)", "/subtask-process-sync"), ("async + admission", "/subtask-process")]:
+        results, elapsed = asyncio.run(drive(base_url, path, args.clients, args.requests, args.timeout))
+        report(name, results, elapsed)
+    print(httpx.get(base_url + "/admission/metrics").json())
+
+    server.terminate()
+    provider.terminate()
+
+
+if __name__ == "__main__":
+    main()
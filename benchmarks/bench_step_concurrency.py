@@ -0,0 +1,115 @@
+"""
+Benchmark for wall-clock time of the post-action LLM calls of one agent step.
+
+A mock provider (benchmarks/stub_llm_server.py) answers every call after a fixed
+latency with a reply matching the prompt (memory, reflection or planning). Each
+step runs the memory and reflection agents either sequentially (inference_chat,
+the previous run.py loop) or concurrently (inference_chat_async, bounded by a
+semaphore), and the script reports the median time per step.
+
+Usage:
+    python benchmarks/bench_step_concurrency.py --latency 0.5 --steps 5
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_llm_server import StubLLMServer
+from ExcelAgent.agents.agent_state import AgentState
+from ExcelAgent.chat.api import inference_chat
+from ExcelAgent.chat.chat import add_response, init_memory_chat
+from ExcelAgent.chat.prompt import get_action_prompt, get_memory_prompt
+from ExcelAgent.chat.response import (
+    memory_agent_response_async, reflect_agent_response, reflect_agent_response_async
+)
+from ExcelAgent.chat import clients
+from ExcelAgent.utils.action_executor import ActionExecutor
+
+ACTION = "Select(0, 0, 0, 3)"
+
+
+def respond(request: dict) -> str:
+    prompt = request["messages"][-1]["content"]
+    if "### Important content ###" in prompt:
+        return "### Important content ###\nNone"
+    if "### Answer ###" in prompt:
+        return "### Thought ###\nThe header row was selected as intended.\n### Answer ###\nA"
+    return "### Completed contents ###\nSelected the header row."
+
+
+def sequential_step(agent_state, path, sheet_state):
+    # The previous loop: memory call, then reflection, then (inside it) planning
+    chat_mem = add_response("user", get_memory_prompt(agent_state.insight), init_memory_chat())
+    inference_chat(chat_mem, agent_state.vl_model_version, agent_state.api_url, agent_state.api_token,
+                   provider=agent_state.model_provider)
+    reflect_agent_response("bold header", "t", "s", ACTION, path, agent_state, "", sheet_state=sheet_state)
+
+
+def concurrent_step(agent_state, path, sheet_state, loop, limiter):
+    async def calls():
+        await asyncio.gather(
+            memory_agent_response_async(agent_state, limiter),
+            reflect_agent_response_async("bold header", "t", "s", ACTION, path, agent_state, "",
+                                         sheet_state=sheet_state, limiter=limiter),
+        )
+    loop.run_until_complete(calls())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark post-action LLM calls per step")
+    parser.add_argument("--latency", type=float, default=0.5, help="Fixed seconds per LLM call")
+    parser.add_argument("--steps", type=int, default=5)
+    parser.add_argument("--max_concurrency", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, StubLLMServer(latency=args.latency, responder=respond) as server:
+        os.chdir(tmp)  # AgentState creates a temp dir in the working directory
+        path = shutil.copy(os.path.join(ROOT, "example.xlsx"), os.path.join(tmp, "example.xlsx"))
+        executor = ActionExecutor(path)
+        sheet_state = executor.get_sheet_state()
+
+        agent_state = AgentState()
+        agent_state.vl_model_version = "stub"
+        agent_state.api_url = server.url + "/v1"
+        agent_state.api_token = "bench"
+        agent_state.model_provider = "openai"
+
+        loop = asyncio.new_event_loop()
+        limiter = asyncio.Semaphore(args.max_concurrency)
+        modes = [
+            ("sequential", lambda: sequential_step(agent_state, path, sheet_state)),
+            (f"concurrent (max {args.max_concurrency})",
+             lambda: concurrent_step(agent_state, path, sheet_state, loop, limiter)),
+        ]
+
+        print(f"{'mode':<20} {'LLM calls':>10} {'s/step':>8}")
+        for name, step in modes:
+            times = []
+            calls_before = server.request_count
+            for _ in range(args.steps):
+                get_action_prompt("bold header", path, [], [], [], "", "", "", "", False, "", "", False, False, False,
+                                  sheet_state=sheet_state)
+                executor.parse_and_execute(ACTION)
+                start = time.perf_counter()
+                step()
+                times.append(time.perf_counter() - start)
+            calls = (server.request_count - calls_before) / args.steps
+            print(f"{name:<20} {calls:>10.1f} {statistics.median(times):>8.3f}")
+
+        loop.run_until_complete(clients.client_registry.aclose())
+        loop.close()
+        os.chdir(ROOT)
+
+
+if __name__ == "__main__":
+    main()
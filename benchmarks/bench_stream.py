@@ -0,0 +1,83 @@
+"""
+Benchmark for time-to-action with streamed responses.
+
+Serves an action-agent style completion from the local stub server
+(benchmarks/stub_llm_server.py) at a fixed token rate and measures when the
+Action is available: after the full completion (inference_chat) and as soon
+as its section closes while streaming (inference_chat_stream + SectionStreamParser).
+
+Usage:
+    python benchmarks/bench_stream.py --chunk_delay 0.02 --runs 5
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_llm_server import StubLLMServer
+from ExcelAgent.chat.api import inference_chat, inference_chat_stream
+from ExcelAgent.chat.stream_parser import SectionStreamParser, clean_action
+
+RESPONSE = (
+    "### Thought ###\n"
+    "The header row should stand out, so I will select the first row and make it bold.\n"
+    "### Action ###\n"
+    "Select(0, 0, 0, 3)\n"
+    "### Summary ###\n"
+    "Select cells A1:D1, the header row of the sheet, so that the next operation can apply bold "
+    "formatting to the column titles. This keeps the data rows unchanged and makes the table easier "
+    "to read for anyone opening the workbook.\n"
+)
+CHAT = [["user", [{"type": "text", "text": "Make the header row bold."}]]]
+
+
+def time_full(url: str, provider: str):
+    start = time.perf_counter()
+    output = inference_chat(CHAT, "stub", url, "bench", provider=provider)
+    action = clean_action(output.split("### Action ###")[-1].split("### Summary ###")[0])
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed, action
+
+
+def time_stream(url: str, provider: str):
+    start = time.perf_counter()
+    found = {}
+
+    def on_section(name, text):
+        if name == "Action":
+            found["action"] = clean_action(text)
+            found["at"] = time.perf_counter() - start
+
+    parser = SectionStreamParser(on_section=on_section)
+    for chunk in inference_chat_stream(CHAT, "stub", url, "bench", provider=provider):
+        parser.feed(chunk)
+    parser.close()
+    return found["at"], time.perf_counter() - start, found["action"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark time-to-action with streaming")
+    parser.add_argument("--chunk_delay", type=float, default=0.02, help="Seconds between 8-character chunks")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds before the first byte")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with StubLLMServer(latency=args.latency, response_text=RESPONSE, chunk_delay=args.chunk_delay) as server:
+        endpoints = [("openai", server.url + "/v1"), ("claude", server.url + "/v1/messages")]
+        print(f"{'provider':<8} {'mode':<10} {'action at (s)':>14} {'complete (s)':>13}  action")
+        for provider, url in endpoints:
+            for mode, fn in [("full", time_full), ("streaming", time_stream)]:
+                results = [fn(url, provider) for _ in range(args.runs)]
+                action_at = statistics.median(r[0] for r in results)
+                complete = statistics.median(r[1] for r in results)
+                print(f"{provider:<8} {mode:<10} {action_at:>14.3f} {complete:>13.3f}  {results[0][2]}")
+
+
+if __name__ == "__main__":
+    main()
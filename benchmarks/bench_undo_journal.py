@@ -0,0 +1,118 @@
+"""
+Benchmark for undoing a rejected step (ExcelAgent/utils/undo_journal.py).
+
+On a generated sheet of --rows rows with a formula column, each case runs one step of
+actions after a checkpoint and then undoes it twice: by rolling the Action's journal back
+in memory, and by reloading the file as saved before the step (what the executor did
+before the journal). The script reports both times and checks that both leave the same
+values, formulas and formatting.
+
+Usage:
+    python benchmarks/bench_undo_journal.py --rows 20000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+
+from ExcelAgent.utils import styles
+from ExcelAgent.utils.action_interpret import Action
+
+
+def make_sheet(path, rows):
+    rng = np.random.default_rng(0)
+    pd.DataFrame({
+        "Item": [f"Item {i}" for i in range(rows)],
+        "Price": rng.integers(1, 500, rows) / 4,
+        "Quantity": rng.integers(0, 20, rows),
+        "Total": [None] * rows,
+    }).to_excel(path, index=False)
+    action = Action(path)
+    action.select("D", 2)
+    action.select_input_field()
+    action.set_input("=B2*C2")
+    action.select_and_drag("D", 2, "D", rows + 1)
+    action.save()
+
+
+def set_one(action, rows):
+    action.select("C", 100)
+    action.select_input_field()
+    action.set_input("7")
+
+
+def set_column(action, rows):
+    action.select("C", 2, "C", rows + 1)
+    action.select_input_field()
+    action.set_input("n/a")
+
+
+def bold_rows(action, rows):
+    action.select("A", 2, "D", 1001)
+    action.format_selection(font=styles.font(bold=True))
+
+
+CASES = [
+    ("set one input", set_one),
+    ("set a whole column (widened)", set_column),
+    ("bold 1000 rows", bold_rows),
+]
+
+
+def state(action):
+    """Values, formulas and fonts of the sheet."""
+    formulas = {cell: formula.text_at(*cell) for cell, formula in action.formulas.formulas.items()}
+    fonts = [(cell.coordinate, cell.font.b) for row in action.active_sheet.iter_rows(max_row=1002) for cell in row]
+    return action.df.copy(), formulas, fonts
+
+
+def same(first, second):
+    return first[0].equals(second[0]) and first[1:] == second[1:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark undoing a step in memory against reloading the file")
+    parser.add_argument("--rows", type=int, default=20000, help="Data rows of the generated sheet")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sheet.xlsx")
+        make_sheet(path, args.rows)
+        action = Action(path)
+        before = state(action)
+        results = []
+        for name, step in CASES:
+            checkpoint = action.checkpoint()
+            step(action, args.rows)
+            start = time.perf_counter()
+            undone = action.rollback(checkpoint)
+            rollback_time = time.perf_counter() - start
+            rolled_back = state(action)
+
+            step(action, args.rows)
+            start = time.perf_counter()
+            action.reload()
+            reload_time = time.perf_counter() - start
+            results.append((name, undone, rollback_time, reload_time,
+                            same(rolled_back, before) and same(state(action), before)))
+
+    print(f"{args.rows} rows")
+    print(f"{'step':<32}{'entries':>8}{'rollback':>11}{'reload':>10}")
+    for name, undone, rollback_time, reload_time, identical in results:
+        print(f"{name:<32}{undone:>8}{rollback_time:>10.4f}s{reload_time:>9.3f}s  "
+              f"({reload_time / rollback_time:.0f}x){'' if identical else '  STATES DIFFER'}")
+    identical = all(result[-1] for result in results)
+    print("states identical" if identical else "STATES DIFFER")
+    sys.exit(0 if identical else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Local stub LLM server used by the benchmarks.
+
+Speaks enough of the OpenAI chat-completions and Anthropic messages APIs for the
+adapters in ExcelAgent/chat/api.py: JSON responses, SSE streaming (stream=true),
+configurable per-request latency, scripted responses and injected failures.
+
+Usage:
+    with StubLLMServer(latency=0.05, response_text="### Action ###\\nTerminate") as server:
+        inference_chat(chat, "stub-model", server.url + "/v1", "key", provider="openai")
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List, Optional, Union
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps connections alive between requests, like real providers
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; avoid Nagle/delayed-ACK stalls
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.stub.lock:
+            self.server.stub.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict, headers: Optional[dict] = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, str(value))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, chunks: List[str], anthropic: bool):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def write_event(data: str, event: Optional[str] = None):
+            payload = (f"event: {event}\n" if event else "") + f"data: {data}\n\n"
+            raw = payload.encode("utf-8")
+            self.wfile.write(f"{len(raw):X}\r\n".encode("ascii") + raw + b"\r\n")
+            self.wfile.flush()
+
+        stub = self.server.stub
+        for chunk in chunks:
+            if stub.chunk_delay:
+                time.sleep(stub.chunk_delay)
+            if anthropic:
+                write_event(
+                    json.dumps({"type": "content_block_delta", "delta": {"type": "text_delta", "text": chunk}}),
+                    event="content_block_delta",
+                )
+            else:
+                write_event(json.dumps({"choices": [{"index": 0, "delta": {"content": chunk}}]}))
+        if anthropic:
+            write_event(json.dumps({"type": "message_stop"}), event="message_stop")
+        else:
+            write_event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        stub = self.server.stub
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        with stub.lock:
+            stub.request_count += 1
+            stub.requests.append(request)
+            stub.request_times.append(time.monotonic())
+            failure = stub.failures.pop(0) if stub.failures else None
+
+        latency = stub.latency() if callable(stub.latency) else stub.latency
+        if latency:
+            time.sleep(latency)
+
+        if failure is not None:
+            status, headers = failure
+            self._send_json(status, {"error": {"message": f"stub failure {status}"}}, headers)
+            return
+
+        text = stub.responder(request) if stub.responder else stub.response_text
+        anthropic = self.path.rstrip("/").endswith("/messages")
+
+        size = max(stub.chunk_size, 1)
+        chunks = [text[i:i + size] for i in range(0, len(text), size)]
+        if request.get("stream"):
+            self._send_stream(chunks, anthropic)
+            return
+        if stub.chunk_delay:
+            # A non-streamed reply still takes the whole generation time
+            time.sleep(stub.chunk_delay * len(chunks))
+        if anthropic:
+            self._send_json(200, {"content": [{"type": "text", "text": text}]})
+        else:
+            self._send_json(
+                200,
+                {
+                    "id": "stub",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request.get("model", "stub"),
+                    "choices": [
+                        {"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}
+                    ],
+                },
+            )
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Accept bursts of concurrent connections (the socketserver default backlog is 5)
+    request_queue_size = 256
+
+
+class StubLLMServer:
+    """
+    Threaded local HTTP server imitating an LLM provider.
+
+    Attributes:
+        url: Base URL (http://127.0.0.1:<port>)
+        request_count: Number of requests received
+        connections: Number of TCP connections accepted
+        failures: Queue of (status, headers) to return instead of the next responses
+        request_times: time.monotonic() of each request's arrival
+    """
+
+    def __init__(
+        self,
+        latency: Union[float, Callable[[], float]] = 0.0,
+        response_text: str = "### Thought ###\nDone.\n### Action ###\nTerminate\n### Summary ###\nDone.",
+        responder: Optional[Callable[[dict], str]] = None,
+        chunk_size: int = 8,
+        chunk_delay: float = 0.0,
+    ):
+        """
+        Args:
+            latency: Seconds to wait before answering each request, or a callable drawing it per request
+            response_text: Text returned when no responder is given
+            responder: Callable mapping the request JSON to the response text
+            chunk_size: Characters per streamed chunk
+            chunk_delay: Seconds to generate each chunk (also delays non-streamed replies)
+        """
+        self.latency = latency
+        self.response_text = response_text
+        self.responder = responder
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.failures = []
+        self.requests = []
+        self.request_times = []
+        self.request_count = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+        self._server = _Server(("127.0.0.1", 0), _Handler)
+        self._server.stub = self
+        # Clients hang up on hedged/cancelled requests; that is not an error worth a traceback
+        self._server.handle_error = lambda request, client_address: None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubLLMServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
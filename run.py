@@ -1,15 +1,26 @@
 import os
+import re
 import time
 import copy
+import asyncio
+import contextlib
 import shutil
-import re
 
 from ExcelAgent.chat.api import inference_chat
-from ExcelAgent.chat.prompt import get_manager_initial_prompt, get_memory_prompt
+from ExcelAgent.chat.prompt import get_memory_prompt, record_before_action_state
 from ExcelAgent.chat.chat import init_action_chat, init_reflect_chat, init_memory_chat, add_response
-from ExcelAgent.chat.response import action_agent_response, reflect_agent_response
+from ExcelAgent.chat.response import (
+    manager_agent_response, action_agent_response, action_agent_response_async, reflect_agent_response,
+    reflect_agent_response_async, memory_agent_response_async
+)
 from ExcelAgent.agents.agent_state import AgentState
+from ExcelAgent.agents.speculation import SpeculationStats, assume_accepted, timed
+from ExcelAgent.agents.subtask_scheduler import plan_subtasks
+from ExcelAgent.utils.sheet_state import render_sheet_state
 from ExcelAgent.utils.action_executor import ActionExecutor
+from ExcelAgent.api.action_parser import parse_action, parse_actions
+from ExcelAgent.api.action_schemas import Select, SelectAndDrag, TellUser, Terminate
+from ExcelAgent.api.exceptions import ActionStrParseError
 
 import argparse
 
@@ -36,6 +47,31 @@ parser.add_argument('--add_info', type=str, default='')
 parser.add_argument('--disable_reflection', action='store_true')
 parser.add_argument('--max_iters', type=int, default=20)
 parser.add_argument('--stagnation_patience', type=int, default=3)
+parser.add_argument('--response_cache', type=str, default=None,
+                    help="SQLite file for caching deterministic (temperature 0) LLM responses across runs")
+parser.add_argument('--requests_per_minute', type=float, default=None,
+                    help="Client-side request rate limit for the provider (calls are paced, not dropped)")
+parser.add_argument('--tokens_per_minute', type=float, default=None,
+                    help="Client-side prompt-token rate limit for the provider")
+parser.add_argument('--max_concurrency', type=int, default=3,
+                    help="Maximum concurrent LLM calls after each action (memory, reflection, planning); 1 runs them sequentially")
+parser.add_argument('--max_steps', type=int, default=1,
+                    help="Maximum actions per subtask; the agent moves on earlier when it terminates")
+parser.add_argument('--speculate', action='store_true',
+                    help="Request the next action while reflection runs, assuming it accepts the step (needs --max_steps > 1)")
+parser.add_argument('--max_actions', type=int, default=1,
+                    help="Actions the agent may plan per LLM turn (';'-separated), executed as one transaction with one save and one reflection")
+parser.add_argument('--keep_rejected_steps', action='store_true',
+                    help="Keep the edits of a step the reflection rejects (answer B or C) instead of undoing them before the next prompt")
+parser.add_argument('--manager', action='store_true',
+                    help="Decompose each instruction into subtasks with the manager agent; subtasks on disjoint columns run concurrently (with --max_concurrency > 1)")
+parser.add_argument('--stream', action='store_true',
+                    help="Stream action-agent responses and execute the action as soon as its section is complete")
+parser.add_argument('--summary_token_budget', type=int, default=None,
+                    help="Summarize the sheet statistically within this many tokens instead of dumping the first 100 rows")
+parser.add_argument('--hedge_backend', action='append', default=[], metavar='PROVIDER:MODEL[:API_URL]',
+                    help="Fallback backend for hedged requests and failover (repeatable, tried in order after the main model); "
+                         "MODEL may contain ':', API_URL must start with its scheme (http:// or https://)")
 
 args = parser.parse_args()
 
@@ -55,17 +91,17 @@ else:
 from ExcelAgent.chat.api import _resolve_api_key, _detect_provider_from_url
 
 # Handle API key from args or environment
+env_key_map = {
+    'gemini': 'GEMINI_API_KEY',
+    'openai': 'OPENAI_API_KEY',
+    'claude': 'CLAUDE_API_KEY',
+    'deepseek': 'DEEPSEEK_API_KEY',
+    'nvidia': 'NVIDIA_API_KEY'
+}
 api_key = args.api_key or args.api_token
 if not api_key:
     import os
     # Try to get from environment based on provider
-    env_key_map = {
-        'gemini': 'GEMINI_API_KEY',
-        'openai': 'OPENAI_API_KEY',
-        'claude': 'CLAUDE_API_KEY',
-        'deepseek': 'DEEPSEEK_API_KEY',
-        'nvidia': 'NVIDIA_API_KEY'
-    }
     env_var = env_key_map.get(args.model_provider, 'GEMINI_API_KEY')
     api_key = os.environ.get(env_var)
     if not api_key:
@@ -84,6 +120,14 @@ model_name = args.model_name
 temperature = args.temperature
 
 # Set API URL based on provider if not explicitly provided
+# Default URLs for different providers
+api_url_map = {
+    'openai': 'https://api.openai.com/v1',
+    'gemini': None,  # Gemini uses google.generativeai SDK directly
+    'deepseek': 'https://api.deepseek.com/v1',
+    'claude': 'https://api.anthropic.com/v1/messages',
+    'nvidia': 'https://integrate.api.nvidia.com/v1'
+}
 if args.api_url:
     api_url = args.api_url
     # Auto-detect provider from URL if provider is 'auto' or not explicitly set
@@ -93,16 +137,50 @@ if args.api_url:
             model_provider = detected_provider
             print(f"🔍 Auto-detected provider: {model_provider} from API URL")
 else:
-    # Default URLs for different providers
-    api_url_map = {
-        'openai': 'https://api.openai.com/v1',
-        'gemini': None,  # Gemini uses google.generativeai SDK directly
-        'deepseek': 'https://api.deepseek.com/v1',
-        'claude': 'https://api.anthropic.com/v1/messages',
-        'nvidia': 'https://integrate.api.nvidia.com/v1'
-    }
     api_url = api_url_map.get(model_provider)
 
+# Cache identical deterministic requests (e.g. rerunning an instruction on the same workbook)
+if args.response_cache:
+    from ExcelAgent.chat.api import configure_response_cache
+    from ExcelAgent.chat.cache import ResponseCache
+    configure_response_cache(ResponseCache(db_path=args.response_cache))
+
+# Pace calls below the provider's rate limits; retries with backoff and the circuit breaker are always on
+if args.requests_per_minute or args.tokens_per_minute:
+    from ExcelAgent.chat.api import configure_retry_scheduler
+    from ExcelAgent.chat.retry import ProviderLimits, RetryScheduler
+    configure_retry_scheduler(RetryScheduler(limits={
+        model_provider: ProviderLimits(args.requests_per_minute, args.tokens_per_minute)
+    }))
+
+# Hedge slow calls to (and fail over to) the extra backends; their keys come from the provider's env var
+router = None
+if args.hedge_backend:
+    from ExcelAgent.chat.api import configure_router
+    from ExcelAgent.chat.router import Backend, HedgedRouter
+    backends = [Backend(model_provider, model_name, api_url, api_key)]
+    # The URL is told apart by its scheme, so model names such as "llama3:8b" keep their colons
+    hedge_spec = re.compile(r"(?P<provider>[^:]+):(?P<model>.+?)(?::(?P<url>https?://.+))?")
+    for spec in args.hedge_backend:
+        match = hedge_spec.fullmatch(spec)
+        if not match:
+            print(f"Error: --hedge_backend expects PROVIDER:MODEL[:API_URL], got '{spec}'")
+            exit(1)
+        hedge_provider, hedge_model = match.group('provider'), match.group('model')
+        if hedge_provider not in env_key_map:
+            print(f"Error: Unknown provider '{hedge_provider}' in --hedge_backend '{spec}'. "
+                  f"Choose one of: {', '.join(env_key_map)}.")
+            exit(1)
+        hedge_url = match.group('url') or api_url_map.get(hedge_provider)
+        env_var = env_key_map[hedge_provider]
+        hedge_key = _resolve_api_key(os.environ.get(env_var, ''))
+        if not hedge_key:
+            print(f"Error: No API key for --hedge_backend '{spec}'. Please set the {env_var} environment variable.")
+            exit(1)
+        backends.append(Backend(hedge_provider, hedge_model, hedge_url, hedge_key))
+    router = HedgedRouter(backends)
+    configure_router(router)
+
 # For backwards compatibility
 vl_model_version = model_name
 API_url = api_url
@@ -146,6 +224,16 @@ reflection_switch = True if not args.disable_reflection else False
 
 # Memory Setting: If you want to improve the operating speed, you can disable the memory unit. This may reduce the success rate.
 memory_switch = False # default: False
+
+# Concurrency Setting: independent LLM calls of a step run on one event loop, at most max_concurrency at a time
+concurrent_calls = args.max_concurrency > 1
+if concurrent_calls:
+    event_loop = asyncio.new_event_loop()
+    llm_limiter = asyncio.Semaphore(args.max_concurrency)
+elif args.speculate:
+    print("⚠️ --speculate needs --max_concurrency > 1; speculation disabled.")
+    args.speculate = False
+speculation_stats = SpeculationStats()
 ###################################################################################################
 
 ### Load caption model ###
@@ -197,6 +285,8 @@ agent_state.api_url = API_url
 agent_state.api_token = token
 agent_state.model_provider = model_provider
 agent_state.temperature = temperature
+agent_state.summary_token_budget = args.summary_token_budget
+agent_state.max_actions = args.max_actions
 
 ###################################################################################################
 
@@ -206,12 +296,210 @@ try:
     print(f"✅ Loaded Excel file: {excel_file_path}")
     print(action_executor.get_sheet_summary(5))
     print()
+    # Prompts are rendered from the executor's in-memory sheet instead of re-reading the file
+    sheet_state = action_executor.get_sheet_state()
 except Exception as e:
     print(f"❌ Error loading Excel file: {e}")
     exit(1)
 
 ###################################################################################################
 
+def parse_agent_plan(action):
+    """
+    The action models of the agent's action string, or None if it cannot be parsed.
+    With --max_actions above 1 the string is a ";"-separated plan; otherwise it is one action.
+    """
+    try:
+        if args.max_actions > 1:
+            return parse_actions(action) or None
+        return [parse_action(action)]
+    except ActionStrParseError:
+        return None
+
+
+def plan_contains(plan, action_type):
+    """Whether a parsed plan includes an action of the given type."""
+    return plan is not None and any(isinstance(parsed, action_type) for parsed in plan)
+
+
+def execute_action(action, executor=None, state=None, save=True):
+    """
+    Execute an action, or a plan of actions as one transaction, on the Excel file and save it once;
+    sets the state's error_flag on failure.
+
+    Args:
+        action: The agent's action string
+        executor: ActionExecutor to run it on (default: the main one)
+        state: AgentState to flag errors on (default: the main one)
+        save: Whether to save the file afterwards (a concurrent subtask's view is merged instead)
+
+    Returns:
+        True if the plan committed, False if it failed and was rolled back
+    """
+    executor = executor or action_executor
+    state = state or agent_state
+    try:
+        print(f"📋 Executing action: {action}")
+        plan = parse_agent_plan(action)
+        if plan is None:
+            print(f"⚠️ Warning: Could not parse action format: {action}")
+            success, result = False, f"Could not parse action: {action}"
+        else:
+            success, result = executor.execute_plan(plan)
+        
+        if success:
+            print(f"✅ Action executed successfully: {result}")
+            
+            # Save the file after successful operation (except for Tell User actions)
+            if save and not all(isinstance(parsed, TellUser) for parsed in plan):
+                save_success, save_result = executor.save()
+                if save_success:
+                    print(f"💾 File saved: {save_result}")
+                else:
+                    print(f"⚠️ Warning: Could not save file: {save_result}")
+            
+            # Show updated sheet summary for verification
+            if plan_contains(plan, (Select, SelectAndDrag)):
+                print("\n" + "="*80)
+                print(executor.get_sheet_summary(10))
+                print("="*80 + "\n")
+        else:
+            print(f"❌ Action execution failed: {result}")
+            state.error_flag = True
+            
+    except Exception as e:
+        print(f"❌ Error during action execution: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        state.error_flag = True
+        success = False
+    return success
+
+
+def revert_step(checkpoint, executor=None, state=None, save=True):
+    """
+    Undo a step the reflection rejected (answer B or C) in memory, so the agent is prompted
+    again on the sheet as it was before the step instead of having to repair it.
+
+    Args:
+        checkpoint: The executor's checkpoint() from before the step
+        executor: ActionExecutor the step ran on (default: the main one)
+        state: AgentState whose reflection thought is told about it (default: the main one)
+        save: Whether to save the file afterwards (a concurrent subtask's view is merged instead)
+    """
+    executor = executor or action_executor
+    state = state or agent_state
+    success, result = executor.rollback(checkpoint, save=save)
+    if success:
+        print(f"↩️ Reverted the rejected step: {result}")
+        state.reflection_thought += " The operation has been undone; the sheet is as it was before it."
+    else:
+        print(f"⚠️ Warning: Could not revert the rejected step: {result}")
+
+
+def execute_early(action):
+    """Streaming callback: start editing while the model is still writing its Summary."""
+    # Tell User needs the user's reply first, so it is handled after the response completes
+    if plan_contains(parse_agent_plan(action), TellUser):
+        return
+    executed_early.append(execute_action(action))
+
+
+async def run_subtask_async(subtask_inst, executor, state):
+    """
+    The action/reflection loop of one subtask running concurrently with others, on its own
+    view of the workbook and its own AgentState. Actions are not saved; the view is merged.
+
+    Returns:
+        True if the subtask stopped to ask the user
+    """
+    view_sheet_state = executor.get_sheet_state()
+    for step in range(args.max_steps):
+        checkpoint = executor.checkpoint()
+        thought, summary, action, _ = await action_agent_response_async(
+            subtask_inst, excel_file_path, state, add_info, sheet_state=view_sheet_state, limiter=llm_limiter,
+        )
+        plan = parse_agent_plan(action)
+        if plan_contains(plan, TellUser):
+            return True
+        executed = execute_action(action, executor=executor, state=state, save=False)
+        # A failed plan was rolled back, so its Terminate did not happen either
+        if executed and plan_contains(plan, Terminate):
+            break
+        if reflection_switch:
+            state.reflection_thought = await reflect_agent_response_async(
+                subtask_inst, thought, summary, action, excel_file_path, state, add_info,
+                sheet_state=view_sheet_state, limiter=llm_limiter,
+            )
+            if not state.reflection_accepted and not args.keep_rejected_steps:
+                revert_step(checkpoint, executor=executor, state=state, save=False)
+    return False
+
+
+def run_concurrent_subtasks(subtasks):
+    """
+    Run independent subtasks at the same time, each on a fork of the saved workbook, then
+    merge their edits into the main workbook and save it once.
+
+    Returns:
+        The subtasks to run again on their own: those that asked the user a question and
+        those whose edits could not be merged (the edits of both are discarded)
+    """
+    print(f"⚡ Running {len(subtasks)} independent subtasks concurrently: {subtasks}")
+    # The forks read the file, and the merge treats anything they lack as their own edit
+    action_executor.save()
+    views = [action_executor.fork() for _ in subtasks]
+    states = [agent_state.fork() for _ in subtasks]
+
+    async def all_subtasks():
+        return await asyncio.gather(*(
+            run_subtask_async(subtask, view, state) for subtask, view, state in zip(subtasks, views, states)
+        ))
+
+    start = time.perf_counter()
+    asked = event_loop.run_until_complete(all_subtasks())
+    print(f"⏱️ Concurrent subtasks took {time.perf_counter() - start:.2f}s")
+
+    # A subtask that asked the user starts over on its own, so its edits so far are not merged
+    merged = [None] * len(subtasks)
+    finished = [index for index, asked_user in enumerate(asked) if not asked_user]
+    for index, cells in zip(finished, action_executor.merge([views[index] for index in finished])):
+        merged[index] = cells
+    for subtask, asked_user in zip(subtasks, asked):
+        if asked_user:
+            print(f"❓ Subtask '{subtask}' asked the user; its edits were discarded and it will run again on its own")
+    claimed = {}
+    for subtask, cells in zip(subtasks, merged):
+        for other, other_cells in claimed.items():
+            if cells and cells & other_cells:
+                print(f"⚠️ Subtasks '{other}' and '{subtask}' both changed {len(cells & other_cells)} cells; "
+                      f"the later subtask's edits were kept")
+        if cells is not None:
+            claimed[subtask] = cells
+    save_success, save_result = action_executor.save()
+    print(f"💾 File saved: {save_result}" if save_success else f"⚠️ Warning: Could not save file: {save_result}")
+
+    # The merged subtasks' steps join the main history in subtask order
+    history = len(agent_state.action_history)
+    progress = []
+    for state, cells in zip(states, merged):
+        if cells is None:
+            continue
+        agent_state.thought_history.extend(state.thought_history[history:])
+        agent_state.summary_history.extend(state.summary_history[history:])
+        agent_state.action_history.extend(state.action_history[history:])
+        if state.completed_requirements != agent_state.completed_requirements:
+            progress.append(state.completed_requirements)
+    if progress:
+        agent_state.completed_requirements = " ".join(progress)
+    # A merged subtask whose last step failed still counts as a failure
+    agent_state.error_flag = any(state.error_flag for state, cells in zip(states, merged) if cells is not None)
+    agent_state.reflection_thought = ""
+    return [subtask for subtask, asked_user, cells in zip(subtasks, asked, merged) if asked_user or cells is None]
+
+
+###################################################################################################
+
 # Start main loop
 
 iter = 0
@@ -227,19 +515,19 @@ while instruction_queue and not done:
         print(f"Max iterations reached: {args.max_iters}. Exiting.")
         break
 
-    prompt_manager = get_manager_initial_prompt(
-        current_instruction,
-        excel_file_path,
-        agent_state.thought_history,
-        agent_state.summary_history,
-        agent_state.action_history,
-        agent_state.completed_requirements,
-        add_info,
-    )
-    # TODO: Replace with real manager LLM call and parsing to subtask_list
-    # For now, use the instruction directly as a single subtask to bypass the manager agent
-    manager_agent_response = "..."
-    subtask_list = [current_instruction]  # Use actual instruction instead of placeholder
+    if args.manager:
+        # Subtasks on disjoint columns form groups that run concurrently; the rest run one at a time
+        subtask_list, subtask_groups = plan_subtasks(
+            manager_agent_response(current_instruction, excel_file_path, agent_state, add_info, sheet_state=sheet_state),
+            list(action_executor.get_df().columns),
+            action_executor.get_workbook().sheetnames,
+        )
+        if not concurrent_calls:
+            subtask_groups = [[subtask] for subtask in subtask_list]
+    else:
+        # Without the manager agent the instruction is the only subtask
+        subtask_list = [current_instruction]
+        subtask_groups = [subtask_list]
     print("Subtask list: ", subtask_list)
 
     if prev_subtask_list == subtask_list:
@@ -253,45 +541,69 @@ while instruction_queue and not done:
 
     enqueued_new_instruction = False
 
-    for subtask_inst in subtask_list:
-        thought, summary, action = action_agent_response(
-            subtask_inst, excel_file_path, agent_state, add_info
-        )
-
-        # Check if agent is asking user for input
-        if "Tell User" in action or "TellUser" in action:
-            # Extract the message from the action string
-            # First try to match quoted content inside Tell User()
-            match = re.search(r'Tell\s*User\s*\(\s*["\'](.+?)["\']\s*\)', action, re.IGNORECASE | re.DOTALL)
-            if not match:
-                # Fallback: try to find content between first ( and last )
-                match = re.search(r'Tell\s*User\s*\((.+)\)', action, re.IGNORECASE | re.DOTALL)
-            
-            if match:
-                message = match.group(1).strip('"\'')
+    while subtask_groups:
+        subtask_group = subtask_groups.pop(0)
+        if len(subtask_group) > 1:
+            subtask_groups[:0] = [[subtask] for subtask in run_concurrent_subtasks(subtask_group)]
+            continue
+        subtask_inst = subtask_group[0]
+
+        # Several actions per subtask; a speculative next action is only kept while reflections accept
+        speculative_next = None
+        for step in range(args.max_steps):
+            executed_early = []
+            # Taken before the action is requested, as streaming may execute it during the response
+            step_checkpoint = action_executor.checkpoint()
+            if speculative_next is not None:
+                # The reflection accepted the last step, so the action decided alongside it stands
+                thought, summary, action, output_action = speculative_next
+                speculative_next = None
+                record_before_action_state(
+                    render_sheet_state(excel_file_path, sheet_state, token_budget=agent_state.summary_token_budget),
+                    sheet_state,
+                )
+                status = "#" * 50 + " Decision (speculative) " + "#" * 50
+                print(status)
+                print(output_action)
+                print('#' * len(status))
+            else:
+                thought, summary, action = action_agent_response(
+                    subtask_inst, excel_file_path, agent_state, add_info, sheet_state=sheet_state,
+                    stream=args.stream, on_action=execute_early if args.stream else None,
+                )
+
+            plan = parse_agent_plan(action)
+            tell_user = next((parsed for parsed in plan or [] if isinstance(parsed, TellUser)), None)
+
+            # Check if agent is asking user for input
+            if tell_user is not None:
+                if len(plan) > 1:
+                    # The actions planned before the question still apply
+                    execute_action(action)
+                message = tell_user.message.strip('"\'')
                 print(f"\n🤖 Agent: {message}")
                 user_response = input("👤 Your response: ").strip()
-                
+            
                 # Queue the user's response as the next instruction
                 if user_response:
                     instruction_queue.insert(0, user_response)
                     print(f"\nContinuing with your instruction: {user_response}\n")
-                    
+                
                     # Record the interaction in agent state
                     agent_state.thought_history.append(thought)
                     agent_state.summary_history.append(summary)
                     agent_state.action_history.append(action)
-                    
+                
                     # Add user's response to completed requirements so agent knows the question was answered
                     if agent_state.completed_requirements:
                         agent_state.completed_requirements += f" User provided clarification: {user_response}."
                     else:
                         agent_state.completed_requirements = f"User clarified their request: {user_response}."
-                    
+                
                     # Clear error flags and reflection to start fresh with new instruction
                     agent_state.error_flag = False
                     agent_state.reflection_thought = ""
-                    
+                
                     prev_subtask_list = None
                     stagnation = 0
                     enqueued_new_instruction = True
@@ -303,72 +615,102 @@ while instruction_queue and not done:
                     done = True
                     break
 
-        # Execute the action on the Excel file
-        try:
-            print(f"📋 Executing action: {action}")
-            success, result = action_executor.parse_and_execute(action)
-            
-            if success:
-                print(f"✅ Action executed successfully: {result}")
-                
-                # Save the file after successful operation (except for Tell User actions)
-                if "Tell User" not in action and "TellUser" not in action:
-                    save_success, save_result = action_executor.save()
-                    if save_success:
-                        print(f"💾 File saved: {save_result}")
-                    else:
-                        print(f"⚠️ Warning: Could not save file: {save_result}")
-                
-                # Show updated sheet summary for verification
-                if "Select" in action:
-                    print("\n" + "="*80)
-                    print(action_executor.get_sheet_summary(10))
-                    print("="*80 + "\n")
-            else:
-                print(f"❌ Action execution failed: {result}")
-                agent_state.error_flag = True
-                
-        except Exception as e:
-            print(f"❌ Error during action execution: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            agent_state.error_flag = True
+            # Execute the action on the Excel file (already done while streaming if it arrived early)
+            executed = executed_early[-1] if executed_early else execute_action(action)
 
-        time.sleep(1)  # Brief pause for output visibility
+            time.sleep(1)  # Brief pause for output visibility
 
-        if "Terminate" in action:
-            print("Terminate action detected. Exiting.")
-            done = True
+            # A failed plan was rolled back, so its Terminate did not happen either
+            if executed and plan_contains(plan, Terminate):
+                if subtask_groups:
+                    print("Terminate action detected. Moving on to the next subtask.")
+                else:
+                    print("Terminate action detected. Exiting.")
+                    done = True
+                break
+
+            if concurrent_calls and (memory_switch or reflection_switch):
+                # Memory, reflection and planning only depend on the executed action; issue them together
+                speculate = args.speculate and reflection_switch and step < args.max_steps - 1
+
+                async def post_action_calls():
+                    speculation = None
+                    if speculate:
+                        # Decide the next action as if the reflection will answer A
+                        assumed_state = assume_accepted(agent_state, thought, summary, action)
+                        speculation = asyncio.ensure_future(timed(action_agent_response_async(
+                            subtask_inst, excel_file_path, assumed_state, add_info,
+                            sheet_state=sheet_state, limiter=llm_limiter, speculative=True,
+                        )))
+                    calls = []
+                    if memory_switch:
+                        calls.append(memory_agent_response_async(agent_state, llm_limiter))
+                    if reflection_switch:
+                        calls.append(reflect_agent_response_async(
+                            subtask_inst, thought, summary, action, excel_file_path, agent_state, add_info,
+                            sheet_state=sheet_state, limiter=llm_limiter,
+                        ))
+                    results = await asyncio.gather(*calls)
+                    calls_done = time.perf_counter()
+                    if reflection_switch:
+                        agent_state.reflection_thought = results[-1]
+
+                    if speculation is None:
+                        return None
+                    if not agent_state.reflection_accepted:
+                        speculation.cancel()
+                        with contextlib.suppress(BaseException):
+                            await speculation
+                        speculation_stats.record_miss()
+                        return None
+                    try:
+                        result, duration, finished = await speculation
+                    except Exception as e:
+                        print(f"⚠️ Speculative action failed, requesting it again: {e}")
+                        speculation_stats.record_error()
+                        return None
+                    speculation_stats.record_hit(duration, max(finished - calls_done, 0.0))
+                    return result
+
+                step_start = time.perf_counter()
+                speculative_next = event_loop.run_until_complete(post_action_calls())
+                print(f"⏱️ Post-action LLM calls took {time.perf_counter() - step_start:.2f}s")
+            else:
+                if memory_switch:
+                    prompt_memory = get_memory_prompt(agent_state.insight)
+                    chat_mem = init_memory_chat()
+                    chat_mem = add_response("user", prompt_memory, chat_mem)
+                    output_memory = inference_chat(
+                        chat_mem, 
+                        vl_model_version, 
+                        API_url, 
+                        token,
+                        provider=model_provider,
+                        temperature=temperature
+                    )
+                    chat_mem = add_response("assistant", output_memory, chat_mem)
+                    status = "#" * 50 + " Memory " + "#" * 50
+                    print(status)
+                    print(output_memory)
+                    print('#' * len(status))
+                    output_memory = (
+                        output_memory.split("### Important content ###")[-1].split("\n\n")[0].strip() + "\n"
+                    )
+                    if "None" not in output_memory and output_memory not in agent_state.memory:
+                        agent_state.memory += output_memory
+
+                if reflection_switch:
+                    agent_state.reflection_thought = reflect_agent_response(
+                        subtask_inst, thought, summary, action, excel_file_path, agent_state, add_info,
+                        sheet_state=sheet_state,
+                    )
+
+            if reflection_switch and not agent_state.reflection_accepted and not args.keep_rejected_steps:
+                revert_step(step_checkpoint)
+
+        if done or enqueued_new_instruction:
             break
 
-        if memory_switch:
-            prompt_memory = get_memory_prompt(agent_state.insight)
-            chat_mem = init_memory_chat()
-            chat_mem = add_response("user", prompt_memory, chat_mem)
-            output_memory = inference_chat(
-                chat_mem, 
-                vl_model_version, 
-                API_url, 
-                token,
-                provider=model_provider,
-                temperature=temperature
-            )
-            chat_mem = add_response("assistant", output_memory, chat_mem)
-            status = "#" * 50 + " Memory " + "#" * 50
-            print(status)
-            print(output_memory)
-            print('#' * len(status))
-            output_memory = (
-                output_memory.split("### Important content ###")[-1].split("\n\n")[0].strip() + "\n"
-            )
-            if "None" not in output_memory and output_memory not in agent_state.memory:
-                agent_state.memory += output_memory
-
-        if reflection_switch:
-            agent_state.reflection_thought = reflect_agent_response(
-                subtask_inst, thought, summary, action, excel_file_path, agent_state, add_info
-            )
-
     if done:
         break
 
@@ -377,4 +719,16 @@ while instruction_queue and not done:
 
     if not instruction_queue:
         print("All subtasks processed. Exiting.")
-        break
\ No newline at end of file
+        break
+
+if args.speculate:
+    print(speculation_stats.summary())
+
+if router is not None:
+    print(router.summary())
+    router.close()
+
+if concurrent_calls:
+    from ExcelAgent.chat import clients
+    event_loop.run_until_complete(clients.client_registry.aclose())
+    event_loop.close()